@@ -0,0 +1,112 @@
+"""
+Benchmark: services.palette vs the previous /color-palette implementation
+=========================================================================
+Extracts palettes from the same images with:
+
+1. the previous route code: resize to 100x100, list(getdata()), 16-level
+   rounding in a list comprehension, Counter.most_common()
+2. services.palette.extract_palette - JPEG draft decode, histogram bins,
+   weighted k-means
+
+Both start from the encoded file bytes, as the route does. Prints time per
+image and the quantization error (mean RGB distance from each pixel of a
+200px thumbnail to its nearest palette color; lower = the palette
+represents the image better). Without --input, synthetic photo-like JPEGs
+are generated.
+
+Run from backend/:
+    python benchmarks/bench_color_palette.py
+    python benchmarks/bench_color_palette.py --input a.jpg b.png --colors 8
+"""
+
+import io
+import sys
+import time
+import argparse
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.palette import extract_palette  # noqa: E402
+
+
+def legacy_palette(content: bytes, num_colors: int):
+    """The /color-palette code before services.palette"""
+    with Image.open(io.BytesIO(content)) as img:
+        img = img.convert("RGB")
+        img = img.resize((100, 100))
+        pixels = list(img.getdata())
+        rounded = [(r//16*16, g//16*16, b//16*16) for r, g, b in pixels]
+        color_counts = Counter(rounded).most_common(num_colors)
+        return [
+            {"rgb": {"r": r, "g": g, "b": b}, "percentage": round(count / len(pixels) * 100, 1)}
+            for (r, g, b), count in color_counts
+        ]
+
+
+def synthetic_image(width: int, height: int, seed: int) -> bytes:
+    """Smooth color regions plus noise, saved as JPEG (like a photo upload)"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    channels = []
+    for _ in range(3):
+        fx, fy, phase = rng.uniform(0.5, 3, 2).tolist() + [rng.uniform(0, 6.28)]
+        channels.append(127 + 100 * np.sin(x / width * fx * 6.28 + phase) * np.cos(y / height * fy * 6.28))
+    array = np.stack(channels, axis=2) + rng.normal(0, 12, (height, width, 3))
+    buffer = io.BytesIO()
+    Image.fromarray(np.clip(array, 0, 255).astype(np.uint8)).save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def quantization_error(content: bytes, colors) -> float:
+    with Image.open(io.BytesIO(content)) as img:
+        img = img.convert("RGB")
+        img.thumbnail((200, 200))
+        pixels = np.asarray(img, dtype=np.float32).reshape(-1, 3)
+    palette = np.array([[c["rgb"]["r"], c["rgb"]["g"], c["rgb"]["b"]] for c in colors], dtype=np.float32)
+    distances = np.sqrt(((pixels[:, None, :] - palette[None]) ** 2).sum(axis=2))
+    return float(distances.min(axis=1).mean())
+
+
+def timed(function, images, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        results = [function(content) for content in images]
+        best = min(best, time.perf_counter() - started)
+    return best / len(images), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", type=Path, nargs="*", help="images to use (default: synthetic JPEGs)")
+    parser.add_argument("--size", default="3000x2000", help="synthetic image size")
+    parser.add_argument("--count", type=int, default=8, help="synthetic images")
+    parser.add_argument("--colors", type=int, default=5, help="palette size")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per implementation (best is kept)")
+    args = parser.parse_args()
+
+    if args.input:
+        images = [path.read_bytes() for path in args.input]
+    else:
+        width, height = (int(v) for v in args.size.split("x"))
+        print(f"Generating {args.count} {width}x{height} JPEGs...")
+        images = [synthetic_image(width, height, seed) for seed in range(args.count)]
+
+    legacy_time, legacy = timed(lambda c: legacy_palette(c, args.colors), images, args.repeat)
+    new_time, new = timed(lambda c: extract_palette(c, args.colors), images, args.repeat)
+    legacy_error = np.mean([quantization_error(c, p) for c, p in zip(images, legacy)])
+    new_error = np.mean([quantization_error(c, p) for c, p in zip(images, new)])
+
+    print(f"{'implementation':<24}{'ms / image':>12}{'quant. error':>14}")
+    print(f"{'previous (Counter)':<24}{legacy_time * 1000:>12.1f}{legacy_error:>14.1f}")
+    print(f"{'services.palette':<24}{new_time * 1000:>12.1f}{new_error:>14.1f}")
+    print(f"speedup: {legacy_time / new_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
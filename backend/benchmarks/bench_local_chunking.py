@@ -0,0 +1,90 @@
+"""
+Benchmark: local chunked encoding vs one libx264 -preset medium run
+===================================================================
+Encodes the same clip twice with the /api/video/compress settings
+(libx264 CRF 20, preset medium, AAC 192k):
+
+1. a single FFmpeg invocation (what compress did before)
+2. services.chunked - keyframe-aligned segments encoded in parallel
+
+and prints wall-clock time, speedup and output sizes. Needs ffmpeg and
+ffprobe on PATH. Without --input a synthetic 1080p clip is generated.
+
+Run from backend/:
+    python benchmarks/bench_local_chunking.py --duration 120
+    python benchmarks/bench_local_chunking.py --input movie.mp4 --workers 8
+"""
+
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.chunked import transcode_chunked_async, local_chunk_workers  # noqa: E402
+from services.process_runner import run_process  # noqa: E402
+
+VIDEO_ARGS = ["-c:v", "libx264", "-crf", "20", "-preset", "medium"]
+AUDIO_ARGS = ["-c:a", "aac", "-b:a", "192k"]
+
+
+async def make_clip(path: Path, duration: int):
+    """Synthetic 1080p30 clip with 2s GOP (like typical phone/camera uploads)"""
+    result = await run_process([
+        "ffmpeg", "-y",
+        "-f", "lavfi", "-i", f"testsrc2=size=1920x1080:rate=30:duration={duration}",
+        "-f", "lavfi", "-i", f"sine=frequency=440:duration={duration}",
+        "-c:v", "libx264", "-preset", "ultrafast", "-g", "60",
+        "-c:a", "aac", "-shortest", str(path),
+    ])
+    if not result.ok:
+        raise SystemExit(f"Could not generate test clip: {result.error}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", type=Path, help="video to encode (default: synthetic clip)")
+    parser.add_argument("--duration", type=int, default=120, help="synthetic clip length in seconds")
+    parser.add_argument("--workers", type=int, default=0, help="parallel encoders (default: cores)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="magetool-bench-") as tmp:
+        tmp = Path(tmp)
+        source = args.input
+        if source is None:
+            source = tmp / "source.mp4"
+            print(f"Generating {args.duration}s 1080p test clip...")
+            await make_clip(source, args.duration)
+
+        single_out = tmp / "single.mp4"
+        started = time.perf_counter()
+        result = await run_process(
+            ["ffmpeg", "-y", "-i", str(source)] + VIDEO_ARGS + AUDIO_ARGS + [str(single_out)]
+        )
+        single_time = time.perf_counter() - started
+        if not result.ok:
+            raise SystemExit(f"Single encode failed: {result.error}")
+
+        workers = args.workers or local_chunk_workers()
+        chunked_out = tmp / "chunked.mp4"
+        started = time.perf_counter()
+        outcome = await transcode_chunked_async(
+            source, chunked_out, VIDEO_ARGS, AUDIO_ARGS, workers=workers, timeout=3600
+        )
+        chunked_time = time.perf_counter() - started
+        if outcome is None:
+            raise SystemExit("Input not chunked (too short, no keyframes, or a single worker)")
+        if not outcome[0]:
+            raise SystemExit(f"Chunked encode failed: {outcome[1]}")
+
+        print(f"{'mode':<28}{'wall (s)':>10}{'size (MB)':>12}")
+        print(f"{'single -preset medium':<28}{single_time:>10.1f}{single_out.stat().st_size / 1e6:>12.2f}")
+        print(f"{f'chunked x{workers}':<28}{chunked_time:>10.1f}{chunked_out.stat().st_size / 1e6:>12.2f}")
+        print(f"speedup: {single_time / chunked_time:.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -46,6 +46,7 @@ class Settings(BaseSettings):
     MAX_VIDEO_SIZE_MB: int = 500
     MAX_AUDIO_SIZE_MB: int = 100
     MAX_DOCUMENT_SIZE_MB: int = 50
+    MAX_BATCH_UPLOAD_MB: int = 200  # all files of an in-memory batch request together
     
     # Timeouts (in seconds)
     REQUEST_TIMEOUT: int = 30
@@ -53,6 +54,68 @@ class Settings(BaseSettings):
     CONVERSION_TIMEOUT: int = 600
     DOWNLOAD_TIMEOUT: int = 60
     
+    # Task Store - "memory" (single worker), "sqlite" (shared by all workers on a host), "redis"
+    TASK_STORE_BACKEND: str = "memory"
+    TASK_STORE_PATH: Path | None = None  # sqlite file, defaults to TEMP_DIR/state/tasks.db
+    TASK_STORE_REDIS_URL: str = "redis://localhost:6379/0"
+    TASK_PROGRESS_FLUSH_MS: int = 500  # coalescing window for progress-only updates
+    
+    # Job Executor - process pool per task category
+    JOB_POOL_SIZES: dict[str, int] = {"image": 2, "video": 2, "audio": 1, "document": 1}
+    JOB_QUEUE_SIZE: int = 8  # jobs allowed to wait per category beyond running ones
+    JOB_RETRY_AFTER_SECONDS: int = 10  # minimum Retry-After hint when a queue is full
+    
+    # Result cache - identical input + task_type + params reuse the previous output
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_MAX_MB: int = 2048  # LRU eviction above this size (TEMP_DIR/cache)
+    
+    # External processes (FFmpeg, ffprobe, LibreOffice, Ghostscript)
+    PROCESS_CONCURRENCY: int = 0  # max simultaneous processes, 0 = CPU cores
+    PROCESS_KILL_GRACE_SECONDS: float = 5.0  # SIGTERM -> SIGKILL delay on timeout/cancel
+    PROCESS_STDERR_LINES: int = 200  # stderr lines kept for error messages
+    PROBE_CACHE_SIZE: int = 256  # ffprobe results kept per process (LRU by path+mtime+size)
+    
+    # Local chunked encoding - long videos are split at keyframes and the
+    # segments encoded in parallel on this node, then concat-merged
+    LOCAL_CHUNKING_ENABLED: bool = True
+    LOCAL_CHUNK_MIN_SECONDS: float = 20.0  # shortest segment worth its own encoder
+    LOCAL_CHUNK_WORKERS: int = 0  # parallel segment encoders, 0 = process slots
+    
+    # Encoder calibration (services/encoder_profile.py) - libx264 preset and
+    # -threads picked per node from a one-off benchmark run after startup
+    ENCODER_CALIBRATION_ENABLED: bool = True
+    ENCODER_CALIBRATION_DELAY_SECONDS: int = 60  # wait after startup before benchmarking
+    ENCODER_TARGET_SPEED: float = 1.0  # x realtime aimed for, at the input's resolution and fps
+    ENCODER_MAX_PRESET: str = "medium"  # slowest preset that may be picked
+    ENCODER_PROFILE_PATH: Path | None = None  # defaults to ~/.cache/magetool/encoder_profile.json (outside TEMP_DIR)
+    
+    # AI upscaling (services/upscaler.py) - Real-ESRGAN in overlapping tiles
+    MODEL_DIR: Path | None = None  # downloaded weights, defaults to TEMP_DIR/models
+    UPSCALE_TILE_SIZE: int = 0  # input pixels per tile side, 0 = from available memory
+    UPSCALE_THREADS: int = 0  # tiles run in parallel, 0 = CPU cores (at most 4)
+    UPSCALE_MEMORY_FRACTION: float = 0.5  # share of available RAM the tiles may use
+    
+    # Model pool (services/model_pool.py) - ML models shared per process
+    MODEL_PRELOAD: list[str] = []  # loaded at startup: rembg, easyocr, realesrgan_x2, realesrgan_x4
+    MODEL_MIN_FREE_MB: int = 1024  # below this much available RAM idle models are evicted
+    MODEL_IDLE_SECONDS: int = 300  # unused this long before a model may be evicted
+    MODEL_SWEEP_SECONDS: int = 30  # memory pressure check interval
+    REMBG_MODEL: str = "u2net"
+    OCR_LANGUAGES: list[str] = ["en"]
+    OCR_BATCH_SIZE: int = 4  # pages per recognition call (services/ocr_batch.py)
+    
+    # Distributed cluster scheduling (services/chunk_scheduler.py)
+    CLUSTER_CHUNKS_PER_WORKER: int = 4  # chunks per worker while there is no throughput history
+    CLUSTER_CHUNK_TARGET_SECONDS: float = 30.0  # wall time per chunk aimed for from throughput history
+    CLUSTER_MAX_CHUNKS: int = 64
+    CLUSTER_MIN_CHUNK_SECONDS: float = 4.0
+    CLUSTER_MAX_ATTEMPTS: int = 3  # per chunk, across workers
+    CLUSTER_WORKER_MAX_FAILURES: int = 2  # consecutive failures before a worker is dropped from the job
+    CLUSTER_SPECULATE_FACTOR: float = 2.0  # re-run a chunk elsewhere after this x its expected time
+    CLUSTER_HEALTH_TTL_SECONDS: float = 10.0  # how long worker load reports are reused
+    CLUSTER_MIN_WORKER_DISK_MB: float = 1024.0  # workers with less free disk get no chunks
+    CLUSTER_MAX_SLOTS_PER_WORKER: int = 2  # chunks in flight per worker at most
+    
     # Rate Limiting
     RATE_LIMIT_REQUESTS: int = 100
     RATE_LIMIT_WINDOW: int = 3600  # 1 hour
@@ -69,6 +132,7 @@ class Settings(BaseSettings):
     AI_SERVICE_URL: str | None = None
     AI_SERVICE_KEY: str | None = None
     GOOGLE_VISION_API_KEY: str | None = None  # For reverse image/video search
+    AI_FINDER_SAMPLE_FRAMES: int = 1  # Keyframes sent per lookup (each one is a billed Vision image)
     
     # Keep-Alive Bot (for Northflank unlimited hours)
     ENABLE_KEEP_ALIVE: bool = False
@@ -20,11 +20,12 @@ from starlette.responses import Response
 from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from slowapi.middleware import SlowAPIMiddleware
+from slowapi.util import get_remote_address
 
 from config import get_settings, Settings
 
 # Import routers
-from routes import health, image, image_editor, video, audio, document, core, tools, distributed
+from routes import health, image, image_editor, video, audio, document, core, tools, distributed, events
 
 # Configure logging
 settings = get_settings()
@@ -71,6 +72,13 @@ async def cleanup_old_files():
                     f"Cleanup complete: deleted {deleted_count} files, "
                     f"freed {freed_mb:.2f} MB"
                 )
+            
+            # Drop task records whose files are gone
+            from services.tasks import task_store, prune_cancel_markers
+            pruned: int = task_store.prune(expiry_seconds)
+            if pruned > 0:
+                logger.info(f"Cleanup: pruned {pruned} expired tasks")
+            prune_cancel_markers(expiry_seconds)
                 
         except Exception as e:
             logger.error(f"Cleanup task error: {e}")
@@ -108,6 +116,7 @@ async def lifespan(app: FastAPI):
     logger.info(f"Environment: {settings.ENVIRONMENT}")
     logger.info(f"Debug mode: {settings.DEBUG}")
     logger.info(f"Temp directory: {settings.TEMP_DIR.absolute()}")
+    logger.info(f"Task store: {settings.TASK_STORE_BACKEND}")
     
     # Ensure temp directory exists
     settings.TEMP_DIR.mkdir(parents=True, exist_ok=True)
@@ -118,6 +127,22 @@ async def lifespan(app: FastAPI):
     # Start Keep-Alive Bot (if enabled)
     keep_alive_task = asyncio.create_task(keep_alive_ping())
     
+    # Benchmark libx264 presets once per node (encoder profile), after startup at low priority
+    from services.encoder_profile import calibrate_after_startup
+    calibration_task = asyncio.create_task(calibrate_after_startup())
+    
+    # Preload configured ML models: image pool workers + models routes use directly
+    preload_task = None
+    if settings.MODEL_PRELOAD:
+        from services.executor import get_executor
+        from services.model_pool import get_model_pool, API_PROCESS
+        get_executor().warm("image")
+        preload_task = asyncio.create_task(asyncio.to_thread(get_model_pool().preload, API_PROCESS))
+    
+    # Push task updates to SSE / WebSocket subscribers
+    from services.events import get_event_hub
+    get_event_hub().attach(asyncio.get_running_loop())
+    
     # Initialize Sentry if configured
     if settings.SENTRY_DSN:
         try:
@@ -138,8 +163,20 @@ async def lifespan(app: FastAPI):
     yield
     
     # Shutdown
+    from services.executor import get_executor
+    from services.tasks import task_store
+    from services.events import get_event_hub
+    from services.cluster import close_transport
+    get_executor().shutdown()
+    get_event_hub().detach()
+    await close_transport()
+    task_store.close()
+    
     cleanup_task.cancel()
     keep_alive_task.cancel()
+    calibration_task.cancel()
+    if preload_task is not None:
+        preload_task.cancel()
     try:
         await cleanup_task
         await keep_alive_task
@@ -245,7 +282,14 @@ async def limit_concurrent_tasks(request: Request, call_next):
 # SECURITY: SECRET HEADER & WAF
 # ==========================================
 import re
-import jwt
+from security import credentials_valid
+
+# Paths that skip the credential check. Browser downloads (<a href>) and
+# EventSource streams cannot send custom headers, so these rely on the task
+# id itself: 128 random bits, only ever given to the client that uploaded.
+# /api/events/ exposes nothing /api/status doesn't to a holder of the id.
+# (/api/ws never reaches this middleware - it checks its own handshake.)
+HEADERLESS_PATHS = ("/api/download/", "/api/events/")
 
 
 @app.middleware("http")
@@ -260,31 +304,18 @@ async def security_guard_middleware(request: Request, call_next):
         return JSONResponse(status_code=405, content={"error": "Method Not Allowed"})
 
     # 1. Secret Header OR JWT Token Check
-    # Browser downloads (<a href>) cannot send custom headers, so we rely on UUID security there.
     if request.url.path.startswith("/api/") and request.method != "OPTIONS":
-        if not request.url.path.startswith("/api/download/"):
-            # A) Check Legacy Secret Header (Admin / Internal / Backward Compatibility)
-            client_secret = request.headers.get("X-Magetool-Secret")
-            is_valid_secret = client_secret == settings.API_SECRET
-
-            # B) Check JWT Token (User / Frontend)
-            is_valid_token = False
+        if not request.url.path.startswith(HEADERLESS_PATHS):
+            token = None
             auth_header = request.headers.get("Authorization")
             if auth_header and auth_header.startswith("Bearer "):
                 token = auth_header.split(" ")[1]
-                try:
-                    # Verify signature using the SAME secret
-                    jwt.decode(token, settings.API_SECRET, algorithms=["HS256"])
-                    is_valid_token = True
-                except jwt.ExpiredSignatureError:
-                    logger.warning(f"⛔ Blocked expired token from {get_remote_address(request)}")
-                except jwt.InvalidTokenError:
-                    logger.warning(f"⛔ Blocked invalid token from {get_remote_address(request)}")
 
             # Reject if NEITHER is valid
-            if not is_valid_secret and not is_valid_token:
+            client = get_remote_address(request)
+            if not credentials_valid(request.headers.get("X-Magetool-Secret"), token, client):
                  # Log the attempt
-                 logger.warning(f"⛔ Blocked unauthorized access to {request.url.path} from {get_remote_address(request)}")
+                 logger.warning(f"⛔ Blocked unauthorized access to {request.url.path} from {client}")
                  return JSONResponse(status_code=403, content={"error": "Unauthorized: Missing or invalid security token"})
 
     # 2. APPLICATION WAF (Web Application Firewall)
@@ -396,6 +427,7 @@ async def http_exception_handler(request: Request, exc: HTTPException):
             "status_code": exc.status_code,
             "timestamp": datetime.utcnow().isoformat() + "Z",
         },
+        headers=getattr(exc, "headers", None),  # e.g. Retry-After on 429
     )
 
 
@@ -407,6 +439,7 @@ async def http_exception_handler(request: Request, exc: HTTPException):
 # Include routers
 app.include_router(health.router, tags=["Health"])
 app.include_router(core.router, prefix="/api", tags=["Core"])
+app.include_router(events.router, prefix="/api", tags=["Events"])
 app.include_router(image.router, prefix="/api/image", tags=["Image"])
 app.include_router(image_editor.router) # Prefix is defined in the router itself
 app.include_router(video.router, prefix="/api/video", tags=["Video"])
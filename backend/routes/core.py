@@ -2,14 +2,19 @@
 Core API routes - Task status and file downloads
 """
 
+import asyncio
 import logging
 from pathlib import Path
-from typing import Callable, Dict, Any
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from typing import Callable, Dict, Any, Optional
+from fastapi import APIRouter, HTTPException
 
 from fastapi.responses import FileResponse
 
-from services.tasks import get_task, format_task_response, TaskStatus, update_task
+from services.tasks import (
+    get_task, format_task_response, TaskStatus, update_task, cancel_task, get_output_path
+)
+from services.result_cache import get_result_cache, cache_key, hash_file, rename_output
+from services.executor import get_executor, QueueFullError
 from config import get_settings, get_mime_type
 
 router = APIRouter()
@@ -21,11 +26,58 @@ logger = logging.getLogger("magetool.core")
 # Processors are registered when routes import this module
 PROCESSORS: Dict[str, Callable] = {}
 
+# Executor pool each task_type runs in (image / video / audio / document)
+PROCESSOR_CATEGORIES: Dict[str, str] = {}
 
-def register_processor(task_type: str, processor: Callable):
+# Default category by the route module that registers the processor
+MODULE_CATEGORIES = {
+    "routes.image": "image",
+    "routes.video": "video",
+    "routes.distributed": "video",
+    "routes.audio": "audio",
+    "routes.document": "document",
+}
+
+
+def register_processor(task_type: str, processor: Callable, category: Optional[str] = None):
     """Register a processing function for a task type"""
     PROCESSORS[task_type] = processor
-    logger.debug(f"Registered processor: {task_type}")
+    PROCESSOR_CATEGORIES[task_type] = category or MODULE_CATEGORIES.get(processor.__module__, "document")
+    logger.debug(f"Registered processor: {task_type} ({PROCESSOR_CATEGORIES[task_type]})")
+
+
+def _result_cache_key(task: Dict[str, Any], input_path: Path, task_type: str, params: Dict[str, Any]) -> str:
+    # Uploads are hashed during ingest; only hash here for inputs that bypassed it
+    digest = (task.get("input_info") or {}).get("sha256") or hash_file(input_path)
+    return cache_key(digest, task_type, params)
+
+
+def _complete_from_cache(task_id: str, key: str, original_filename: str) -> bool:
+    """Finish a task from the result cache. Returns False on a miss."""
+    cache = get_result_cache()
+    meta = cache.get(key, settings.TEMP_DIR / f"{task_id}_cached.tmp")
+    if meta is None:
+        return False
+    
+    # Give the linked file the task's usual output name
+    output_path = get_output_path(task_id, meta.get("extension", ""))
+    (settings.TEMP_DIR / f"{task_id}_cached.tmp").replace(output_path)
+    
+    output_filename = rename_output(
+        meta.get("output_filename") or output_path.name,
+        meta.get("original_filename") or "",
+        original_filename,
+    )
+    update_task(
+        task_id,
+        status=TaskStatus.COMPLETE,
+        progress_percent=100,
+        output_filename=output_filename,
+        output_path=output_path,
+        file_size=output_path.stat().st_size,
+        metrics={"cache_hit": True},
+    )
+    return True
 
 
 @router.get("/status/{task_id}")
@@ -40,7 +92,7 @@ async def get_task_status(task_id: str):
 
 
 @router.post("/start/{task_id}")
-async def start_processing(task_id: str, background_tasks: BackgroundTasks):
+async def start_processing(task_id: str):
     """Start processing for an uploaded task"""
     task = get_task(task_id)
     
@@ -51,6 +103,8 @@ async def start_processing(task_id: str, background_tasks: BackgroundTasks):
     if task["status"] != TaskStatus.UPLOADED:
         if task["status"] == TaskStatus.PROCESSING:
             return {"task_id": task_id, "status": "already_processing", "message": "Task is already being processed"}
+        elif task["status"] == TaskStatus.QUEUED:
+            return {"task_id": task_id, "status": "already_queued", "message": "Task is already waiting in the queue"}
         elif task["status"] == TaskStatus.COMPLETE:
             return {"task_id": task_id, "status": "complete", "message": "Task already completed"}
         else:
@@ -83,11 +137,52 @@ async def start_processing(task_id: str, background_tasks: BackgroundTasks):
     params = task.get("params", {})
     original_filename = task.get("original_filename", "file")
     
-    # Start processing in background
-    logger.info(f"Starting processing: {task_id} ({task_type})")
-    background_tasks.add_task(processor, task_id, input_path, original_filename, **params)
+    # Same input + task_type + params as an earlier task: reuse its output
+    key = None
+    if settings.RESULT_CACHE_ENABLED:
+        try:
+            key = await asyncio.to_thread(_result_cache_key, task, input_path, task_type, params)
+        except OSError as e:
+            logger.warning(f"Result cache key failed for {task_id}: {e}")
+        if key and await asyncio.to_thread(_complete_from_cache, task_id, key, original_filename):
+            logger.info(f"Result cache hit: {task_id} ({task_type})")
+            return {"task_id": task_id, "status": "complete", "message": "Result served from cache"}
+    
+    # Hand off to the job executor (separate process pool per category)
+    category = PROCESSOR_CATEGORIES.get(task_type, "document")
+    try:
+        get_executor().submit(
+            category, task_type, processor, task_id, input_path, original_filename, params,
+            cache_key=key,
+        )
+    except QueueFullError as e:
+        logger.warning(f"Rejected {task_id}: {category} queue full (retry in {e.retry_after}s)")
+        raise HTTPException(
+            status_code=429,
+            detail="Server is busy processing other files. Please retry shortly.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    
+    logger.info(f"Queued processing: {task_id} ({task_type}) on {category} pool")
+    
+    return {"task_id": task_id, "status": "queued", "message": "Processing queued"}
+
+
+@router.post("/cancel/{task_id}")
+async def cancel_processing(task_id: str):
+    """Cancel a queued or running task (running FFmpeg etc. is killed)"""
+    task = get_task(task_id)
+    
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    if task["status"] in (TaskStatus.COMPLETE, TaskStatus.FAILED, TaskStatus.CANCELLED):
+        return {"task_id": task_id, "status": task["status"], "message": "Task already finished"}
+    
+    cancel_task(task_id)
+    logger.info(f"Cancelled task: {task_id}")
     
-    return {"task_id": task_id, "status": "processing", "message": "Processing started"}
+    return {"task_id": task_id, "status": "cancelled", "message": "Task cancelled"}
 
 
 @router.get("/download/{task_id}")
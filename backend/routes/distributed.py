@@ -5,8 +5,11 @@ These routes use the cluster orchestrator to process videos
 across multiple HF Space workers for faster processing.
 
 Only enable these routes when workers are deployed and healthy.
+If no worker answers its health check, the job runs on this node
+instead (keyframe-aligned chunks across the local cores).
 """
 
+import asyncio
 import logging
 from pathlib import Path
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException, BackgroundTasks
@@ -14,33 +17,23 @@ from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Background
 from services.tasks import (
     create_task, update_task, get_input_path, get_output_path, TaskStatus
 )
-from services.cluster import get_orchestrator, is_cluster_available
+from services.cluster import get_orchestrator, is_cluster_available, close_transport
 from config import get_settings
 from routes.core import register_processor
+from routes.video import (
+    process_video_compress, process_video_convert, process_video_speed, process_video_rotate,
+    process_video_to_gif,
+)
+from services.ingest import save_upload_file
+from services.operation_spec import (
+    OperationSpec, speed_spec, rotate_spec, gif_spec, ROTATION_FILTERS,
+)
 
 router = APIRouter()
 settings = get_settings()
 logger = logging.getLogger("magetool.distributed")
 
 
-# ==========================================
-# HELPER: Async file save
-# ==========================================
-import aiofiles
-
-async def save_upload_file(upload_file: UploadFile, destination: Path) -> int:
-    """Save uploaded file using async streaming"""
-    try:
-        total_size = 0
-        async with aiofiles.open(destination, "wb") as f:
-            while chunk := await upload_file.read(1024 * 1024):
-                await f.write(chunk)
-                total_size += len(chunk)
-        return total_size
-    finally:
-        await upload_file.close()
-
-
 # ==========================================
 # CLUSTER STATUS ENDPOINT
 # ==========================================
@@ -60,16 +53,17 @@ async def cluster_status():
         }
     
     try:
-        health = await orchestrator.check_workers_health()
-        healthy_count = sum(1 for v in health.values() if v)
+        loads = await orchestrator.get_worker_loads(refresh=True)
+        healthy_count = sum(1 for load in loads.values() if load.healthy)
         
         return {
             "available": healthy_count > 0,
-            "total_workers": len(health),
+            "total_workers": len(loads),
             "healthy_workers": healthy_count,
             "workers": [
-                {"url": url, "healthy": status}
-                for url, status in health.items()
+                {**load.to_dict(), "load_score": round(load.score, 2)} if load.healthy
+                else {"url": url, "healthy": False}
+                for url, load in loads.items()
             ]
         }
     except Exception as e:
@@ -99,12 +93,10 @@ async def process_distributed_compress(
         # Check cluster availability
         healthy_workers = await orchestrator.get_healthy_workers()
         if not healthy_workers:
-            # Fallback to single-node processing
+            # Fallback to single-node processing (chunked across local cores)
             logger.warning("No healthy workers, falling back to local processing")
-            update_task(
-                task_id,
-                status=TaskStatus.FAILED,
-                error_message="Cluster unavailable, please use standard compression"
+            await asyncio.to_thread(
+                process_video_compress, task_id, input_path, original_filename, quality=quality
             )
             return
         
@@ -180,7 +172,7 @@ async def compress_video_distributed(
     # Save uploaded file
     input_ext = Path(file.filename).suffix.lstrip(".") or "mp4"
     input_path = get_input_path(task_id, input_ext)
-    await save_upload_file(file, input_path)
+    await save_upload_file(file, input_path, "video", task_id=task_id, validate=False)
     
     # Update task status
     update_task(
@@ -215,10 +207,9 @@ async def process_distributed_convert(
         
         healthy_workers = await orchestrator.get_healthy_workers()
         if not healthy_workers:
-            update_task(
-                task_id,
-                status=TaskStatus.FAILED,
-                error_message="Cluster unavailable"
+            logger.warning("No healthy workers, falling back to local processing")
+            await asyncio.to_thread(
+                process_video_convert, task_id, input_path, original_filename, output_format=output_format
             )
             return
         
@@ -279,7 +270,7 @@ async def convert_video_distributed(
     
     input_ext = Path(file.filename).suffix.lstrip(".") or "mp4"
     input_path = get_input_path(task_id, input_ext)
-    await save_upload_file(file, input_path)
+    await save_upload_file(file, input_path, "video", task_id=task_id, validate=False)
     
     update_task(
         task_id,
@@ -295,6 +286,164 @@ async def convert_video_distributed(
     }
 
 
+# ==========================================
+# DISTRIBUTED SPEC OPERATIONS
+# ==========================================
+# Single-node processors (routes/video.py), used when an operation can't be
+# chunked (services.operation_spec rules) or no worker is healthy. mute and
+# add-music only stream-copy the video, so they have no distributed variant.
+LOCAL_PROCESSORS = {
+    "speed": process_video_speed,
+    "rotate": process_video_rotate,
+    "to-gif": process_video_to_gif,
+}
+
+
+def build_operation_spec(operation: str, input_path: Path, params: dict) -> OperationSpec:
+    """The spec of a video.py operation for the given task params"""
+    ext = input_path.suffix.lstrip(".")
+    if operation == "speed":
+        return speed_spec(params.get("speed_factor", 2.0), params.get("preserve_audio", True), ext)
+    if operation == "rotate":
+        return rotate_spec(params.get("rotation", "90"), ext)
+    if operation == "to-gif":
+        return gif_spec(params.get("fps", 15), params.get("width") or 640)
+    raise ValueError(f"Unknown operation: {operation}")
+
+
+def _spec_output_filename(operation: str, original_filename: str, spec: OperationSpec, params: dict) -> str:
+    """Same names as the single-node processors"""
+    from services.tasks import get_output_filename
+    
+    suffixes = {
+        "speed": f"speed_{params.get('speed_factor', 2.0)}x",
+        "rotate": "rotated",
+    }
+    if operation == "to-gif":
+        return f"{Path(original_filename).stem}.gif"
+    return get_output_filename(original_filename, suffix=suffixes[operation], extension=spec.output_format)
+
+
+async def process_distributed_operation(
+    task_id: str,
+    input_path: Path,
+    original_filename: str,
+    operation: str,
+    **params
+):
+    """Background task: a video.py operation with its video chain chunked across workers"""
+    try:
+        update_task(task_id, status=TaskStatus.PROCESSING, progress_percent=10)
+        
+        spec = build_operation_spec(operation, input_path, params)
+        orchestrator = get_orchestrator()
+        
+        blocker = spec.chunk_blocker()
+        healthy_workers = [] if blocker else await orchestrator.get_healthy_workers()
+        if not healthy_workers:
+            logger.warning(f"Running {operation} locally: {blocker or 'no healthy workers'}")
+            await asyncio.to_thread(
+                LOCAL_PROCESSORS[operation], task_id, input_path, original_filename, **params
+            )
+            return
+        
+        update_task(task_id, progress_percent=20)
+        
+        result = await orchestrator.process_distributed(video_path=input_path, task_id=task_id, spec=spec)
+        
+        if not result.get("success"):
+            raise Exception(result.get("error", "Distributed processing failed"))
+        
+        update_task(task_id, progress_percent=90)
+        
+        output_path = result["output_path"]
+        update_task(
+            task_id,
+            status=TaskStatus.COMPLETE,
+            progress_percent=100,
+            output_filename=_spec_output_filename(operation, original_filename, spec, params),
+            output_path=output_path,
+            file_size=output_path.stat().st_size,
+        )
+        
+        logger.info(f"Distributed {operation} complete: {task_id} using {result.get('workers_used', 0)} workers")
+        
+    except Exception as e:
+        logger.error(f"Distributed {operation} failed: {task_id} - {e}")
+        update_task(task_id, status=TaskStatus.FAILED, error_message=str(e))
+
+
+async def _queue_operation(file: UploadFile, operation: str, params: dict) -> dict:
+    """Save the upload and park the task until /api/start/{task_id}"""
+    orchestrator = get_orchestrator()
+    if not orchestrator.is_available():
+        raise HTTPException(
+            status_code=503,
+            detail=f"Distributed processing cluster not configured. Use /api/video/{operation} instead."
+        )
+    
+    task_id = create_task(file.filename, f"distributed_{operation.replace('-', '_')}")
+    
+    input_ext = Path(file.filename).suffix.lstrip(".") or "mp4"
+    input_path = get_input_path(task_id, input_ext)
+    await save_upload_file(file, input_path, "video", task_id=task_id, validate=False)
+    
+    update_task(
+        task_id,
+        status=TaskStatus.UPLOADED,
+        progress_percent=100,
+        input_path=input_path,
+        params={"operation": operation, **params}
+    )
+    
+    return {
+        "task_id": task_id,
+        "message": "File uploaded, distributed processing queued",
+        "workers_available": len(orchestrator.worker_urls)
+    }
+
+
+@router.post("/speed-distributed")
+async def speed_video_distributed(
+    file: UploadFile = File(...),
+    speed_factor: float = Form(default=2.0),
+    preserve_audio: bool = Form(default=True),
+):
+    """Change playback speed, setpts chunked across workers (audio tempo done once here)"""
+    if speed_factor < 0.25 or speed_factor > 4.0:
+        raise HTTPException(status_code=400, detail="Speed factor must be between 0.25 and 4.0")
+    return await _queue_operation(file, "speed", {"speed_factor": speed_factor, "preserve_audio": preserve_audio})
+
+
+@router.post("/rotate-distributed")
+async def rotate_video_distributed(
+    file: UploadFile = File(...),
+    rotation: str = Form(default="90"),
+):
+    """Rotate or flip video, chunked across workers"""
+    if rotation not in ROTATION_FILTERS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid rotation. Must be one of: {', '.join(ROTATION_FILTERS)}"
+        )
+    return await _queue_operation(file, "rotate", {"rotation": rotation})
+
+
+@router.post("/to-gif-distributed")
+async def video_to_gif_distributed(
+    file: UploadFile = File(...),
+    fps: int = Form(default=15),
+    width: int = Form(default=None),
+):
+    """
+    Convert video to GIF: workers decode, resample and scale the chunks,
+    the palette passes run once over the joined (already small) frames
+    """
+    if fps < 5 or fps > 30:
+        raise HTTPException(status_code=400, detail="FPS must be between 5 and 30")
+    return await _queue_operation(file, "to-gif", {"fps": fps, "width": width})
+
+
 # ==========================================
 # REGISTER PROCESSORS
 # ==========================================
@@ -302,16 +451,20 @@ async def convert_video_distributed(
 
 def _wrap_async_processor(async_func):
     """Wrap async processor for background task execution"""
-    import asyncio
     def wrapper(*args, **kwargs):
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
         try:
             return loop.run_until_complete(async_func(*args, **kwargs))
         finally:
+            # Pooled worker connections belong to this loop
+            loop.run_until_complete(close_transport())
             loop.close()
     return wrapper
 
 register_processor("distributed_compress", _wrap_async_processor(process_distributed_compress))
 register_processor("distributed_convert", _wrap_async_processor(process_distributed_convert))
-
+for _operation in LOCAL_PROCESSORS:
+    register_processor(
+        f"distributed_{_operation.replace('-', '_')}", _wrap_async_processor(process_distributed_operation)
+    )
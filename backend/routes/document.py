@@ -18,46 +18,15 @@ from services.tasks import (
 )
 from config import get_settings
 from routes.core import register_processor
+from services.ingest import save_upload_file
+from services.process_runner import run_process_sync
+from services.zip_stream import StoredZip
 
 router = APIRouter()
 settings = get_settings()
 logger = logging.getLogger("magetool.document")
 
 
-import aiofiles
-
-# Chunk size for async file streaming (1MB chunks for optimal speed)
-UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB
-
-async def save_upload_file(upload_file: UploadFile, destination: Path):
-    """
-    Save uploaded file to disk using async chunked streaming.
-    
-    Benefits:
-    - Non-blocking: Won't freeze event loop during large uploads
-    - Memory efficient: Only 1MB in memory at a time
-    - Faster: 3-5x improvement for large files
-    """
-    try:
-        total_size = 0
-        async with aiofiles.open(destination, "wb") as f:
-            while chunk := await upload_file.read(UPLOAD_CHUNK_SIZE):
-                await f.write(chunk)
-                total_size += len(chunk)
-        return total_size
-    finally:
-        await upload_file.close()
-        
-        # GAREEB SHIELD: Validate file content (Magic Bytes)
-        try:
-            from services.validation import validate_file_content
-            validate_file_content(destination)
-        except Exception as e:
-             if destination.exists():
-                 destination.unlink()
-             raise e
-
-
 def process_document_convert(task_id: str, input_path: Path, original_filename: str, **params):
     """Background task: Convert document format"""
     output_format = params.get("output_format", "txt")
@@ -74,7 +43,6 @@ def process_document_convert(task_id: str, input_path: Path, original_filename:
         # EXCEL/PPT TO PDF (LibreOffice)
         # ==========================================
         if input_ext in ["xlsx", "xls", "pptx", "ppt", "odp", "ods"] and output_format == "pdf":
-            import subprocess
             import shutil
             
             # Find LibreOffice executable
@@ -95,7 +63,7 @@ def process_document_convert(task_id: str, input_path: Path, original_filename:
             env = os.environ.copy()
             env["HOME"] = "/tmp"  # Fix for Docker/non-root user
             
-            result = subprocess.run([
+            result = run_process_sync([
                 str(libreoffice_cmd),
                 "--headless",
                 "--invisible",
@@ -105,7 +73,7 @@ def process_document_convert(task_id: str, input_path: Path, original_filename:
                 "--convert-to", "pdf",
                 "--outdir", str(temp_output_dir),
                 str(input_path)
-            ], capture_output=True, text=True, timeout=180, env=env)
+            ], timeout=180, env=env, task_id=task_id)
             
             expected_output = temp_output_dir / (input_path.stem + ".pdf")
             
@@ -113,7 +81,7 @@ def process_document_convert(task_id: str, input_path: Path, original_filename:
                 shutil.move(str(expected_output), str(output_path))
                 logger.info(f"LibreOffice Excel/PPT conversion successful: {task_id}")
             else:
-                error_msg = result.stderr or result.stdout or "Unknown error"
+                error_msg = result.error or result.text or "Unknown error"
                 logger.error(f"LibreOffice output not found. stderr: {error_msg}")
                 raise Exception(f"Excel/PPT to PDF conversion failed: {error_msg}")
 
@@ -175,7 +143,6 @@ def process_document_convert(task_id: str, input_path: Path, original_filename:
         elif input_ext in ["docx", "doc", "odt", "rtf"]:
             if output_format == "pdf":
                 # Use LibreOffice ONLY for pixel-perfect conversion
-                import subprocess
                 import shutil
                 
                 # Find LibreOffice executable
@@ -197,7 +164,7 @@ def process_document_convert(task_id: str, input_path: Path, original_filename:
                 env = os.environ.copy()
                 env["HOME"] = "/tmp"  # Fix for Docker/non-root user
                 
-                result = subprocess.run([
+                result = run_process_sync([
                     str(libreoffice_cmd),
                     "--headless",
                     "--invisible",
@@ -207,7 +174,7 @@ def process_document_convert(task_id: str, input_path: Path, original_filename:
                     "--convert-to", "pdf",
                     "--outdir", str(temp_output_dir),
                     str(input_path)
-                ], capture_output=True, text=True, timeout=180, env=env)
+                ], timeout=180, env=env, task_id=task_id)
                 
                 # LibreOffice creates file with same name but .pdf extension
                 expected_output = temp_output_dir / (input_path.stem + ".pdf")
@@ -217,7 +184,7 @@ def process_document_convert(task_id: str, input_path: Path, original_filename:
                     shutil.move(str(expected_output), str(output_path))
                     logger.info(f"LibreOffice conversion successful: {task_id}")
                 else:
-                    error_msg = result.stderr or result.stdout or "Unknown error"
+                    error_msg = result.error or result.text or "Unknown error"
                     logger.error(f"LibreOffice output not found. stderr: {error_msg}")
                     raise Exception(f"LibreOffice conversion failed: {error_msg}")
                     
@@ -359,7 +326,6 @@ def process_document_convert(task_id: str, input_path: Path, original_filename:
         # DOCX/DOC/etc TO PPTX (LibreOffice)
         # ==========================================
         elif output_format == "pptx" and input_ext in ["docx", "doc", "odt", "rtf", "txt", "html"]:
-            import subprocess
             import shutil
             
             libreoffice_cmd = None
@@ -378,7 +344,7 @@ def process_document_convert(task_id: str, input_path: Path, original_filename:
             env = os.environ.copy()
             env["HOME"] = "/tmp"
             
-            result = subprocess.run([
+            result = run_process_sync([
                 str(libreoffice_cmd),
                 "--headless",
                 "--invisible",
@@ -388,7 +354,7 @@ def process_document_convert(task_id: str, input_path: Path, original_filename:
                 "--convert-to", "pptx",
                 "--outdir", str(temp_output_dir),
                 str(input_path)
-            ], capture_output=True, text=True, timeout=180, env=env)
+            ], timeout=180, env=env, task_id=task_id)
             
             expected_output = temp_output_dir / (input_path.stem + ".pptx")
             
@@ -396,7 +362,7 @@ def process_document_convert(task_id: str, input_path: Path, original_filename:
                 shutil.move(str(expected_output), str(output_path))
                 logger.info(f"LibreOffice PPTX conversion successful: {task_id}")
             else:
-                error_msg = result.stderr or result.stdout or "Unknown error"
+                error_msg = result.error or result.text or "Unknown error"
                 logger.error(f"LibreOffice PPTX output not found. stderr: {error_msg}")
                 raise Exception(f"PPTX conversion failed: {error_msg}")
 
@@ -404,7 +370,6 @@ def process_document_convert(task_id: str, input_path: Path, original_filename:
         # DOC/ODT/RTF/TXT/HTML TO DOCX (LibreOffice)
         # ==========================================
         elif output_format == "docx" and input_ext in ["doc", "odt", "rtf", "txt", "html"]:
-            import subprocess
             import shutil
             
             libreoffice_cmd = None
@@ -423,7 +388,7 @@ def process_document_convert(task_id: str, input_path: Path, original_filename:
             env = os.environ.copy()
             env["HOME"] = "/tmp"
             
-            result = subprocess.run([
+            result = run_process_sync([
                 str(libreoffice_cmd),
                 "--headless",
                 "--invisible",
@@ -433,7 +398,7 @@ def process_document_convert(task_id: str, input_path: Path, original_filename:
                 "--convert-to", "docx",
                 "--outdir", str(temp_output_dir),
                 str(input_path)
-            ], capture_output=True, text=True, timeout=180, env=env)
+            ], timeout=180, env=env, task_id=task_id)
             
             expected_output = temp_output_dir / (input_path.stem + ".docx")
             
@@ -441,7 +406,7 @@ def process_document_convert(task_id: str, input_path: Path, original_filename:
                 shutil.move(str(expected_output), str(output_path))
                 logger.info(f"LibreOffice DOCX conversion successful: {task_id}")
             else:
-                error_msg = result.stderr or result.stdout or "Unknown error"
+                error_msg = result.error or result.text or "Unknown error"
                 logger.error(f"LibreOffice DOCX output not found. stderr: {error_msg}")
                 raise Exception(f"DOCX conversion failed: {error_msg}")
         
@@ -641,7 +606,7 @@ async def convert_document(
     
     input_ext = Path(file.filename).suffix.lstrip(".") or "txt"
     input_path = get_input_path(task_id, input_ext)
-    await save_upload_file(file, input_path)
+    await save_upload_file(file, input_path, "document", task_id=task_id)
     
     update_task(
         task_id,
@@ -677,7 +642,7 @@ async def merge_pdfs(
     input_paths = []
     for i, file in enumerate(files):
         input_path = get_input_path(f"{task_id}_{i}", "pdf")
-        await save_upload_file(file, input_path)
+        await save_upload_file(file, input_path, "document", task_id=task_id if i == 0 else None)
         input_paths.append(str(input_path))
     
     # Use first file as primary input_path
@@ -705,7 +670,7 @@ async def split_pdf(
     task_id = create_task(file.filename, "pdf_split")
     
     input_path = get_input_path(task_id, "pdf")
-    await save_upload_file(file, input_path)
+    await save_upload_file(file, input_path, "document", task_id=task_id)
     
     update_task(
         task_id,
@@ -731,7 +696,6 @@ def process_pdf_compress(task_id: str, input_path: Path, original_filename: str,
         
         # Method 1: Try Ghostscript first (best for image PDFs)
         try:
-            import subprocess
             import platform
             
             update_task(task_id, progress_percent=20)
@@ -751,7 +715,7 @@ def process_pdf_compress(task_id: str, input_path: Path, original_filename: str,
             
             update_task(task_id, progress_percent=40)
             
-            result = subprocess.run([
+            result = run_process_sync([
                 str(gs_cmd),
                 "-sDEVICE=pdfwrite",
                 f"-dPDFSETTINGS={gs_quality}",
@@ -764,20 +728,18 @@ def process_pdf_compress(task_id: str, input_path: Path, original_filename: str,
                 "-dMonoImageResolution=150",
                 f"-sOutputFile={output_path}",
                 str(input_path)
-            ], capture_output=True, text=True, timeout=300)
+            ], timeout=300, task_id=task_id)
             
             update_task(task_id, progress_percent=80)
             
-            if result.returncode == 0 and output_path.exists() and output_path.stat().st_size > 0:
+            if result.ok and output_path.exists() and output_path.stat().st_size > 0:
                 compression_success = True
                 logger.info(f"PDF compressed using Ghostscript: {task_id}")
             else:
-                logger.warning(f"Ghostscript failed: {result.stderr}")
+                logger.warning(f"Ghostscript failed: {result.error}")
                 
         except FileNotFoundError:
             logger.info("Ghostscript not available, trying PyPDF2")
-        except subprocess.TimeoutExpired:
-            logger.warning("Ghostscript timeout, trying PyPDF2")
         except Exception as e:
             logger.warning(f"Ghostscript error: {e}, trying PyPDF2")
         
@@ -850,7 +812,7 @@ async def compress_pdf(
     task_id = create_task(file.filename, "pdf_compress")
     
     input_path = get_input_path(task_id, "pdf")
-    await save_upload_file(file, input_path)
+    await save_upload_file(file, input_path, "document", task_id=task_id)
     
     update_task(
         task_id,
@@ -920,7 +882,7 @@ async def protect_pdf(
     task_id = create_task(file.filename, "pdf_protect")
     
     input_path = get_input_path(task_id, "pdf")
-    await save_upload_file(file, input_path)
+    await save_upload_file(file, input_path, "document", task_id=task_id)
     
     update_task(
         task_id,
@@ -991,7 +953,7 @@ async def unlock_pdf(
     task_id = create_task(file.filename, "pdf_unlock")
     
     input_path = get_input_path(task_id, "pdf")
-    await save_upload_file(file, input_path)
+    await save_upload_file(file, input_path, "document", task_id=task_id)
     
     update_task(
         task_id,
@@ -1015,41 +977,39 @@ async def file_to_image(
     
     input_ext = Path(file.filename).suffix.lstrip(".") or "pdf"
     input_path = get_input_path(task_id, input_ext)
-    await save_upload_file(file, input_path)
+    await save_upload_file(file, input_path, "document", task_id=task_id)
     
     def process_file_to_image(task_id: str, input_path: Path, output_format: str, original_filename: str):
         try:
-            import zipfile
-            
             update_task(task_id, status=TaskStatus.PROCESSING, progress_percent=10)
             
+            output_path = get_output_path(task_id, "zip")
+            extension = output_format.lower()
+            save_format = "JPEG" if extension in ("jpg", "jpeg") else extension.upper()
+            
             try:
-                from pdf2image import convert_from_path
-                images = convert_from_path(str(input_path), dpi=150)
+                from pdf2image import convert_from_path, pdfinfo_from_path
+                page_count = pdfinfo_from_path(str(input_path))["Pages"]
             except ImportError:
-                # Fallback: just save first page as preview
-                from PIL import Image
                 logger.warning("pdf2image not installed, using placeholder")
-                images = []
+                page_count = 0
             except Exception as e:
                 logger.warning(f"pdf2image failed: {e}, using placeholder")
-                images = []
-            
-            update_task(task_id, progress_percent=50)
-            
-            output_path = get_output_path(task_id, "zip")
-            
-            with zipfile.ZipFile(output_path, 'w') as zf:
-                if images:
-                    for i, img in enumerate(images):
-                        import io
-                        buffer = io.BytesIO()
-                        img.save(buffer, format=output_format.upper())
-                        buffer.seek(0)
-                        zf.writestr(f"page_{i+1}.{output_format}", buffer.read())
-                else:
+                page_count = 0
+            
+            # One page rendered at a time, stored as-is (PNG/JPEG don't deflate)
+            with StoredZip(output_path) as archive:
+                for page in range(1, page_count + 1):
+                    image = convert_from_path(str(input_path), dpi=150, first_page=page, last_page=page)[0]
+                    buffer = io.BytesIO()
+                    image.save(buffer, format=save_format)
+                    image.close()
+                    archive.add(f"page_{page}.{extension}", buffer.getvalue())
+                    update_task(task_id, progress_percent=10 + int(80 * page / page_count))
+                
+                if archive.count == 0:
                     # Create placeholder
-                    zf.writestr("readme.txt", "PDF conversion requires pdf2image and poppler to be installed.")
+                    archive.add("readme.txt", b"PDF conversion requires pdf2image and poppler to be installed.")
             
             update_task(task_id, progress_percent=90)
             
@@ -1087,7 +1047,7 @@ async def convert_data_format(
     
     input_ext = Path(file.filename).suffix.lstrip(".") or "csv"
     input_path = get_input_path(task_id, input_ext)
-    await save_upload_file(file, input_path)
+    await save_upload_file(file, input_path, "document", task_id=task_id)
     
     def process_data_convert(task_id: str, input_path: Path, output_format: str, original_filename: str):
         try:
@@ -1260,7 +1220,7 @@ async def adjust_file_size(
     
     input_ext = Path(file.filename).suffix.lstrip(".") or "bin"
     input_path = get_input_path(task_id, input_ext)
-    await save_upload_file(file, input_path)
+    await save_upload_file(file, input_path, "document", task_id=task_id)
     
     def process_size_adjust(task_id: str, input_path: Path, mode: str, target_size: int, original_filename: str):
         try:
@@ -1494,7 +1454,7 @@ async def ppt_watermark_remove(
     
     input_ext = Path(file.filename).suffix.lstrip(".") or "pptx"
     input_path = get_input_path(task_id, input_ext)
-    await save_upload_file(file, input_path)
+    await save_upload_file(file, input_path, "document", task_id=task_id)
     
     update_task(
         task_id,
@@ -1728,7 +1688,7 @@ async def create_pdf_from_images(
     for i, file in enumerate(files):
         ext = Path(file.filename).suffix.lstrip(".") or "jpg"
         input_path = get_input_path(f"{task_id}_{i}", ext)
-        await save_upload_file(file, input_path)
+        await save_upload_file(file, input_path, "document", task_id=task_id if i == 0 else None)
         input_paths.append(str(input_path))
     
     # Use first file as primary input_path
@@ -0,0 +1,137 @@
+"""
+Task event routes - push progress instead of polling /api/status
+- GET /api/events/{task_id}: Server-Sent Events stream for one task
+- WS  /api/ws: multiplexed WebSocket, subscribe/unsubscribe per task_id
+
+GET /api/status/{task_id} stays available as the polling fallback.
+
+The SSE route is exempt from the secret header (EventSource cannot send
+one, see HEADERLESS_PATHS in main.py). The WebSocket checks the same
+credentials as the HTTP middleware during the handshake, before accepting:
+X-Magetool-Secret / Authorization headers (non-browser clients), the JWT
+as a subprotocol - new WebSocket(url, ["bearer", token]) - or ?token=.
+"""
+
+import json
+import asyncio
+import logging
+from typing import Dict, Optional, Tuple
+from fastapi import APIRouter, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+
+from services.tasks import get_task
+from services.events import get_event_hub
+from security import credentials_valid
+
+router = APIRouter()
+logger = logging.getLogger("magetool.events")
+
+# Max tasks a single WebSocket may watch at once
+MAX_WS_SUBSCRIPTIONS = 20
+
+# Subprotocol that carries the JWT: Sec-WebSocket-Protocol: bearer, <token>
+WS_AUTH_SUBPROTOCOL = "bearer"
+
+
+@router.get("/events/{task_id}")
+async def task_events(task_id: str, request: Request):
+    """Stream task status changes as Server-Sent Events"""
+    if not get_task(task_id):
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    hub = get_event_hub()
+
+    async def event_source():
+        async for event in hub.stream(task_id):
+            if await request.is_disconnected():
+                return
+            if event is None:
+                yield ": keepalive\n\n"
+                continue
+            yield f"event: status\ndata: {json.dumps(event, default=str)}\n\n"
+        yield "event: end\ndata: {}\n\n"
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"X-Accel-Buffering": "no"},  # Disable proxy buffering (nginx)
+    )
+
+
+def _ws_credentials(websocket: WebSocket) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """(secret, token, subprotocol to accept with) offered on the handshake"""
+    token, subprotocol = None, None
+    auth_header = websocket.headers.get("authorization", "")
+    if auth_header.startswith("Bearer "):
+        token = auth_header.split(" ")[1]
+
+    offered = [p.strip() for p in websocket.headers.get("sec-websocket-protocol", "").split(",") if p.strip()]
+    if len(offered) >= 2 and offered[0] == WS_AUTH_SUBPROTOCOL:
+        # The browser requires the server to pick one of the offered subprotocols
+        token, subprotocol = offered[1], WS_AUTH_SUBPROTOCOL
+
+    return websocket.headers.get("x-magetool-secret"), token or websocket.query_params.get("token"), subprotocol
+
+
+@router.websocket("/ws")
+async def task_events_ws(websocket: WebSocket):
+    """
+    Multiplexed task events.
+    Client sends {"action": "subscribe" | "unsubscribe", "task_id": "..."}
+    Server sends {"type": "status", "task": {...}} and {"type": "end", "task_id": "..."}
+    """
+    secret, token, subprotocol = _ws_credentials(websocket)
+    client = websocket.client.host if websocket.client else ""
+    if not credentials_valid(secret, token, client):
+        logger.warning(f"⛔ Blocked unauthorized WebSocket from {client}")
+        await websocket.close(code=1008)  # Policy violation; handshake answered 403
+        return
+    await websocket.accept(subprotocol=subprotocol)
+
+    hub = get_event_hub()
+    streams: Dict[str, asyncio.Task] = {}
+    send_lock = asyncio.Lock()
+
+    async def send(message: dict):
+        async with send_lock:
+            await websocket.send_text(json.dumps(message, default=str))
+
+    async def forward(task_id: str):
+        try:
+            async for event in hub.stream(task_id):
+                if event is not None:
+                    await send({"type": "status", "task": event})
+            await send({"type": "end", "task_id": task_id})
+        except Exception as e:
+            logger.debug(f"WebSocket stream for {task_id} stopped: {e}")
+        finally:
+            streams.pop(task_id, None)
+
+    try:
+        while True:
+            message = await websocket.receive_json()
+            action = message.get("action") if isinstance(message, dict) else None
+            task_id = str(message.get("task_id", "")) if isinstance(message, dict) else ""
+
+            if action == "subscribe":
+                if task_id in streams:
+                    continue
+                if len(streams) >= MAX_WS_SUBSCRIPTIONS:
+                    await send({"type": "error", "task_id": task_id, "error": "Too many subscriptions"})
+                elif not get_task(task_id):
+                    await send({"type": "error", "task_id": task_id, "error": "Task not found"})
+                else:
+                    streams[task_id] = asyncio.create_task(forward(task_id))
+            elif action == "unsubscribe":
+                stream = streams.pop(task_id, None)
+                if stream:
+                    stream.cancel()
+            else:
+                await send({"type": "error", "error": "Unknown action"})
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.debug(f"WebSocket closed: {e}")
+    finally:
+        for stream in list(streams.values()):
+            stream.cancel()
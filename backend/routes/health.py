@@ -3,10 +3,10 @@ Health check endpoints for monitoring
 """
 
 import shutil
-import subprocess
 from fastapi import APIRouter, Request
 from config import get_settings
 from limiter import limiter
+from services.process_runner import run_process
 
 router = APIRouter()
 settings = get_settings()
@@ -47,12 +47,8 @@ async def readiness_check(request: Request):
     
     # Check FFmpeg
     try:
-        result = subprocess.run(
-            ["ffmpeg", "-version"],
-            capture_output=True,
-            timeout=5,
-        )
-        checks["ffmpeg"] = result.returncode == 0
+        result = await run_process(["ffmpeg", "-version"], timeout=5)
+        checks["ffmpeg"] = result.ok
     except Exception:
         pass
     
@@ -70,6 +66,11 @@ async def readiness_check(request: Request):
 async def metrics(request: Request):
     """Prometheus-compatible metrics endpoint"""
     from services.tasks import task_store
+    from services.executor import get_executor
+    from services.result_cache import get_result_cache
+    from services.probe import get_probe_cache
+    from services.encoder_profile import get_encoder_profile, choose_encoder
+    from services.model_pool import collect_stats
     
     # Get disk usage
     try:
@@ -93,4 +94,12 @@ async def metrics(request: Request):
         "magetool_tasks_failed": tasks_by_status["failed"],
         "magetool_disk_usage_percent": disk_usage,
         "magetool_disk_free_mb": disk_free_mb,
+        "magetool_job_pools": get_executor().stats(),
+        "magetool_result_cache": get_result_cache().stats(),
+        "magetool_probe_cache": get_probe_cache().stats(),
+        "magetool_encoder": {
+            "calibrated_at": getattr(get_encoder_profile(), "calibrated_at", None),
+            **vars(choose_encoder()),  # at the calibration resolution (720p30)
+        },
+        "magetool_models": collect_stats(),  # per process: load time, memory, idle time
     }
@@ -2,6 +2,7 @@
 Image processing routes
 """
 
+import asyncio
 import logging
 from pathlib import Path
 from fastapi import APIRouter, UploadFile, File, Form, BackgroundTasks, HTTPException
@@ -10,51 +11,21 @@ from PIL import Image
 import io
 
 from services.tasks import (
-    create_task, update_task, get_input_path, get_output_path, TaskStatus
+    create_task, update_task, get_task, delete_task, get_input_path, get_output_path, TaskStatus
 )
 from config import get_settings, SUPPORTED_FORMATS
 from routes.core import register_processor
+from services.ingest import save_upload_file, read_upload
+from services.upscaler import upscale_file
+from services.model_pool import use_model
+from services.ocr_batch import run_ocr, count_pages, combined_text
+from services.palette import extract_palette, check_options as check_palette_options, PaletteError
 
 router = APIRouter()
 settings = get_settings()
 logger = logging.getLogger("magetool.image")
 
 
-import aiofiles
-
-# Chunk size for async file streaming (1MB chunks for optimal speed)
-UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB
-
-async def save_upload_file(upload_file: UploadFile, destination: Path):
-    """
-    Save uploaded file to disk using async chunked streaming.
-    
-    Benefits:
-    - Non-blocking: Won't freeze event loop during large uploads
-    - Memory efficient: Only 1MB in memory at a time
-    - Faster: 3-5x improvement for large files
-    """
-    try:
-        total_size = 0
-        async with aiofiles.open(destination, "wb") as f:
-            while chunk := await upload_file.read(UPLOAD_CHUNK_SIZE):
-                await f.write(chunk)
-                total_size += len(chunk)
-        return total_size
-    finally:
-        await upload_file.close()
-        
-        # GAREEB SHIELD: Validate file content (Magic Bytes)
-        try:
-            from services.validation import validate_file_content
-            validate_file_content(destination)
-        except Exception as e:
-             # Clean up if invalid
-             if destination.exists():
-                 destination.unlink()
-             raise e
-
-
 def process_image_convert(task_id: str, input_path: Path, original_filename: str, **params):
     """Background task: Convert image format"""
     try:
@@ -228,7 +199,7 @@ async def convert_image(
     # Get input extension and save file
     input_ext = Path(file.filename).suffix.lstrip(".") or "png"
     input_path = get_input_path(task_id, input_ext)
-    await save_upload_file(file, input_path)
+    await save_upload_file(file, input_path, "image", task_id=task_id)
     
     # Set status to UPLOADED and store params
     update_task(
@@ -259,7 +230,7 @@ async def resize_image(
     
     input_ext = Path(file.filename).suffix.lstrip(".") or "png"
     input_path = get_input_path(task_id, input_ext)
-    await save_upload_file(file, input_path)
+    await save_upload_file(file, input_path, "image", task_id=task_id)
     
     update_task(
         task_id,
@@ -288,7 +259,7 @@ async def crop_image(
     
     input_ext = Path(file.filename).suffix.lstrip(".") or "png"
     input_path = get_input_path(task_id, input_ext)
-    await save_upload_file(file, input_path)
+    await save_upload_file(file, input_path, "image", task_id=task_id)
     
     update_task(
         task_id,
@@ -331,11 +302,12 @@ def process_image_remove_bg(task_id: str, input_path: Path, original_filename: s
         
         update_task(task_id, progress_percent=20)
         
-        with Image.open(input_path) as img:
+        # Shared ONNX session instead of a new one per remove() call
+        with Image.open(input_path) as img, use_model("rembg") as session:
             update_task(task_id, progress_percent=40)
             
             # Remove background
-            output_img = remove(img)
+            output_img = remove(img, session=session)
             
             update_task(task_id, progress_percent=80)
             
@@ -370,7 +342,7 @@ async def remove_background(
     
     input_ext = Path(file.filename).suffix.lstrip(".") or "png"
     input_path = get_input_path(task_id, input_ext)
-    await save_upload_file(file, input_path)
+    await save_upload_file(file, input_path, "image", task_id=task_id)
     
     update_task(
         task_id,
@@ -391,49 +363,17 @@ def process_image_upscale(task_id: str, input_path: Path, original_filename: str
         
         output_path = get_output_path(task_id, "png")
         method_used = "unknown"
+        upscale_metrics = {}
         
         # Try Real-ESRGAN first (actual AI upscaling)
         try:
-            from realesrgan import RealESRGANer
-            from basicsr.archs.rrdbnet_arch import RRDBNet
-            import numpy as np
-            import cv2
-            
             update_task(task_id, progress_percent=20)
             
-            # Load image with OpenCV
-            img = cv2.imread(str(input_path), cv2.IMREAD_UNCHANGED)
-            
-            if img is None:
-                raise Exception("Failed to load image with OpenCV")
-            
-            update_task(task_id, progress_percent=30)
-            
-            # Initialize Real-ESRGAN model
-            model = RRDBNet(num_in_ch=3, num_out_ch=3, num_feat=64, num_block=23, num_grow_ch=32, scale=scale)
-            
-            # Model path - downloads automatically if not present
-            model_name = f"RealESRGAN_x{scale}plus"
-            
-            upsampler = RealESRGANer(
-                scale=scale,
-                model_path=None,  # Auto-download
-                model=model,
-                tile=0,
-                tile_pad=10,
-                pre_pad=0,
-                half=False,  # Use FP32 for CPU
+            # Cached model, memory-sized tiles on a thread pool
+            upscale_metrics = upscale_file(
+                input_path, output_path, scale,
+                on_progress=lambda done: update_task(task_id, progress_percent=20 + int(60 * done)),
             )
-            
-            update_task(task_id, progress_percent=50)
-            
-            # Upscale the image
-            output, _ = upsampler.enhance(img, outscale=scale)
-            
-            update_task(task_id, progress_percent=80)
-            
-            # Save result
-            cv2.imwrite(str(output_path), output)
             method_used = "realesrgan"
             
             logger.info(f"AI upscale complete with Real-ESRGAN: {task_id}")
@@ -536,6 +476,7 @@ def process_image_upscale(task_id: str, input_path: Path, original_filename: str
             output_filename=output_filename,
             output_path=output_path,
             file_size=output_path.stat().st_size,
+            metrics={"method": method_used, **upscale_metrics},
         )
         
         logger.info(f"Image upscale complete: {task_id} (method: {method_used})")
@@ -558,7 +499,7 @@ async def upscale_image(
     
     input_ext = Path(file.filename).suffix.lstrip(".") or "png"
     input_path = get_input_path(task_id, input_ext)
-    await save_upload_file(file, input_path)
+    await save_upload_file(file, input_path, "image", task_id=task_id)
     
     update_task(
         task_id,
@@ -706,7 +647,7 @@ async def add_watermark(
     
     input_ext = Path(file.filename).suffix.lstrip(".") or "png"
     input_path = get_input_path(task_id, input_ext)
-    await save_upload_file(file, input_path)
+    await save_upload_file(file, input_path, "image", task_id=task_id)
     
     update_task(
         task_id,
@@ -772,7 +713,7 @@ async def scrub_exif(
     
     input_ext = Path(file.filename).suffix.lstrip(".") or "png"
     input_path = get_input_path(task_id, input_ext)
-    await save_upload_file(file, input_path)
+    await save_upload_file(file, input_path, "image", task_id=task_id)
     
     update_task(
         task_id,
@@ -794,55 +735,14 @@ def process_image_ocr(task_id: str, input_path: Path, original_filename: str, **
         text = ""
         
         try:
-            import easyocr
-            
-            # Use cached reader (initialized once, reused for all requests)
-            global _ocr_reader
-            if '_ocr_reader' not in globals() or _ocr_reader is None:
-                logger.info("Initializing EasyOCR reader (one-time)...")
-                _ocr_reader = easyocr.Reader(['en'], gpu=False, verbose=False)
-            
             update_task(task_id, progress_percent=30)
             
-            # Preprocess image for faster OCR
-            with Image.open(input_path) as img:
-                # Convert to RGB if needed
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
-                
-                # Resize large images for speed (OCR doesn't need 4K resolution)
-                max_dimension = 2000
-                if max(img.width, img.height) > max_dimension:
-                    ratio = max_dimension / max(img.width, img.height)
-                    new_size = (int(img.width * ratio), int(img.height * ratio))
-                    img = img.resize(new_size, Image.Resampling.LANCZOS)
-                    logger.info(f"Resized image for OCR: {new_size}")
-                
-                # Save preprocessed image to temp
-                temp_ocr_path = input_path.parent / f"{task_id}_ocr_temp.jpg"
-                img.save(temp_ocr_path, "JPEG", quality=95)
-            
-            update_task(task_id, progress_percent=50)
-            
-            # Read text from preprocessed image
-            results = _ocr_reader.readtext(str(temp_ocr_path))
-            
-            # Clean up temp file
-            temp_ocr_path.unlink(missing_ok=True)
-            
-            # Combine all detected text
-            text = '\n'.join([result[1] for result in results])
+            # Prepared in memory and passed to the reader as an array (services/ocr_batch.py)
+            pages = run_ocr([(input_path, original_filename)])
+            text = pages[0]["text"] if pages else ""
             
         except ImportError:
-            logger.warning("easyocr not installed, trying pytesseract fallback")
-            
-            # Fallback to pytesseract (lighter, faster)
-            try:
-                import pytesseract
-                with Image.open(input_path) as img:
-                    text = pytesseract.image_to_string(img)
-            except ImportError:
-                text = "OCR functionality is not available. Please install easyocr or pytesseract."
+            text = "OCR functionality is not available. Please install easyocr or pytesseract."
                 
         except Exception as ocr_error:
             logger.error(f"OCR processing error: {ocr_error}")
@@ -877,10 +777,6 @@ def process_image_ocr(task_id: str, input_path: Path, original_filename: str, **
         logger.error(f"OCR failed: {task_id} - {e}")
         update_task(task_id, status=TaskStatus.FAILED, error_message=str(e))
 
-# Initialize OCR reader as None (will be loaded on first use)
-_ocr_reader = None
-
-
 @router.post("/ocr")
 async def ocr_image(
     file: UploadFile = File(...),
@@ -891,7 +787,7 @@ async def ocr_image(
     
     input_ext = Path(file.filename).suffix.lstrip(".") or "png"
     input_path = get_input_path(task_id, input_ext)
-    await save_upload_file(file, input_path)
+    await save_upload_file(file, input_path, "image", task_id=task_id)
     
     update_task(
         task_id,
@@ -904,6 +800,150 @@ async def ocr_image(
     return {"task_id": task_id, "message": "File uploaded successfully"}
 
 
+def process_image_ocr_batch(task_id: str, input_path: Path, original_filename: str, **params):
+    """Background task: OCR many images / PDF pages into one txt or json file"""
+    import json
+    
+    try:
+        output_format = params.get("output_format", "txt")
+        sources = [(Path(path), name) for path, name in params.get("inputs", [])]
+        if not sources:
+            raise ValueError("No files provided")
+        
+        update_task(task_id, status=TaskStatus.PROCESSING, progress_percent=5)
+        
+        try:
+            total = count_pages(sources)
+        except ImportError:
+            raise Exception("pdf2image not installed. Required for PDF OCR.")
+        
+        # Finished pages are appended here (served by /ocr-batch/{task_id}/pages)
+        pages_path = ocr_pages_path(task_id)
+        pages_path.unlink(missing_ok=True)
+        
+        def on_page(record):
+            with open(pages_path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+            update_task(
+                task_id,
+                progress_percent=5 + int(85 * record["page"] / max(total, 1)),
+                metrics={
+                    "pages_done": record["page"],
+                    "pages_total": total,
+                    # Pushed to /events subscribers as each page finishes
+                    "last_page": {key: record[key] for key in ("page", "source", "source_page", "text")},
+                },
+            )
+        
+        try:
+            pages = run_ocr(sources, on_page=on_page)
+        except ImportError:
+            raise Exception("OCR functionality is not available. Please install easyocr or pytesseract.")
+        
+        update_task(task_id, progress_percent=95)
+        
+        output_ext = "json" if output_format.lower() == "json" else "txt"
+        output_path = get_output_path(task_id, output_ext)
+        if output_ext == "json":
+            output_path.write_text(json.dumps({
+                "page_count": len(pages),
+                "text": combined_text(pages),
+                "pages": pages,
+            }))
+        else:
+            output_path.write_text(combined_text(pages))
+        
+        from services.tasks import get_output_filename
+        output_filename = get_output_filename(original_filename, suffix="text", extension=output_ext)
+        
+        update_task(
+            task_id,
+            status=TaskStatus.COMPLETE,
+            progress_percent=100,
+            output_filename=output_filename,
+            output_path=output_path,
+            file_size=output_path.stat().st_size,
+        )
+        
+        logger.info(f"Batch OCR complete: {task_id} ({len(pages)} pages)")
+        
+    except Exception as e:
+        logger.error(f"Batch OCR failed: {task_id} - {e}")
+        update_task(task_id, status=TaskStatus.FAILED, error_message=str(e))
+
+
+def ocr_pages_path(task_id: str) -> Path:
+    """Per-page results of a batch OCR task, one JSON object per line"""
+    return get_output_path(task_id, "pages.jsonl")
+
+
+@router.post("/ocr-batch")
+async def ocr_batch(
+    files: List[UploadFile] = File(...),
+    output_format: str = Form(default="txt"),
+):
+    """Extract text from many images and/or PDFs into one txt or json file"""
+    if not files or len(files) > 50:
+        raise HTTPException(status_code=400, detail="1-50 files required for batch OCR")
+    
+    task_id = create_task(files[0].filename if len(files) == 1 else "ocr_batch", "image_ocr_batch")
+    
+    inputs = []
+    try:
+        for i, f in enumerate(files):
+            input_ext = Path(f.filename).suffix.lstrip(".").lower() or "png"
+            input_path = get_input_path(f"{task_id}_{i}", input_ext)
+            category = "document" if input_ext == "pdf" else "image"
+            await save_upload_file(f, input_path, category, task_id=task_id if i == 0 else None)
+            inputs.append([str(input_path), f.filename])
+    except Exception:
+        # One bad file rejects the batch: no half-uploaded task left behind
+        for saved_path, _ in inputs:
+            Path(saved_path).unlink(missing_ok=True)
+        delete_task(task_id)
+        raise
+    
+    update_task(
+        task_id,
+        status=TaskStatus.UPLOADED,
+        progress_percent=100,
+        input_path=Path(inputs[0][0]),
+        params={"inputs": inputs, "output_format": output_format},
+    )
+    
+    return {"task_id": task_id, "message": "Files uploaded successfully"}
+
+
+@router.get("/ocr-batch/{task_id}/pages")
+async def ocr_batch_pages(task_id: str, after: int = 0):
+    """Pages of a batch OCR task finished so far (page numbers > after)"""
+    import json
+    
+    task = get_task(task_id)
+    if not task or task.get("task_type") != "image_ocr_batch":
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    # A result-cache hit completes without a pages file - the output holds every page
+    pages = []
+    pages_path = ocr_pages_path(task_id)
+    if pages_path.exists():
+        with open(pages_path) as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break  # page still being written
+                record = json.loads(line)
+                if record["page"] > after:
+                    pages.append(record)
+    
+    metrics = task.get("metrics") or {}
+    return {
+        "task_id": task_id,
+        "status": task["status"],
+        "pages_total": metrics.get("pages_total"),
+        "pages": pages,
+    }
+
+
 def process_image_meme(task_id: str, input_path: Path, original_filename: str, **params):
     """Background task: Generate meme with top and bottom text"""
     try:
@@ -989,7 +1029,7 @@ async def generate_meme(
     
     input_ext = Path(file.filename).suffix.lstrip(".") or "png"
     input_path = get_input_path(task_id, input_ext)
-    await save_upload_file(file, input_path)
+    await save_upload_file(file, input_path, "image", task_id=task_id)
     
     update_task(
         task_id,
@@ -1074,7 +1114,7 @@ async def apply_negative(
     
     input_ext = Path(file.filename).suffix.lstrip(".") or "png"
     input_path = get_input_path(task_id, input_ext)
-    await save_upload_file(file, input_path)
+    await save_upload_file(file, input_path, "image", task_id=task_id)
     
     update_task(
         task_id,
@@ -1091,45 +1131,61 @@ async def apply_negative(
 async def extract_color_palette(
     file: UploadFile = File(...),
     num_colors: int = Form(default=5),
+    weighting: str = Form(default="uniform"),  # uniform, ignore_extremes (skip near-white/black)
 ):
     """Extract dominant colors from image (synchronous)"""
-    input_ext = Path(file.filename).suffix.lstrip(".") or "png"
-    content = await file.read()
+    content = await read_upload(file, "image")
     
     try:
-        with Image.open(io.BytesIO(content)) as img:
-            img = img.convert("RGB")
-            img = img.resize((100, 100))  # Reduce for faster processing
-            
-            pixels = list(img.getdata())
-            
-            # Simple color quantization
-            from collections import Counter
-            
-            # Round colors to reduce variations
-            rounded = [(r//16*16, g//16*16, b//16*16) for r, g, b in pixels]
-            color_counts = Counter(rounded).most_common(num_colors)
-            
-            colors = []
-            for (r, g, b), count in color_counts:
-                hex_color = f"#{r:02x}{g:02x}{b:02x}"
-                colors.append({
-                    "hex": hex_color,
-                    "rgb": {"r": r, "g": g, "b": b},
-                    "percentage": round(count / len(pixels) * 100, 1)
-                })
-            
-            return {
-                "success": True,
-                "filename": file.filename,
-                "colors": colors
-            }
-            
+        # Histogram bins + weighted k-means (services/palette.py), off the event loop
+        colors = await asyncio.to_thread(extract_palette, content, num_colors, weighting)
+        return {
+            "success": True,
+            "filename": file.filename,
+            "colors": colors
+        }
+    except PaletteError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Color palette extraction failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/color-palette/batch")
+async def extract_color_palettes(
+    files: List[UploadFile] = File(...),
+    num_colors: int = Form(default=5),
+    weighting: str = Form(default="uniform"),
+):
+    """Dominant colors of up to 50 images in one request (synchronous)"""
+    if not files or len(files) > 50:
+        raise HTTPException(status_code=400, detail="1-50 images required")
+    try:
+        check_palette_options(num_colors, weighting)
+    except PaletteError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Held in memory for the whole request: per-file and total size capped (413)
+    uploads = []
+    budget = settings.MAX_BATCH_UPLOAD_MB * 1024 * 1024
+    for f in files:
+        content = await read_upload(f, "image", budget)
+        budget -= len(content)
+        uploads.append((f.filename, content))
+    
+    def run():
+        palettes = []
+        for filename, content in uploads:
+            try:
+                palettes.append({"filename": filename, "colors": extract_palette(content, num_colors, weighting)})
+            except Exception as e:
+                # One unreadable image doesn't fail the others
+                palettes.append({"filename": filename, "error": str(e)})
+        return palettes
+    
+    return {"success": True, "palettes": await asyncio.to_thread(run)}
+
+
 def process_image_splitter(task_id: str, input_path: Path, original_filename: str, **params):
     """Background task: Split image into grid segments"""
     try:
@@ -1198,7 +1254,7 @@ async def split_image(
     
     input_ext = Path(file.filename).suffix.lstrip(".") or "png"
     input_path = get_input_path(task_id, input_ext)
-    await save_upload_file(file, input_path)
+    await save_upload_file(file, input_path, "image", task_id=task_id)
     
     update_task(
         task_id,
@@ -1281,7 +1337,7 @@ async def generate_favicon(
     
     input_ext = Path(file.filename).suffix.lstrip(".") or "png"
     input_path = get_input_path(task_id, input_ext)
-    await save_upload_file(file, input_path)
+    await save_upload_file(file, input_path, "image", task_id=task_id)
     
     update_task(
         task_id,
@@ -1343,7 +1399,7 @@ async def blur_face(
     
     input_ext = Path(file.filename).suffix.lstrip(".") or "png"
     input_path = get_input_path(task_id, input_ext)
-    await save_upload_file(file, input_path)
+    await save_upload_file(file, input_path, "image", task_id=task_id)
     
     update_task(
         task_id,
@@ -1435,7 +1491,7 @@ async def passport_photo(
     
     input_ext = Path(file.filename).suffix.lstrip(".") or "png"
     input_path = get_input_path(task_id, input_ext)
-    await save_upload_file(file, input_path)
+    await save_upload_file(file, input_path, "image", task_id=task_id)
     
     update_task(
         task_id,
@@ -1536,7 +1592,7 @@ async def create_collage(
     for i, f in enumerate(files):
         input_ext = Path(f.filename).suffix.lstrip(".") or "png"
         input_path = get_input_path(f"{task_id}_{i}", input_ext)
-        await save_upload_file(f, input_path)
+        await save_upload_file(f, input_path, "image", task_id=task_id if i == 0 else None)
         input_paths.append(str(input_path))
     
     # Use first file as primary input_path
@@ -1569,7 +1625,7 @@ async def remove_watermark(
     
     input_ext = Path(file.filename).suffix.lstrip(".") or "png"
     input_path = get_input_path(task_id, input_ext)
-    await save_upload_file(file, input_path)
+    await save_upload_file(file, input_path, "image", task_id=task_id)
     
     def process_watermark_remove(task_id: str, input_path: Path, detection_mode: str, original_filename: str):
         try:
@@ -1834,7 +1890,7 @@ async def convert_to_svg(
     
     input_ext = Path(file.filename).suffix.lstrip(".") or "png"
     input_path = get_input_path(task_id, input_ext)
-    await save_upload_file(file, input_path)
+    await save_upload_file(file, input_path, "image", task_id=task_id)
     
     update_task(
         task_id,
@@ -2056,7 +2112,7 @@ async def adjust_image_size(
     
     input_ext = Path(file.filename).suffix.lstrip(".") or "png"
     input_path = get_input_path(task_id, input_ext)
-    await save_upload_file(file, input_path)
+    await save_upload_file(file, input_path, "image", task_id=task_id)
     
     update_task(
         task_id,
@@ -2286,7 +2342,7 @@ async def convert_images_to_pdf(
     for i, file in enumerate(files):
         input_ext = Path(file.filename).suffix.lstrip(".") or "png"
         input_path = get_input_path(task_id, f"{i}_{input_ext}")
-        await save_upload_file(file, input_path)
+        await save_upload_file(file, input_path, "image", task_id=task_id if i == 0 else None)
         image_paths.append(str(input_path))
     
     update_task(
@@ -2316,6 +2372,7 @@ register_processor("image_upscale", process_image_upscale)
 register_processor("image_watermark_add", process_image_watermark_add)
 register_processor("image_exif_scrub", process_image_exif_scrub)
 register_processor("image_ocr", process_image_ocr)
+register_processor("image_ocr_batch", process_image_ocr_batch)
 register_processor("meme_generator", process_image_meme)
 register_processor("image_negative", process_image_negative)
 register_processor("image_splitter", process_image_splitter)
@@ -202,8 +202,15 @@ async def ai_remove_bg(file: UploadFile = File(...)):
     """Remove background using Rembg"""
     try:
         from rembg import remove
+        from services.model_pool import use_model
         input_data = await file.read()
-        output_data = remove(input_data)
+        
+        def run():
+            # Shared session from the model pool (preloaded with MODEL_PRELOAD)
+            with use_model("rembg") as session:
+                return remove(input_data, session=session)
+        
+        output_data = await asyncio.to_thread(run)
         
         # Save output to temp folder for retrieval (Subject to 30 min cleanup)
         filename = f"nobg-{uuid.uuid4()}.png"
@@ -3,73 +3,31 @@ Video processing routes
 """
 
 import logging
-import subprocess
 from pathlib import Path
 from fastapi import APIRouter, UploadFile, File, Form, BackgroundTasks, HTTPException
 
 from services.tasks import (
-    create_task, update_task, get_input_path, get_output_path, TaskStatus
+    create_task, update_task, get_task, get_input_path, get_output_path, TaskStatus
 )
 from config import get_settings, SUPPORTED_FORMATS
 from routes.core import register_processor
+from services.ingest import save_upload_file
+from services.ffmpeg import run_ffmpeg, probe_duration
+from services.probe import probe_media, probe_media_sync, probe_duration as probe_duration_async, ProbeError
+from services.chunked import transcode_chunked
+from services.encoder_profile import choose_encoder
+from services.gif_pipeline import make_gif
+from services.zip_stream import frames_to_zip_sync
+from services.frame_sampler import sample_keyframes
+from services.remux import copy_blocker, remux_args, audio_copy_allowed, smart_trim
+from services.target_size import encode_to_size
+from services.operation_spec import rotate_spec, speed_spec, mute_spec, add_music_spec
 
 router = APIRouter()
 settings = get_settings()
 logger = logging.getLogger("magetool.video")
 
 
-import aiofiles
-
-# Chunk size for async file streaming (1MB chunks for optimal speed)
-UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB
-
-async def save_upload_file(upload_file: UploadFile, destination: Path):
-    """
-    Save uploaded file to disk using async chunked streaming.
-    
-    Benefits:
-    - Non-blocking: Won't freeze event loop during large uploads
-    - Memory efficient: Only 1MB in memory at a time
-    - Faster: 3-5x improvement for large video files
-    """
-    try:
-        total_size = 0
-        async with aiofiles.open(destination, "wb") as f:
-            while chunk := await upload_file.read(UPLOAD_CHUNK_SIZE):
-                await f.write(chunk)
-                total_size += len(chunk)
-        return total_size
-    finally:
-        await upload_file.close()
-        
-        # GAREEB SHIELD: Validate file content (Magic Bytes)
-        try:
-            from services.validation import validate_file_content
-            validate_file_content(destination)
-        except Exception as e:
-             if destination.exists():
-                 destination.unlink()
-             raise e
-
-
-def run_ffmpeg(args: list, timeout: int = 600) -> tuple[bool, str]:
-    """Run FFmpeg command and return success status and output"""
-    try:
-        result = subprocess.run(
-            ["ffmpeg", "-y"] + args,
-            capture_output=True,
-            text=True,
-            timeout=timeout,
-        )
-        return result.returncode == 0, result.stderr
-    except subprocess.TimeoutExpired:
-        return False, "Processing timeout exceeded"
-    except FileNotFoundError:
-        return False, "FFmpeg not installed"
-    except Exception as e:
-        return False, str(e)
-
-
 def process_video_convert(task_id: str, input_path: Path, original_filename: str, **params):
     """Background task: Convert video format"""
     try:
@@ -78,8 +36,8 @@ def process_video_convert(task_id: str, input_path: Path, original_filename: str
         output_format = params.get("output_format", "mp4")
         output_path = get_output_path(task_id, output_format)
         
-        # Build FFmpeg command
-        ffmpeg_args = ["-i", str(input_path)]
+        # Build FFmpeg output options
+        ffmpeg_args = []
         
         # Add resolution if specified
         resolution = params.get("resolution")
@@ -103,14 +61,35 @@ def process_video_convert(task_id: str, input_path: Path, original_filename: str
         if bitrate:
             ffmpeg_args.extend(["-b:v", bitrate])
         
-        # Balanced preset: good quality + reasonable speed
-        ffmpeg_args.extend(["-preset", "medium"])
-        
-        ffmpeg_args.append(str(output_path))
-        
         update_task(task_id, progress_percent=30)
         
-        success, error = run_ffmpeg(ffmpeg_args)
+        # Container-only change (codecs legal in the target, picture untouched): remux
+        remuxed = False
+        if not ffmpeg_args and output_format != "gif":
+            try:
+                info = probe_media_sync(input_path)
+                blocker = copy_blocker(info, output_format)
+            except ProbeError as e:
+                blocker = str(e)
+            if blocker is None:
+                success, error = run_ffmpeg(remux_args(info, input_path, output_path), task_id=task_id)
+                remuxed = success
+                if not success:
+                    logger.warning(f"Remux failed for {task_id}, re-encoding: {error}")
+            else:
+                logger.info(f"Video convert {task_id}: re-encoding, {blocker}")
+        
+        if not remuxed:
+            # Preset calibrated for this node (medium until calibrated)
+            encoder = choose_encoder(input_path)
+            ffmpeg_args.extend(["-preset", encoder.preset])
+            
+            # Long inputs: keyframe-aligned segments encoded on all cores
+            result = transcode_chunked(input_path, output_path, ffmpeg_args, [], task_id=task_id)
+            if result is None:
+                ffmpeg_args += encoder.thread_args()
+                result = run_ffmpeg(["-i", str(input_path)] + ffmpeg_args + [str(output_path)], task_id=task_id)
+            success, error = result
         
         if not success:
             raise Exception(f"FFmpeg error: {error}")
@@ -152,28 +131,35 @@ def process_extract_audio(task_id: str, input_path: Path, original_filename: str
             "-acodec",
         ]
         
-        # Select codec based on format
-        if output_format == "mp3":
+        # Copy the track when the container takes its codec as-is
+        try:
+            copy_audio = audio_copy_allowed(probe_media_sync(input_path), output_format, bitrate)
+        except ProbeError:
+            copy_audio = False
+        
+        if copy_audio:
+            ffmpeg_args.append("copy")
+        elif output_format == "mp3":
             ffmpeg_args.append("libmp3lame")
-        elif output_format == "aac":
+        elif output_format in ["aac", "m4a"]:
             ffmpeg_args.append("aac")
         elif output_format == "flac":
             ffmpeg_args.append("flac")
         elif output_format == "ogg":
             ffmpeg_args.append("libvorbis")
-        elif output_format in ["wav", "m4a"]:
-            ffmpeg_args.append("copy")
+        elif output_format == "wav":
+            ffmpeg_args.append("pcm_s16le")
         else:
             ffmpeg_args.append("copy")
         
-        if bitrate and output_format not in ["flac", "wav"]:
+        if bitrate and ffmpeg_args[-1] != "copy" and output_format not in ["flac", "wav"]:
             ffmpeg_args.extend(["-b:a", bitrate])
         
         ffmpeg_args.append(str(output_path))
         
         update_task(task_id, progress_percent=30)
         
-        success, error = run_ffmpeg(ffmpeg_args)
+        success, error = run_ffmpeg(ffmpeg_args, task_id=task_id)
         
         if not success:
             raise Exception(f"FFmpeg error: {error}")
@@ -214,19 +200,23 @@ def process_video_trim(task_id: str, input_path: Path, original_filename: str, *
         ext = input_path.suffix.lstrip(".")
         output_path = get_output_path(task_id, ext)
         
-        # OPTIMIZED: -ss BEFORE input = fast seek (input seeking)
-        ffmpeg_args = [
-            "-ss", start_time,
-            "-i", str(input_path),
-            "-to", end_time,
-            "-c", "copy",  # Stream copy for fast trimming
-            "-avoid_negative_ts", "make_zero",  # Fix timestamp issues
-            str(output_path),
-        ]
-        
         update_task(task_id, progress_percent=30)
         
-        success, error = run_ffmpeg(ffmpeg_args)
+        # Smart cut: re-encode only the GOPs at the cut points, copy the rest
+        result = smart_trim(input_path, output_path, start_time, end_time,
+                            preset=choose_encoder(input_path).preset, task_id=task_id)
+        if result is None:
+            # OPTIMIZED: -ss BEFORE input = fast seek (input seeking)
+            ffmpeg_args = [
+                "-ss", start_time,
+                "-i", str(input_path),
+                "-to", end_time,
+                "-c", "copy",  # Stream copy for fast trimming
+                "-avoid_negative_ts", "make_zero",  # Fix timestamp issues
+                str(output_path),
+            ]
+            result = run_ffmpeg(ffmpeg_args, task_id=task_id)
+        success, error = result
         
         if not success:
             raise Exception(f"FFmpeg error: {error}")
@@ -258,8 +248,37 @@ def process_video_compress(task_id: str, input_path: Path, original_filename: st
         update_task(task_id, status=TaskStatus.PROCESSING, progress_percent=10)
         
         quality = params.get("quality", "medium")
+        target_size = params.get("target_size")  # bytes, two-pass mode
         output_path = get_output_path(task_id, "mp4")
         
+        if target_size:
+            # Bitrate from the size budget; pass-1 stats reused across requests for the same file
+            encoder = choose_encoder(input_path)
+            task = get_task(task_id) or {}
+            report = encode_to_size(
+                input_path, output_path, target_size,
+                preset=encoder.preset,
+                thread_args=encoder.thread_args(),
+                input_digest=(task.get("input_info") or {}).get("sha256"),
+                task_id=task_id,
+            )
+            
+            from services.tasks import get_output_filename
+            output_filename = get_output_filename(original_filename, suffix="compressed", extension="mp4")
+            
+            update_task(
+                task_id,
+                status=TaskStatus.COMPLETE,
+                progress_percent=100,
+                output_filename=output_filename,
+                output_path=output_path,
+                file_size=report["achieved_size"],
+                metrics=report,
+            )
+            
+            logger.info(f"Video compress complete: {task_id} ({report['achieved_size']} / {target_size} bytes)")
+            return
+        
         # CRF values: lower = better quality (sharper), higher = more compression
         # FLASH MODE: Using lower CRF for sharper output
         crf_map = {
@@ -269,19 +288,19 @@ def process_video_compress(task_id: str, input_path: Path, original_filename: st
         }
         crf = crf_map.get(quality, "23")
         
-        ffmpeg_args = [
-            "-i", str(input_path),
-            "-c:v", "libx264",
-            "-crf", crf,
-            "-preset", "medium",
-            "-c:a", "aac",
-            "-b:a", "192k",  # Higher audio bitrate
-            str(output_path),
-        ]
+        # Preset calibrated for this node (medium until calibrated)
+        encoder = choose_encoder(input_path)
+        video_args = ["-c:v", "libx264", "-crf", crf, "-preset", encoder.preset]
+        audio_args = ["-c:a", "aac", "-b:a", "192k"]  # Higher audio bitrate
         
         update_task(task_id, progress_percent=30)
         
-        success, error = run_ffmpeg(ffmpeg_args)
+        # Long inputs: keyframe-aligned segments encoded on all cores
+        result = transcode_chunked(input_path, output_path, video_args, audio_args, task_id=task_id)
+        if result is None:
+            ffmpeg_args = ["-i", str(input_path)] + video_args + encoder.thread_args() + audio_args + [str(output_path)]
+            result = run_ffmpeg(ffmpeg_args, task_id=task_id)
+        success, error = result
         
         if not success:
             raise Exception(f"FFmpeg error: {error}")
@@ -327,7 +346,7 @@ async def convert_video(
     
     input_ext = Path(file.filename).suffix.lstrip(".") or "mp4"
     input_path = get_input_path(task_id, input_ext)
-    await save_upload_file(file, input_path)
+    await save_upload_file(file, input_path, "video", task_id=task_id)
     
     # Store params and set status to UPLOADED (processing deferred)
     update_task(
@@ -364,7 +383,7 @@ async def extract_audio(
     
     input_ext = Path(file.filename).suffix.lstrip(".") or "mp4"
     input_path = get_input_path(task_id, input_ext)
-    await save_upload_file(file, input_path)
+    await save_upload_file(file, input_path, "video", task_id=task_id)
     
     update_task(
         task_id,
@@ -391,7 +410,7 @@ async def trim_video(
     
     input_ext = Path(file.filename).suffix.lstrip(".") or "mp4"
     input_path = get_input_path(task_id, input_ext)
-    await save_upload_file(file, input_path)
+    await save_upload_file(file, input_path, "video", task_id=task_id)
     
     update_task(
         task_id,
@@ -411,6 +430,7 @@ async def trim_video(
 async def compress_video(
     file: UploadFile = File(...),
     quality: str = Form(default="medium"),
+    target_size_mb: float = Form(default=None),  # Two-pass encode to this size instead of a quality
 ):
     """Compress video to reduce file size"""
     if quality not in ["low", "medium", "high"]:
@@ -419,11 +439,14 @@ async def compress_video(
             detail="Quality must be 'low', 'medium', or 'high'"
         )
     
+    if target_size_mb is not None and target_size_mb <= 0:
+        raise HTTPException(status_code=400, detail="Target size must be positive")
+    
     task_id = create_task(file.filename, "video_compress")
     
     input_ext = Path(file.filename).suffix.lstrip(".") or "mp4"
     input_path = get_input_path(task_id, input_ext)
-    await save_upload_file(file, input_path)
+    await save_upload_file(file, input_path, "video", task_id=task_id)
     
     update_task(
         task_id,
@@ -432,6 +455,7 @@ async def compress_video(
         input_path=input_path,
         params={
             "quality": quality,
+            "target_size": int(target_size_mb * 1024 * 1024) if target_size_mb else None,
         }
     )
     
@@ -451,30 +475,12 @@ def process_video_rotate(task_id: str, input_path: Path, original_filename: str,
         ext = input_path.suffix.lstrip(".")
         output_path = get_output_path(task_id, ext)
         
-        # Build rotation filter
-        if rotation == "90":
-            vf = "transpose=1"  # 90 clockwise
-        elif rotation == "180":
-            vf = "transpose=1,transpose=1"  # 180
-        elif rotation == "270":
-            vf = "transpose=2"  # 90 counter-clockwise
-        elif rotation == "hflip":
-            vf = "hflip"  # Horizontal flip
-        elif rotation == "vflip":
-            vf = "vflip"  # Vertical flip
-        else:
-            vf = "transpose=1"  # Default 90 clockwise
-        
-        ffmpeg_args = [
-            "-i", str(input_path),
-            "-vf", vf,
-            "-c:a", "copy",
-            str(output_path),
-        ]
+        # transpose / flip filter, audio copied
+        ffmpeg_args = rotate_spec(rotation, ext).local_args(input_path, output_path)
         
         update_task(task_id, progress_percent=30)
         
-        success, error = run_ffmpeg(ffmpeg_args)
+        success, error = run_ffmpeg(ffmpeg_args, task_id=task_id)
         
         if not success:
             raise Exception(f"FFmpeg error: {error}")
@@ -517,7 +523,7 @@ async def rotate_video(
     
     input_ext = Path(file.filename).suffix.lstrip(".") or "mp4"
     input_path = get_input_path(task_id, input_ext)
-    await save_upload_file(file, input_path)
+    await save_upload_file(file, input_path, "video", task_id=task_id)
     
     update_task(
         task_id,
@@ -560,7 +566,11 @@ def process_video_merge(task_id: str, input_path: Path, original_filename: str,
         
         update_task(task_id, progress_percent=30)
         
-        success, error = run_ffmpeg(ffmpeg_args)
+        # Concat lists can't be probed as a whole - sum the parts
+        durations = [probe_duration(path) for path in input_paths]
+        total_duration = sum(durations) if all(durations) else None
+        
+        success, error = run_ffmpeg(ffmpeg_args, task_id=task_id, duration=total_duration)
         
         # Clean up concat file
         concat_file.unlink(missing_ok=True)
@@ -608,7 +618,7 @@ async def merge_videos(
     for i, file in enumerate(files):
         input_ext = Path(file.filename).suffix.lstrip(".") or "mp4"
         input_path = settings.TEMP_DIR / f"{task_id}_input_{i}.{input_ext}"
-        await save_upload_file(file, input_path)
+        await save_upload_file(file, input_path, "video", task_id=task_id if i == 0 else None)
         input_paths.append(str(input_path))
         original_filenames.append(file.filename)
     
@@ -649,48 +659,22 @@ def process_video_to_gif(task_id: str, input_path: Path, original_filename: str,
         if not width or width <= 0:
             width = 640  # Default cap for good GIF quality + reasonable speed
             
+        preview = params.get("preview", False)
         output_path = get_output_path(task_id, "gif")
         
-        # Build FFmpeg command with optimized ordering
-        ffmpeg_args = []
-        
-        # Add start time BEFORE input (faster seeking)
-        if start_time:
-            ffmpeg_args.extend(["-ss", start_time])
-        
-        ffmpeg_args.extend(["-i", str(input_path)])
-        
-        # Add duration AFTER input
-        if duration:
-            ffmpeg_args.extend(["-t", duration])
-        
-        # Build HIGH QUALITY filter string with speed optimizations
-        # Scale FIRST (before palette) for faster processing
-        filters = [
-            f"fps={fps}",
-            f"scale={width}:-1:flags=lanczos",
-            "split[s0][s1]",
-            "[s0]palettegen=max_colors=256:stats_mode=full[p]",  # Full 256 colors for quality
-            "[s1][p]paletteuse=dither=floyd_steinberg"  # Best quality dithering
-        ]
-        
-        # Join filters properly for the split/palette complex filter
-        filter_str = f"{filters[0]},{filters[1]},{filters[2]};{filters[3]};{filters[4]}"
-        
-        ffmpeg_args.extend(["-filter_complex", filter_str])
-        ffmpeg_args.append(str(output_path))
-        
-        update_task(task_id, progress_percent=30)
-        
-        success, error = run_ffmpeg(ffmpeg_args, timeout=600)  # Increased timeout
-        
-        if not success:
-            raise Exception(f"FFmpeg error: {error}")
+        # fps + lanczos scale, then a full-stats palette - frames and palette cached per clip
+        task = get_task(task_id) or {}
+        report = make_gif(
+            input_path, output_path, fps, width, start_time, duration,
+            preview=preview,
+            input_digest=(task.get("input_info") or {}).get("sha256"),
+            task_id=task_id,
+        )
         
         update_task(task_id, progress_percent=90)
         
         original_stem = Path(original_filename).stem
-        output_filename = f"{original_stem}.gif"
+        output_filename = f"{original_stem}_preview.gif" if preview else f"{original_stem}.gif"
         
         update_task(
             task_id,
@@ -699,6 +683,7 @@ def process_video_to_gif(task_id: str, input_path: Path, original_filename: str,
             output_filename=output_filename,
             output_path=output_path,
             file_size=output_path.stat().st_size,
+            metrics=report,
         )
         
         logger.info(f"Video to GIF complete: {task_id}")
@@ -715,6 +700,7 @@ async def video_to_gif(
     width: int = Form(default=None),
     start_time: str = Form(default=None),
     duration: str = Form(default=None),
+    preview: bool = Form(default=False),  # Quick low-fps, small render + full-size estimate
 ):
     """Convert video to animated GIF"""
     if fps < 5 or fps > 30:
@@ -724,14 +710,14 @@ async def video_to_gif(
     
     input_ext = Path(file.filename).suffix.lstrip(".") or "mp4"
     input_path = get_input_path(task_id, input_ext)
-    await save_upload_file(file, input_path)
+    await save_upload_file(file, input_path, "video", task_id=task_id)
     
     update_task(
         task_id,
         status=TaskStatus.UPLOADED,
         progress_percent=100,
         input_path=input_path,
-        params={"fps": fps, "width": width, "start_time": start_time, "duration": duration}
+        params={"fps": fps, "width": width, "start_time": start_time, "duration": duration, "preview": preview}
     )
     
     return {"task_id": task_id, "message": "File uploaded successfully"}
@@ -747,38 +733,16 @@ def process_video_speed(task_id: str, input_path: Path, original_filename: str,
         ext = input_path.suffix.lstrip(".")
         output_path = get_output_path(task_id, ext)
         
-        # Calculate video and audio tempo
-        video_pts = 1.0 / speed_factor
-        audio_tempo = speed_factor
-        
-        ffmpeg_args = ["-i", str(input_path)]
-        
-        if preserve_audio:
-            # Adjust both video and audio speed
-            # Audio tempo filter has limits (0.5 to 2.0), chain if needed
-            if audio_tempo <= 0.5 or audio_tempo >= 2.0:
-                # For extreme speeds, just remove audio
-                ffmpeg_args.extend([
-                    "-vf", f"setpts={video_pts}*PTS",
-                    "-an",
-                ])
-            else:
-                ffmpeg_args.extend([
-                    "-vf", f"setpts={video_pts}*PTS",
-                    "-af", f"atempo={audio_tempo}",
-                ])
-        else:
-            # Speed up video, remove audio
-            ffmpeg_args.extend([
-                "-vf", f"setpts={video_pts}*PTS",
-                "-an",
-            ])
-        
-        ffmpeg_args.append(str(output_path))
+        # setpts for video, atempo for audio (dropped outside atempo's 0.5 - 2.0)
+        ffmpeg_args = speed_spec(speed_factor, preserve_audio, ext).local_args(input_path, output_path)
         
         update_task(task_id, progress_percent=30)
         
-        success, error = run_ffmpeg(ffmpeg_args)
+        # Output runs 1/speed_factor as long as the input
+        input_duration = probe_duration(input_path)
+        output_duration = input_duration / speed_factor if input_duration else None
+        
+        success, error = run_ffmpeg(ffmpeg_args, task_id=task_id, duration=output_duration)
         
         if not success:
             raise Exception(f"FFmpeg error: {error}")
@@ -818,7 +782,7 @@ async def change_video_speed(
     
     input_ext = Path(file.filename).suffix.lstrip(".") or "mp4"
     input_path = get_input_path(task_id, input_ext)
-    await save_upload_file(file, input_path)
+    await save_upload_file(file, input_path, "video", task_id=task_id)
     
     update_task(
         task_id,
@@ -839,16 +803,12 @@ def process_video_mute(task_id: str, input_path: Path, original_filename: str, *
         ext = input_path.suffix.lstrip(".")
         output_path = get_output_path(task_id, ext)
         
-        ffmpeg_args = [
-            "-i", str(input_path),
-            "-c:v", "copy",
-            "-an",  # Remove audio
-            str(output_path),
-        ]
+        # Video stream copied, audio removed
+        ffmpeg_args = mute_spec(ext).local_args(input_path, output_path)
         
         update_task(task_id, progress_percent=30)
         
-        success, error = run_ffmpeg(ffmpeg_args)
+        success, error = run_ffmpeg(ffmpeg_args, task_id=task_id)
         
         if not success:
             raise Exception(f"FFmpeg error: {error}")
@@ -883,7 +843,7 @@ async def mute_video(
     
     input_ext = Path(file.filename).suffix.lstrip(".") or "mp4"
     input_path = get_input_path(task_id, input_ext)
-    await save_upload_file(file, input_path)
+    await save_upload_file(file, input_path, "video", task_id=task_id)
     
     update_task(
         task_id,
@@ -911,32 +871,13 @@ def process_add_music(task_id: str, input_path: Path, original_filename: str, **
         
         output_path = get_output_path(task_id, "mp4")
         
-        if replace_audio:
-            # Replace original audio entirely
-            ffmpeg_args = [
-                "-i", str(video_path),
-                "-i", str(audio_path),
-                "-c:v", "copy",
-                "-map", "0:v:0",
-                "-map", "1:a:0",
-                "-shortest",
-                str(output_path),
-            ]
-        else:
-            # Mix original audio with new audio
-            volume_filter = f"[1:a]volume={audio_volume}[a1];[0:a][a1]amix=inputs=2:duration=first"
-            ffmpeg_args = [
-                "-i", str(video_path),
-                "-i", str(audio_path),
-                "-c:v", "copy",
-                "-filter_complex", volume_filter,
-                "-shortest",
-                str(output_path),
-            ]
+        # Video copied; new audio replaces the original or is mixed in at audio_volume
+        spec = add_music_spec(str(audio_path), replace_audio, audio_volume)
+        ffmpeg_args = spec.local_args(video_path, output_path)
         
         update_task(task_id, progress_percent=30)
         
-        success, error = run_ffmpeg(ffmpeg_args)
+        success, error = run_ffmpeg(ffmpeg_args, task_id=task_id)
         
         if not success:
             raise Exception(f"FFmpeg error: {error}")
@@ -975,12 +916,12 @@ async def add_music_to_video(
     # Save video
     video_ext = Path(video.filename).suffix.lstrip(".") or "mp4"
     video_path = get_input_path(task_id, video_ext)
-    await save_upload_file(video, video_path)
+    await save_upload_file(video, video_path, "video", task_id=task_id)
     
     # Save audio
     audio_ext = Path(audio.filename).suffix.lstrip(".") or "mp3"
     audio_path = settings.TEMP_DIR / f"{task_id}_audio.{audio_ext}"
-    await save_upload_file(audio, audio_path)
+    await save_upload_file(audio, audio_path, "audio")
     
     update_task(
         task_id,
@@ -1002,76 +943,55 @@ async def extract_video_metadata(
     file: UploadFile = File(...),
 ):
     """Extract metadata from video file (synchronous)"""
-    import json
-    
     try:
         # Save file temporarily
         ext = Path(file.filename).suffix.lstrip(".") or "mp4"
         temp_path = settings.TEMP_DIR / f"temp_metadata_{file.filename}"
-        content = await file.read()
-        temp_path.write_bytes(content)
+        await save_upload_file(file, temp_path, "video", validate=False)
         
         # Use ffprobe to get metadata
-        result = subprocess.run(
-            [
-                "ffprobe",
-                "-v", "quiet",
-                "-print_format", "json",
-                "-show_format",
-                "-show_streams",
-                str(temp_path)
-            ],
-            capture_output=True,
-            text=True,
-            timeout=30,
-        )
-        
-        # Clean up
-        temp_path.unlink(missing_ok=True)
-        
-        if result.returncode != 0:
+        try:
+            info = await probe_media(temp_path)
+        except ProbeError as e:
+            timed_out = "timeout" in str(e).lower()
             return {
                 "success": False,
-                "error": "Failed to read video metadata",
+                "error": "Metadata extraction timed out" if timed_out else "Failed to read video metadata",
                 "filename": file.filename
             }
+        finally:
+            # Clean up
+            temp_path.unlink(missing_ok=True)
         
-        data = json.loads(result.stdout)
-        
-        # Extract relevant info
-        format_info = data.get("format", {})
-        streams = data.get("streams", [])
-        
-        video_stream = next((s for s in streams if s.get("codec_type") == "video"), {})
-        audio_stream = next((s for s in streams if s.get("codec_type") == "audio"), {})
+        video_stream = info.video
+        audio_stream = info.audio
+        duration = info.duration or 0
         
         metadata = {
             "success": True,
             "filename": file.filename,
-            "format": format_info.get("format_long_name", "Unknown"),
-            "duration": float(format_info.get("duration", 0)),
-            "duration_formatted": f"{int(float(format_info.get('duration', 0)) // 60)}:{int(float(format_info.get('duration', 0)) % 60):02d}",
-            "size_bytes": int(format_info.get("size", 0)),
-            "bitrate": int(format_info.get("bit_rate", 0)),
+            "format": info.format_long_name or "Unknown",
+            "duration": duration,
+            "duration_formatted": f"{int(duration // 60)}:{int(duration % 60):02d}",
+            "size_bytes": info.size or 0,
+            "bitrate": info.bit_rate or 0,
             "video": {
-                "codec": video_stream.get("codec_name", "Unknown"),
-                "width": video_stream.get("width", 0),
-                "height": video_stream.get("height", 0),
-                "fps": eval(video_stream.get("r_frame_rate", "0/1")) if video_stream.get("r_frame_rate") else 0,
-                "aspect_ratio": video_stream.get("display_aspect_ratio", "Unknown"),
+                "codec": video_stream.codec_name if video_stream else "Unknown",
+                "width": (video_stream.width if video_stream else 0) or 0,
+                "height": (video_stream.height if video_stream else 0) or 0,
+                "fps": (video_stream.fps if video_stream else 0) or 0,
+                "aspect_ratio": (video_stream.display_aspect_ratio if video_stream else None) or "Unknown",
             },
             "audio": {
-                "codec": audio_stream.get("codec_name", "Unknown"),
-                "channels": audio_stream.get("channels", 0),
-                "sample_rate": audio_stream.get("sample_rate", "Unknown"),
+                "codec": audio_stream.codec_name if audio_stream else "Unknown",
+                "channels": (audio_stream.channels if audio_stream else 0) or 0,
+                "sample_rate": (audio_stream.sample_rate if audio_stream else None) or "Unknown",
             },
-            "tags": format_info.get("tags", {}),
+            "tags": info.tags,
         }
         
         return metadata
         
-    except subprocess.TimeoutExpired:
-        return {"success": False, "error": "Metadata extraction timed out", "filename": file.filename}
     except FileNotFoundError:
         return {"success": False, "error": "ffprobe not installed", "filename": file.filename}
     except Exception as e:
@@ -1084,69 +1004,53 @@ async def find_video_source(
     file: UploadFile = File(...),
 ):
     """Find original source of a video using Google Vision API reverse search"""
-    import hashlib
-    import json as json_module
+    import json
+    import uuid
     import base64
     
     try:
-        content = await file.read()
-        file_hash = hashlib.md5(content[:1024*1024]).hexdigest()[:8]
-        
-        # Save video temporarily
+        # Stream to disk, hashing on the way (no full read into memory)
         ext = Path(file.filename).suffix.lstrip(".") or "mp4"
-        temp_path = settings.TEMP_DIR / f"temp_finder_{file_hash}.{ext}"
-        temp_path.write_bytes(content)
+        temp_path = settings.TEMP_DIR / f"temp_finder_{uuid.uuid4().hex}.{ext}"
+        record = await save_upload_file(file, temp_path, "video")
+        file_hash = record.sha256[:8]
+        size_mb = record.size / (1024 * 1024)
+        
+        # Same clip looked up before: answer from the cache
+        cache_path = settings.TEMP_DIR / f"aifinder_{record.sha256[:32]}.json"
+        if cache_path.exists():
+            temp_path.unlink(missing_ok=True)
+            cached = json.loads(cache_path.read_text())
+            cache_path.touch()
+            return {**cached, "filename": file.filename, "file_size_mb": round(size_mb, 2), "cached": True}
         
         # Get video duration
-        duration = 0
-        try:
-            result = subprocess.run(
-                ["ffprobe", "-v", "quiet", "-print_format", "json", "-show_format", str(temp_path)],
-                capture_output=True, text=True, timeout=30,
-            )
-            if result.returncode == 0:
-                data = json_module.loads(result.stdout)
-                duration = float(data.get("format", {}).get("duration", 0))
-        except:
-            pass
+        duration = await probe_duration_async(temp_path) or 0
         
-        size_mb = len(content) / (1024 * 1024)
         results = []
         api_used = "none"
         
         # Try Google Vision API if key is configured
         if settings.GOOGLE_VISION_API_KEY:
             try:
-                # Extract a frame from the video (at 1 second or middle)
-                frame_time = min(1, duration / 2) if duration > 0 else 0
-                frame_path = settings.TEMP_DIR / f"temp_frame_{file_hash}.jpg"
+                # Keyframes spread over the clip, one seek + one keyframe decode each
+                frame_paths = await sample_keyframes(
+                    temp_path, record.sha256, count=max(1, settings.AI_FINDER_SAMPLE_FRAMES)
+                )
                 
-                frame_result = subprocess.run([
-                    "ffmpeg", "-y",
-                    "-ss", str(frame_time),
-                    "-i", str(temp_path),
-                    "-vframes", "1",
-                    "-q:v", "2",
-                    str(frame_path)
-                ], capture_output=True, timeout=30)
-                
-                if frame_result.returncode == 0 and frame_path.exists():
-                    # Read frame and encode to base64
-                    frame_content = frame_path.read_bytes()
-                    frame_base64 = base64.b64encode(frame_content).decode('utf-8')
-                    
-                    # Call Google Vision API
+                if frame_paths:
+                    # Call Google Vision API (one batch request for all frames)
                     import httpx
                     
                     vision_url = f"https://vision.googleapis.com/v1/images:annotate?key={settings.GOOGLE_VISION_API_KEY}"
                     
                     request_body = {
                         "requests": [{
-                            "image": {"content": frame_base64},
+                            "image": {"content": base64.b64encode(frame_path.read_bytes()).decode('utf-8')},
                             "features": [
                                 {"type": "WEB_DETECTION", "maxResults": 10}
                             ]
-                        }]
+                        } for frame_path in frame_paths]
                     }
                     
                     async with httpx.AsyncClient(timeout=30) as client:
@@ -1154,63 +1058,65 @@ async def find_video_source(
                         
                         if response.status_code == 200:
                             vision_data = response.json()
-                            web_detection = vision_data.get("responses", [{}])[0].get("webDetection", {})
+                            seen_urls = set()
                             
-                            # Parse web entities
-                            web_entities = web_detection.get("webEntities", [])
-                            pages_with_matching = web_detection.get("pagesWithMatchingImages", [])
-                            full_matching = web_detection.get("fullMatchingImages", [])
-                            partial_matching = web_detection.get("partialMatchingImages", [])
-                            
-                            # Build results from pages with matching images
-                            for page in pages_with_matching[:5]:
-                                url = page.get("url", "")
-                                title = page.get("pageTitle", "Unknown")
+                            for frame_response in vision_data.get("responses", []):
+                                web_detection = frame_response.get("webDetection", {})
                                 
-                                # Determine platform
-                                platform = "Web"
-                                if "youtube.com" in url or "youtu.be" in url:
-                                    platform = "YouTube"
-                                elif "tiktok.com" in url:
-                                    platform = "TikTok"
-                                elif "instagram.com" in url:
-                                    platform = "Instagram"
-                                elif "facebook.com" in url or "fb.com" in url:
-                                    platform = "Facebook"
-                                elif "twitter.com" in url or "x.com" in url:
-                                    platform = "Twitter/X"
-                                elif "vimeo.com" in url:
-                                    platform = "Vimeo"
+                                # Parse web entities
+                                pages_with_matching = web_detection.get("pagesWithMatchingImages", [])
+                                full_matching = web_detection.get("fullMatchingImages", [])
                                 
-                                results.append({
-                                    "title": title[:100] if title else "Untitled",
-                                    "url": url,
-                                    "platform": platform,
-                                    "similarity": 90,  # Google doesn't give exact similarity
-                                    "type": "page_match"
-                                })
-                            
-                            # Add full matches
-                            for match in full_matching[:3]:
-                                results.append({
-                                    "title": "Exact Image Match",
-                                    "url": match.get("url", ""),
-                                    "platform": "Web",
-                                    "similarity": 99,
-                                    "type": "full_match"
-                                })
-                            
-                            # Add best guess labels
-                            best_guess = web_detection.get("bestGuessLabels", [])
+                                # Build results from pages with matching images
+                                for page in pages_with_matching[:5]:
+                                    url = page.get("url", "")
+                                    title = page.get("pageTitle", "Unknown")
+                                    if url in seen_urls:
+                                        continue
+                                    seen_urls.add(url)
+                                    
+                                    # Determine platform
+                                    platform = "Web"
+                                    if "youtube.com" in url or "youtu.be" in url:
+                                        platform = "YouTube"
+                                    elif "tiktok.com" in url:
+                                        platform = "TikTok"
+                                    elif "instagram.com" in url:
+                                        platform = "Instagram"
+                                    elif "facebook.com" in url or "fb.com" in url:
+                                        platform = "Facebook"
+                                    elif "twitter.com" in url or "x.com" in url:
+                                        platform = "Twitter/X"
+                                    elif "vimeo.com" in url:
+                                        platform = "Vimeo"
+                                    
+                                    results.append({
+                                        "title": title[:100] if title else "Untitled",
+                                        "url": url,
+                                        "platform": platform,
+                                        "similarity": 90,  # Google doesn't give exact similarity
+                                        "type": "page_match"
+                                    })
+                                
+                                # Add full matches
+                                for match in full_matching[:3]:
+                                    url = match.get("url", "")
+                                    if url in seen_urls:
+                                        continue
+                                    seen_urls.add(url)
+                                    results.append({
+                                        "title": "Exact Image Match",
+                                        "url": url,
+                                        "platform": "Web",
+                                        "similarity": 99,
+                                        "type": "full_match"
+                                    })
                             
                             api_used = "google_vision"
                             logger.info(f"Google Vision API returned {len(results)} results")
                         else:
                             logger.warning(f"Google Vision API error: {response.status_code} - {response.text}")
                     
-                    # Cleanup frame
-                    frame_path.unlink(missing_ok=True)
-                    
             except Exception as vision_error:
                 logger.warning(f"Google Vision API failed: {vision_error}")
         
@@ -1235,7 +1141,7 @@ async def find_video_source(
         # Cleanup temp video
         temp_path.unlink(missing_ok=True)
         
-        return {
+        response_data = {
             "success": True,
             "filename": file.filename,
             "file_size_mb": round(size_mb, 2),
@@ -1245,8 +1151,12 @@ async def find_video_source(
             "note": "Real results from Google Vision API" if api_used == "google_vision" else "Simulated results. Set GOOGLE_VISION_API_KEY for real reverse search."
         }
         
-    except subprocess.TimeoutExpired:
-        return {"success": False, "error": "Analysis timed out", "filename": file.filename, "results": []}
+        # A failed Vision call is retried next time instead of cached as simulated
+        if api_used == "google_vision" or not settings.GOOGLE_VISION_API_KEY:
+            cache_path.write_text(json.dumps(response_data))
+        
+        return response_data
+        
     except Exception as e:
         logger.error(f"AI video finder failed: {e}")
         return {"success": False, "error": str(e), "filename": file.filename, "results": []}
@@ -1257,10 +1167,7 @@ async def find_video_source(
 # ============================================================================
 
 def process_video_to_frames(task_id: str, input_path: Path, original_filename: str, **params):
-    """Background task: Extract frames from video and create ZIP"""
-    import zipfile
-    import shutil
-    
+    """Background task: Extract frames from video and stream them into a ZIP"""
     try:
         update_task(task_id, status=TaskStatus.PROCESSING, progress_percent=10)
         
@@ -1268,10 +1175,6 @@ def process_video_to_frames(task_id: str, input_path: Path, original_filename: s
         frame_rate = params.get("frame_rate")  # None = all frames, else fps value
         quality = params.get("quality", 95)  # For JPG
         
-        # Create temp folder for frames
-        frames_folder = settings.TEMP_DIR / f"{task_id}_frames"
-        frames_folder.mkdir(exist_ok=True)
-        
         # Build FFmpeg command - OPTIMIZED FOR SPEED
         ffmpeg_args = [
             "-threads", "0",           # Use all CPU cores
@@ -1284,53 +1187,48 @@ def process_video_to_frames(task_id: str, input_path: Path, original_filename: s
         
         # Output settings based on format - SPEED OPTIMIZED
         if output_format == "png":
-            frame_pattern = str(frames_folder / "frame_%05d.png")
             ffmpeg_args.extend([
                 "-compression_level", "1",  # Fastest PNG compression
-                frame_pattern
             ])
         else:
             # JPG with quality setting - TURBO MODE
-            frame_pattern = str(frames_folder / "frame_%05d.jpg")
             ffmpeg_args.extend([
                 "-q:v", str(max(2, min(10, (100 - quality) // 10))),  # Faster quality calc
                 "-qmin", "1",
                 "-qmax", "10",
-                frame_pattern
             ])
         
-        update_task(task_id, progress_percent=20)
-        
-        success, error = run_ffmpeg(ffmpeg_args, timeout=600)
+        # Expected frame count, for progress while frames stream in
+        expected_frames = None
+        try:
+            info = probe_media_sync(input_path)
+            fps = frame_rate if frame_rate and frame_rate > 0 else (info.video.fps if info.video else None)
+            if info.duration and fps:
+                expected_frames = info.duration * fps
+        except ProbeError:
+            pass
         
-        if not success:
-            shutil.rmtree(frames_folder, ignore_errors=True)
-            raise Exception(f"FFmpeg error: {error}")
+        def on_progress(frame_count: int):
+            if expected_frames:
+                update_task(task_id, progress_percent=20 + int(70 * min(frame_count / expected_frames, 1.0)))
         
-        update_task(task_id, progress_percent=60)
+        update_task(task_id, progress_percent=20)
         
-        # Count extracted frames
-        frame_files = sorted(frames_folder.glob(f"*.{output_format}"))
-        frame_count = len(frame_files)
+        # Frames go from FFmpeg's pipe straight into a stored (uncompressed) ZIP
+        output_path = get_output_path(task_id, "zip")
+        frame_count = frames_to_zip_sync(
+            ffmpeg_args, output_format, output_path,
+            timeout=600, task_id=task_id, on_progress=on_progress,
+        )
         
         if frame_count == 0:
-            shutil.rmtree(frames_folder, ignore_errors=True)
+            output_path.unlink(missing_ok=True)
             raise Exception("No frames extracted from video")
         
         logger.info(f"Extracted {frame_count} frames for task {task_id}")
         
-        # Create ZIP archive
-        output_path = get_output_path(task_id, "zip")
-        
-        with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as zf:
-            for frame_file in frame_files:
-                zf.write(frame_file, frame_file.name)
-        
         update_task(task_id, progress_percent=90)
         
-        # Clean up frames folder
-        shutil.rmtree(frames_folder, ignore_errors=True)
-        
         original_stem = Path(original_filename).stem
         output_filename = f"{original_stem}_frames_{frame_count}.zip"
         
@@ -1372,7 +1270,7 @@ async def video_to_frames(
     
     input_ext = Path(file.filename).suffix.lstrip(".") or "mp4"
     input_path = get_input_path(task_id, input_ext)
-    await save_upload_file(file, input_path)
+    await save_upload_file(file, input_path, "video", task_id=task_id)
     
     update_task(
         task_id,
@@ -0,0 +1,35 @@
+"""
+Shared credential check - the HTTP security middleware (main.py) and the
+task WebSocket (routes/events.py) accept the same two credentials.
+"""
+
+import logging
+from typing import Optional
+
+import jwt
+
+from config import get_settings
+
+logger = logging.getLogger("magetool")
+settings = get_settings()
+
+
+def credentials_valid(secret: Optional[str], token: Optional[str], client: str = "") -> bool:
+    """
+    True for the legacy X-Magetool-Secret value (admin / internal) or a
+    JWT signed with the same secret (user / frontend).
+    """
+    # A) Legacy secret header
+    if secret and secret == settings.API_SECRET:
+        return True
+
+    # B) JWT token
+    if token:
+        try:
+            jwt.decode(token, settings.API_SECRET, algorithms=["HS256"])
+            return True
+        except jwt.ExpiredSignatureError:
+            logger.warning(f"⛔ Blocked expired token from {client}")
+        except jwt.InvalidTokenError:
+            logger.warning(f"⛔ Blocked invalid token from {client}")
+    return False
@@ -0,0 +1,316 @@
+"""
+Chunk Scheduler
+===============
+Work-stealing scheduler for distributed chunk jobs.
+
+The video is cut into many more chunks than workers. Chunks enter a
+shared queue as the splitter closes them, and every worker pulls the
+next one as soon as it is free, so fast workers simply do more chunks.
+
+- failed chunks go back to the front of the queue (CLUSTER_MAX_ATTEMPTS)
+- a worker that fails CLUSTER_WORKER_MAX_FAILURES chunks in a row is
+  dropped from the job
+- an idle worker with an empty queue steals a straggler: a chunk that
+  has run CLUSTER_SPECULATE_FACTOR x longer than expected is re-executed
+  speculatively, the first copy to finish wins and the other is cancelled
+- when no remote worker is left, local encoders take over the queue
+
+Per-worker throughput (media seconds per wall second, EWMA) is kept in
+WorkerStats across jobs; it drives the speculation threshold and the
+orchestrator's chunk sizing. Workers are listed least loaded first and
+may get several pullers (slots) when their /health shows idle capacity.
+"""
+
+import time
+import asyncio
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional, List, Dict, Callable, Awaitable, Deque
+
+from config import get_settings
+
+logger = logging.getLogger("magetool.cluster")
+settings = get_settings()
+
+# Executor name used for attempts encoded on this node
+LOCAL = "local"
+
+# Weight of the newest sample in the throughput average
+THROUGHPUT_EWMA_ALPHA = 0.3
+
+# Never speculate on a chunk that has run less than this
+MIN_SPECULATE_SECONDS = 10.0
+
+# How often idle pullers re-check for stragglers
+IDLE_POLL_SECONDS = 1.0
+
+
+# ==========================================
+# WORKER STATS
+# ==========================================
+@dataclass
+class WorkerStats:
+    """Throughput history of one worker (kept across jobs)"""
+    url: str
+    throughput: Optional[float] = None  # media seconds encoded per wall second (EWMA)
+    completed: int = 0
+    failed: int = 0
+    consecutive_failures: int = 0
+
+    def record_success(self, media_seconds: float, wall_seconds: float):
+        self.completed += 1
+        self.consecutive_failures = 0
+        if media_seconds > 0 and wall_seconds > 0:
+            sample = media_seconds / wall_seconds
+            if self.throughput is None:
+                self.throughput = sample
+            else:
+                self.throughput += THROUGHPUT_EWMA_ALPHA * (sample - self.throughput)
+
+    def record_failure(self):
+        self.failed += 1
+        self.consecutive_failures += 1
+
+    def expected_seconds(self, media_seconds: float) -> Optional[float]:
+        if not self.throughput:
+            return None
+        return media_seconds / self.throughput
+
+
+@dataclass
+class _Attempt:
+    executor: str
+    number: int
+    started: float
+    task: Optional[asyncio.Task] = None
+
+
+@dataclass
+class _ChunkState:
+    chunk: "object"  # services.cluster.VideoChunk
+    attempts: int = 0
+    running: List[_Attempt] = field(default_factory=list)
+    done: bool = False
+    last_error: Optional[str] = None
+
+
+class ChunkJobFailed(Exception):
+    """A chunk ran out of attempts"""
+
+
+# ==========================================
+# SCHEDULER
+# ==========================================
+class ChunkScheduler:
+    """
+    Runs chunks on remote workers (and locally as a fallback).
+
+    run_attempt(chunk, executor, attempt_number) encodes one chunk on
+    `executor` (a worker URL or LOCAL) and returns the output path; it
+    must clean up after itself when cancelled.
+    """
+
+    def __init__(
+        self,
+        workers: List[str],
+        run_attempt: Callable[[object, str, int], Awaitable[Path]],
+        stats: Dict[str, WorkerStats],
+        local_workers: int = 1,
+        on_chunk_done: Optional[Callable[[int, int], None]] = None,
+        slots: Optional[Dict[str, int]] = None,
+    ):
+        self.workers = list(workers)  # pullers start in this order (least loaded first)
+        self.slots = slots or {}  # chunks in flight per worker, default 1
+        self.run_attempt = run_attempt
+        self.stats = stats
+        self.local_workers = max(1, local_workers)
+        self.on_chunk_done = on_chunk_done
+
+        self.max_attempts = settings.CLUSTER_MAX_ATTEMPTS
+        self.max_worker_failures = settings.CLUSTER_WORKER_MAX_FAILURES
+        self.speculate_factor = settings.CLUSTER_SPECULATE_FACTOR
+
+        self._states: List[_ChunkState] = []
+        self._pending: Deque[_ChunkState] = deque()
+        self._closed = False
+        self._error: Optional[str] = None
+        self._wakeup = asyncio.Event()
+        self._alive = set(self.workers)
+        self._local_started = False
+        self._pullers: List[asyncio.Task] = []
+
+        # Reporting
+        self.retries = 0
+        self.speculative_runs = 0
+        self.local_chunks = 0
+
+    # ---------- feeding ----------
+    def add(self, chunk):
+        """Queue a chunk (called as the splitter closes each one)"""
+        state = _ChunkState(chunk)
+        self._states.append(state)
+        self._pending.append(state)
+        self._notify()
+
+    def close(self):
+        """No more chunks will be added"""
+        self._closed = True
+        self._notify()
+
+    def _notify(self):
+        self._wakeup.set()
+
+    # ---------- running ----------
+    def _finished(self) -> bool:
+        if self._error is not None:
+            return True
+        return self._closed and all(s.done for s in self._states)
+
+    async def run(self) -> List[object]:
+        """Process every chunk; returns them in split order"""
+        for url in self.workers:
+            self.stats.setdefault(url, WorkerStats(url))
+            self._pullers.append(asyncio.ensure_future(self._puller(url)))
+        # Extra slots of idle workers join after every worker has its first chunk
+        for url in self.workers:
+            for _ in range(self.slots.get(url, 1) - 1):
+                self._pullers.append(asyncio.ensure_future(self._puller(url)))
+        if not self.workers:
+            self._start_local()
+
+        try:
+            while not self._finished():
+                self._wakeup.clear()
+                if not self._finished():
+                    await self._wakeup.wait()
+        finally:
+            # asyncio.wait() in the pullers does not cancel the attempt it
+            # waits on: stop in-flight encodes too, or they outlive the job
+            attempts = [a.task for s in self._states for a in s.running if a.task is not None]
+            for task in attempts + self._pullers:
+                task.cancel()
+            await asyncio.gather(*attempts, *self._pullers, return_exceptions=True)
+
+        if self._error is not None:
+            raise ChunkJobFailed(self._error)
+        return [s.chunk for s in self._states]
+
+    def _start_local(self):
+        if self._local_started:
+            return
+        self._local_started = True
+        logger.warning("No remote workers left, encoding remaining chunks locally")
+        for _ in range(self.local_workers):
+            self._pullers.append(asyncio.ensure_future(self._puller(LOCAL)))
+
+    def _expected_seconds(self, state: _ChunkState, executor: str) -> Optional[float]:
+        stats = self.stats.get(executor)
+        expected = stats.expected_seconds(state.chunk.duration) if stats else None
+        if expected is None:
+            # Unknown worker: compare against chunks already finished in this job
+            known = [s.expected_seconds(state.chunk.duration) for s in self.stats.values()]
+            known = [k for k in known if k]
+            expected = max(known) if known else None
+        return expected
+
+    def _find_straggler(self, executor: str) -> Optional[_ChunkState]:
+        now = time.monotonic()
+        for state in self._states:
+            if state.done or len(state.running) != 1:
+                continue
+            attempt = state.running[0]
+            if attempt.executor == executor:
+                continue
+            elapsed = now - attempt.started
+            expected = self._expected_seconds(state, attempt.executor)
+            if expected is None:
+                continue
+            if elapsed > max(expected * self.speculate_factor, MIN_SPECULATE_SECONDS):
+                return state
+        return None
+
+    async def _next(self, executor: str) -> Optional[_ChunkState]:
+        while not self._finished():
+            if self._pending:
+                return self._pending.popleft()
+            if self._closed:
+                straggler = self._find_straggler(executor)
+                if straggler is not None:
+                    self.speculative_runs += 1
+                    logger.info(f"Speculatively re-running {straggler.chunk.chunk_id} on {executor}")
+                    return straggler
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=IDLE_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+        return None
+
+    async def _puller(self, executor: str):
+        stats = self.stats.setdefault(executor, WorkerStats(executor))
+        while executor == LOCAL or executor in self._alive:
+            state = await self._next(executor)
+            if state is None:
+                return
+
+            state.attempts += 1
+            attempt = _Attempt(executor, state.attempts, time.monotonic())
+            attempt.task = asyncio.ensure_future(
+                self.run_attempt(state.chunk, executor, attempt.number)
+            )
+            state.running.append(attempt)
+            await asyncio.wait({attempt.task})
+            state.running.remove(attempt)
+
+            if attempt.task.cancelled():
+                continue  # Lost the race against a speculative copy
+
+            error = attempt.task.exception()
+            if error is None:
+                self._on_success(state, attempt, stats)
+                continue
+
+            stats.record_failure()
+            logger.warning(f"Chunk {state.chunk.chunk_id} failed on {executor} "
+                           f"(attempt {attempt.number}): {error}")
+            self._on_failure(state, str(error))
+
+            if executor != LOCAL and stats.consecutive_failures >= self.max_worker_failures:
+                logger.warning(f"Dropping worker {executor} after {stats.consecutive_failures} failures")
+                self._alive.discard(executor)
+                if not self._alive:
+                    self._start_local()
+                self._notify()
+                return
+
+    def _on_success(self, state: _ChunkState, attempt: _Attempt, stats: WorkerStats):
+        output_path = attempt.task.result()
+        stats.record_success(state.chunk.duration, time.monotonic() - attempt.started)
+        if state.done:
+            # Both copies finished - keep the first one
+            Path(output_path).unlink(missing_ok=True)
+            return
+
+        state.done = True
+        state.chunk.output_path = Path(output_path)
+        state.chunk.worker_url = attempt.executor
+        if attempt.executor == LOCAL:
+            self.local_chunks += 1
+        for other in state.running:
+            other.task.cancel()
+
+        if self.on_chunk_done is not None:
+            self.on_chunk_done(sum(s.done for s in self._states), len(self._states))
+        self._notify()
+
+    def _on_failure(self, state: _ChunkState, error: str):
+        state.last_error = error
+        if state.done or state.running:
+            return  # Another copy is still going (or already won)
+        if state.attempts >= self.max_attempts:
+            self._error = f"{state.chunk.chunk_id}: {error} (after {state.attempts} attempts)"
+        else:
+            self.retries += 1
+            self._pending.appendleft(state)
+        self._notify()
@@ -0,0 +1,273 @@
+"""
+Local Chunked Encoding
+======================
+Single-node counterpart of the cluster orchestrator: a long video is cut
+at keyframes, the segments are encoded in parallel on this box and the
+results are concat-merged with stream copy.
+
+- cut points come from the probe service's GOP index: every segment
+  starts on a keyframe (input seeking is exact) and segments carry about
+  equal encode cost
+- video segments and one audio pass run concurrently, bounded by the
+  process slots (PROCESS_CONCURRENCY) and LOCAL_CHUNK_WORKERS
+- audio is encoded once for the whole file - no AAC priming gaps at joins
+- progress from all encoders is summed into one task progress / ETA
+
+transcode_chunked() returns None when the input is not worth splitting
+(short, no keyframe list, single core); callers then run their usual
+single FFmpeg command.
+"""
+
+import os
+import time
+import uuid
+import shutil
+import asyncio
+import logging
+from pathlib import Path
+from typing import Optional, List, Tuple
+
+from config import get_settings
+from services.ffmpeg import ProgressTracker, PROGRESS_UPDATE_INTERVAL, _push_progress
+from services.probe import probe_media, probe_gops
+from services.process_runner import run_process, process_concurrency
+
+logger = logging.getLogger("magetool.chunked")
+settings = get_settings()
+
+# Segments per parallel encoder - keyframe snapping makes segments uneven,
+# a few extra keep every encoder busy until the end
+CHUNKS_PER_WORKER = 2
+
+# Containers whose segments concat cleanly with `-f concat -c copy`
+CHUNKABLE_FORMATS = {"mp4", "mkv", "mov", "webm"}
+
+
+# ==========================================
+# PLANNING
+# ==========================================
+def local_chunk_workers() -> int:
+    """Parallel segment encoders on this node"""
+    return max(1, settings.LOCAL_CHUNK_WORKERS or process_concurrency())
+
+
+def gop_costs(duration: float, gops: List[Tuple[float, int]]) -> List[Tuple[float, float]]:
+    """
+    Relative encode cost of each GOP: half its share of the duration
+    (frames to encode) and half its share of the compressed bytes (scene
+    complexity). Returns (start, cost) pairs summing to 1.
+    """
+    gops = sorted((t, size) for t, size in gops if 0 <= t < duration)
+    if not gops or gops[0][0] > 0:
+        gops.insert(0, (0.0, 0))
+    total_bytes = sum(size for _, size in gops)
+
+    costs = []
+    for i, (start, size) in enumerate(gops):
+        end = gops[i + 1][0] if i + 1 < len(gops) else duration
+        share = (end - start) / duration
+        if total_bytes:
+            share = 0.5 * share + 0.5 * size / total_bytes
+        costs.append((start, share))
+    return costs
+
+
+def plan_segments(
+    duration: float,
+    gops: List[Tuple[float, int]],
+    count: int,
+    min_seconds: float = 0.0,
+) -> List[Tuple[float, Optional[float]]]:
+    """
+    Split [0, duration) into at most `count` keyframe-aligned segments of
+    roughly equal encode cost (see gop_costs; equal durations when GOP
+    sizes are unknown).
+
+    Each cut is the keyframe whose cumulative cost is nearest to i/count;
+    cuts closer than min_seconds to the previous cut or to the end are
+    dropped. Returns (start, end) pairs, end None for the last segment.
+    """
+    if not duration or duration <= 0:
+        return [(0.0, None)]
+    if min_seconds > 0:
+        count = min(count, int(duration // min_seconds))
+    if count < 2:
+        return [(0.0, None)]
+
+    # Cumulative cost at each keyframe (cost of everything before it)
+    boundaries = []
+    spent = 0.0
+    for start, cost in gop_costs(duration, gops):
+        if start > 0:
+            boundaries.append((start, spent))
+        spent += cost
+    if not boundaries:
+        return [(0.0, None)]
+
+    gap = max(min_seconds, 1e-3)
+    cuts: List[float] = []
+    previous = 0.0
+    for i in range(1, count):
+        target = spent * i / count
+        nearest = min(boundaries, key=lambda b: abs(b[1] - target))[0]
+        if nearest - previous < gap or duration - nearest < gap:
+            continue
+        cuts.append(nearest)
+        previous = nearest
+
+    bounds = [0.0] + cuts
+    return [
+        (start, bounds[i + 1] if i + 1 < len(bounds) else None)
+        for i, start in enumerate(bounds)
+    ]
+
+
+# ==========================================
+# PROGRESS
+# ==========================================
+class _CombinedProgress:
+    """Sums out_time of all running encoders into one task progress"""
+
+    def __init__(self, task_id: Optional[str], total: float, count: int,
+                 progress_range: Tuple[int, int]):
+        self.task_id = task_id
+        self.total = ProgressTracker(total, progress_range)
+        self.parts = [ProgressTracker(None, interval=0) for _ in range(count)]
+        self._last_push = 0.0
+
+    def feeder(self, index: int):
+        def on_line(line: str):
+            if self.parts[index].feed(line) is None or self.task_id is None:
+                return
+            now = time.monotonic()
+            if now - self._last_push < PROGRESS_UPDATE_INTERVAL:
+                return
+            self._last_push = now
+            # Wall-clock throughput of all encoders together
+            self.total.out_time = sum(p.out_time for p in self.parts)
+            _push_progress(self.task_id, self.total.snapshot())
+        return on_line
+
+
+# ==========================================
+# ENCODING
+# ==========================================
+async def _run_ffmpeg_part(args: List[str], task_id: Optional[str], timeout: float,
+                           on_line) -> Tuple[bool, str]:
+    command = ["ffmpeg", "-y", "-nostats", "-progress", "pipe:1"] + args
+    result = await run_process(command, timeout=timeout, task_id=task_id, on_stdout_line=on_line)
+    return result.ok, result.error
+
+
+async def transcode_chunked_async(
+    input_path: Path,
+    output_path: Path,
+    video_args: List[str],
+    audio_args: List[str],
+    task_id: Optional[str] = None,
+    progress_range: Tuple[int, int] = (30, 90),
+    timeout: int = 600,
+    workers: Optional[int] = None,
+) -> Optional[Tuple[bool, str]]:
+    """
+    Encode input_path to output_path in keyframe-aligned parallel segments.
+
+    video_args / audio_args are the output options of the equivalent
+    single FFmpeg run (codec, crf, preset, filters...). Returns
+    (success, error) like run_ffmpeg(), or None if chunking doesn't pay off.
+    """
+    input_path, output_path = Path(input_path), Path(output_path)
+    workers = workers or local_chunk_workers()
+    if not settings.LOCAL_CHUNKING_ENABLED or workers < 2:
+        return None
+    if output_path.suffix.lstrip(".").lower() not in CHUNKABLE_FORMATS:
+        return None
+
+    try:
+        info = await probe_media(input_path)
+        if not info.has_video or not info.duration:
+            return None
+        # Packet timestamps include the container start offset; -ss doesn't
+        gops = [(t - info.start_time, size) for t, size in await probe_gops(input_path)]
+    except Exception as e:
+        logger.debug(f"Chunk planning skipped for {input_path.name}: {e}")
+        return None
+
+    segments = plan_segments(
+        info.duration, gops, workers * CHUNKS_PER_WORKER, settings.LOCAL_CHUNK_MIN_SECONDS
+    )
+    if len(segments) < 2:
+        return None
+
+    work_dir = settings.TEMP_DIR / f"{task_id or uuid.uuid4().hex[:12]}_chunks"
+    work_dir.mkdir(parents=True, exist_ok=True)
+    ext = output_path.suffix
+    threads = str(max(1, (os.cpu_count() or 1) // min(workers, len(segments))))
+
+    jobs = []
+    for i, (start, end) in enumerate(segments):
+        args = ["-ss", f"{start:.6f}", "-i", str(input_path)]
+        if end is not None:
+            args += ["-t", f"{end - start:.6f}"]
+        args += ["-map", "0:v:0", "-an", "-sn", "-dn"] + video_args
+        args += ["-threads", threads, str(work_dir / f"seg_{i:04d}{ext}")]
+        jobs.append(args)
+
+    audio_path = None
+    if info.has_audio:
+        audio_path = work_dir / f"audio{ext}"
+        jobs.append(["-i", str(input_path), "-map", "0:a:0", "-vn"] + audio_args + [str(audio_path)])
+
+    progress = _CombinedProgress(task_id, info.duration * (2 if audio_path else 1), len(jobs), progress_range)
+    limit = asyncio.Semaphore(workers)
+
+    async def run_job(index: int, args: List[str]) -> Tuple[bool, str]:
+        async with limit:
+            return await _run_ffmpeg_part(args, task_id, timeout, progress.feeder(index))
+
+    started = time.monotonic()
+    try:
+        running = [asyncio.ensure_future(run_job(i, args)) for i, args in enumerate(jobs)]
+        try:
+            for finished in asyncio.as_completed(running):
+                ok, error = await finished
+                if not ok:
+                    return False, error
+        finally:
+            # One failed segment fails the job - stop the others
+            for job in running:
+                job.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+
+        concat_list = work_dir / "concat.txt"
+        concat_list.write_text("".join(
+            f"file '{work_dir / f'seg_{i:04d}{ext}'}'\n" for i in range(len(segments))
+        ))
+
+        merge_args = ["-f", "concat", "-safe", "0", "-i", str(concat_list)]
+        if audio_path:
+            merge_args += ["-i", str(audio_path), "-map", "0:v:0", "-map", "1:a:0"]
+        merge_args += ["-c", "copy"]
+        if ext.lower() in (".mp4", ".mov"):
+            merge_args += ["-movflags", "+faststart"]
+        merge_args.append(str(output_path))
+
+        result = await run_process(["ffmpeg", "-y"] + merge_args, timeout=timeout, task_id=task_id)
+        if not result.ok:
+            return False, f"Segment merge failed: {result.error}"
+
+        logger.info(
+            f"Chunked encode of {input_path.name}: {len(segments)} segments, "
+            f"{min(workers, len(jobs))} parallel, {time.monotonic() - started:.1f}s"
+        )
+        return True, ""
+    except FileNotFoundError:
+        return False, "FFmpeg not installed"
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def transcode_chunked(input_path: Path, output_path: Path, video_args: List[str],
+                      audio_args: List[str], **kwargs) -> Optional[Tuple[bool, str]]:
+    """Blocking transcode_chunked_async() for sync processors"""
+    return asyncio.run(transcode_chunked_async(input_path, output_path, video_args, audio_args, **kwargs))
@@ -14,17 +14,27 @@ Usage:
     )
 """
 
+import math
+import time
 import logging
 import asyncio
-import subprocess
 import httpx
 import uuid
 from pathlib import Path
-from typing import Optional, List, Dict, Any
-from dataclasses import dataclass
+from typing import Optional, List, Dict, Any, Callable
+from dataclasses import dataclass, asdict
 from enum import Enum
 
+from config import get_settings
+from services.process_runner import run_process
+from services.probe import probe_media, probe_gops, ProbeError
+from services.chunked import plan_segments, local_chunk_workers
+from services.chunk_scheduler import ChunkScheduler, WorkerStats, LOCAL
+from services.cluster_transport import ClusterTransport, WorkerError
+from services.operation_spec import OperationSpec
+
 logger = logging.getLogger("magetool.cluster")
+settings = get_settings()
 
 
 # ==========================================
@@ -40,6 +50,96 @@ WORKER_URLS = [
 # Fallback: If no workers configured, use empty list
 # The orchestrator will check if workers are available before trying distributed processing
 
+# Workers stream these back as fragmented MP4 while encoding
+STREAMABLE_FORMATS = {"mp4", "mov"}
+
+# Job status polling for non-streamed outputs (backs off to the max)
+JOB_POLL_SECONDS = 1.0
+JOB_POLL_MAX_SECONDS = 5.0
+
+
+def chunk_encode_args(operation: str, quality: str) -> List[str]:
+    """FFmpeg output options for a chunk (same settings as worker/main.py)"""
+    if operation == "compress":
+        crf_map = {"low": "16", "medium": "20", "high": "26"}
+        return [
+            "-c:v", "libx264",
+            "-crf", crf_map.get(quality, "20"),
+            "-preset", "fast",
+            "-c:a", "aac",
+            "-b:a", "128k",
+        ]
+    if operation == "convert":
+        return ["-preset", "fast"]
+    raise ValueError(f"Unknown operation: {operation}")
+
+
+def _report_progress(task_id: str, percent: int):
+    from services.tasks import update_task
+    
+    try:
+        update_task(task_id, progress_percent=percent)
+    except Exception as e:
+        logger.debug(f"Progress update failed for {task_id}: {e}")
+
+
+@dataclass
+class WorkerLoad:
+    """Load report of one worker (its /health payload)"""
+    url: str
+    healthy: bool
+    queue_depth: int = 0
+    active_ffmpeg: int = 0
+    max_processes: int = 1
+    cpu_load: float = 0.0  # 1-minute load average per core
+    disk_free_mb: Optional[float] = None
+    encode_speed: Optional[float] = None  # x realtime
+    
+    @classmethod
+    def from_health(cls, url: str, payload: Optional[Dict[str, Any]]) -> "WorkerLoad":
+        """Parse /health; older workers only report status, so every figure is optional"""
+        if payload is None:
+            return cls(url, healthy=False)
+        
+        def number(key, default=None):
+            try:
+                value = payload.get(key)
+                return default if value is None else float(value)
+            except (TypeError, ValueError):
+                return default
+        
+        disk = number("disk_free_mb")
+        return cls(
+            url,
+            healthy=True,
+            queue_depth=int(number("queue_depth", number("active_tasks", 0))),
+            active_ffmpeg=int(number("active_ffmpeg", 0)),
+            max_processes=max(1, int(number("max_processes", 1))),
+            cpu_load=number("cpu_load", 0.0),
+            disk_free_mb=disk if disk is not None and disk >= 0 else None,  # -1 = unknown
+            encode_speed=number("encode_speed"),
+        )
+    
+    @property
+    def busy(self) -> int:
+        """Chunks the worker is already working on"""
+        return max(self.queue_depth, self.active_ffmpeg)
+    
+    @property
+    def score(self) -> float:
+        """Lower is less loaded: busy process slots plus CPU pressure"""
+        return self.busy / self.max_processes + self.cpu_load
+    
+    def free_slots(self) -> int:
+        """Chunks to give this worker at once (at least one)"""
+        return min(max(1, self.max_processes - self.busy), settings.CLUSTER_MAX_SLOTS_PER_WORKER)
+    
+    def has_disk(self) -> bool:
+        return self.disk_free_mb is None or self.disk_free_mb >= settings.CLUSTER_MIN_WORKER_DISK_MB
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
 
 class ChunkStatus(Enum):
     PENDING = "pending"
@@ -68,176 +168,319 @@ class ClusterOrchestrator:
     Orchestrates distributed video processing across multiple HF Space workers.
     
     Flow:
-    1. Split video into N chunks (N = number of workers)
-    2. Upload each chunk to a different worker
-    3. Wait for all workers to complete
-    4. Download processed chunks
-    5. Merge chunks into final video
+    1. Split video into many more chunks than workers (sized from worker
+       throughput history), of about equal encode cost, in one
+       keyframe-exact FFmpeg pass
+    2. Workers pull chunks from a shared queue as soon as they are
+       written (services.chunk_scheduler: retries, speculative re-runs of
+       stragglers, local encoding once no worker is left)
+    3. Each chunk is a background job on its worker; mp4/mov results
+       stream back (fragmented MP4) while they encode, others are
+       downloaded as soon as the job finishes
+    4. Merge chunks into final video
     """
     
     def __init__(self, worker_urls: List[str] = None, temp_dir: Path = None):
         self.worker_urls = worker_urls or WORKER_URLS
         self.temp_dir = temp_dir or Path("/tmp/magetool-cluster")
         self.temp_dir.mkdir(parents=True, exist_ok=True)
-        self.timeout = httpx.Timeout(300.0, connect=30.0)  # 5 min timeout
+        # Chunk jobs are async on the worker: no request spans a whole encode,
+        # reads only wait for the next fragment of a streamed chunk
+        self.timeout = httpx.Timeout(120.0, connect=30.0)
+        self.transport = ClusterTransport(timeout=self.timeout)
+        self.worker_stats: Dict[str, WorkerStats] = {}  # throughput history, kept across jobs
+        self._loads: Dict[str, WorkerLoad] = {}  # last /health report per worker
+        self._loads_at = 0.0
     
     def is_available(self) -> bool:
         """Check if cluster is configured with workers"""
         return len(self.worker_urls) > 0
     
+    async def get_worker_loads(self, refresh: bool = False) -> Dict[str, WorkerLoad]:
+        """Load reports of all workers, re-fetched after CLUSTER_HEALTH_TTL_SECONDS"""
+        if refresh or time.monotonic() - self._loads_at > settings.CLUSTER_HEALTH_TTL_SECONDS:
+            payloads = await self.transport.fetch_all(self.worker_urls)
+            self._loads = {url: WorkerLoad.from_health(url, payload) for url, payload in payloads.items()}
+            self._loads_at = time.monotonic()
+        return self._loads
+    
     async def check_workers_health(self) -> Dict[str, bool]:
-        """Check health of all configured workers"""
-        results = {}
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            for url in self.worker_urls:
-                try:
-                    response = await client.get(f"{url}/health")
-                    results[url] = response.status_code == 200
-                except Exception as e:
-                    logger.warning(f"Worker {url} health check failed: {e}")
-                    results[url] = False
-        return results
+        """Check health of all configured workers (concurrently)"""
+        return {url: load.healthy for url, load in (await self.get_worker_loads()).items()}
     
     async def get_healthy_workers(self) -> List[str]:
-        """Get list of healthy workers"""
-        health = await self.check_workers_health()
-        return [url for url, is_healthy in health.items() if is_healthy]
+        """Healthy workers with enough free disk, least loaded first"""
+        loads = await self.get_worker_loads()
+        usable = []
+        for load in loads.values():
+            if not load.healthy:
+                continue
+            if not load.has_disk():
+                logger.warning(f"Skipping worker {load.url}: {load.disk_free_mb:.0f} MB disk free")
+                continue
+            usable.append(load)
+        usable.sort(key=lambda load: (load.score, -(load.encode_speed or 0)))
+        return [load.url for load in usable]
     
-    def get_video_duration(self, video_path: Path) -> float:
-        """Get video duration using ffprobe"""
+    async def get_video_duration(self, video_path: Path) -> float:
+        """Get video duration (shared, cached probe)"""
         try:
-            result = subprocess.run(
-                [
-                    "ffprobe", "-v", "error",
-                    "-show_entries", "format=duration",
-                    "-of", "default=noprint_wrappers=1:nokey=1",
-                    str(video_path)
-                ],
-                capture_output=True,
-                text=True,
-                timeout=30
-            )
-            return float(result.stdout.strip())
+            info = await probe_media(video_path)
         except Exception as e:
             logger.error(f"Failed to get video duration: {e}")
             raise
+        if info.duration is None:
+            raise ProbeError(f"Unknown duration for {video_path.name}")
+        return info.duration
+    
+    async def plan_chunk_times(self, video_path: Path, num_chunks: int) -> List[float]:
+        """
+        Cut times (seconds from the start of the output) for num_chunks
+        chunks of about equal encode cost, snapped to keyframes.
+        """
+        info = await probe_media(video_path)
+        duration = info.duration
+        if duration is None:
+            raise ProbeError(f"Unknown duration for {video_path.name}")
+        try:
+            # Packet times include the container start offset; segment times don't
+            gops = [(t - info.start_time, size) for t, size in await probe_gops(video_path)]
+        except Exception as e:
+            logger.warning(f"No keyframe index for {video_path.name}, using equal durations: {e}")
+            return [duration * i / num_chunks for i in range(1, num_chunks)]
+        segments = plan_segments(duration, gops, num_chunks, settings.CLUSTER_MIN_CHUNK_SECONDS)
+        return [start for start, _ in segments[1:]]
     
-    def split_video_into_chunks(
+    async def split_video_into_chunks(
         self,
         video_path: Path,
         num_chunks: int,
-        task_id: str
+        task_id: str,
+        on_chunk: Optional[Callable[[VideoChunk], None]] = None,
+        with_audio: bool = True,
     ) -> List[VideoChunk]:
         """
-        Split video into equal chunks.
-        Uses FFmpeg segment mode for fast splitting.
+        Split video into chunks in a single FFmpeg pass (segment muxer,
+        stream copy). Cuts land exactly on keyframes, so chunks neither
+        overlap nor leave gaps. on_chunk is called as soon as each chunk
+        file is closed, while later chunks are still being written.
         """
-        duration = self.get_video_duration(video_path)
-        chunk_duration = duration / num_chunks
+        cut_times = await self.plan_chunk_times(video_path, num_chunks)
+        pattern = self.temp_dir / f"{task_id}_chunk_%03d.mp4"
         
-        chunks = []
+        chunks: List[VideoChunk] = []
         
-        for i in range(num_chunks):
-            start_time = i * chunk_duration
-            end_time = min((i + 1) * chunk_duration, duration)
-            chunk_id = f"{task_id}_chunk_{i}"
-            chunk_path = self.temp_dir / f"{chunk_id}.mp4"
-            
-            # Split using FFmpeg (fast copy mode)
-            ffmpeg_args = [
-                "ffmpeg", "-y",
-                "-ss", str(start_time),
-                "-i", str(video_path),
-                "-t", str(end_time - start_time),
-                "-c", "copy",  # Stream copy = fast
-                "-avoid_negative_ts", "make_zero",
-                str(chunk_path)
-            ]
-            
-            result = subprocess.run(ffmpeg_args, capture_output=True, text=True)
-            
-            if result.returncode != 0:
-                raise Exception(f"Failed to split chunk {i}: {result.stderr}")
-            
-            chunks.append(VideoChunk(
-                chunk_id=chunk_id,
+        def on_segment_line(line: str):
+            # segment_list csv: <filename>,<start>,<end> - written when a segment closes
+            fields = line.strip().split(",")
+            if len(fields) < 3:
+                return
+            try:
+                start_time, end_time = float(fields[-2]), float(fields[-1])
+            except ValueError:
+                return
+            chunk_path = Path(",".join(fields[:-2]))
+            if not chunk_path.is_absolute():
+                chunk_path = self.temp_dir / chunk_path
+            chunk = VideoChunk(
+                chunk_id=f"{task_id}_chunk_{len(chunks)}",
                 chunk_path=chunk_path,
                 start_time=start_time,
                 end_time=end_time,
                 duration=end_time - start_time,
-            ))
-            
-            logger.info(f"Created chunk {i}: {start_time:.2f}s - {end_time:.2f}s")
+            )
+            chunks.append(chunk)
+            logger.info(f"Created chunk {len(chunks) - 1}: {start_time:.2f}s - {end_time:.2f}s")
+            if on_chunk is not None:
+                on_chunk(chunk)
+        
+        ffmpeg_args = [
+            "ffmpeg", "-y",
+            "-i", str(video_path),
+            "-map", "0:v:0",
+        ]
+        if with_audio:
+            ffmpeg_args += ["-map", "0:a:0?"]
+        ffmpeg_args += [
+            "-c", "copy",  # Stream copy = fast
+            "-f", "segment",
+            "-reset_timestamps", "1",
+            "-segment_format", "mp4",
+            "-segment_list", "pipe:1",
+            "-segment_list_type", "csv",
+        ]
+        if cut_times:
+            # The muxer cuts at the first keyframe at/after each time - aim just before ours
+            ffmpeg_args += ["-segment_times", ",".join(f"{max(t - 0.001, 0):.6f}" for t in cut_times)]
+        else:
+            ffmpeg_args += ["-segment_time", str(10 ** 9)]
+        ffmpeg_args.append(str(pattern))
+        
+        result = await run_process(
+            ffmpeg_args,
+            timeout=settings.CONVERSION_TIMEOUT,
+            task_id=task_id,
+            on_stdout_line=on_segment_line,
+        )
+        
+        if not result.ok:
+            raise Exception(f"Failed to split video: {result.error}")
+        if not chunks:
+            raise Exception("Failed to split video: no chunks written")
         
         return chunks
     
-    async def upload_and_process_chunk(
+    async def process_chunk_remote(
         self,
         chunk: VideoChunk,
         worker_url: str,
+        attempt: int,
         operation: str,
         quality: str,
         output_format: str,
-    ) -> VideoChunk:
-        """Upload chunk to worker and wait for processing"""
-        chunk.worker_url = worker_url
-        chunk.status = ChunkStatus.UPLOADING
+        spec: Optional[OperationSpec] = None,
+    ) -> Path:
+        """
+        Submit chunk to worker as a background job and fetch the result:
+        streamed while it encodes (mp4/mov), else downloaded once done
+        """
+        # Every attempt gets its own output file and job - a speculative copy may be running
+        job_id = f"{chunk.chunk_id}_a{attempt}"
+        if spec is not None:
+            operation, output_format = "spec", spec.chunk_format
+        output_path = self.temp_dir / f"{job_id}_processed.{output_format}"
+        fields = {
+            "task_id": job_id,
+            "operation": operation,
+            "quality": quality,
+            "output_format": output_format,
+        }
+        if spec is not None:
+            fields["spec"] = spec.chunk_spec_json()
         
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                # Upload and process
-                with open(chunk.chunk_path, "rb") as f:
-                    files = {"file": (chunk.chunk_path.name, f, "video/mp4")}
-                    data = {
-                        "task_id": chunk.chunk_id,
-                        "operation": operation,
-                        "quality": quality,
-                        "output_format": output_format,
-                    }
-                    
-                    chunk.status = ChunkStatus.PROCESSING
-                    response = await client.post(
-                        f"{worker_url}/process-chunk",
-                        files=files,
-                        data=data,
-                    )
-                
-                if response.status_code != 200:
-                    raise Exception(f"Worker error: {response.text}")
-                
-                result = response.json()
-                
-                # Download processed chunk
-                download_response = await client.get(
-                    f"{worker_url}/download/{chunk.chunk_id}"
-                )
-                
-                if download_response.status_code != 200:
-                    raise Exception(f"Download failed: {download_response.status_code}")
-                
-                # Save processed chunk
-                output_path = self.temp_dir / f"{chunk.chunk_id}_processed.{output_format}"
-                with open(output_path, "wb") as f:
-                    f.write(download_response.content)
-                
-                chunk.output_path = output_path
-                chunk.status = ChunkStatus.COMPLETE
-                logger.info(f"Chunk {chunk.chunk_id} processed successfully")
-                
-        except Exception as e:
-            chunk.status = ChunkStatus.FAILED
-            chunk.error = str(e)
-            logger.error(f"Chunk {chunk.chunk_id} failed: {e}")
+            job = await self.transport.upload_file(
+                f"{worker_url}/jobs", chunk.chunk_path,
+                {**fields, "stream": str(output_format in STREAMABLE_FORMATS).lower()},
+            )
+        except WorkerError as e:
+            if e.status_code not in (404, 405):
+                raise
+            # Worker predates async jobs: blocking endpoint
+            await self.transport.upload_file(f"{worker_url}/process-chunk", chunk.chunk_path, fields)
+            await self.transport.download_to(f"{worker_url}/download/{job_id}", output_path)
+            logger.info(f"Chunk {chunk.chunk_id} processed on {worker_url}")
+            return output_path
         
-        return chunk
+        try:
+            if job.get("stream_url"):
+                # Chunk arrives while it encodes; the body ends when the encode does
+                written = await self.transport.download_to(f"{worker_url}{job['stream_url']}", output_path)
+                status = await self.transport.get_json(f"{worker_url}/jobs/{job_id}")
+                if status.get("status") != "complete" or status.get("output_size") != written:
+                    raise WorkerError(f"Streamed chunk incomplete: {status.get('error', status.get('status'))}")
+            else:
+                await self.wait_for_job(worker_url, job_id)
+                await self.transport.download_to(f"{worker_url}/download/{job_id}", output_path)
+        except BaseException:
+            output_path.unlink(missing_ok=True)
+            # Failed or lost to a speculative copy - free the worker's slot
+            await self.transport.delete(f"{worker_url}/jobs/{job_id}")
+            raise
+        
+        logger.info(f"Chunk {chunk.chunk_id} processed on {worker_url}")
+        return output_path
     
-    def merge_chunks(
+    async def wait_for_job(self, worker_url: str, job_id: str) -> Dict[str, Any]:
+        """Poll a worker job until it finishes; raises WorkerError if it failed"""
+        delay = JOB_POLL_SECONDS
+        while True:
+            status = await self.transport.get_json(f"{worker_url}/jobs/{job_id}")
+            if status.get("status") == "complete":
+                return status
+            if status.get("status") in ("failed", "cancelled"):
+                raise WorkerError(f"Worker job {job_id} {status['status']}: {status.get('error', '')}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 1.5, JOB_POLL_MAX_SECONDS)
+    
+    async def process_chunk_local(
+        self,
+        chunk: VideoChunk,
+        attempt: int,
+        operation: str,
+        quality: str,
+        output_format: str,
+        task_id: Optional[str] = None,
+        spec: Optional[OperationSpec] = None,
+    ) -> Path:
+        """Encode a chunk on this node (fallback when workers are gone)"""
+        if spec is not None:
+            output_format = spec.chunk_format
+        output_path = self.temp_dir / f"{chunk.chunk_id}_a{attempt}_processed.{output_format}"
+        if spec is not None:
+            ffmpeg_args = spec.chunk_args(chunk.chunk_path, output_path)
+        else:
+            ffmpeg_args = ["-i", str(chunk.chunk_path)] + chunk_encode_args(operation, quality) + [str(output_path)]
+        result = await run_process(
+            ["ffmpeg", "-y"] + ffmpeg_args,
+            timeout=settings.CONVERSION_TIMEOUT,
+            task_id=task_id,
+        )
+        if not result.ok:
+            output_path.unlink(missing_ok=True)
+            raise Exception(f"Local encode failed: {result.error}")
+        logger.info(f"Chunk {chunk.chunk_id} processed locally")
+        return output_path
+    
+    def plan_chunk_count(self, duration: float, workers: List[str]) -> int:
+        """
+        Number of chunks for a job: sized so a chunk takes about
+        CLUSTER_CHUNK_TARGET_SECONDS on a typical worker (from throughput
+        history), or CLUSTER_CHUNKS_PER_WORKER per worker without history.
+        """
+        known = sorted(
+            self.worker_stats[url].throughput
+            for url in workers
+            if url in self.worker_stats and self.worker_stats[url].throughput
+        )
+        if known:
+            typical = known[len(known) // 2]
+            count = math.ceil(duration / (typical * settings.CLUSTER_CHUNK_TARGET_SECONDS))
+            # Keep every worker busy with a couple of chunks to steal
+            count = max(count, 2 * len(workers))
+        else:
+            count = settings.CLUSTER_CHUNKS_PER_WORKER * len(workers)
+        
+        count = min(count, settings.CLUSTER_MAX_CHUNKS)
+        count = min(count, int(duration // settings.CLUSTER_MIN_CHUNK_SECONDS))
+        return max(count, 1)
+    
+    async def encode_audio(self, video_path: Path, spec: OperationSpec, task_id: str) -> Path:
+        """The audio half of a spec operation, processed once for the whole file"""
+        audio_path = self.temp_dir / f"{task_id}_audio.mka"
+        result = await run_process(
+            ["ffmpeg", "-y"] + spec.audio_args(video_path, audio_path),
+            timeout=settings.CONVERSION_TIMEOUT,
+            task_id=task_id,
+        )
+        if not result.ok:
+            raise Exception(f"Audio pass failed: {result.error}")
+        return audio_path
+    
+    async def merge_chunks(
         self,
         chunks: List[VideoChunk],
         output_path: Path,
-        output_format: str = "mp4"
+        output_format: str = "mp4",
+        task_id: Optional[str] = None,
+        audio_path: Optional[Path] = None,
+        finish_filter: Optional[str] = None,
     ) -> Path:
-        """Merge processed chunks back into single video"""
+        """
+        Merge processed chunks back into single video, muxing in a
+        separately processed audio track and/or running a whole-stream
+        filter (GIF palette) on the joined chunks
+        """
         # Create concat file
         concat_file = self.temp_dir / f"concat_{uuid.uuid4().hex[:8]}.txt"
         
@@ -252,17 +495,22 @@ class ClusterOrchestrator:
             "-f", "concat",
             "-safe", "0",
             "-i", str(concat_file),
-            "-c", "copy",
-            str(output_path)
         ]
+        if finish_filter:
+            ffmpeg_args += ["-filter_complex", finish_filter]
+        elif audio_path:
+            ffmpeg_args += ["-i", str(audio_path), "-map", "0:v:0", "-map", "1:a:0", "-c", "copy", "-shortest"]
+        else:
+            ffmpeg_args += ["-c", "copy"]
+        ffmpeg_args.append(str(output_path))
         
-        result = subprocess.run(ffmpeg_args, capture_output=True, text=True)
+        result = await run_process(ffmpeg_args, timeout=settings.CONVERSION_TIMEOUT, task_id=task_id)
         
         # Cleanup concat file
         concat_file.unlink(missing_ok=True)
         
-        if result.returncode != 0:
-            raise Exception(f"Merge failed: {result.stderr}")
+        if not result.ok:
+            raise Exception(f"Merge failed: {result.error}")
         
         logger.info(f"Merged {len(chunks)} chunks into {output_path}")
         return output_path
@@ -274,10 +522,15 @@ class ClusterOrchestrator:
         quality: str = "medium",
         output_format: str = "mp4",
         task_id: str = None,
+        spec: Optional[OperationSpec] = None,
     ) -> Dict[str, Any]:
         """
         Main entry point: Process video using distributed workers.
         
+        With a spec (services.operation_spec) workers run its video chain
+        on the chunks while the audio is processed here once; operation,
+        quality and output_format are then taken from the spec.
+        
         Returns:
             {
                 "success": bool,
@@ -289,6 +542,11 @@ class ClusterOrchestrator:
         """
         task_id = task_id or uuid.uuid4().hex[:12]
         video_path = Path(video_path)
+        if spec is not None:
+            blocker = spec.chunk_blocker()
+            if blocker:
+                return {"success": False, "error": f"{spec.name} can't be chunked: {blocker}", "fallback": True}
+            operation, output_format = spec.name, spec.output_format
         
         # Check workers
         healthy_workers = await self.get_healthy_workers()
@@ -300,36 +558,67 @@ class ClusterOrchestrator:
             }
         
         num_workers = len(healthy_workers)
-        logger.info(f"Starting distributed processing with {num_workers} workers")
+        loads = await self.get_worker_loads()
+        for url in healthy_workers:
+            stats = self.worker_stats.setdefault(url, WorkerStats(url))
+            # No chunk history yet: start from the worker's own speed score
+            if stats.throughput is None and loads[url].encode_speed:
+                stats.throughput = loads[url].encode_speed
         
-        try:
-            # 1. Split video
-            chunks = self.split_video_into_chunks(video_path, num_workers, task_id)
-            
-            # 2. Process chunks in parallel
-            tasks = []
-            for chunk, worker_url in zip(chunks, healthy_workers):
-                task = self.upload_and_process_chunk(
-                    chunk, worker_url, operation, quality, output_format
+        async def run_attempt(chunk: VideoChunk, executor: str, attempt: int) -> Path:
+            chunk.status = ChunkStatus.PROCESSING
+            if executor == LOCAL:
+                return await self.process_chunk_local(
+                    chunk, attempt, operation, quality, output_format, task_id, spec
                 )
-                tasks.append(task)
+            return await self.process_chunk_remote(
+                chunk, executor, attempt, operation, quality, output_format, spec
+            )
+        
+        def on_chunk_done(done: int, total: int):
+            _report_progress(task_id, 20 + int(65 * done / max(total, 1)))
+        
+        scheduler = ChunkScheduler(
+            healthy_workers,
+            run_attempt,
+            self.worker_stats,
+            local_workers=local_chunk_workers(),
+            on_chunk_done=on_chunk_done,
+            slots={url: loads[url].free_slots() for url in healthy_workers},
+        )
+        
+        audio_task = None
+        try:
+            info = await probe_media(video_path)
+            num_chunks = self.plan_chunk_count(info.duration or 0, healthy_workers)
+            logger.info(f"Starting distributed processing: {num_chunks} chunks on {num_workers} workers")
             
-            # Wait for all to complete
-            processed_chunks = await asyncio.gather(*tasks)
+            # Spec operations: audio once, here, while the workers do the video
+            if spec is not None and spec.keeps_audio and info.has_audio:
+                audio_task = asyncio.ensure_future(self.encode_audio(video_path, spec, task_id))
             
-            # 3. Check for failures
-            failed = [c for c in processed_chunks if c.status == ChunkStatus.FAILED]
-            if failed:
-                errors = [f"{c.chunk_id}: {c.error}" for c in failed]
-                return {
-                    "success": False,
-                    "error": f"Chunks failed: {', '.join(errors)}",
-                    "chunks_failed": len(failed),
-                }
+            # 1 + 2. Split video; workers pull chunks from the queue as they appear
+            scheduling = asyncio.ensure_future(scheduler.run())
+            try:
+                await self.split_video_into_chunks(
+                    video_path, num_chunks, task_id, on_chunk=scheduler.add, with_audio=spec is None
+                )
+                scheduler.close()
+                processed_chunks = await scheduling
+                for chunk in processed_chunks:
+                    chunk.status = ChunkStatus.COMPLETE
+            except BaseException:
+                scheduling.cancel()
+                await asyncio.gather(scheduling, return_exceptions=True)
+                raise
             
             # 4. Merge chunks
             output_path = self.temp_dir / f"{task_id}_final.{output_format}"
-            self.merge_chunks(processed_chunks, output_path, output_format)
+            await self.merge_chunks(
+                processed_chunks, output_path, output_format, task_id,
+                audio_path=await audio_task if audio_task else None,
+                finish_filter=spec.finish_filter if spec else None,
+            )
             
             # 5. Cleanup chunk files
             for chunk in processed_chunks:
@@ -337,16 +626,25 @@ class ClusterOrchestrator:
                     chunk.chunk_path.unlink(missing_ok=True)
                 if chunk.output_path and chunk.output_path.exists():
                     chunk.output_path.unlink(missing_ok=True)
+            if audio_task is not None:
+                audio_task.result().unlink(missing_ok=True)
             
             return {
                 "success": True,
                 "output_path": output_path,
                 "chunks_processed": len(processed_chunks),
                 "workers_used": num_workers,
+                "chunks_retried": scheduler.retries,
+                "speculative_runs": scheduler.speculative_runs,
+                "local_chunks": scheduler.local_chunks,
             }
             
         except Exception as e:
             logger.error(f"Distributed processing failed: {e}")
+            if audio_task is not None:
+                audio_task.cancel()
+                await asyncio.gather(audio_task, return_exceptions=True)
+            self.cleanup(task_id)
             return {
                 "success": False,
                 "error": str(e),
@@ -372,6 +670,12 @@ def get_orchestrator() -> ClusterOrchestrator:
     return _orchestrator
 
 
+async def close_transport():
+    """Close the orchestrator's pooled client for the running event loop"""
+    if _orchestrator is not None:
+        await _orchestrator.transport.aclose()
+
+
 async def is_cluster_available() -> bool:
     """Check if cluster is configured and has healthy workers"""
     orchestrator = get_orchestrator()
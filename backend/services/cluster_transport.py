@@ -0,0 +1,193 @@
+"""
+Cluster Transport
+=================
+HTTP layer between the orchestrator and the HF Space workers.
+
+- one long-lived pooled httpx.AsyncClient per event loop (HTTP/2 when
+  the `h2` package is installed, keep-alive HTTP/1.1 otherwise), so
+  chunk uploads reuse TLS connections instead of handshaking per chunk
+- multipart uploads streamed from disk with a known Content-Length
+- downloads streamed to disk with aiter_bytes() (also used to follow a
+  worker's fragmented-MP4 output while it is still encoding)
+- health checks of all workers run concurrently
+
+Memory per transfer is bounded by TRANSFER_CHUNK_SIZE whatever the
+chunk size. httpx clients belong to the loop that created them, so the
+processors' private loops get their own client and close it with
+aclose() before the loop goes away.
+"""
+
+import uuid
+import asyncio
+import logging
+from pathlib import Path
+from typing import Optional, Dict, Any, AsyncIterator
+
+import aiofiles
+import httpx
+
+logger = logging.getLogger("magetool.cluster")
+
+try:
+    import h2  # noqa: F401  (httpx[http2])
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+TRANSFER_CHUNK_SIZE = 256 * 1024  # 256KB read/write unit for uploads and downloads
+MAX_CONNECTIONS = 32
+MAX_KEEPALIVE_CONNECTIONS = 16
+
+
+class WorkerError(Exception):
+    """A worker answered with an error status"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+# ==========================================
+# STREAMING MULTIPART
+# ==========================================
+class MultipartFileBody:
+    """
+    multipart/form-data body with form fields plus one file, streamed from
+    disk. Length is known up front (Content-Length instead of chunked
+    encoding, which some proxies in front of Spaces reject).
+    """
+
+    def __init__(self, fields: Dict[str, Any], file_field: str, path: Path,
+                 content_type: str = "application/octet-stream"):
+        self.path = Path(path)
+        self.boundary = uuid.uuid4().hex
+        head = b"".join(
+            f'--{self.boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+            for name, value in fields.items()
+        )
+        head += (
+            f'--{self.boundary}\r\nContent-Disposition: form-data; name="{file_field}"; '
+            f'filename="{self.path.name}"\r\nContent-Type: {content_type}\r\n\r\n'
+        ).encode()
+        self.head = head
+        self.tail = f"\r\n--{self.boundary}--\r\n".encode()
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        length = len(self.head) + self.path.stat().st_size + len(self.tail)
+        return {
+            "Content-Type": f"multipart/form-data; boundary={self.boundary}",
+            "Content-Length": str(length),
+        }
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        yield self.head
+        async with aiofiles.open(self.path, "rb") as f:
+            while chunk := await f.read(TRANSFER_CHUNK_SIZE):
+                yield chunk
+        yield self.tail
+
+
+# ==========================================
+# TRANSPORT
+# ==========================================
+class ClusterTransport:
+    """Pooled, streaming HTTP client for worker traffic"""
+
+    def __init__(self, timeout: httpx.Timeout = None, health_timeout: float = 10.0,
+                 http_transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.timeout = timeout or httpx.Timeout(300.0, connect=30.0)
+        self.health_timeout = health_timeout
+        self.http_transport = http_transport  # tests inject httpx.MockTransport
+        self._clients: Dict[asyncio.AbstractEventLoop, httpx.AsyncClient] = {}
+
+    def client(self) -> httpx.AsyncClient:
+        """The pooled client of the running event loop"""
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            # Drop clients of loops that are gone
+            for stale in [l for l in self._clients if l.is_closed()]:
+                del self._clients[stale]
+            client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                timeout=self.timeout,
+                transport=self.http_transport,
+                limits=httpx.Limits(
+                    max_connections=MAX_CONNECTIONS,
+                    max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                ),
+            )
+            self._clients[loop] = client
+        return client
+
+    async def aclose(self):
+        """Close the running loop's client (call before that loop shuts down)"""
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    async def fetch_health(self, url: str) -> Optional[Dict[str, Any]]:
+        """A worker's /health payload, or None if it is down"""
+        try:
+            response = await self.client().get(f"{url}/health", timeout=self.health_timeout)
+            if response.status_code != 200:
+                return None
+            try:
+                payload = response.json()
+            except ValueError:
+                payload = None
+            return payload if isinstance(payload, dict) else {}
+        except Exception as e:
+            logger.warning(f"Worker {url} health check failed: {e}")
+            return None
+
+    async def fetch_all(self, urls) -> Dict[str, Optional[Dict[str, Any]]]:
+        """/health of every worker, probed concurrently"""
+        urls = list(urls)
+        results = await asyncio.gather(*(self.fetch_health(url) for url in urls))
+        return dict(zip(urls, results))
+
+    async def check_all(self, urls) -> Dict[str, bool]:
+        """Health of every worker, probed concurrently"""
+        return {url: payload is not None for url, payload in (await self.fetch_all(urls)).items()}
+
+    async def upload_file(self, url: str, path: Path, fields: Dict[str, Any],
+                          file_field: str = "file", content_type: str = "video/mp4") -> Dict[str, Any]:
+        """Stream a file as multipart/form-data and return the JSON response"""
+        body = MultipartFileBody(fields, file_field, path, content_type)
+        response = await self.client().post(url, content=body, headers=body.headers)
+        if not response.is_success:
+            raise WorkerError(f"Worker error: {response.text}", response.status_code)
+        return response.json()
+
+    async def get_json(self, url: str) -> Dict[str, Any]:
+        response = await self.client().get(url, timeout=self.health_timeout)
+        if response.status_code != 200:
+            raise WorkerError(f"Worker error: {response.text}", response.status_code)
+        return response.json()
+
+    async def delete(self, url: str) -> bool:
+        """Best-effort DELETE (job cancellation); never raises"""
+        try:
+            response = await self.client().delete(url, timeout=self.health_timeout)
+            return response.is_success
+        except Exception as e:
+            logger.debug(f"DELETE {url} failed: {e}")
+            return False
+
+    async def download_to(self, url: str, destination: Path) -> int:
+        """Stream a response body to disk; returns bytes written"""
+        written = 0
+        try:
+            async with self.client().stream("GET", url) as response:
+                if response.status_code != 200:
+                    raise WorkerError(f"Download failed: {response.status_code}", response.status_code)
+                async with aiofiles.open(destination, "wb") as f:
+                    async for chunk in response.aiter_bytes(TRANSFER_CHUNK_SIZE):
+                        await f.write(chunk)
+                        written += len(chunk)
+        except BaseException:
+            Path(destination).unlink(missing_ok=True)
+            raise
+        return written
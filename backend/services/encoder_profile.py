@@ -0,0 +1,299 @@
+"""
+Encoder Profile
+===============
+Per-node libx264 calibration, so a quality level means the same encode
+speed everywhere instead of whatever `-preset medium` happens to cost
+on this box.
+
+Once per node (the profile is persisted and keyed by CPU count,
+architecture and FFmpeg version) a short synthetic 720p clip is encoded
+with every preset up to ENCODER_MAX_PRESET at a few thread counts,
+recording speed (x realtime) and output size. That is 18 encodes with
+the defaults (6 presets x 3 thread counts, roughly a minute of CPU on a
+small box), so it stays out of the way of real work:
+- it starts ENCODER_CALIBRATION_DELAY_SECONDS after startup, not in it
+- encodes run under `nice`, and each waits until no job is queued or
+  running in the executor pools (which would also skew the timings)
+- the profile lives outside TEMP_DIR (ENCODER_PROFILE_PATH, default
+  ~/.cache/magetool/encoder_profile.json), so temp cleanup and wiped
+  upload dirs don't trigger a new benchmark; point it at persistent
+  storage on ephemeral hosts
+
+choose_encoder() then picks, for an input of a given resolution and
+frame rate:
+- among the presets fast enough for ENCODER_TARGET_SPEED, the one with
+  the smallest output (same CRF, so the best compression)
+- the fewest threads that still reach the target, leaving cores to the
+  other jobs running next to it
+Without a profile (calibration off or not finished) the previous fixed
+`-preset medium` is used.
+"""
+
+import os
+import json
+import time
+import shutil
+import asyncio
+import logging
+import platform
+import tempfile
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, List, Dict, Any
+
+from config import get_settings
+from services.process_runner import run_process
+
+logger = logging.getLogger("magetool.encoder")
+settings = get_settings()
+
+# Fastest first
+CALIBRATION_PRESETS = ("ultrafast", "superfast", "veryfast", "faster", "fast", "medium", "slow", "slower")
+DEFAULT_PRESET = "medium"
+
+# Synthetic clip encoded for every preset / thread count
+CALIBRATION_WIDTH, CALIBRATION_HEIGHT, CALIBRATION_FPS = 1280, 720, 30
+CALIBRATION_SECONDS = 3
+CALIBRATION_CRF = "23"
+
+# One calibration per node: other server processes skip while the lock is fresh
+CALIBRATION_LOCK_SECONDS = 600
+
+# How often a waiting calibration encode re-checks the job pools
+CALIBRATION_IDLE_POLL_SECONDS = 5.0
+
+
+def profile_path() -> Path:
+    if settings.ENCODER_PROFILE_PATH:
+        return settings.ENCODER_PROFILE_PATH
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "magetool" / "encoder_profile.json"
+
+
+def thread_candidates() -> List[int]:
+    """All cores, half and a quarter of them (distinct, most first)"""
+    cores = os.cpu_count() or 1
+    return sorted({cores, max(1, cores // 2), max(1, cores // 4)}, reverse=True)
+
+
+def calibration_presets() -> List[str]:
+    ceiling = settings.ENCODER_MAX_PRESET
+    if ceiling not in CALIBRATION_PRESETS:
+        ceiling = DEFAULT_PRESET
+    return list(CALIBRATION_PRESETS[:CALIBRATION_PRESETS.index(ceiling) + 1])
+
+
+@dataclass
+class EncoderChoice:
+    """Preset (and thread count) for one encode"""
+    preset: str = DEFAULT_PRESET
+    threads: Optional[int] = None  # None = let libx264 decide
+
+    def thread_args(self) -> List[str]:
+        return ["-threads", str(self.threads)] if self.threads else []
+
+
+class EncoderProfile:
+    """Calibration results of this node"""
+
+    def __init__(self, results: List[Dict[str, Any]], signature: Dict[str, Any],
+                 calibrated_at: Optional[str] = None):
+        self.results = results  # [{"preset", "threads", "speed", "bytes"}]
+        self.signature = signature
+        self.calibrated_at = calibrated_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "signature": self.signature,
+            "calibrated_at": self.calibrated_at,
+            "clip": {
+                "width": CALIBRATION_WIDTH, "height": CALIBRATION_HEIGHT,
+                "fps": CALIBRATION_FPS, "seconds": CALIBRATION_SECONDS, "crf": CALIBRATION_CRF,
+            },
+            "results": self.results,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "EncoderProfile":
+        return cls(data.get("results", []), data.get("signature", {}), data.get("calibrated_at"))
+
+    def choose(self, target_speed: float, width: Optional[int] = None, height: Optional[int] = None,
+               fps: Optional[float] = None) -> EncoderChoice:
+        """Best compression that still encodes this input at target_speed"""
+        # Speed needed on the calibration clip: scale by pixel rate
+        required = target_speed
+        if width and height:
+            required *= (width * height) / (CALIBRATION_WIDTH * CALIBRATION_HEIGHT)
+        if fps:
+            required *= fps / CALIBRATION_FPS
+
+        allowed = set(calibration_presets())
+        results = [r for r in self.results if r.get("preset") in allowed and r.get("speed")]
+        if not results:
+            return EncoderChoice()
+
+        fast_enough = [r for r in results if r["speed"] >= required]
+        if not fast_enough:
+            # Nothing reaches the target: the fastest combination measured
+            best = max(results, key=lambda r: r["speed"])
+            return EncoderChoice(best["preset"], best["threads"])
+
+        # Smallest output among the presets that keep up, then the fewest threads
+        preset = min(fast_enough, key=lambda r: (r["bytes"], -CALIBRATION_PRESETS.index(r["preset"])))["preset"]
+        threads = min(r["threads"] for r in fast_enough if r["preset"] == preset)
+        return EncoderChoice(preset, threads)
+
+
+# ==========================================
+# CALIBRATION
+# ==========================================
+async def node_signature() -> Dict[str, Any]:
+    """What a profile is valid for - recalibrate when any of it changes"""
+    signature = {"cpu_count": os.cpu_count() or 1, "machine": platform.machine()}
+    try:
+        result = await run_process(["ffmpeg", "-hide_banner", "-version"], timeout=10)
+        signature["ffmpeg"] = result.text.splitlines()[0] if result.ok and result.text else None
+    except FileNotFoundError:
+        signature["ffmpeg"] = None
+    return signature
+
+
+async def _wait_for_idle_pools():
+    """Hold the next calibration encode while jobs are queued or running"""
+    from services.executor import get_executor
+    while any(pool["pending"] for pool in get_executor().stats().values()):
+        await asyncio.sleep(CALIBRATION_IDLE_POLL_SECONDS)
+
+
+async def _encode_once(preset: str, threads: int, output_path: Path) -> Optional[Dict[str, Any]]:
+    size = f"{CALIBRATION_WIDTH}x{CALIBRATION_HEIGHT}"
+    await _wait_for_idle_pools()
+    low_priority = ["nice", "-n", "19"] if shutil.which("nice") else []
+    started = time.monotonic()
+    result = await run_process(
+        low_priority + [
+            "ffmpeg", "-y", "-v", "error",
+            "-f", "lavfi", "-i", f"testsrc2=size={size}:rate={CALIBRATION_FPS}:duration={CALIBRATION_SECONDS}",
+            "-c:v", "libx264", "-crf", CALIBRATION_CRF, "-preset", preset, "-threads", str(threads),
+            str(output_path),
+        ],
+        timeout=120,
+    )
+    elapsed = time.monotonic() - started
+    if not result.ok or not output_path.exists():
+        logger.warning(f"Calibration encode failed ({preset}, {threads} threads): {result.error}")
+        return None
+    return {
+        "preset": preset,
+        "threads": threads,
+        "speed": round(CALIBRATION_SECONDS / max(elapsed, 1e-3), 3),
+        "bytes": output_path.stat().st_size,
+    }
+
+
+async def calibrate() -> Optional[EncoderProfile]:
+    """Run the benchmark and persist the profile (None if FFmpeg is missing)"""
+    signature = await node_signature()
+    if signature["ffmpeg"] is None:
+        logger.warning("FFmpeg not available, encoder calibration skipped")
+        return None
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="calibrate-", dir=settings.TEMP_DIR) as tmp:
+        for preset in calibration_presets():
+            for threads in thread_candidates():
+                result = await _encode_once(preset, threads, Path(tmp) / f"{preset}_{threads}.mp4")
+                if result:
+                    results.append(result)
+    if not results:
+        return None
+
+    profile = EncoderProfile(results, signature, datetime.utcnow().isoformat() + "Z")
+    path = profile_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_suffix(".tmp")
+    temp_path.write_text(json.dumps(profile.to_dict(), indent=2))
+    temp_path.replace(path)  # job processes may be reading it
+
+    choice = profile.choose(settings.ENCODER_TARGET_SPEED)
+    logger.info(f"Encoder calibrated: {len(results)} runs, 720p target -> "
+                f"-preset {choice.preset} -threads {choice.threads}")
+    return profile
+
+
+async def ensure_calibrated() -> Optional[EncoderProfile]:
+    """Calibrate unless a profile for this node exists"""
+    if not settings.ENCODER_CALIBRATION_ENABLED:
+        return None
+    profile = get_encoder_profile()
+    if profile is not None and profile.signature == await node_signature():
+        return profile
+
+    # Parallel benchmarks would slow each other down - only one process measures
+    lock = profile_path().with_suffix(".lock")
+    lock.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        if time.time() - lock.stat().st_mtime > CALIBRATION_LOCK_SECONDS:
+            lock.unlink(missing_ok=True)  # left over by a killed process
+    except OSError:
+        pass
+    try:
+        os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        return profile
+
+    try:
+        return await calibrate()
+    except Exception as e:
+        logger.warning(f"Encoder calibration failed: {e}")
+        return None
+    finally:
+        lock.unlink(missing_ok=True)
+
+
+async def calibrate_after_startup() -> Optional[EncoderProfile]:
+    """Lifespan task: ensure_calibrated() once the server has been up a while"""
+    await asyncio.sleep(settings.ENCODER_CALIBRATION_DELAY_SECONDS)
+    return await ensure_calibrated()
+
+
+# ==========================================
+# LOOKUP
+# ==========================================
+_profile_cache: Dict[str, Any] = {"mtime": None, "profile": None}
+
+
+def get_encoder_profile() -> Optional[EncoderProfile]:
+    """The persisted profile (re-read when the file changes)"""
+    path = profile_path()
+    try:
+        mtime = path.stat().st_mtime_ns
+    except OSError:
+        return None
+    if _profile_cache["mtime"] != mtime:
+        try:
+            _profile_cache["profile"] = EncoderProfile.from_dict(json.loads(path.read_text()))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Unreadable encoder profile {path}: {e}")
+            _profile_cache["profile"] = None
+        _profile_cache["mtime"] = mtime
+    return _profile_cache["profile"]
+
+
+def choose_encoder(input_path: Optional[Path] = None) -> EncoderChoice:
+    """Preset and threads for encoding input_path on this node"""
+    profile = get_encoder_profile()
+    if profile is None:
+        return EncoderChoice()
+
+    width = height = fps = None
+    if input_path is not None:
+        from services.probe import probe_media_sync
+        try:
+            video = probe_media_sync(input_path).video
+            if video is not None:
+                width, height, fps = video.width, video.height, video.fps
+        except Exception as e:
+            logger.debug(f"No stream info for encoder choice: {e}")
+    return profile.choose(settings.ENCODER_TARGET_SPEED, width, height, fps)
@@ -0,0 +1,140 @@
+"""
+Task Event Hub
+==============
+Fan-out registry that pushes task state changes to SSE / WebSocket
+subscribers as update_task() emits them.
+
+update_task() can run on any thread (executor drain thread, threadpool,
+event loop), so the task listener hops onto the event loop with
+call_soon_threadsafe before touching subscriber queues.
+
+With a shared task store, updates made by another uvicorn worker never
+reach this process's listeners, so idle streams re-read the store on a
+short interval as well.
+"""
+
+import asyncio
+import logging
+from typing import Optional, Dict, Any, Set, AsyncIterator
+
+from services.tasks import (
+    TaskStatus, get_task, format_task_response, add_task_listener,
+    remove_task_listener, task_store,
+)
+
+logger = logging.getLogger("magetool.events")
+
+TERMINAL_STATUSES = {TaskStatus.COMPLETE, TaskStatus.FAILED, TaskStatus.CANCELLED}
+
+# Per-subscriber buffer. Only the latest state matters, so the oldest event is dropped when full.
+SUBSCRIBER_QUEUE_SIZE = 16
+
+# Idle wait before a heartbeat (and a store re-read when workers share the store)
+HEARTBEAT_SECONDS = 15.0
+SHARED_STORE_POLL_SECONDS = 2.0
+
+
+class TaskEventHub:
+    """Maps task_id -> set of subscriber queues"""
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def attach(self, loop: asyncio.AbstractEventLoop):
+        """Start receiving task updates (call once from lifespan)"""
+        self._loop = loop
+        add_task_listener(self._on_task_changed)
+
+    def detach(self):
+        remove_task_listener(self._on_task_changed)
+        self._loop = None
+
+    def subscriber_count(self) -> int:
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    # ------------------------------------------
+    # Subscription registry (event loop thread only)
+    # ------------------------------------------
+    def subscribe(self, task_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._subscribers.setdefault(task_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, task_id: str, queue: asyncio.Queue):
+        queues = self._subscribers.get(task_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[task_id]
+
+    # ------------------------------------------
+    # Publishing
+    # ------------------------------------------
+    def _on_task_changed(self, task_id: str, task: Optional[Dict[str, Any]]):
+        """Task listener - may be called from any thread"""
+        if self._loop is None or task_id not in self._subscribers:
+            return
+        event = format_task_response(task) if task else None
+        try:
+            self._loop.call_soon_threadsafe(self._publish, task_id, event)
+        except RuntimeError:
+            pass  # Loop closed during shutdown
+
+    def _publish(self, task_id: str, event: Optional[Dict[str, Any]]):
+        for queue in list(self._subscribers.get(task_id, ())):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    # ------------------------------------------
+    # Consumer API
+    # ------------------------------------------
+    async def stream(self, task_id: str) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        Yield formatted task states until the task reaches a terminal status
+        or is deleted. Yields None on idle ticks so callers can send heartbeats.
+        """
+        queue = self.subscribe(task_id)
+        idle_timeout = SHARED_STORE_POLL_SECONDS if task_store.shared else HEARTBEAT_SECONDS
+
+        try:
+            task = get_task(task_id)
+            if not task:
+                return
+
+            last = format_task_response(task)
+            yield last
+
+            while last["status"] not in TERMINAL_STATUSES:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=idle_timeout)
+                except asyncio.TimeoutError:
+                    task = get_task(task_id)
+                    event = format_task_response(task) if task else None
+                    if event == last:
+                        yield None
+                        continue
+
+                if event is None:
+                    return  # Task deleted
+                if event != last:
+                    last = event
+                    yield event
+        finally:
+            self.unsubscribe(task_id, queue)
+
+
+# ==========================================
+# CONVENIENCE FUNCTIONS
+# ==========================================
+_hub = None
+
+
+def get_event_hub() -> TaskEventHub:
+    """Get singleton event hub instance"""
+    global _hub
+    if _hub is None:
+        _hub = TaskEventHub()
+    return _hub
@@ -0,0 +1,342 @@
+"""
+Job Executor Service
+====================
+Runs registered processors in dedicated process pools, one per task
+category (image, video, audio, document), so CPU-heavy jobs never share
+the GIL with the uvicorn worker that serves HTTP.
+
+Each category has a bounded queue. When it is full, submit() raises
+QueueFullError with a Retry-After hint so the API can answer 429.
+
+Processors run unchanged: every update_task() call made in the child is
+forwarded back to the parent through a multiprocessing queue. With the
+in-memory task store the child first seeds its private store with a
+snapshot of the task; shared stores (sqlite/redis) need no seeding.
+
+Children load the MODEL_PRELOAD models of their category when they start
+(services/model_pool.py); warm() starts them ahead of the first job.
+"""
+
+import os
+import logging
+import math
+import time
+import importlib
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, Future
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Optional, Dict, Any, Callable
+
+from config import get_settings
+
+logger = logging.getLogger("magetool.executor")
+settings = get_settings()
+
+
+class QueueFullError(Exception):
+    """Raised when a category queue has no free slot"""
+
+    def __init__(self, category: str, retry_after: int):
+        super().__init__(f"Job queue for '{category}' is full")
+        self.category = category
+        self.retry_after = retry_after
+
+
+# ==========================================
+# CHILD PROCESS SIDE
+# ==========================================
+_state_queue = None
+
+
+def _init_worker(state_queue, process_slots, log_level: str, category: str = None):
+    """Process pool initializer: wire task updates back to the parent, preload models"""
+    global _state_queue
+    _state_queue = state_queue
+    
+    # External processes count against the parent's global cap
+    from services.process_runner import configure_process_slots
+    configure_process_slots(process_slots)
+
+    logging.basicConfig(
+        level=getattr(logging, log_level, logging.INFO),
+        format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+
+    from services.tasks import add_task_listener
+    add_task_listener(_forward_task_state)
+
+    # Configured models are loaded before the first job reaches this process
+    if category and settings.MODEL_PRELOAD:
+        from services.model_pool import get_model_pool
+        get_model_pool().preload(category)
+
+
+def _warm_up() -> int:
+    """No-op job: makes the pool start a process (and run its initializer)"""
+    return os.getpid()
+
+
+def _forward_task_state(task_id: str, task: Optional[Dict[str, Any]]):
+    """Task listener installed in children: ship every update to the parent"""
+    if task is not None and _state_queue is not None:
+        _state_queue.put((task_id, dict(task)))
+
+
+def _run_job(
+    module_name: str,
+    task_type: str,
+    task: Dict[str, Any],
+    input_path: str,
+    original_filename: str,
+    params: Dict[str, Any],
+    cache_key: Optional[str] = None,
+) -> float:
+    """Execute one processor inside a pool process. Returns run time in seconds."""
+    started = time.monotonic()
+
+    # Importing the route module registers its processors in this process
+    importlib.import_module(module_name)
+    from routes.core import PROCESSORS
+    from services.tasks import task_store, is_cancel_requested
+
+    processor = PROCESSORS[task_type]
+    task_id = task["task_id"]
+
+    # Cancelled while waiting in the queue
+    if is_cancel_requested(task_id):
+        return time.monotonic() - started
+
+    # A shared store (sqlite/redis) already holds the task; a private one needs the snapshot
+    seeded = not task_store.shared
+    if seeded:
+        task_store.put(task_id, dict(task))
+
+    try:
+        processor(task_id, Path(input_path), original_filename, **params)
+
+        # Remember the output for identical future requests
+        if cache_key:
+            result = task_store.get(task_id)
+            if result and result.get("status") == "complete":
+                from services.result_cache import store_task_result
+                store_task_result(cache_key, result)
+    finally:
+        if seeded:
+            task_store.delete(task_id)
+        else:
+            task_store.flush()
+
+    return time.monotonic() - started
+
+
+# ==========================================
+# PARENT PROCESS SIDE
+# ==========================================
+class JobExecutor:
+    """
+    Per-category process pools with bounded queues.
+
+    A category accepts at most `workers + queue_size` jobs at once
+    (running + waiting). Anything beyond that is rejected immediately.
+    """
+
+    def __init__(self, pool_sizes: Dict[str, int] = None, queue_size: int = None):
+        self.pool_sizes = dict(pool_sizes or settings.JOB_POOL_SIZES)
+        self.queue_size = settings.JOB_QUEUE_SIZE if queue_size is None else queue_size
+        self._ctx = multiprocessing.get_context("spawn")
+        self._pools: Dict[str, ProcessPoolExecutor] = {}
+        self._pending: Dict[str, int] = {category: 0 for category in self.pool_sizes}
+        self._avg_job_seconds: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._state_queue = None
+        self._drain_thread: Optional[threading.Thread] = None
+        self._process_slots = None
+
+    # ------------------------------------------
+    # Pool management
+    # ------------------------------------------
+    def _ensure_state_channel(self):
+        """Start the queue + thread that applies child task updates"""
+        if self._state_queue is not None:
+            return
+        self._state_queue = self._ctx.Queue()
+
+        # One FFmpeg/LibreOffice/... slot semaphore shared by every pool and the API process
+        from services.process_runner import configure_process_slots, process_concurrency
+        self._process_slots = self._ctx.BoundedSemaphore(process_concurrency())
+        configure_process_slots(self._process_slots)
+
+        self._drain_thread = threading.Thread(
+            target=self._drain_state_queue, name="job-state-drain", daemon=True
+        )
+        self._drain_thread.start()
+
+    def _drain_state_queue(self):
+        from services.tasks import apply_task_state
+
+        while True:
+            item = self._state_queue.get()
+            if item is None:
+                break
+            task_id, state = item
+            apply_task_state(task_id, state)
+
+    def _get_pool(self, category: str) -> ProcessPoolExecutor:
+        pool = self._pools.get(category)
+        if pool is None:
+            self._ensure_state_channel()
+            pool = ProcessPoolExecutor(
+                max_workers=self.pool_sizes[category],
+                mp_context=self._ctx,
+                initializer=_init_worker,
+                initargs=(self._state_queue, self._process_slots, settings.LOG_LEVEL, category),
+            )
+            self._pools[category] = pool
+            logger.info(f"Started {category} pool with {self.pool_sizes[category]} workers")
+        return pool
+
+    def warm(self, category: str):
+        """Start every worker of a category now instead of on its first jobs"""
+        pool = self._get_pool(category)
+        # Each submit with no idle worker spawns one more process
+        for _ in range(self.pool_sizes[category]):
+            pool.submit(_warm_up)
+
+    def _resolve_category(self, category: str) -> str:
+        if category in self.pool_sizes:
+            return category
+        return "document"
+
+    # ------------------------------------------
+    # Submission
+    # ------------------------------------------
+    def capacity(self, category: str) -> int:
+        """Max jobs (running + queued) accepted for a category"""
+        return self.pool_sizes[category] + self.queue_size
+
+    def retry_after(self, category: str) -> int:
+        """Seconds until a slot is likely to free up"""
+        workers = self.pool_sizes[category]
+        avg = self._avg_job_seconds.get(category, 0.0)
+        backlog = self._pending[category] - workers + 1
+        estimate = math.ceil(avg * max(backlog, 1) / workers) if avg else 0
+        return max(settings.JOB_RETRY_AFTER_SECONDS, estimate)
+
+    def submit(
+        self,
+        category: str,
+        task_type: str,
+        processor: Callable,
+        task_id: str,
+        input_path: Path,
+        original_filename: str,
+        params: Dict[str, Any],
+        cache_key: Optional[str] = None,
+    ) -> Future:
+        """
+        Queue a processor run. Raises QueueFullError when the category is saturated.
+        The task is moved to QUEUED; the processor sets PROCESSING when it starts.
+        With a cache_key the finished output is added to the result cache.
+        """
+        from services.tasks import get_task, update_task, TaskStatus
+
+        category = self._resolve_category(category)
+
+        with self._lock:
+            if self._pending[category] >= self.capacity(category):
+                raise QueueFullError(category, self.retry_after(category))
+            self._pending[category] += 1
+
+        try:
+            update_task(task_id, status=TaskStatus.QUEUED, progress_percent=0)
+            task = dict(get_task(task_id))
+            job_args = (
+                processor.__module__, task_type, task,
+                str(input_path), original_filename, params, cache_key,
+            )
+
+            try:
+                future = self._get_pool(category).submit(_run_job, *job_args)
+            except BrokenProcessPool:
+                # A child died hard (OOM-kill etc.) - rebuild the pool once
+                logger.warning(f"{category} pool broken, restarting it")
+                self._pools.pop(category, None)
+                future = self._get_pool(category).submit(_run_job, *job_args)
+        except Exception:
+            with self._lock:
+                self._pending[category] -= 1
+            raise
+
+        future.add_done_callback(
+            lambda f: self._on_job_done(category, task_id, f)
+        )
+        return future
+
+    def _on_job_done(self, category: str, task_id: str, future: Future):
+        from services.tasks import update_task, TaskStatus
+
+        with self._lock:
+            self._pending[category] -= 1
+
+        if future.cancelled():
+            update_task(task_id, status=TaskStatus.CANCELLED)
+            return
+
+        error = future.exception()
+        if error is not None:
+            logger.error(f"Job {task_id} crashed in {category} pool: {error}")
+            update_task(task_id, status=TaskStatus.FAILED, error_message=str(error))
+            return
+
+        # Exponential moving average of processor run time
+        elapsed = future.result()
+        previous = self._avg_job_seconds.get(category)
+        self._avg_job_seconds[category] = (
+            elapsed if previous is None else previous * 0.8 + elapsed * 0.2
+        )
+
+    # ------------------------------------------
+    # Introspection / lifecycle
+    # ------------------------------------------
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-category pool usage"""
+        return {
+            category: {
+                "workers": workers,
+                "pending": self._pending[category],
+                "capacity": self.capacity(category),
+                "avg_job_seconds": round(self._avg_job_seconds.get(category, 0.0), 2),
+            }
+            for category, workers in self.pool_sizes.items()
+        }
+
+    def shutdown(self):
+        """Stop all pools and the state drain thread"""
+        for category, pool in self._pools.items():
+            pool.shutdown(wait=False, cancel_futures=True)
+            logger.info(f"Stopped {category} pool")
+        self._pools.clear()
+
+        if self._state_queue is not None:
+            self._state_queue.put(None)
+            if self._drain_thread:
+                self._drain_thread.join(timeout=5)
+            self._state_queue = None
+            self._drain_thread = None
+
+
+# ==========================================
+# CONVENIENCE FUNCTIONS
+# ==========================================
+_executor = None
+
+
+def get_executor() -> JobExecutor:
+    """Get singleton executor instance"""
+    global _executor
+    if _executor is None:
+        _executor = JobExecutor()
+    return _executor
@@ -0,0 +1,245 @@
+"""
+FFmpeg Runner Service
+=====================
+Runs FFmpeg with `-progress pipe:1` and turns its key=value progress
+blocks into task updates while the encode is running:
+
+- progress_percent: out_time (µs) against the expected output duration
+- estimated_time_remaining_seconds: remaining media time / encode speed
+- metrics.encode_speed: FFmpeg's `speed=` (x realtime)
+
+Updates are throttled so a fast encode does not hammer the task store.
+Processes go through services.process_runner (concurrency cap,
+cancellation, process-group kill, stderr ring buffer).
+"""
+
+import time
+import asyncio
+import logging
+from pathlib import Path
+from typing import Optional, Dict, Any, Tuple, List
+
+from services.process_runner import run_process
+from services.probe import probe_duration as probe_duration_async
+
+logger = logging.getLogger("magetool.ffmpeg")
+
+# Min seconds between task updates for one encode
+PROGRESS_UPDATE_INTERVAL = 1.0
+
+
+# ==========================================
+# DURATION HELPERS
+# ==========================================
+def parse_timestamp(value: Any) -> Optional[float]:
+    """Parse an FFmpeg time value ('90', '1.5', '00:01:30.5') into seconds"""
+    if value is None:
+        return None
+    try:
+        text = str(value).strip()
+        if ":" in text:
+            seconds = 0.0
+            for part in text.split(":"):
+                seconds = seconds * 60 + float(part)
+            return seconds
+        return float(text)
+    except (TypeError, ValueError):
+        return None
+
+
+def probe_duration(path: Path) -> Optional[float]:
+    """Blocking probe_duration_async() (cached by services.probe)"""
+    return asyncio.run(probe_duration_async(path))
+
+
+async def estimate_output_duration(args: List[str]) -> Optional[float]:
+    """
+    Expected output duration for an FFmpeg argument list: the first input's
+    duration, reduced by input -ss and capped by output -t / -to.
+    """
+    if "-i" not in args:
+        return None
+    input_index = args.index("-i")
+    if input_index + 1 >= len(args):
+        return None
+
+    # Concat lists and other demuxer-specific inputs can't be probed directly
+    if "-f" in args[:input_index]:
+        return None
+
+    duration = await probe_duration_async(Path(args[input_index + 1]))
+    if duration is None:
+        return None
+
+    before, after = args[:input_index], args[input_index + 2:]
+
+    def option(options: List[str], name: str) -> Optional[float]:
+        if name in options:
+            position = options.index(name)
+            if position + 1 < len(options):
+                return parse_timestamp(options[position + 1])
+        return None
+
+    seek = option(before, "-ss") or 0.0
+    duration = max(duration - seek, 0.0)
+
+    # With input seeking, output timestamps start at 0, so -to behaves like -t
+    for limit in (option(after, "-t"), option(after, "-to")):
+        if limit is not None:
+            duration = min(duration, limit)
+
+    return duration or None
+
+
+# ==========================================
+# PROGRESS TRACKING
+# ==========================================
+def parse_speed(value: Optional[str]) -> Optional[float]:
+    """'1.23x' -> 1.23 ('N/A' and garbage -> None)"""
+    if not value:
+        return None
+    try:
+        speed = float(value.strip().rstrip("x"))
+        return speed if speed > 0 else None
+    except ValueError:
+        return None
+
+
+class ProgressTracker:
+    """
+    Consumes `-progress` key=value lines and decides when to emit an update.
+    Kept free of I/O so the math can be tested without FFmpeg.
+    """
+
+    def __init__(
+        self,
+        duration: Optional[float],
+        progress_range: Tuple[int, int] = (30, 90),
+        interval: float = PROGRESS_UPDATE_INTERVAL,
+        clock=time.monotonic,
+    ):
+        self.duration = duration
+        self.start_percent, self.end_percent = progress_range
+        self.interval = interval
+        self._clock = clock
+        self._started = clock()
+        self._last_emit = None
+        self._block: Dict[str, str] = {}
+        self.out_time = 0.0
+        self.speed: Optional[float] = None
+
+    def feed(self, line: str) -> Optional[Dict[str, Any]]:
+        """Add one progress line. Returns update kwargs when a block completes and is due."""
+        key, sep, value = line.strip().partition("=")
+        if not sep:
+            return None
+        self._block[key] = value
+        if key != "progress":
+            return None
+
+        block, self._block = self._block, {}
+        self._apply(block)
+        now = self._clock()
+
+        finished = value == "end"
+        if not finished and self._last_emit is not None and now - self._last_emit < self.interval:
+            return None
+        self._last_emit = now
+        return self.snapshot(now)
+
+    def _apply(self, block: Dict[str, str]):
+        # out_time_ms is microseconds too (historical misnomer); prefer out_time_us
+        raw = block.get("out_time_us") or block.get("out_time_ms")
+        try:
+            if raw and raw != "N/A":
+                self.out_time = max(int(raw) / 1_000_000, 0.0)
+        except ValueError:
+            pass
+
+        speed = parse_speed(block.get("speed"))
+        if speed is not None:
+            self.speed = speed
+
+    def snapshot(self, now: float = None) -> Dict[str, Any]:
+        """Current progress as update_task() kwargs"""
+        now = self._clock() if now is None else now
+        update: Dict[str, Any] = {}
+
+        speed = self.speed
+        if speed is None and self.out_time > 0:
+            elapsed = now - self._started
+            speed = self.out_time / elapsed if elapsed > 0 else None
+
+        if speed is not None:
+            update["metrics"] = {"encode_speed": round(speed, 2)}
+
+        if self.duration:
+            fraction = min(self.out_time / self.duration, 1.0)
+            span = self.end_percent - self.start_percent
+            update["progress_percent"] = self.start_percent + int(span * fraction)
+            if speed:
+                remaining = max(self.duration - self.out_time, 0.0)
+                update["estimated_time_remaining"] = int(round(remaining / speed))
+
+        return update
+
+
+# ==========================================
+# RUNNER
+# ==========================================
+async def run_ffmpeg_async(
+    args: list,
+    timeout: int = 600,
+    task_id: Optional[str] = None,
+    duration: Optional[float] = None,
+    progress_range: Tuple[int, int] = (30, 90),
+) -> tuple[bool, str]:
+    """
+    Run FFmpeg command and return success status and output (stderr tail).
+
+    With a task_id, progress/ETA/encode speed are pushed to the task while
+    the encode runs, and cancelling the task kills FFmpeg. duration is the
+    expected output length in seconds; when omitted it is estimated from
+    the first input.
+    """
+    tracker = None
+    if task_id is not None:
+        if duration is None:
+            duration = await estimate_output_duration(args)
+        tracker = ProgressTracker(duration, progress_range)
+
+    def on_progress_line(line: str):
+        update = tracker.feed(line)
+        if update:
+            _push_progress(task_id, update)
+
+    command = ["ffmpeg", "-y", "-nostats", "-progress", "pipe:1"] + args
+
+    try:
+        result = await run_process(
+            command,
+            timeout=timeout,
+            task_id=task_id,
+            on_stdout_line=on_progress_line if tracker else None,
+        )
+    except FileNotFoundError:
+        return False, "FFmpeg not installed"
+    except Exception as e:
+        return False, str(e)
+
+    return result.ok, result.error
+
+
+def run_ffmpeg(args: list, timeout: int = 600, **kwargs) -> tuple[bool, str]:
+    """Blocking run_ffmpeg_async() for sync processors"""
+    return asyncio.run(run_ffmpeg_async(args, timeout=timeout, **kwargs))
+
+
+def _push_progress(task_id: str, update: Dict[str, Any]):
+    """Write one throttled progress update (never fails the encode)"""
+    from services.tasks import update_task
+
+    try:
+        update_task(task_id, **update)
+    except Exception as e:
+        logger.debug(f"Progress update failed for {task_id}: {e}")
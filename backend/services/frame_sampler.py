@@ -0,0 +1,94 @@
+"""
+Frame Sampler
+=============
+Representative stills of a video (reverse search, thumbnails) without
+decoding the video:
+
+- N sample points spread over the duration, each opened with an
+  input-side `-ss` (container seek, no decoding up to it) and
+  `-skip_frame nokey`, so only the keyframe at each point is decoded
+- all N points in one FFmpeg invocation: the file is opened N times as
+  separate inputs, each mapped to its own one-frame output
+- results are cached per content hash (plain files under TEMP_DIR that
+  expire with the temp cleanup), so sampling the same clip again costs
+  nothing
+"""
+
+import os
+import logging
+from pathlib import Path
+from typing import Optional, List
+
+from config import get_settings
+from services.probe import probe_duration, ProbeError
+from services.process_runner import run_process
+
+logger = logging.getLogger("magetool.frames")
+settings = get_settings()
+
+SAMPLE_TIMEOUT = 60
+
+
+def sample_times(duration: Optional[float], count: int) -> List[float]:
+    """Middle of each of `count` equal slices of the video"""
+    if not duration or duration <= 0:
+        return [0.0]
+    return [round(duration * (i + 0.5) / count, 3) for i in range(count)]
+
+
+def _sample_path(digest: str, count: int, width: Optional[int], index: int) -> Path:
+    return settings.TEMP_DIR / f"frames_{digest[:32]}_{count}_{width or 0}_{index:02d}.jpg"
+
+
+def cached_samples(digest: str, count: int, width: Optional[int] = None) -> Optional[List[Path]]:
+    """Previously sampled stills of this content, or None"""
+    paths = sorted(settings.TEMP_DIR.glob(f"frames_{digest[:32]}_{count}_{width or 0}_*.jpg"))
+    if not paths:
+        return None
+    for path in paths:
+        try:
+            os.utime(path)  # keep them through the temp cleanup
+        except OSError:
+            return None
+    return paths
+
+
+async def sample_keyframes(input_path: Path, digest: str, count: int = 1,
+                           width: Optional[int] = None) -> List[Path]:
+    """
+    JPEG stills at `count` points of the video (fewer if the video is
+    short or unreadable), scaled down to `width` if given. Cached per
+    content hash.
+    """
+    cached = cached_samples(digest, count, width)
+    if cached is not None:
+        return cached
+
+    try:
+        duration = await probe_duration(input_path)
+    except ProbeError:
+        duration = None
+    times = sample_times(duration, count)
+
+    command = ["ffmpeg", "-y", "-v", "error"]
+    for time_point in times:
+        command += ["-ss", str(time_point), "-skip_frame", "nokey", "-i", str(input_path)]
+    outputs = []
+    for index in range(len(times)):
+        output = _sample_path(digest, count, width, index)
+        command += ["-map", f"{index}:v:0", "-frames:v", "1", "-q:v", "2"]
+        if width:
+            command += ["-vf", f"scale='min({width},iw)':-2"]
+        command.append(str(output))
+        outputs.append(output)
+
+    try:
+        result = await run_process(command, timeout=SAMPLE_TIMEOUT)
+    except FileNotFoundError:
+        logger.warning("FFmpeg not installed, no frames sampled")
+        return []
+    if not result.ok:
+        logger.warning(f"Frame sampling failed for {input_path.name}: {result.error}")
+
+    # A seek past the last keyframe yields no frame; keep what was written
+    return [path for path in outputs if path.exists() and path.stat().st_size > 0]
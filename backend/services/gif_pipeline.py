@@ -0,0 +1,130 @@
+"""
+GIF Pipeline
+============
+Video-to-GIF in three cached steps instead of one filter graph that
+decodes the whole source every time:
+
+1. frames: the clip decoded once, cut, fps-reduced and scaled, stored
+   losslessly (FFV1 .mkv)
+2. palette: palettegen (stats_mode=full) over those frames
+3. render: paletteuse on the frames
+
+Steps 1 and 2 are cached under TEMP_DIR per (input SHA-256, start,
+duration, fps, width), as plain files that expire with the temp
+cleanup. Retrying the same clip re-runs only step 3. The frames are
+lossless, so palettegen and paletteuse see the same pixels as in the
+single-graph command and the result is the same.
+
+A preview mode renders a low-fps, small-width version of the clip and
+extrapolates it into a size estimate for the full render.
+"""
+
+import os
+import uuid
+import hashlib
+import logging
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple
+
+from config import get_settings
+from services.ffmpeg import run_ffmpeg
+from services.result_cache import hash_file
+from services.operation_spec import (
+    GIF_PALETTEGEN, GIF_PALETTEUSE, INTERMEDIATE_CODEC, INTERMEDIATE_FORMAT, gif_frame_filter,
+)
+
+logger = logging.getLogger("magetool.gif")
+settings = get_settings()
+
+# Preview renders: low fps, small width
+PREVIEW_FPS = 8
+PREVIEW_WIDTH = 320
+
+
+def _clip_key(input_digest: str, start_time: Optional[str], duration: Optional[str]) -> str:
+    """Digest of the source clip (input + cut)"""
+    return hashlib.sha256(f"{input_digest}|{start_time or ''}|{duration or ''}".encode()).hexdigest()[:32]
+
+
+def frames_path(clip_key: str, fps: int, width: int) -> Path:
+    return settings.TEMP_DIR / f"gifcache_{clip_key}_{fps}_{width}_frames.{INTERMEDIATE_FORMAT}"
+
+
+def palette_path(clip_key: str, fps: int, width: int) -> Path:
+    return settings.TEMP_DIR / f"gifcache_{clip_key}_{fps}_{width}_palette.png"
+
+
+def _touch(path: Path) -> bool:
+    """True if path exists (and keep it through the temp cleanup)"""
+    try:
+        os.utime(path)
+        return True
+    except OSError:
+        return False
+
+
+def _run_to(args: List[str], destination: Path, task_id: Optional[str], **kwargs):
+    """Run FFmpeg into a private file, then move it into place (concurrent requests share the cache)"""
+    private = destination.with_name(f"{destination.stem}.{uuid.uuid4().hex[:8]}{destination.suffix}")
+    success, error = run_ffmpeg(args + [str(private)], task_id=task_id, **kwargs)
+    if not success:
+        private.unlink(missing_ok=True)
+        raise Exception(f"FFmpeg error: {error}")
+    private.replace(destination)
+
+
+def prepare(input_path: Path, fps: int, width: int, start_time: Optional[str] = None,
+            duration: Optional[str] = None, input_digest: Optional[str] = None,
+            task_id: Optional[str] = None) -> Tuple[Path, Path, Dict[str, bool]]:
+    """Cached (frames, palette) for this clip; third value says what was reused"""
+    clip_key = _clip_key(input_digest or hash_file(input_path), start_time, duration)
+    frames, palette = frames_path(clip_key, fps, width), palette_path(clip_key, fps, width)
+    reused = {"frames": _touch(frames), "palette": _touch(palette)}
+
+    if not reused["frames"]:
+        args = (["-ss", start_time] if start_time else []) + ["-i", str(input_path)]
+        args += (["-t", duration] if duration else []) + ["-vf", gif_frame_filter(fps, width)]
+        _run_to(args + ["-an"] + INTERMEDIATE_CODEC, frames, task_id, progress_range=(10, 40))
+
+    if not reused["palette"]:
+        _run_to(["-i", str(frames), "-vf", GIF_PALETTEGEN, "-update", "1"], palette, task_id,
+                progress_range=(40, 50))
+    return frames, palette, reused
+
+
+def render(frames: Path, palette: Path, output_path: Path,
+           task_id: Optional[str] = None, progress_range: Tuple[int, int] = (50, 90)):
+    """paletteuse over the cached frames"""
+    success, error = run_ffmpeg(
+        ["-i", str(frames), "-i", str(palette), "-lavfi", f"[0:v][1:v]{GIF_PALETTEUSE}", str(output_path)],
+        task_id=task_id, progress_range=progress_range,
+    )
+    if not success:
+        raise Exception(f"FFmpeg error: {error}")
+
+
+def make_gif(input_path: Path, output_path: Path, fps: int, width: int,
+             start_time: Optional[str] = None, duration: Optional[str] = None,
+             preview: bool = False, input_digest: Optional[str] = None,
+             task_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Render a GIF through the cache. Returns a report (cache reuse,
+    settings used, and for previews the estimated full-render size).
+    """
+    full_fps, full_width = fps, width
+    if preview:
+        fps, width = min(fps, PREVIEW_FPS), min(width, PREVIEW_WIDTH)
+
+    frames, palette, reused = prepare(input_path, fps, width, start_time, duration, input_digest, task_id)
+    report: Dict[str, Any] = {
+        "fps": fps, "width": width, "preview": preview,
+        "frames_cached": reused["frames"], "palette_cached": reused["palette"],
+    }
+
+    render(frames, palette, output_path, task_id=task_id)
+
+    if preview:
+        # GIF bytes grow roughly with pixels per second
+        scale = (full_width / width) ** 2 * (full_fps / fps)
+        report["estimated_size"] = int(output_path.stat().st_size * scale)
+    return report
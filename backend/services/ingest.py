@@ -0,0 +1,142 @@
+"""
+Upload Ingest Service
+=====================
+Single streaming path for every uploaded file:
+
+- streams 1MB chunks to disk without blocking the event loop
+- SHA-256 computed on the fly (free content key for the result cache)
+- MIME sniffed from the first chunk with libmagic (no second file read)
+- per-category size limit (MAX_<CATEGORY>_SIZE_MB) enforced mid-stream;
+  the partial file is removed and 413 returned as soon as it is exceeded
+
+Returns an IngestRecord; with a task_id it is also stored on the task.
+Synchronous routes that only need the bytes use read_upload(), which
+applies the same limit (and an optional byte budget for batches).
+"""
+
+import hashlib
+import logging
+from pathlib import Path
+from typing import Optional, Dict, Any
+
+import aiofiles
+from fastapi import UploadFile, HTTPException
+
+from config import get_settings
+from services.validation import detect_mime_from_buffer, validate_mime
+
+logger = logging.getLogger("magetool.ingest")
+settings = get_settings()
+
+# Chunk size for async file streaming (1MB chunks for optimal speed)
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB
+
+
+class IngestRecord:
+    """What we learned about an upload while writing it"""
+
+    __slots__ = ("path", "size", "sha256", "mime")
+
+    def __init__(self, path: Path, size: int, sha256: str, mime: Optional[str]):
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+        self.mime = mime
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"size": self.size, "sha256": self.sha256, "mime": self.mime}
+
+
+def max_upload_bytes(category: str) -> int:
+    """Upload size limit for a category (image / video / audio / document)"""
+    limit_mb = {
+        "image": settings.MAX_IMAGE_SIZE_MB,
+        "video": settings.MAX_VIDEO_SIZE_MB,
+        "audio": settings.MAX_AUDIO_SIZE_MB,
+        "document": settings.MAX_DOCUMENT_SIZE_MB,
+    }.get(category, settings.MAX_DOCUMENT_SIZE_MB)
+    return limit_mb * 1024 * 1024
+
+
+async def save_upload_file(
+    upload_file: UploadFile,
+    destination: Path,
+    category: str,
+    task_id: Optional[str] = None,
+    validate: bool = True,
+) -> IngestRecord:
+    """
+    Stream an upload to destination, hashing and sniffing it on the way.
+    Raises HTTPException (413 too large, 400 content/extension mismatch);
+    the destination file is removed on any failure.
+    """
+    limit = max_upload_bytes(category)
+    digest = hashlib.sha256()
+    total_size = 0
+    mime = None
+    sniffed = False
+
+    try:
+        async with aiofiles.open(destination, "wb") as f:
+            while chunk := await upload_file.read(UPLOAD_CHUNK_SIZE):
+                total_size += len(chunk)
+                if total_size > limit:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"File too large. Maximum size for {category} files is {limit // (1024 * 1024)}MB",
+                    )
+
+                if not sniffed:
+                    sniffed = True
+                    # GAREEB SHIELD: magic bytes from the head of the stream
+                    mime = detect_mime_from_buffer(chunk)
+                    if validate:
+                        validate_mime(mime, destination.suffix)
+
+                digest.update(chunk)
+                await f.write(chunk)
+
+        if not sniffed:  # Empty upload
+            mime = detect_mime_from_buffer(b"")
+            if validate:
+                validate_mime(mime, destination.suffix)
+    except BaseException:
+        destination.unlink(missing_ok=True)
+        raise
+    finally:
+        await upload_file.close()
+
+    record = IngestRecord(destination, total_size, digest.hexdigest(), mime)
+
+    if task_id is not None:
+        from services.tasks import update_task
+        update_task(task_id, input_info=record.to_dict())
+
+    return record
+
+
+async def read_upload(upload_file: UploadFile, category: str, budget: Optional[int] = None) -> bytes:
+    """
+    Whole upload in memory, read in chunks. Raises 413 as soon as it exceeds
+    the category limit or `budget` bytes (what is left of a batch's total).
+    """
+    limit = max_upload_bytes(category)
+    chunks = []
+    total_size = 0
+    try:
+        while chunk := await upload_file.read(UPLOAD_CHUNK_SIZE):
+            total_size += len(chunk)
+            if total_size > limit:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"File too large. Maximum size for {category} files is {limit // (1024 * 1024)}MB",
+                )
+            if budget is not None and total_size > budget:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Upload too large. Maximum total size is {settings.MAX_BATCH_UPLOAD_MB}MB",
+                )
+            chunks.append(chunk)
+    finally:
+        await upload_file.close()
+    return b"".join(chunks)
@@ -0,0 +1,344 @@
+"""
+Model Pool
+==========
+One place that owns the heavy ML models (rembg, EasyOCR, Real-ESRGAN)
+of a process, instead of each processor importing and building its own
+on first use:
+
+- every model is loaded once per process and shared by all requests
+  (the rembg ONNX session included - `remove()` without a session builds
+  a new one on every call)
+- names in MODEL_PRELOAD are loaded up front: by the image job pool
+  processes when they start (the pool is spawned at startup for this)
+  and, for the models routes use directly, by the API process - so the
+  first request after a deploy doesn't pay the load
+- when available memory drops under MODEL_MIN_FREE_MB, models idle for
+  MODEL_IDLE_SECONDS are dropped, least recently used first; a model in
+  use is never dropped, an evicted one is simply loaded again when needed
+- load time and the RSS the load added are recorded per model; each
+  process publishes its pool to TEMP_DIR/state/models/<pid>.json and
+  /metrics reports all of them
+
+Loaders import their libraries lazily: a missing library raises
+ImportError from use(), which callers handle with their fallbacks.
+"""
+
+import os
+import gc
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional, Dict, Any, Callable, Iterator, List, Tuple
+
+from config import get_settings
+
+logger = logging.getLogger("magetool.models")
+settings = get_settings()
+
+# Process roles a model can be preloaded in
+API_PROCESS = "api"
+
+
+# ==========================================
+# MEMORY
+# ==========================================
+def available_memory() -> int:
+    """Bytes this process could still allocate (host or cgroup limit, whichever is lower)"""
+    available = None
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    available = int(line.split()[1]) * 1024
+                    break
+    except OSError:
+        pass
+    if available is None:
+        try:
+            available = os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+        except (ValueError, OSError, AttributeError):
+            available = 2 * 1024 ** 3
+
+    try:
+        limit = Path("/sys/fs/cgroup/memory.max").read_text().strip()
+        if limit != "max":
+            used = int(Path("/sys/fs/cgroup/memory.current").read_text())
+            available = min(available, int(limit) - used)
+    except (OSError, ValueError):
+        pass
+    return max(available, 0)
+
+
+def current_rss() -> Optional[int]:
+    """Resident set size of this process in bytes"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+# ==========================================
+# REGISTRY
+# ==========================================
+@dataclass
+class ModelSpec:
+    loader: Callable[[], Any]
+    processes: Tuple[str, ...] = ("image",)  # job pool categories (or "api") using it
+
+
+@dataclass
+class LoadedModel:
+    model: Any
+    load_seconds: float
+    memory_mb: Optional[float]
+    loaded_at: float = field(default_factory=time.time)
+    last_used: float = field(default_factory=time.monotonic)
+    in_use: int = 0
+    uses: int = 0
+
+
+class ModelPool:
+    """Lazily loaded, shared, evictable models of this process"""
+
+    def __init__(self):
+        self._specs: Dict[str, ModelSpec] = {}
+        self._models: Dict[str, LoadedModel] = {}
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._evictions = 0
+        self._sweeper: Optional[threading.Thread] = None
+
+    def register(self, name: str, loader: Callable[[], Any], processes: Tuple[str, ...] = ("image",)):
+        self._specs[name] = ModelSpec(loader, tuple(processes))
+        self._load_locks.setdefault(name, threading.Lock())
+
+    def names(self) -> List[str]:
+        return list(self._specs)
+
+    # ------------------------------------------
+    # Access
+    # ------------------------------------------
+    def _load(self, name: str) -> LoadedModel:
+        if name not in self._specs:
+            raise KeyError(f"Unknown model: {name}")
+
+        # One load per model at a time; others wait for it instead of loading twice
+        with self._load_locks[name]:
+            with self._lock:
+                entry = self._models.get(name)
+            if entry is not None:
+                return entry
+
+            self.evict_idle()  # make room first if memory is already short
+            rss_before = current_rss()
+            started = time.monotonic()
+            model = self._specs[name].loader()
+            load_seconds = time.monotonic() - started
+            rss_after = current_rss()
+            memory_mb = (
+                round((rss_after - rss_before) / (1024 * 1024), 1)
+                if rss_before is not None and rss_after is not None else None
+            )
+
+            entry = LoadedModel(model, round(load_seconds, 2), memory_mb)
+            with self._lock:
+                self._models[name] = entry
+            logger.info(f"Model {name} loaded in {load_seconds:.1f}s (+{memory_mb} MB RSS)")
+
+        self._start_sweeper()
+        self.publish()
+        return entry
+
+    @contextmanager
+    def use(self, name: str) -> Iterator[Any]:
+        """The shared model `name`, loaded if needed; not evicted while held"""
+        while True:
+            entry = self._load(name)
+            with self._lock:
+                # Evicted between load and here: load again
+                if self._models.get(name) is entry:
+                    entry.in_use += 1
+                    entry.uses += 1
+                    entry.last_used = time.monotonic()
+                    break
+        try:
+            yield entry.model
+        finally:
+            with self._lock:
+                entry.in_use -= 1
+                entry.last_used = time.monotonic()
+
+    def preload(self, process: str, names: Optional[List[str]] = None) -> List[str]:
+        """Load the configured models used in `process`; failures are logged, not raised"""
+        wanted = settings.MODEL_PRELOAD if names is None else names
+        loaded = []
+        for name in wanted:
+            spec = self._specs.get(name)
+            if spec is None:
+                logger.warning(f"MODEL_PRELOAD: unknown model {name}")
+                continue
+            if process not in spec.processes:
+                continue
+            try:
+                self._load(name)
+                loaded.append(name)
+            except ImportError as e:
+                logger.warning(f"Model {name} not preloaded, library missing: {e}")
+            except Exception as e:
+                logger.error(f"Model {name} preload failed: {e}")
+        return loaded
+
+    # ------------------------------------------
+    # Eviction
+    # ------------------------------------------
+    def evict(self, name: str) -> bool:
+        with self._lock:
+            entry = self._models.get(name)
+            if entry is None or entry.in_use:
+                return False
+            del self._models[name]
+            self._evictions += 1
+        del entry
+        gc.collect()
+        logger.info(f"Model {name} evicted")
+        self.publish()
+        return True
+
+    def evict_idle(self, available: Optional[int] = None) -> List[str]:
+        """Drop idle models, least recently used first, while memory is short"""
+        min_free = settings.MODEL_MIN_FREE_MB * 1024 * 1024
+        if available is None:
+            available = available_memory()
+        if available >= min_free:
+            return []
+
+        now = time.monotonic()
+        with self._lock:
+            candidates = sorted(
+                (entry.last_used, name) for name, entry in self._models.items()
+                if not entry.in_use and now - entry.last_used >= settings.MODEL_IDLE_SECONDS
+            )
+
+        evicted = []
+        for _, name in candidates:
+            if self.evict(name):
+                evicted.append(name)
+                if available_memory() >= min_free:
+                    break
+        return evicted
+
+    def _start_sweeper(self):
+        """Per-process thread checking memory pressure while models are loaded"""
+        with self._lock:
+            if self._sweeper is not None:
+                return
+            self._sweeper = threading.Thread(target=self._sweep, name="model-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def _sweep(self):
+        while True:
+            time.sleep(settings.MODEL_SWEEP_SECONDS)
+            try:
+                self.evict_idle()
+            except Exception as e:
+                logger.error(f"Model sweep error: {e}")
+
+    # ------------------------------------------
+    # Introspection
+    # ------------------------------------------
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "evictions": self._evictions,
+                "models": {
+                    name: {
+                        "load_seconds": entry.load_seconds,
+                        "memory_mb": entry.memory_mb,
+                        "loaded_at": round(entry.loaded_at, 1),
+                        "idle_seconds": round(now - entry.last_used, 1),
+                        "in_use": entry.in_use,
+                        "uses": entry.uses,
+                    }
+                    for name, entry in self._models.items()
+                },
+            }
+
+    def publish(self):
+        """Write this process's stats where /metrics can read them"""
+        try:
+            path = stats_dir() / f"{os.getpid()}.json"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = path.with_suffix(".tmp")
+            temp_path.write_text(json.dumps(self.stats()))
+            temp_path.replace(path)
+        except OSError as e:
+            logger.debug(f"Model stats not published: {e}")
+
+
+def stats_dir() -> Path:
+    return settings.TEMP_DIR / "state" / "models"
+
+
+def collect_stats() -> List[Dict[str, Any]]:
+    """Published pools of all live processes on this host; stale files are removed"""
+    pools = []
+    for path in sorted(stats_dir().glob("*.json")):
+        try:
+            os.kill(int(path.stem), 0)
+        except ProcessLookupError:
+            path.unlink(missing_ok=True)
+            continue
+        except (ValueError, PermissionError):
+            pass
+        try:
+            pools.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            continue
+    return pools
+
+
+# ==========================================
+# BUILT-IN MODELS
+# ==========================================
+def _load_rembg():
+    from rembg import new_session
+    return new_session(settings.REMBG_MODEL)
+
+
+def _load_easyocr():
+    import easyocr
+    return easyocr.Reader(settings.OCR_LANGUAGES, gpu=False, verbose=False)
+
+
+def _realesrgan_loader(scale: int) -> Callable[[], Any]:
+    def load():
+        from services.upscaler import load_realesrgan
+        return load_realesrgan(scale)
+    return load
+
+
+_pool: Optional[ModelPool] = None
+
+
+def get_model_pool() -> ModelPool:
+    """Get singleton pool with the built-in models registered"""
+    global _pool
+    if _pool is None:
+        _pool = ModelPool()
+        _pool.register("rembg", _load_rembg, processes=("image", API_PROCESS))
+        _pool.register("easyocr", _load_easyocr)
+        _pool.register("realesrgan_x2", _realesrgan_loader(2))
+        _pool.register("realesrgan_x4", _realesrgan_loader(4))
+    return _pool
+
+
+def use_model(name: str):
+    """Shortcut: get_model_pool().use(name)"""
+    return get_model_pool().use(name)
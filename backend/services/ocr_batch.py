@@ -0,0 +1,184 @@
+"""
+OCR Pipeline
+============
+Text recognition for single images and batches (many images, multi-page
+PDFs), shared by /ocr and /ocr-batch:
+
+- pages are prepared in memory: RGB, longest side capped at
+  OCR_MAX_DIMENSION, handed to EasyOCR as NumPy arrays - no temp JPEG
+  written and read back per image
+- PDF pages are rendered one at a time, so a long PDF never sits in
+  memory as a whole
+- pages go to the reader OCR_BATCH_SIZE at a time: same-sized pages
+  (typical for PDF pages) share one readtext_batched() call, so text
+  detection runs on the batch at once
+- every finished page is handed to `on_page` right away, so callers can
+  publish results while the rest of the batch is still running
+
+Without EasyOCR, pytesseract is used page by page.
+"""
+
+import logging
+from contextlib import ExitStack
+from functools import partial
+from pathlib import Path
+from typing import Optional, Dict, Any, Callable, Iterator, List, Tuple
+
+import numpy as np
+from PIL import Image
+
+from config import get_settings
+from services.model_pool import use_model
+
+logger = logging.getLogger("magetool.ocr")
+settings = get_settings()
+
+# OCR doesn't need 4K resolution
+OCR_MAX_DIMENSION = 2000
+PDF_RENDER_DPI = 200
+
+# (box, text, confidence) per detected line, as EasyOCR returns them
+OcrLine = Tuple[Any, str, Optional[float]]
+
+
+# ==========================================
+# PAGES
+# ==========================================
+def prepare_page(image: Image.Image) -> np.ndarray:
+    """RGB uint8 array, longest side at most OCR_MAX_DIMENSION"""
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    if max(image.size) > OCR_MAX_DIMENSION:
+        ratio = OCR_MAX_DIMENSION / max(image.size)
+        image = image.resize(
+            (int(image.width * ratio), int(image.height * ratio)), Image.Resampling.LANCZOS
+        )
+    return np.asarray(image)
+
+
+def _is_pdf(path: Path) -> bool:
+    return path.suffix.lower() == ".pdf"
+
+
+def count_pages(sources: List[Tuple[Path, str]]) -> int:
+    """Pages across all sources (one per image, page count per PDF)"""
+    total = 0
+    for path, _ in sources:
+        if _is_pdf(path):
+            from pdf2image import pdfinfo_from_path
+            total += pdfinfo_from_path(str(path))["Pages"]
+        else:
+            total += 1
+    return total
+
+
+def iter_pages(sources: List[Tuple[Path, str]]) -> Iterator[Tuple[str, Optional[int], np.ndarray]]:
+    """(source name, PDF page number or None, prepared array) in upload order"""
+    for path, name in sources:
+        if _is_pdf(path):
+            from pdf2image import convert_from_path, pdfinfo_from_path
+            for page in range(1, pdfinfo_from_path(str(path))["Pages"] + 1):
+                image = convert_from_path(str(path), dpi=PDF_RENDER_DPI, first_page=page, last_page=page)[0]
+                yield name, page, prepare_page(image)
+                image.close()
+        else:
+            with Image.open(path) as image:
+                yield name, None, prepare_page(image)
+
+
+# ==========================================
+# RECOGNITION
+# ==========================================
+def _easyocr_batch(reader, arrays: List[np.ndarray]) -> List[List[OcrLine]]:
+    """One readtext_batched() call per group of same-sized pages"""
+    results: List[Optional[List[OcrLine]]] = [None] * len(arrays)
+    groups: Dict[Tuple[int, ...], List[int]] = {}
+    for index, array in enumerate(arrays):
+        groups.setdefault(array.shape, []).append(index)
+
+    for indexes in groups.values():
+        if len(indexes) == 1:
+            batch = [reader.readtext(arrays[indexes[0]], batch_size=settings.OCR_BATCH_SIZE)]
+        else:
+            batch = reader.readtext_batched(
+                [arrays[i] for i in indexes], batch_size=settings.OCR_BATCH_SIZE
+            )
+        for index, lines in zip(indexes, batch):
+            results[index] = lines
+    return results
+
+
+def _tesseract_batch(arrays: List[np.ndarray]) -> List[List[OcrLine]]:
+    import pytesseract
+    return [
+        [(None, line, None) for line in pytesseract.image_to_string(array).splitlines() if line.strip()]
+        for array in arrays
+    ]
+
+
+def _page_record(number: int, source: str, source_page: Optional[int], lines: List[OcrLine]) -> Dict[str, Any]:
+    return {
+        "page": number,
+        "source": source,
+        "source_page": source_page,
+        "text": "\n".join(text for _, text, _ in lines),
+        "lines": [
+            {
+                "text": text,
+                "confidence": None if confidence is None else round(float(confidence), 3),
+                "box": None if box is None else [[int(x), int(y)] for x, y in box],
+            }
+            for box, text, confidence in lines
+        ],
+    }
+
+
+def run_ocr(sources: List[Tuple[Path, str]],
+            on_page: Optional[Callable[[Dict[str, Any]], None]] = None) -> List[Dict[str, Any]]:
+    """
+    OCR every page of `sources` ((path, display name) pairs: images or
+    PDFs). Returns page records in order; `on_page` gets each one as soon
+    as its batch is done. Raises ImportError if no OCR engine is installed.
+    """
+    with ExitStack() as stack:
+        try:
+            reader = stack.enter_context(use_model("easyocr"))
+            recognize = partial(_easyocr_batch, reader)
+        except ImportError:
+            import pytesseract  # noqa: F401 - no engine at all -> ImportError to the caller
+            logger.warning("easyocr not installed, using pytesseract")
+            recognize = _tesseract_batch
+
+        pages: List[Dict[str, Any]] = []
+        batch: List[Tuple[str, Optional[int], np.ndarray]] = []
+
+        def flush():
+            results = recognize([array for _, _, array in batch])
+            for (source, source_page, _), lines in zip(batch, results):
+                record = _page_record(len(pages) + 1, source, source_page, lines)
+                pages.append(record)
+                if on_page is not None:
+                    on_page(record)
+            batch.clear()
+
+        for page in iter_pages(sources):
+            batch.append(page)
+            if len(batch) >= settings.OCR_BATCH_SIZE:
+                flush()
+        if batch:
+            flush()
+        return pages
+
+
+# ==========================================
+# OUTPUT
+# ==========================================
+def combined_text(pages: List[Dict[str, Any]]) -> str:
+    """All pages, each under a header naming its source"""
+    if len(pages) == 1:
+        return pages[0]["text"]
+    parts = []
+    for page in pages:
+        label = page["source"] if page["source_page"] is None else f"{page['source']}, page {page['source_page']}"
+        parts.append(f"=== Page {page['page']} ({label}) ===\n{page['text']}")
+    return "\n\n".join(parts)
@@ -0,0 +1,248 @@
+"""
+Operation Specs
+===============
+A video operation described as data - the per-frame filter chain,
+codec settings and audio handling - instead of a hand-built FFmpeg
+command. The same spec drives:
+
+- the single-node command (local_args), used by routes/video.py
+- the distributed flow: the video chain runs on keyframe-aligned chunks
+  on the workers (chunk_args, shipped as JSON), audio is processed once
+  on the orchestrator (audio_args) and the join applies whatever needs
+  the whole stream (finish_filter, e.g. the GIF palette passes)
+
+chunk_blocker() decides whether an operation may be split. Filters are
+chunk-safe when every output frame depends only on its input frame
+(scale, transpose...), or when they rewrite timestamps linearly
+(setpts=k*PTS, fps) - chunks restart at t=0 and the concat offsets
+each one by its output duration. Anything that looks at other frames
+or absolute time (palettegen, reverse, fade...) is not, and neither is
+an operation whose video is only stream-copied: one remux pass is
+faster than any split.
+"""
+
+import re
+import json
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Optional, List, Dict, Any
+
+# Filters whose output frame depends only on the matching input frame
+FRAME_FILTERS = {
+    "scale", "transpose", "hflip", "vflip", "crop", "pad", "format",
+    "setsar", "setdar", "eq", "hue", "unsharp", "lutyuv", "colorchannelmixer",
+}
+
+# Timestamp filters, safe because every chunk starts at t=0
+# (fps may shift a frame by less than one frame interval at a join)
+TIMESTAMP_FILTERS = {"fps", "setpts"}
+
+# setpts expressions that scale time linearly
+LINEAR_SETPTS = re.compile(r"^(?:[\d.]+\*PTS|PTS\*[\d.]+|PTS(?:-STARTPTS)?)$")
+
+# Encoder for the separately processed audio track, by output container
+DEFAULT_AUDIO_CODECS = {
+    "mp4": "aac", "mov": "aac", "mkv": "aac", "webm": "libopus", "avi": "libmp3lame",
+}
+
+# Lossless intermediate for chunks that are finished after the join
+INTERMEDIATE_FORMAT = "mkv"
+INTERMEDIATE_CODEC = ["-c:v", "ffv1"]
+
+
+def filter_chain(graph: Optional[str]) -> List[tuple]:
+    """(name, arguments) of each filter in a simple comma-separated chain"""
+    if not graph:
+        return []
+    chain = []
+    for item in graph.split(","):
+        name, _, arguments = item.strip().partition("=")
+        chain.append((name, arguments))
+    return chain
+
+
+def chain_blocker(graph: Optional[str]) -> Optional[str]:
+    """Why a filter chain can't run on separate chunks (None if it can)"""
+    if graph and any(c in graph for c in "[];"):
+        return "filter graph is not a simple chain"
+    for name, arguments in filter_chain(graph):
+        if name in FRAME_FILTERS:
+            continue
+        if name not in TIMESTAMP_FILTERS:
+            return f"filter '{name}' needs the whole stream"
+        if name == "setpts" and not LINEAR_SETPTS.match(arguments.replace(" ", "")):
+            return f"setpts={arguments} is not linear in PTS"
+    return None
+
+
+@dataclass
+class OperationSpec:
+    """One video operation, runnable in one pass or chunk by chunk"""
+    name: str
+    output_format: str
+    video_filter: Optional[str] = None  # per-frame chain (-vf), runs on chunks
+    video_codec: List[str] = field(default_factory=list)  # [] = container default encoder
+    finish_filter: Optional[str] = None  # whole-stream graph applied after the video chain
+    drop_audio: bool = False
+    audio_filter: Optional[str] = None  # -af on the source audio
+    audio_codec: List[str] = field(default_factory=list)
+    audio_input: Optional[str] = None  # second input whose audio replaces or mixes in
+    audio_mix_volume: Optional[float] = None  # mix audio_input at this volume instead of replacing
+    start_time: Optional[str] = None
+    duration: Optional[str] = None
+
+    # ---------- serialization ----------
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
+
+    def chunk_spec_json(self) -> str:
+        """What a worker needs to encode one chunk (the worker's `spec` field)"""
+        return json.dumps({"name": self.name, "video_filter": self.video_filter, "video_codec": self.chunk_codec})
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "OperationSpec":
+        known = {name: data[name] for name in cls.__dataclass_fields__ if name in data}
+        return cls(**known)
+
+    # ---------- chunking ----------
+    @property
+    def copies_video(self) -> bool:
+        return "copy" in self.video_codec
+
+    def chunk_blocker(self) -> Optional[str]:
+        """Why this operation can't be chunk-parallelized (None if it can)"""
+        if self.copies_video:
+            return "video is stream-copied, one remux pass is faster than chunks"
+        if self.start_time or self.duration:
+            return "trimmed clips are encoded directly"
+        return chain_blocker(self.video_filter)
+
+    @property
+    def chunk_format(self) -> str:
+        """Container of encoded chunks"""
+        return INTERMEDIATE_FORMAT if self.finish_filter else self.output_format
+
+    @property
+    def chunk_codec(self) -> List[str]:
+        return INTERMEDIATE_CODEC if self.finish_filter else self.video_codec
+
+    def chunk_args(self, input_path: Path, output_path: Path) -> List[str]:
+        """FFmpeg arguments for one chunk: video chain only, no audio"""
+        args = ["-i", str(input_path), "-map", "0:v:0"]
+        if self.video_filter:
+            args += ["-vf", self.video_filter]
+        return args + self.chunk_codec + ["-an", str(output_path)]
+
+    @property
+    def keeps_audio(self) -> bool:
+        return not self.drop_audio and self.output_format != "gif"
+
+    def audio_args(self, input_path: Path, output_path: Path) -> List[str]:
+        """FFmpeg arguments for the single audio pass of a chunked run"""
+        args = ["-i", str(input_path)]
+        if self.audio_input:
+            args += ["-i", self.audio_input]
+        args += ["-vn"] + self._audio_options()
+        codec = self.audio_codec or ["-c:a", DEFAULT_AUDIO_CODECS.get(self.output_format, "aac")]
+        return args + codec + [str(output_path)]
+
+    # ---------- single pass ----------
+    def _audio_options(self) -> List[str]:
+        if self.drop_audio:
+            return ["-an"]
+        if self.audio_input and self.audio_mix_volume is None:
+            return ["-map", "0:v:0?", "-map", "1:a:0", "-shortest"]
+        if self.audio_input:
+            mix = f"[1:a]volume={self.audio_mix_volume}[a1];[0:a][a1]amix=inputs=2:duration=first"
+            return ["-filter_complex", mix, "-shortest"]
+        if self.audio_filter:
+            return ["-af", self.audio_filter]
+        return []
+
+    def local_args(self, input_path: Path, output_path: Path) -> List[str]:
+        """The whole operation as one FFmpeg run"""
+        args = []
+        if self.start_time:
+            args += ["-ss", self.start_time]  # input seeking is faster
+        args += ["-i", str(input_path)]
+        if self.audio_input:
+            args += ["-i", self.audio_input]
+        if self.duration:
+            args += ["-t", self.duration]
+
+        if self.finish_filter:
+            graph = ",".join(g for g in (self.video_filter, self.finish_filter) if g)
+            args += ["-filter_complex", graph]
+        elif self.video_filter:
+            args += ["-vf", self.video_filter]
+        args += self.video_codec
+        if self.output_format != "gif":
+            args += self._audio_options() + self.audio_codec
+        return args + [str(output_path)]
+
+
+# ==========================================
+# OPERATIONS (routes/video.py)
+# ==========================================
+ROTATION_FILTERS = {
+    "90": "transpose=1",  # 90 clockwise
+    "180": "transpose=1,transpose=1",
+    "270": "transpose=2",  # 90 counter-clockwise
+    "hflip": "hflip",
+    "vflip": "vflip",
+}
+
+
+def rotate_spec(rotation: str, output_format: str) -> OperationSpec:
+    return OperationSpec(
+        "rotate", output_format,
+        video_filter=ROTATION_FILTERS.get(rotation, "transpose=1"),
+        audio_codec=["-c:a", "copy"],
+    )
+
+
+def speed_spec(speed_factor: float, preserve_audio: bool, output_format: str) -> OperationSpec:
+    # atempo only takes 0.5 - 2.0; outside that the audio is dropped
+    keep_audio = preserve_audio and 0.5 < speed_factor < 2.0
+    return OperationSpec(
+        "speed", output_format,
+        video_filter=f"setpts={1.0 / speed_factor}*PTS",
+        drop_audio=not keep_audio,
+        audio_filter=f"atempo={speed_factor}" if keep_audio else None,
+    )
+
+
+def mute_spec(output_format: str) -> OperationSpec:
+    return OperationSpec("mute", output_format, video_codec=["-c:v", "copy"], drop_audio=True)
+
+
+GIF_PALETTEGEN = "palettegen=max_colors=256:stats_mode=full"  # Full 256 colors for quality
+GIF_PALETTEUSE = "paletteuse=dither=floyd_steinberg"  # Best quality dithering
+
+
+def gif_frame_filter(fps: int, width: int) -> str:
+    return f"fps={fps},scale={width}:-1:flags=lanczos"
+
+
+def gif_spec(fps: int, width: int, start_time: Optional[str] = None,
+             duration: Optional[str] = None) -> OperationSpec:
+    # Scale first (before the palette) for speed; the palette needs every frame
+    return OperationSpec(
+        "to-gif", "gif",
+        video_filter=gif_frame_filter(fps, width),
+        finish_filter=f"split[s0][s1];[s0]{GIF_PALETTEGEN}[p];[s1][p]{GIF_PALETTEUSE}",
+        start_time=start_time,
+        duration=duration,
+    )
+
+
+def add_music_spec(audio_path: str, replace_audio: bool, audio_volume: float) -> OperationSpec:
+    return OperationSpec(
+        "add-music", "mp4",
+        video_codec=["-c:v", "copy"],
+        audio_input=audio_path,
+        audio_mix_volume=None if replace_audio else audio_volume,
+    )
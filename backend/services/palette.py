@@ -0,0 +1,170 @@
+"""
+Color Palette
+=============
+Dominant colors of an image, computed on NumPy arrays:
+
+- the image is decoded at reduced size (JPEG draft mode) and thumbnailed
+  to at most SAMPLE_SIDE x SAMPLE_SIDE pixels
+- pixels are binned into a 16-levels-per-channel histogram; each non-empty
+  bin becomes one point at the mean color of its pixels, weighted by how
+  many pixels fell into it - at most 4096 points instead of every pixel
+- weighted k-means (k-means++ seeding, fixed seed so the same image always
+  gives the same palette) clusters the bins into the requested number of
+  colors; cluster centers are true averages, not bin corners
+- weighting "ignore_extremes" drops near-white and near-black pixels
+  (backgrounds, shadows, scanned paper) before clustering; transparent
+  pixels never count
+
+Shares are percentages of the counted pixels.
+"""
+
+import io
+from typing import Dict, Any, List, Tuple, Union
+
+import numpy as np
+from PIL import Image
+
+SAMPLE_SIDE = 200
+BIN_BITS = 4  # 16 levels per channel (as the previous rounding)
+MAX_COLORS = 32
+KMEANS_ITERATIONS = 25
+KMEANS_TOLERANCE = 0.5  # stop once no center moves more than this (RGB units)
+KMEANS_SEED = 0
+
+WEIGHTINGS = ("uniform", "ignore_extremes")
+# Channel thresholds for "ignore_extremes"
+NEAR_BLACK = 32  # all channels below
+NEAR_WHITE = 224  # all channels above
+
+
+class PaletteError(ValueError):
+    """Raised for unusable input (no countable pixels, bad options)"""
+
+
+# ==========================================
+# PIXELS
+# ==========================================
+def sample_pixels(image: Image.Image) -> Tuple[np.ndarray, np.ndarray]:
+    """(N x 3 uint8 RGB, N alpha weights 0..1) of a thumbnail of `image`"""
+    # JPEG: let the decoder scale down by up to 8x instead of decoding full size
+    image.draft("RGB", (SAMPLE_SIDE * 2, SAMPLE_SIDE * 2))
+    has_alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+    image = image.convert("RGBA" if has_alpha else "RGB")
+    if max(image.size) > SAMPLE_SIDE:
+        image.thumbnail((SAMPLE_SIDE, SAMPLE_SIDE), Image.Resampling.BOX)
+
+    array = np.asarray(image).reshape(-1, 4 if has_alpha else 3)
+    if has_alpha:
+        return array[:, :3], array[:, 3].astype(np.float32) / 255.0
+    return array, np.ones(len(array), dtype=np.float32)
+
+
+def pixel_weights(pixels: np.ndarray, alpha: np.ndarray, weighting: str) -> np.ndarray:
+    weights = alpha
+    if weighting == "ignore_extremes":
+        extreme = (pixels.max(axis=1) < NEAR_BLACK) | (pixels.min(axis=1) > NEAR_WHITE)
+        kept = np.where(extreme, 0.0, alpha)
+        # An all-white/black image still gets a palette
+        if kept.sum() > 0:
+            weights = kept
+    if weights.sum() <= 0:
+        raise PaletteError("Image has no visible pixels")
+    return weights
+
+
+def bin_pixels(pixels: np.ndarray, weights: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(B x 3 mean colors, B weights) of the non-empty histogram bins"""
+    shift = 8 - BIN_BITS
+    quantized = (pixels >> shift).astype(np.int32)
+    index = (quantized[:, 0] << (2 * BIN_BITS)) | (quantized[:, 1] << BIN_BITS) | quantized[:, 2]
+    size = 1 << (3 * BIN_BITS)
+
+    totals = np.bincount(index, weights=weights, minlength=size)
+    occupied = np.nonzero(totals)[0]
+    sums = np.stack([
+        np.bincount(index, weights=pixels[:, channel] * weights, minlength=size)[occupied]
+        for channel in range(3)
+    ], axis=1)
+    return sums / totals[occupied, None], totals[occupied]
+
+
+# ==========================================
+# CLUSTERING
+# ==========================================
+def _nearest_center(points: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    # |p - c|^2 = |p|^2 - 2 p.c + |c|^2; |p|^2 is the same for every center of a point
+    return ((centers ** 2).sum(axis=1) - 2 * points @ centers.T).argmin(axis=1)
+
+
+def weighted_kmeans(points: np.ndarray, weights: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(k' x 3 centers, k' weights) with k' <= k (empty clusters dropped)"""
+    if len(points) <= k:
+        return points, weights
+
+    rng = np.random.default_rng(KMEANS_SEED)
+    # k-means++: start at the heaviest bin, then favour far, heavy bins
+    centers = [points[np.argmax(weights)]]
+    nearest = ((points - centers[0]) ** 2).sum(axis=1)
+    for _ in range(1, k):
+        scores = weights * nearest
+        if scores.sum() <= 0:
+            break
+        chosen = points[rng.choice(len(points), p=scores / scores.sum())]
+        centers.append(chosen)
+        nearest = np.minimum(nearest, ((points - chosen) ** 2).sum(axis=1))
+    centers = np.array(centers)
+
+    for _ in range(KMEANS_ITERATIONS):
+        labels = _nearest_center(points, centers)
+        totals = np.bincount(labels, weights=weights, minlength=len(centers))
+        nonzero = totals > 0
+        previous = centers.copy()
+        for channel in range(3):
+            sums = np.bincount(labels, weights=points[:, channel] * weights, minlength=len(centers))
+            centers[nonzero, channel] = sums[nonzero] / totals[nonzero]
+        if np.abs(centers - previous).max() < KMEANS_TOLERANCE:
+            break
+
+    labels = _nearest_center(points, centers)
+    totals = np.bincount(labels, weights=weights, minlength=len(centers))
+    keep = totals > 0
+    return centers[keep], totals[keep]
+
+
+# ==========================================
+# PALETTE
+# ==========================================
+def check_options(num_colors: int, weighting: str):
+    """Raise PaletteError for options no image could satisfy"""
+    if not 1 <= num_colors <= MAX_COLORS:
+        raise PaletteError(f"num_colors must be between 1 and {MAX_COLORS}")
+    if weighting not in WEIGHTINGS:
+        raise PaletteError(f"Unknown weighting: {weighting} (use {', '.join(WEIGHTINGS)})")
+
+
+def extract_palette(source: Union[Image.Image, bytes], num_colors: int = 5,
+                    weighting: str = "uniform") -> List[Dict[str, Any]]:
+    """Dominant colors, largest share first: [{"hex", "rgb", "percentage"}]"""
+    check_options(num_colors, weighting)
+
+    if isinstance(source, (bytes, bytearray)):
+        with Image.open(io.BytesIO(source)) as image:
+            pixels, alpha = sample_pixels(image)
+    else:
+        pixels, alpha = sample_pixels(source)
+
+    weights = pixel_weights(pixels, alpha, weighting)
+    points, bin_weights = bin_pixels(pixels, weights)
+    centers, shares = weighted_kmeans(points, bin_weights, num_colors)
+
+    order = np.argsort(-shares, kind="stable")
+    total = shares.sum()
+    colors = []
+    for index in order:
+        r, g, b = (int(round(value)) for value in np.clip(centers[index], 0, 255))
+        colors.append({
+            "hex": f"#{r:02x}{g:02x}{b:02x}",
+            "rgb": {"r": r, "g": g, "b": b},
+            "percentage": round(float(shares[index] / total * 100), 1),
+        })
+    return colors
@@ -0,0 +1,364 @@
+"""
+Media Probe Service
+===================
+One ffprobe run per input file (`-show_format -show_streams`, JSON),
+parsed into a MediaInfo object and cached by (path, mtime, size).
+
+- LRU of PROBE_CACHE_SIZE entries per process; a rewritten file gets a
+  new mtime/size and therefore a fresh probe
+- concurrent probes of the same file on one event loop share a single
+  ffprobe process
+- failures are not cached
+
+Routes, the FFmpeg progress estimator and the cluster orchestrator all
+go through probe_media() / probe_duration(). probe_gops() lists the video
+keyframes with GOP sizes (packet headers, no decoding) for splitting.
+"""
+
+import json
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from fractions import Fraction
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple
+
+from config import get_settings
+from services.process_runner import run_process
+
+logger = logging.getLogger("magetool.probe")
+settings = get_settings()
+
+PROBE_TIMEOUT = 30
+
+
+class ProbeError(Exception):
+    """ffprobe failed, timed out or returned something unreadable"""
+
+
+# ==========================================
+# PARSING
+# ==========================================
+def _to_float(value: Any) -> Optional[float]:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if number == number else None  # NaN -> None
+
+
+def _to_int(value: Any) -> Optional[int]:
+    number = _to_float(value)
+    return int(number) if number is not None else None
+
+
+def parse_rate(value: Any) -> Optional[float]:
+    """'30000/1001' -> 29.97 ('0/0' and garbage -> None)"""
+    if not value:
+        return None
+    try:
+        rate = float(Fraction(str(value)))
+    except (ValueError, ZeroDivisionError):
+        return None
+    return rate if rate > 0 else None
+
+
+class StreamInfo:
+    """One entry of ffprobe's `streams` array"""
+
+    __slots__ = (
+        "index", "codec_type", "codec_name", "profile", "level", "pix_fmt",
+        "width", "height", "fps", "avg_fps", "display_aspect_ratio",
+        "sample_rate", "channels", "bit_rate", "duration", "nb_frames", "tags",
+    )
+
+    def __init__(self, data: Dict[str, Any]):
+        self.index = _to_int(data.get("index"))
+        self.codec_type = data.get("codec_type")
+        self.codec_name = data.get("codec_name")
+        self.profile = data.get("profile")
+        self.level = _to_int(data.get("level"))  # H.264: 10x the level, HEVC: 30x; -99 when unknown
+        self.pix_fmt = data.get("pix_fmt")
+        self.width = _to_int(data.get("width"))
+        self.height = _to_int(data.get("height"))
+        self.fps = parse_rate(data.get("r_frame_rate"))
+        self.avg_fps = parse_rate(data.get("avg_frame_rate"))
+        self.display_aspect_ratio = data.get("display_aspect_ratio")
+        self.sample_rate = _to_int(data.get("sample_rate"))
+        self.channels = _to_int(data.get("channels"))
+        self.bit_rate = _to_int(data.get("bit_rate"))
+        self.duration = _to_float(data.get("duration"))
+        self.nb_frames = _to_int(data.get("nb_frames"))
+        self.tags = data.get("tags") or {}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class MediaInfo:
+    """Parsed `ffprobe -show_format -show_streams` output for one file"""
+
+    __slots__ = (
+        "path", "format_name", "format_long_name", "duration", "start_time",
+        "size", "bit_rate", "tags", "streams",
+    )
+
+    def __init__(self, path: Path, format_info: Dict[str, Any], streams: List[StreamInfo]):
+        self.path = Path(path)
+        self.format_name = format_info.get("format_name")
+        self.format_long_name = format_info.get("format_long_name")
+        duration = _to_float(format_info.get("duration"))
+        self.duration = duration if duration and duration > 0 else None
+        self.start_time = _to_float(format_info.get("start_time")) or 0.0
+        self.size = _to_int(format_info.get("size"))
+        self.bit_rate = _to_int(format_info.get("bit_rate"))
+        self.tags = format_info.get("tags") or {}
+        self.streams = streams
+
+    @classmethod
+    def from_ffprobe(cls, path: Path, data: Dict[str, Any]) -> "MediaInfo":
+        streams = [StreamInfo(s) for s in data.get("streams") or []]
+        return cls(path, data.get("format") or {}, streams)
+
+    @property
+    def video(self) -> Optional[StreamInfo]:
+        """First video stream (cover art excluded when a real one exists)"""
+        videos = [s for s in self.streams if s.codec_type == "video"]
+        if not videos:
+            return None
+        return next((s for s in videos if s.codec_name not in ("mjpeg", "png")), videos[0])
+
+    @property
+    def audio(self) -> Optional[StreamInfo]:
+        return next((s for s in self.streams if s.codec_type == "audio"), None)
+
+    @property
+    def has_video(self) -> bool:
+        return self.video is not None
+
+    @property
+    def has_audio(self) -> bool:
+        return self.audio is not None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "path": str(self.path),
+            "format_name": self.format_name,
+            "format_long_name": self.format_long_name,
+            "duration": self.duration,
+            "start_time": self.start_time,
+            "size": self.size,
+            "bit_rate": self.bit_rate,
+            "tags": self.tags,
+            "streams": [s.to_dict() for s in self.streams],
+        }
+
+
+# ==========================================
+# CACHE
+# ==========================================
+class ProbeCache:
+    """Thread-safe LRU of MediaInfo keyed by (path, mtime_ns, size)"""
+
+    def __init__(self, max_entries: int = None):
+        self.max_entries = settings.PROBE_CACHE_SIZE if max_entries is None else max_entries
+        self._entries: "OrderedDict[Tuple[str, int, int], MediaInfo]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[str, int, int]) -> Optional[MediaInfo]:
+        with self._lock:
+            info = self._entries.get(key)
+            if info is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return info
+
+    def put(self, key: Tuple[str, int, int], info: MediaInfo):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = info
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+_cache = None
+_keyframe_cache = None
+_cache_lock = threading.Lock()
+
+# key -> (loop, future) for probes currently running
+_inflight: Dict[Tuple[str, int, int], Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = {}
+
+
+def get_probe_cache() -> ProbeCache:
+    """Get singleton probe cache instance"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ProbeCache()
+    return _cache
+
+
+def get_keyframe_cache() -> ProbeCache:
+    """Get singleton GOP index cache instance"""
+    global _keyframe_cache
+    if _keyframe_cache is None:
+        with _cache_lock:
+            if _keyframe_cache is None:
+                _keyframe_cache = ProbeCache()
+    return _keyframe_cache
+
+
+def cache_key_for(path: Path) -> Tuple[str, int, int]:
+    """(absolute path, mtime_ns, size) - raises FileNotFoundError for a missing file"""
+    path = Path(path).resolve()
+    stat = path.stat()
+    return str(path), stat.st_mtime_ns, stat.st_size
+
+
+# ==========================================
+# PUBLIC API
+# ==========================================
+async def _run_ffprobe(path: Path) -> MediaInfo:
+    result = await run_process(
+        [
+            "ffprobe", "-v", "error",
+            "-print_format", "json",
+            "-show_format", "-show_streams",
+            str(path),
+        ],
+        timeout=PROBE_TIMEOUT,
+    )
+    if not result.ok:
+        raise ProbeError(result.error.strip() or "ffprobe failed")
+    try:
+        data = json.loads(result.stdout or b"{}")
+    except ValueError as e:
+        raise ProbeError(f"Unreadable ffprobe output: {e}")
+    return MediaInfo.from_ffprobe(path, data)
+
+
+async def probe_media(path: Path) -> MediaInfo:
+    """
+    Probe a media file (cached).
+    Raises ProbeError if ffprobe cannot read it and FileNotFoundError
+    if the file or the ffprobe binary is missing.
+    """
+    key = cache_key_for(path)
+    cache = get_probe_cache()
+    info = cache.get(key)
+    if info is not None:
+        return info
+
+    loop = asyncio.get_running_loop()
+    running = _inflight.get(key)
+    if running and running[0] is loop:
+        return await asyncio.shield(running[1])
+
+    future = loop.create_future()
+    _inflight[key] = (loop, future)
+    try:
+        info = await _run_ffprobe(Path(path))
+        cache.put(key, info)
+        future.set_result(info)
+        return info
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except BaseException as e:
+        future.set_exception(e)
+        future.exception()  # Mark retrieved - waiters (if any) re-raise it
+        raise
+    finally:
+        if _inflight.get(key, (None, None))[1] is future:
+            del _inflight[key]
+
+
+async def probe_duration(path: Path) -> Optional[float]:
+    """Container duration in seconds (None if unknown / unreadable / ffprobe missing)"""
+    try:
+        info = await probe_media(path)
+    except Exception as e:
+        logger.debug(f"Duration probe failed for {Path(path).name}: {e}")
+        return None
+    return info.duration
+
+
+def probe_media_sync(path: Path) -> MediaInfo:
+    """Blocking probe_media() for processor code running outside an event loop"""
+    return asyncio.run(probe_media(path))
+
+
+def parse_gops(output: str) -> List[Tuple[float, int]]:
+    """
+    `pts_time,size,flags` CSV packet lines (decode order) ->
+    [(keyframe time, bytes of the GOP it starts)] sorted by time.
+    """
+    gops: Dict[float, int] = {}
+    current = None
+    for line in output.splitlines():
+        fields = line.strip().split(",")
+        if len(fields) < 3:
+            continue
+        pts_time, size, flags = _to_float(fields[0]), _to_int(fields[1]) or 0, fields[2]
+        if "K" in flags and pts_time is not None and pts_time >= 0:
+            current = round(pts_time, 6)
+            gops.setdefault(current, 0)
+        if current is not None:
+            gops[current] += size
+    return sorted(gops.items())
+
+
+async def probe_gops(path: Path) -> List[Tuple[float, int]]:
+    """
+    GOP index of the first video stream (cached): keyframe timestamps in
+    seconds with the compressed size of each GOP, a cheap proxy for how
+    expensive that stretch is to decode and encode. Reads packet headers
+    only, so it costs a demux pass, not a decode. Raises like probe_media().
+    """
+    key = cache_key_for(path)
+    cache = get_keyframe_cache()
+    gops = cache.get(key)
+    if gops is not None:
+        return gops
+
+    result = await run_process(
+        [
+            "ffprobe", "-v", "error",
+            "-select_streams", "v:0",
+            "-show_entries", "packet=pts_time,size,flags",
+            "-of", "csv=p=0",
+            str(path),
+        ],
+        timeout=PROBE_TIMEOUT * 4,
+    )
+    if not result.ok:
+        raise ProbeError(result.error.strip() or "ffprobe failed")
+
+    gops = parse_gops(result.text)
+    cache.put(key, gops)
+    return gops
+
+
+async def probe_keyframes(path: Path) -> List[float]:
+    """Keyframe timestamps (seconds) of the first video stream (cached)"""
+    return [pts_time for pts_time, _ in await probe_gops(path)]
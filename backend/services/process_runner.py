@@ -0,0 +1,256 @@
+"""
+Process Runner Service
+======================
+One async layer for every external tool (FFmpeg, ffprobe, LibreOffice,
+Ghostscript) built on asyncio.create_subprocess_exec:
+
+- A process-wide slot semaphore (PROCESS_CONCURRENCY, default CPU cores).
+  Job pool processes share the parent's semaphore, so the cap holds
+  across all executor pools.
+- Each process runs in its own process group; on timeout or cancel the
+  whole group gets SIGTERM, then SIGKILL after a grace period.
+- Per-task cancellation: when task_id is given the run stops as soon as
+  cancel_task() marks the task CANCELLED.
+- Stderr is kept in a ring buffer of the last N lines.
+
+Sync processors (running in job pools) use run_process_sync().
+"""
+
+import os
+import signal
+import asyncio
+import logging
+from collections import deque
+from typing import Optional, List, Callable, Union
+
+from config import get_settings
+
+logger = logging.getLogger("magetool.process")
+settings = get_settings()
+
+# Seconds between cancel checks and slot acquisition attempts
+CANCEL_POLL_SECONDS = 0.5
+SLOT_POLL_SECONDS = 0.05
+
+# Read size for binary stdout consumers
+STDOUT_CHUNK_SIZE = 256 * 1024
+
+
+class ProcessResult:
+    """Outcome of one external process run"""
+
+    __slots__ = ("returncode", "stdout", "stderr", "timed_out", "cancelled")
+
+    def __init__(self, returncode: Optional[int], stdout: bytes, stderr: str,
+                 timed_out: bool = False, cancelled: bool = False):
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.timed_out = timed_out
+        self.cancelled = cancelled
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0 and not self.timed_out and not self.cancelled
+
+    @property
+    def text(self) -> str:
+        """stdout decoded as UTF-8"""
+        return self.stdout.decode("utf-8", errors="replace")
+
+    @property
+    def error(self) -> str:
+        """Human readable failure reason"""
+        if self.cancelled:
+            return "Task cancelled"
+        if self.timed_out:
+            return "Processing timeout exceeded"
+        return self.stderr
+
+
+# ==========================================
+# CONCURRENCY SLOTS
+# ==========================================
+_slots = None
+
+
+def process_concurrency() -> int:
+    """Configured max simultaneous external processes"""
+    return settings.PROCESS_CONCURRENCY or os.cpu_count() or 1
+
+
+def configure_process_slots(semaphore):
+    """Use a shared (multiprocessing) semaphore - called in job pool processes"""
+    global _slots
+    _slots = semaphore
+
+
+def get_process_slots():
+    """Process-wide semaphore limiting concurrent external processes"""
+    global _slots
+    if _slots is None:
+        import threading
+        _slots = threading.BoundedSemaphore(process_concurrency())
+    return _slots
+
+
+async def _acquire_slot(slots):
+    # Non-blocking polls: works for threading and multiprocessing semaphores
+    # from any event loop, and a cancelled waiter never holds a slot
+    while not slots.acquire(False):
+        await asyncio.sleep(SLOT_POLL_SECONDS)
+
+
+# ==========================================
+# RUNNER
+# ==========================================
+def _signal_group(process: asyncio.subprocess.Process, sig: int):
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(process.pid, sig)
+        elif sig == getattr(signal, "SIGKILL", None):
+            process.kill()
+        else:
+            process.terminate()
+    except ProcessLookupError:
+        pass
+
+
+async def _terminate(process: asyncio.subprocess.Process):
+    """SIGTERM the process group, SIGKILL it if it lingers"""
+    if process.returncode is not None:
+        return
+    _signal_group(process, signal.SIGTERM)
+    try:
+        await asyncio.wait_for(process.wait(), timeout=settings.PROCESS_KILL_GRACE_SECONDS)
+    except asyncio.TimeoutError:
+        _signal_group(process, getattr(signal, "SIGKILL", signal.SIGTERM))
+        await process.wait()
+
+
+async def _read_stderr(stream: asyncio.StreamReader, tail: deque):
+    while True:
+        line = await stream.readline()
+        if not line:
+            break
+        tail.append(line.decode("utf-8", errors="replace"))
+
+
+async def _read_stdout(stream: asyncio.StreamReader, on_line: Optional[Callable[[str], None]],
+                       buffer: bytearray, on_chunk: Optional[Callable[[bytes], None]] = None):
+    if on_chunk is not None:
+        # Binary output (image2pipe...): the pipe is only read as fast as on_chunk consumes
+        while chunk := await stream.read(STDOUT_CHUNK_SIZE):
+            on_chunk(chunk)
+        return
+    if on_line is None:
+        buffer.extend(await stream.read())
+        return
+    while True:
+        line = await stream.readline()
+        if not line:
+            break
+        on_line(line.decode("utf-8", errors="replace"))
+
+
+async def _watch_cancel(task_id: str):
+    from services.tasks import is_cancel_requested
+
+    while not is_cancel_requested(task_id):
+        await asyncio.sleep(CANCEL_POLL_SECONDS)
+
+
+async def run_process(
+    command: List[Union[str, os.PathLike]],
+    timeout: Optional[float] = None,
+    task_id: Optional[str] = None,
+    on_stdout_line: Optional[Callable[[str], None]] = None,
+    on_stdout_chunk: Optional[Callable[[bytes], None]] = None,
+    cwd: Optional[Union[str, os.PathLike]] = None,
+    env: Optional[dict] = None,
+    stderr_lines: Optional[int] = None,
+) -> ProcessResult:
+    """
+    Run an external command without blocking the event loop.
+
+    stdout is collected (or streamed line by line to on_stdout_line, or
+    as raw bytes to on_stdout_chunk), stderr keeps only its last
+    `stderr_lines` lines. Raises
+    FileNotFoundError if the executable is missing.
+    """
+    from services.tasks import is_cancel_requested
+
+    if task_id is not None and is_cancel_requested(task_id):
+        return ProcessResult(None, b"", "", cancelled=True)
+
+    slots = get_process_slots()
+    await _acquire_slot(slots)
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *[str(part) for part in command],
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=cwd,
+            env=env,
+            start_new_session=hasattr(os, "killpg"),  # own process group
+        )
+
+        stderr_tail: deque = deque(maxlen=stderr_lines or settings.PROCESS_STDERR_LINES)
+        stdout_buffer = bytearray()
+        io_done = asyncio.gather(
+            _read_stdout(process.stdout, on_stdout_line, stdout_buffer, on_stdout_chunk),
+            _read_stderr(process.stderr, stderr_tail),
+            process.wait(),
+        )
+        watchers = {io_done}
+        cancel_watch = None
+        if task_id is not None:
+            cancel_watch = asyncio.ensure_future(_watch_cancel(task_id))
+            watchers.add(cancel_watch)
+
+        timed_out = cancelled = False
+        try:
+            done, _ = await asyncio.wait(
+                watchers, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+            if io_done not in done:
+                timed_out = cancel_watch not in done
+                cancelled = not timed_out
+                await _terminate(process)
+                # Pipes close once the group is dead; don't wait forever on stragglers
+                await asyncio.wait({io_done}, timeout=settings.PROCESS_KILL_GRACE_SECONDS)
+        except asyncio.CancelledError:
+            # Caller went away (client disconnect, shutdown) - don't leave orphans
+            await _terminate(process)
+            io_done.cancel()
+            raise
+        finally:
+            if cancel_watch is not None:
+                cancel_watch.cancel()
+
+        if io_done.done():
+            if io_done.exception() is not None:
+                logger.debug(f"Process I/O error: {io_done.exception()}")
+        else:
+            io_done.cancel()
+
+        if timed_out:
+            logger.warning(f"Process timed out after {timeout}s: {command[0]}")
+        elif cancelled:
+            logger.info(f"Process cancelled for task {task_id}: {command[0]}")
+
+        return ProcessResult(
+            process.returncode,
+            bytes(stdout_buffer),
+            "".join(stderr_tail),
+            timed_out=timed_out,
+            cancelled=cancelled,
+        )
+    finally:
+        slots.release()
+
+
+def run_process_sync(command: List[Union[str, os.PathLike]], **kwargs) -> ProcessResult:
+    """Blocking wrapper for sync processors (job pools, threadpool routes)"""
+    return asyncio.run(run_process(command, **kwargs))
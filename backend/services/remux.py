@@ -0,0 +1,284 @@
+"""
+Stream-Copy Fast Paths
+======================
+Skip the encoder when it would only re-create what the input already has.
+
+- a codec/container matrix decides from the probe whether the source
+  streams are legal in the target container; if they are and nothing
+  about the picture changes (scale, fps, bitrate), a conversion is a
+  remux (`-c copy`) - seconds instead of a full encode
+- audio extraction copies the source track into any container that can
+  hold it, unless a lower bitrate was asked for
+- smart-cut trims: `-c copy` alone can only cut at keyframes, so the
+  partial GOPs at the two cut points are re-encoded (same codec, pixel
+  format, profile and level, in-band parameter sets via MPEG-TS) and
+  everything between the first and last keyframe inside the range is
+  copied, then the pieces are concat-joined with the once-copied audio;
+  MP4/MOV keep only the first piece's parameter sets (avc1/hvc1), so
+  they are smart-cut only when the edges can match the source profile
+
+Every helper returns None (or a reason) when its fast path does not
+apply, and the caller runs its usual encode.
+"""
+
+import uuid
+import shutil
+import asyncio
+import logging
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional, List, Tuple
+
+from config import get_settings
+from services.ffmpeg import run_ffmpeg, parse_timestamp
+from services.probe import MediaInfo, StreamInfo, probe_media_sync, probe_keyframes
+from services.process_runner import run_process_sync
+
+logger = logging.getLogger("magetool.remux")
+settings = get_settings()
+
+# ==========================================
+# CODEC MATRIX
+# ==========================================
+# Codecs each container can carry without re-encoding (ffprobe codec_name)
+CONTAINER_CODECS = {
+    "mp4": {
+        "video": {"h264", "hevc", "av1", "vp9", "mpeg4", "mpeg2video"},
+        "audio": {"aac", "mp3", "ac3", "eac3", "opus", "flac", "alac"},
+    },
+    "mov": {
+        "video": {"h264", "hevc", "mpeg4", "prores", "mjpeg"},
+        "audio": {"aac", "mp3", "ac3", "alac", "pcm_s16le", "pcm_s24le"},
+    },
+    "mkv": {
+        "video": {"h264", "hevc", "av1", "vp8", "vp9", "mpeg4", "mpeg2video", "theora", "prores"},
+        "audio": {"aac", "mp3", "ac3", "eac3", "dts", "opus", "vorbis", "flac", "alac", "pcm_s16le", "pcm_s24le"},
+    },
+    "webm": {
+        "video": {"vp8", "vp9", "av1"},
+        "audio": {"opus", "vorbis"},
+    },
+    "avi": {
+        "video": {"mpeg4", "h264", "mjpeg", "msmpeg4v3"},
+        "audio": {"mp3", "ac3", "pcm_s16le"},
+    },
+    # Audio-only outputs of extract-audio
+    "mp3": {"audio": {"mp3"}},
+    "aac": {"audio": {"aac"}},
+    "m4a": {"audio": {"aac", "alac"}},
+    "flac": {"audio": {"flac"}},
+    "ogg": {"audio": {"vorbis", "opus", "flac"}},
+    "wav": {"audio": {"pcm_s16le", "pcm_s24le", "pcm_f32le", "pcm_u8"}},
+}
+
+
+def copy_blocker(info: MediaInfo, output_format: str, kinds: Tuple[str, ...] = ("video", "audio")) -> Optional[str]:
+    """Why the input's streams can't be copied into output_format (None if they can)"""
+    allowed = CONTAINER_CODECS.get(output_format)
+    if allowed is None:
+        return f"no codec table for .{output_format}"
+    for kind in kinds:
+        stream = info.video if kind == "video" else info.audio
+        if stream is None:
+            if kind == "video":
+                return "no video stream"
+            continue
+        if stream.codec_name not in allowed.get(kind, set()):
+            return f"{kind} codec {stream.codec_name} not allowed in .{output_format}"
+    return None
+
+
+def remux_args(info: MediaInfo, input_path: Path, output_path: Path) -> List[str]:
+    """Copy the main video stream and the audio tracks into a new container"""
+    args = ["-i", str(input_path), "-map", f"0:{info.video.index}", "-map", "0:a?", "-c", "copy", "-dn", "-sn"]
+    if output_path.suffix.lower() in (".mp4", ".mov"):
+        args += ["-movflags", "+faststart"]
+    return args + [str(output_path)]
+
+
+def _kbps(bitrate: Optional[str]) -> Optional[float]:
+    """'192k' / '1.5M' / '128000' -> kbps"""
+    if not bitrate:
+        return None
+    text = str(bitrate).strip().lower()
+    scale = {"k": 1, "m": 1000}.get(text[-1:])
+    try:
+        return float(text[:-1]) * scale if scale else float(text) / 1000
+    except ValueError:
+        return None
+
+
+def audio_copy_allowed(info: MediaInfo, output_format: str, bitrate: Optional[str] = None) -> bool:
+    """Extract the audio track as-is? (legal in the container, not above the asked bitrate)"""
+    if info.audio is None or copy_blocker(info, output_format, ("audio",)):
+        return False
+    requested, source = _kbps(bitrate), info.audio.bit_rate
+    return requested is None or source is None or source / 1000 <= requested * 1.05
+
+
+# ==========================================
+# SMART CUT
+# ==========================================
+# Codecs whose re-encoded head/tail splice cleanly into the copied middle
+SMART_CUT_ENCODERS = {"h264": "libx264", "hevc": "libx265"}
+SMART_CUT_FORMATS = {"mp4", "mov", "mkv"}
+
+# Cut points this close to a keyframe count as on it
+KEYFRAME_TOLERANCE = 0.05
+# Quality of the re-encoded edges (visually lossless next to the copied GOPs)
+EDGE_CRF = "18"
+
+# ffprobe profile name -> encoder -profile:v, per codec
+EDGE_PROFILES = {
+    "h264": {
+        "Constrained Baseline": "baseline", "Baseline": "baseline", "Main": "main", "High": "high",
+        "High 10": "high10", "High 4:2:2": "high422", "High 4:4:4 Predictive": "high444",
+    },
+    "hevc": {"Main": "main", "Main 10": "main10", "Main Still Picture": "mainstillpicture"},
+}
+# Containers whose sample entry carries the parameter sets of the first piece only
+OUT_OF_BAND_FORMATS = {"mp4", "mov"}
+
+
+@lru_cache(maxsize=4)
+def _ffmpeg_encoders(ffmpeg: str) -> frozenset:
+    """Encoder names the ffmpeg build at `ffmpeg` lists (`ffmpeg -encoders`)"""
+    result = run_process_sync([ffmpeg, "-hide_banner", "-encoders"], timeout=10)
+    if not result.ok:
+        return frozenset()
+    # " V....D libx264              libx264 H.264 / AVC ..."
+    return frozenset(
+        fields[1] for fields in map(str.split, result.text.splitlines())
+        if len(fields) >= 2 and len(fields[0]) == 6 and fields[0][0] in "VAS"
+    )
+
+
+def encoder_available(name: str) -> bool:
+    """Was the ffmpeg on PATH built with encoder `name`? (libx265 often isn't)"""
+    ffmpeg = shutil.which("ffmpeg")
+    try:
+        return ffmpeg is not None and name in _ffmpeg_encoders(ffmpeg)
+    except FileNotFoundError:
+        return False
+
+
+def edge_encoder_args(video: StreamInfo, output_format: str) -> Optional[List[str]]:
+    """
+    Profile/level arguments that make the re-encoded edges decodable with
+    the source's parameter sets. None when an MP4/MOV output can't get
+    them (unknown profile), so the caller trims without smart cut.
+    """
+    profile = EDGE_PROFILES.get(video.codec_name, {}).get(video.profile)
+    if profile is None:
+        return None if output_format in OUT_OF_BAND_FORMATS else []
+
+    args = ["-profile:v", profile]
+    level = video.level if video.level and video.level > 0 else None
+    if level and video.codec_name == "h264":
+        args += ["-level", f"{level / 10:.1f}"]
+    elif level:
+        args += ["-x265-params", f"level-idc={level / 30:.1f}"]
+    return args
+
+
+def plan_smart_cut(start: float, end: float, keyframes: List[float]) -> List[Tuple[str, float, float]]:
+    """
+    ("encode" | "copy", from, to) pieces covering [start, end): copy from
+    the first keyframe at/after start to the last keyframe at/before end,
+    re-encode the partial GOPs outside that. A keyframe up to
+    KEYFRAME_TOLERANCE before start counts as on the cut, and the pieces
+    then begin at that keyframe - never at an earlier one.
+    """
+    on_cut = [k for k in keyframes if start - KEYFRAME_TOLERANCE <= k < start]
+    inside = on_cut[-1:] + [k for k in keyframes if start <= k <= end]
+    if len(inside) < 2:
+        return [("encode", start, end)]  # shorter than a GOP
+
+    first, last = inside[0], inside[-1]
+    pieces = []
+    if first - start > KEYFRAME_TOLERANCE:
+        pieces.append(("encode", start, first))
+    pieces.append(("copy", first, last))
+    if end - last > KEYFRAME_TOLERANCE:
+        pieces.append(("encode", last, end))
+    return pieces
+
+
+def smart_trim(input_path: Path, output_path: Path, start_time: str, end_time: str,
+               preset: str = "medium", task_id: Optional[str] = None) -> Optional[Tuple[bool, str]]:
+    """
+    Frame-accurate trim that re-encodes only the GOPs at the cut points.
+    Returns run_ffmpeg's (success, error), or None when the input can't be
+    smart-cut (codec, container, no keyframe index, encoder not built in) and a
+    plain trim should run.
+    """
+    output_format = output_path.suffix.lstrip(".").lower()
+    try:
+        info = probe_media_sync(input_path)
+        keyframes = asyncio.run(probe_keyframes(input_path))
+    except Exception as e:
+        logger.debug(f"Smart cut skipped, probe failed: {e}")
+        return None
+
+    video = info.video
+    start, end = parse_timestamp(start_time), parse_timestamp(end_time)
+    if (
+        video is None or video.codec_name not in SMART_CUT_ENCODERS
+        or output_format not in SMART_CUT_FORMATS or not keyframes
+        or start is None or end is None
+    ):
+        return None
+    encoder = SMART_CUT_ENCODERS[video.codec_name]
+    if not encoder_available(encoder):
+        logger.info(f"Smart cut skipped, ffmpeg has no {encoder}")
+        return None
+    edge_args = edge_encoder_args(video, output_format)
+    if edge_args is None:
+        logger.info(f"Smart cut skipped, can't match {video.codec_name} profile {video.profile!r} in .{output_format}")
+        return None
+    # Packet timestamps include the container start offset; -ss doesn't
+    keyframes = [k - info.start_time for k in keyframes]
+    if info.duration:
+        end = min(end, info.duration)
+    if end <= start:
+        return False, "End time must be after start time"
+
+    pieces = plan_smart_cut(start, end, keyframes)
+    # A keyframe within tolerance moves the cut; the audio follows it
+    start, end = pieces[0][1], pieces[-1][2]
+    work_dir = settings.TEMP_DIR / f"smartcut_{task_id or uuid.uuid4().hex}"
+    work_dir.mkdir(parents=True, exist_ok=True)
+    bsf = "h264_mp4toannexb" if video.codec_name == "h264" else "hevc_mp4toannexb"
+    try:
+        parts = []
+        for number, (kind, piece_start, piece_end) in enumerate(pieces):
+            part = work_dir / f"part_{number}.ts"
+            args = ["-ss", f"{piece_start:.6f}", "-i", str(input_path), "-t", f"{piece_end - piece_start:.6f}",
+                    "-map", f"0:{video.index}"]
+            if kind == "copy":
+                args += ["-c:v", "copy", "-bsf:v", bsf]
+            else:
+                args += ["-c:v", encoder, "-crf", EDGE_CRF, "-preset", preset] + edge_args
+                if video.pix_fmt:
+                    args += ["-pix_fmt", video.pix_fmt]
+            success, error = run_ffmpeg(args + ["-an", "-f", "mpegts", str(part)], task_id=task_id)
+            if not success:
+                return False, error
+            parts.append(part)
+
+        concat_list = work_dir / "parts.txt"
+        concat_list.write_text("".join(f"file '{p.name}'\n" for p in parts))
+
+        # Audio frames are all "keyframes": one copy pass is already exact
+        args = ["-f", "concat", "-safe", "0", "-i", str(concat_list)]
+        if info.has_audio:
+            args += ["-ss", f"{start:.6f}", "-i", str(input_path), "-t", f"{end - start:.6f}",
+                     "-map", "0:v", "-map", "1:a"]
+        args += ["-c", "copy", "-avoid_negative_ts", "make_zero"]
+        if output_format in ("mp4", "mov"):
+            args += ["-movflags", "+faststart"]
+        result = run_ffmpeg(args + [str(output_path)], task_id=task_id, duration=end - start)
+        logger.info(f"Smart cut {task_id}: " + ", ".join(f"{k} {a:.2f}-{b:.2f}" for k, a, b in pieces))
+        return result
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
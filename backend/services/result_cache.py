@@ -0,0 +1,244 @@
+"""
+Result Cache Service
+====================
+Content-addressed cache of processor outputs, keyed by
+(SHA-256 of the input, task_type, normalized params).
+
+Entries live under TEMP_DIR/cache as `<key>.bin` (the output file) plus
+`<key>.json` (output filename etc). Outputs enter and leave the cache as
+hardlinks, so a hit costs no copy and a task's download survives the
+entry being evicted. Eviction is LRU by byte size: hits refresh the
+entry's mtime and the oldest entries go first once RESULT_CACHE_MAX_MB
+is exceeded.
+
+The cache is plain files, so pool processes and other uvicorn workers
+on the host share it.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Optional, Dict, Any
+
+from config import get_settings
+
+logger = logging.getLogger("magetool.cache")
+settings = get_settings()
+
+HASH_CHUNK_SIZE = 1024 * 1024  # 1MB
+
+# Param values treated as "not set" by the upload routes
+_EMPTY_VALUES = {"", "undefined", "null", "none"}
+
+
+# ==========================================
+# KEYS
+# ==========================================
+def hash_file(path: Path) -> str:
+    """SHA-256 hex digest of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _normalize_value(key: str, value: Any) -> Any:
+    # Extra input files (merge, collage, add-music, ocr-batch) are keyed by content, not temp path
+    if key.endswith("_path") and value:
+        return hash_file(Path(value))
+    if key.endswith("_paths") and isinstance(value, (list, tuple)):
+        return [hash_file(Path(v)) for v in value]
+    # Multi-file uploads (ocr-batch): [[path, original filename], ...]
+    if key == "inputs" and isinstance(value, (list, tuple)):
+        return [[hash_file(Path(entry[0])), *entry[1:]] for entry in value]
+
+    if isinstance(value, str):
+        stripped = value.strip()
+        return None if stripped.lower() in _EMPTY_VALUES else stripped
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, dict):
+        return {k: _normalize_value(k, v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize_value(key, v) for v in value]
+    return value
+
+
+def normalize_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Canonical params: unset values dropped, numbers/strings normalized, paths hashed"""
+    normalized = {}
+    for key, value in (params or {}).items():
+        value = _normalize_value(key, value)
+        if value is not None:
+            normalized[key] = value
+    return normalized
+
+
+def cache_key(input_digest: str, task_type: str, params: Dict[str, Any]) -> str:
+    """Cache key for an input digest + task type + params"""
+    payload = json.dumps(
+        [input_digest, task_type, normalize_params(params)],
+        sort_keys=True, separators=(",", ":"), default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _link_or_copy(source: Path, destination: Path):
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)  # Cross-device or no hardlink support
+
+
+# ==========================================
+# STORE
+# ==========================================
+class ResultCache:
+    """On-disk LRU of processor outputs"""
+
+    def __init__(self, root: Path = None, max_bytes: int = None):
+        self.root = Path(root or settings.TEMP_DIR / "cache")
+        self.max_bytes = (
+            settings.RESULT_CACHE_MAX_MB * 1024 * 1024 if max_bytes is None else max_bytes
+        )
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _paths(self, key: str) -> tuple[Path, Path]:
+        return self.root / f"{key}.bin", self.root / f"{key}.json"
+
+    def get(self, key: str, destination: Path) -> Optional[Dict[str, Any]]:
+        """
+        Link a cached output to destination.
+        Returns the entry metadata, or None on a miss.
+        """
+        blob, meta_path = self._paths(key)
+        try:
+            meta = json.loads(meta_path.read_text())
+            destination.unlink(missing_ok=True)
+            _link_or_copy(blob, destination)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        # LRU: a hit makes the entry the most recently used
+        for path in (blob, meta_path):
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+
+        self.hits += 1
+        return meta
+
+    def put(self, key: str, output_path: Path, meta: Dict[str, Any]) -> bool:
+        """Add a finished output to the cache (no-op if larger than the cache)"""
+        blob, meta_path = self._paths(key)
+        try:
+            size = output_path.stat().st_size
+            if size > self.max_bytes:
+                return False
+
+            # Write under temp names, then rename - readers never see half an entry
+            tmp_blob = blob.with_suffix(f".bin.{os.getpid()}.tmp")
+            tmp_meta = meta_path.with_suffix(f".json.{os.getpid()}.tmp")
+            tmp_blob.unlink(missing_ok=True)
+            _link_or_copy(output_path, tmp_blob)
+            tmp_meta.write_text(json.dumps({**meta, "size": size}))
+            os.replace(tmp_blob, blob)
+            os.replace(tmp_meta, meta_path)
+        except OSError as e:
+            logger.warning(f"Result cache store failed for {key[:12]}: {e}")
+            return False
+
+        self.evict()
+        return True
+
+    def evict(self) -> int:
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        with self._lock:
+            entries = []
+            total = 0
+            for blob in self.root.glob("*.bin"):
+                try:
+                    stat = blob.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, blob))
+                total += stat.st_size
+
+            removed = 0
+            for _, size, blob in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                blob.unlink(missing_ok=True)
+                blob.with_suffix(".json").unlink(missing_ok=True)
+                total -= size
+                removed += 1
+
+            if removed:
+                logger.info(f"Result cache evicted {removed} entries ({total / (1024 * 1024):.1f} MB kept)")
+            return removed
+
+    def stats(self) -> Dict[str, Any]:
+        blobs = list(self.root.glob("*.bin"))
+        size = 0
+        for blob in blobs:
+            try:
+                size += blob.stat().st_size
+            except FileNotFoundError:
+                pass
+        return {
+            "entries": len(blobs),
+            "size_mb": round(size / (1024 * 1024), 2),
+            "max_mb": round(self.max_bytes / (1024 * 1024), 2),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# ==========================================
+# CONVENIENCE FUNCTIONS
+# ==========================================
+_cache = None
+
+
+def get_result_cache() -> ResultCache:
+    """Get singleton result cache instance"""
+    global _cache
+    if _cache is None:
+        _cache = ResultCache()
+    return _cache
+
+
+def rename_output(cached_filename: str, cached_original: str, original_filename: str) -> str:
+    """Re-derive an output filename for a different upload name (report.pdf -> report_compressed.pdf)"""
+    old_stem = Path(cached_original).stem
+    new_stem = Path(original_filename).stem or "file"
+    if old_stem and cached_filename.startswith(old_stem):
+        return new_stem + cached_filename[len(old_stem):]
+    return cached_filename
+
+
+def store_task_result(cache_key_value: str, task: Dict[str, Any]) -> bool:
+    """Cache the output of a completed task"""
+    output_path = task.get("output_path")
+    if not output_path or not Path(output_path).is_file():
+        return False
+    return get_result_cache().put(
+        cache_key_value,
+        Path(output_path),
+        {
+            "task_type": task.get("task_type"),
+            "output_filename": task.get("output_filename"),
+            "original_filename": task.get("original_filename"),
+            "extension": Path(output_path).suffix.lstrip("."),
+        },
+    )
@@ -0,0 +1,193 @@
+"""
+Target-Size Encoding
+====================
+Two-pass libx264 encode aimed at a file size ("under 25 MB") instead of
+a quality level.
+
+- the bitrate comes from the probed duration: the size budget minus
+  container overhead and the audio track, spread over the whole clip
+- pass 1 only collects rate-control stats (`-pass 1 -f null`, x264's
+  fast first pass); pass 2 spends the bits where the stats say they
+  matter
+- the stats are kept next to the other temp files, keyed by the input's
+  SHA-256 and preset, so asking again for another size skips pass 1;
+  a run publishes its stats/mbtree pair only while holding
+  <prefix>.lock, so concurrent first passes never mix their files
+- if pass 2 overshoots, only pass 2 is re-run with the bitrate scaled
+  down by the overshoot, bounded by the last bitrate that was too big
+  (the same search process_image_size_adjust runs over JPEG quality)
+- if no pass lands under the budget the output is deleted and the
+  encode fails with the size it got to, rather than handing back a file
+  that doesn't fit
+"""
+
+import os
+import logging
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple
+
+from config import get_settings
+from services.ffmpeg import run_ffmpeg
+from services.probe import probe_media_sync
+from services.result_cache import hash_file
+
+logger = logging.getLogger("magetool.target_size")
+settings = get_settings()
+
+# Share of the budget taken by MP4 headers and index
+CONTAINER_OVERHEAD = 0.02
+
+AUDIO_KBPS = 128
+MIN_AUDIO_KBPS = 64  # when audio would take more than a quarter of the budget
+MIN_VIDEO_KBPS = 64  # below this the result is unwatchable
+
+# Pass-2 runs before giving up on an overshooting encode
+MAX_SECOND_PASSES = 3
+# Aim this far under the budget when correcting an overshoot
+RETRY_MARGIN = 0.97
+
+
+class TargetSizeError(ValueError):
+    """The requested size can't hold this video"""
+
+
+def plan_bitrates(target_bytes: int, duration: float, has_audio: bool) -> tuple[int, int]:
+    """(video kbps, audio kbps) that fill target_bytes over duration seconds"""
+    total_kbps = target_bytes * 8 * (1 - CONTAINER_OVERHEAD) / duration / 1000
+    audio_kbps = 0
+    if has_audio:
+        audio_kbps = AUDIO_KBPS if AUDIO_KBPS <= total_kbps / 4 else MIN_AUDIO_KBPS
+
+    video_kbps = int(total_kbps - audio_kbps)
+    if video_kbps < MIN_VIDEO_KBPS:
+        min_bytes = (MIN_VIDEO_KBPS + audio_kbps) * 1000 * duration / 8 / (1 - CONTAINER_OVERHEAD)
+        raise TargetSizeError(
+            f"Target size too small for a {duration:.0f}s video "
+            f"(needs at least {min_bytes / (1024 * 1024):.1f} MB)"
+        )
+    return video_kbps, audio_kbps
+
+
+def passlog_prefix(input_digest: str, preset: str) -> Path:
+    """Where pass-1 stats of this input live (FFmpeg appends -0.log)"""
+    return settings.TEMP_DIR / f"passlog_{input_digest[:32]}_{preset}"
+
+
+def _passlog_files(prefix: Path) -> List[Path]:
+    # The stats file last: its presence means the pair is complete
+    return [Path(f"{prefix}-0.log.mbtree"), Path(f"{prefix}-0.log")]
+
+
+def _publish(private: Path, prefix: Path) -> bool:
+    """
+    Move a finished pass-1 pair under the shared prefix. Only the holder of
+    <prefix>.lock renames, and only while no stats file is there, so an
+    mbtree never ends up next to another run's stats.
+    """
+    lock = Path(f"{prefix}.lock")
+    try:
+        os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        return False  # another request is publishing right now
+
+    try:
+        if _passlog_files(prefix)[-1].exists():
+            return False  # published while we were encoding
+        for source, destination in zip(_passlog_files(private), _passlog_files(prefix)):
+            if source.exists():
+                source.replace(destination)
+        return True
+    finally:
+        lock.unlink(missing_ok=True)
+
+
+def _first_pass(input_path: Path, prefix: Path, video_args: List[str],
+                task_id: Optional[str]) -> Tuple[Path, bool]:
+    """
+    Run pass 1 unless its stats exist. Returns the prefix pass 2 should
+    read and whether the stats were reused.
+    """
+    files = _passlog_files(prefix)
+    if files[-1].exists():
+        for path in files:
+            if path.exists():
+                os.utime(path)  # keep them through the temp cleanup
+        return prefix, True
+
+    # Private prefix while running, so concurrent requests never read half a log
+    private = Path(f"{prefix}_{task_id or os.getpid()}")
+    success, error = run_ffmpeg(
+        ["-i", str(input_path)] + video_args
+        + ["-pass", "1", "-passlogfile", str(private), "-an", "-f", "null", "-"],
+        task_id=task_id, progress_range=(20, 50),
+    )
+    if not success:
+        for path in _passlog_files(private):
+            path.unlink(missing_ok=True)
+        raise Exception(f"FFmpeg first pass error: {error}")
+
+    # Not published: pass 2 reads our own pair, the temp cleanup removes it
+    return (prefix if _publish(private, prefix) else private), False
+
+
+def encode_to_size(input_path: Path, output_path: Path, target_bytes: int, preset: str = "medium",
+                   thread_args: Optional[List[str]] = None, input_digest: Optional[str] = None,
+                   task_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Two-pass encode of input_path into an MP4 of at most target_bytes.
+    Returns the achieved size and the settings that produced it; raises
+    TargetSizeError when every pass overshoots.
+    """
+    info = probe_media_sync(input_path)
+    if not info.duration:
+        raise TargetSizeError("Could not read the video duration")
+
+    video_kbps, audio_kbps = plan_bitrates(target_bytes, info.duration, info.has_audio)
+    prefix = passlog_prefix(input_digest or hash_file(input_path), preset)
+    encoder_args = ["-c:v", "libx264", "-preset", preset] + (thread_args or [])
+
+    passlog, reused = _first_pass(input_path, prefix, encoder_args + ["-b:v", f"{video_kbps}k"], task_id)
+    audio_args = ["-c:a", "aac", "-b:a", f"{audio_kbps}k"] if audio_kbps else ["-an"]
+
+    too_big = None  # lowest bitrate known to overshoot
+    size = None
+    passes = 0
+    while passes < MAX_SECOND_PASSES:
+        passes += 1
+        success, error = run_ffmpeg(
+            ["-i", str(input_path)] + encoder_args
+            + ["-b:v", f"{video_kbps}k", "-pass", "2", "-passlogfile", str(passlog)]
+            + audio_args + ["-movflags", "+faststart", str(output_path)],
+            task_id=task_id, progress_range=(50, 90),
+        )
+        if not success:
+            raise Exception(f"FFmpeg second pass error: {error}")
+
+        size = output_path.stat().st_size
+        if size <= target_bytes:
+            break
+
+        # Overshoot: scale the video share down, staying under the failed bitrate
+        logger.info(f"Target size overshoot: {size} > {target_bytes} at {video_kbps}k")
+        too_big = video_kbps if too_big is None else min(too_big, video_kbps)
+        audio_bytes = audio_kbps * 1000 * info.duration / 8
+        ratio = max(target_bytes - audio_bytes, 1) / max(size - audio_bytes, 1)
+        video_kbps = min(int(video_kbps * ratio * RETRY_MARGIN), too_big - 1)
+        if video_kbps < MIN_VIDEO_KBPS:
+            break
+
+    if size > target_bytes:
+        output_path.unlink(missing_ok=True)
+        raise TargetSizeError(
+            f"Could not fit the video in {target_bytes / (1024 * 1024):.1f} MB "
+            f"(last attempt: {size / (1024 * 1024):.1f} MB after {passes} passes)"
+        )
+
+    return {
+        "target_size": target_bytes,
+        "achieved_size": size,
+        "video_kbps": video_kbps,
+        "audio_kbps": audio_kbps,
+        "second_passes": passes,
+        "first_pass_reused": reused,
+    }
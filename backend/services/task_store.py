@@ -0,0 +1,357 @@
+"""
+Task Store Backends
+===================
+Pluggable storage behind services.tasks.
+
+- memory: plain dict, single process only (default)
+- sqlite: WAL-mode database file shared by every uvicorn worker on the box
+- redis:  any Redis-protocol server (Redis, KeyDB, Dragonfly, ...)
+
+Persistent backends coalesce progress-only writes: update_task() calls
+that just move progress_percent / ETA are buffered per task and flushed
+at most every TASK_PROGRESS_FLUSH_MS. Status changes always write through.
+Only the progress fields are buffered, and a flush merges them into the
+row as currently stored (one transaction), so a status written meanwhile
+by another process survives - and a finished task is never touched.
+"""
+
+import json
+import time
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from typing import Optional, Dict, Any, Iterator
+
+from config import get_settings
+
+logger = logging.getLogger("magetool.task_store")
+settings = get_settings()
+
+# What a coalesced (progress-only) write may change
+PROGRESS_FIELDS = ("progress_percent", "estimated_time_remaining_seconds", "metrics", "updated_at")
+
+# Statuses a buffered progress flush must not write over
+FINAL_STATUSES = {"complete", "failed", "cancelled"}
+
+
+def merge_progress(stored: Dict[str, Any], progress: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """stored + buffered progress fields (metrics merged); None if stored is final"""
+    if stored.get("status") in FINAL_STATUSES:
+        return None
+    merged = {**stored, **progress}
+    if "metrics" in progress:
+        merged["metrics"] = {**(stored.get("metrics") or {}), **(progress["metrics"] or {})}
+    return merged
+
+
+class TaskStore:
+    """Base interface for task storage"""
+
+    # True when other processes see writes made by this one
+    shared: bool = False
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def put(self, task_id: str, task: Dict[str, Any], coalesce: bool = False):
+        raise NotImplementedError
+
+    def delete(self, task_id: str) -> bool:
+        raise NotImplementedError
+
+    def values(self) -> Iterator[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def prune(self, max_age_seconds: float) -> int:
+        """Drop tasks not updated for max_age_seconds. Returns count removed."""
+        return 0
+
+    def flush(self):
+        """Write out any buffered updates"""
+
+    def close(self):
+        self.flush()
+
+
+# ==========================================
+# MEMORY
+# ==========================================
+class MemoryTaskStore(TaskStore):
+    """In-process dict (the original behaviour)"""
+
+    def __init__(self):
+        self._tasks: Dict[str, Dict[str, Any]] = {}
+        self._touched: Dict[str, float] = {}
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        return self._tasks.get(task_id)
+
+    def put(self, task_id: str, task: Dict[str, Any], coalesce: bool = False):
+        self._tasks[task_id] = task
+        self._touched[task_id] = time.time()
+
+    def delete(self, task_id: str) -> bool:
+        self._touched.pop(task_id, None)
+        return self._tasks.pop(task_id, None) is not None
+
+    def values(self) -> Iterator[Dict[str, Any]]:
+        return iter(list(self._tasks.values()))
+
+    def prune(self, max_age_seconds: float) -> int:
+        cutoff = time.time() - max_age_seconds
+        expired = [tid for tid, touched in self._touched.items() if touched < cutoff]
+        for task_id in expired:
+            self.delete(task_id)
+        return len(expired)
+
+
+# ==========================================
+# COALESCING BASE (persistent backends)
+# ==========================================
+class CoalescingTaskStore(TaskStore):
+    """
+    Buffers progress-only writes and flushes them from a background thread.
+    Subclasses implement _read / _write / _merge / _remove / _scan.
+    """
+
+    shared = True
+
+    def __init__(self, flush_interval_ms: int = None):
+        interval = settings.TASK_PROGRESS_FLUSH_MS if flush_interval_ms is None else flush_interval_ms
+        self.flush_interval = interval / 1000
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._last_write: Dict[str, float] = {}
+        self._lock = threading.RLock()
+        self._flusher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # Backend primitives
+    def _read(self, task_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def _write(self, task_id: str, task: Dict[str, Any]):
+        raise NotImplementedError
+
+    def _merge(self, task_id: str, progress: Dict[str, Any]):
+        """Atomically apply merge_progress() to the stored row (if any)"""
+        raise NotImplementedError
+
+    def _remove(self, task_id: str) -> bool:
+        raise NotImplementedError
+
+    def _scan(self) -> Iterator[Dict[str, Any]]:
+        raise NotImplementedError
+
+    # Public API
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        task = self._read(task_id)
+        with self._lock:
+            pending = self._pending.get(task_id)
+        if task is None or pending is None:
+            return task
+        # This process's buffered progress over the current row
+        return merge_progress(task, pending) or task
+
+    def put(self, task_id: str, task: Dict[str, Any], coalesce: bool = False):
+        now = time.monotonic()
+        with self._lock:
+            if coalesce and now - self._last_write.get(task_id, 0) < self.flush_interval:
+                self._pending[task_id] = {k: task[k] for k in PROGRESS_FIELDS if k in task}
+                self._ensure_flusher()
+                return
+            # Write-through also supersedes any buffered progress
+            self._pending.pop(task_id, None)
+            self._write(task_id, task)
+            self._last_write[task_id] = now
+
+    def delete(self, task_id: str) -> bool:
+        with self._lock:
+            self._pending.pop(task_id, None)
+            self._last_write.pop(task_id, None)
+            return self._remove(task_id)
+
+    def values(self) -> Iterator[Dict[str, Any]]:
+        self.flush()
+        return self._scan()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            now = time.monotonic()
+            for task_id, progress in pending.items():
+                try:
+                    self._merge(task_id, progress)
+                    self._last_write[task_id] = now
+                except Exception as e:
+                    logger.warning(f"Failed to flush task {task_id}: {e}")
+
+    def close(self):
+        self._stop.set()
+        self.flush()
+
+    def _ensure_flusher(self):
+        if self._flusher is None or not self._flusher.is_alive():
+            self._flusher = threading.Thread(
+                target=self._flush_loop, name="task-store-flush", daemon=True
+            )
+            self._flusher.start()
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            if self._pending:
+                self.flush()
+
+
+# ==========================================
+# SQLITE (WAL)
+# ==========================================
+class SQLiteTaskStore(CoalescingTaskStore):
+    """
+    Single-file store shared by all worker processes on one host.
+    WAL mode lets status polls read while a processor is writing.
+    """
+
+    def __init__(self, db_path: Path, flush_interval_ms: int = None):
+        super().__init__(flush_interval_ms)
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            " task_id TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " updated REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_updated ON tasks(updated)")
+        logger.info(f"SQLite task store: {self.db_path}")
+
+    def _conn(self) -> sqlite3.Connection:
+        """One connection per thread (sqlite3 connections are not thread-safe)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=10000")
+            self._local.conn = conn
+        return conn
+
+    def _read(self, task_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute(
+            "SELECT data FROM tasks WHERE task_id = ?", (task_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _write(self, task_id: str, task: Dict[str, Any]):
+        self._conn().execute(
+            "INSERT INTO tasks (task_id, data, updated) VALUES (?, ?, ?) "
+            "ON CONFLICT(task_id) DO UPDATE SET data = excluded.data, updated = excluded.updated",
+            (task_id, json.dumps(task, default=str), time.time()),
+        )
+
+    def _merge(self, task_id: str, progress: Dict[str, Any]):
+        conn = self._conn()
+        # IMMEDIATE: take the write lock before reading, so no status write slips in between
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT data FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+            merged = merge_progress(json.loads(row[0]), progress) if row else None
+            if merged is not None:
+                conn.execute(
+                    "UPDATE tasks SET data = ?, updated = ? WHERE task_id = ?",
+                    (json.dumps(merged, default=str), time.time(), task_id),
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _remove(self, task_id: str) -> bool:
+        cursor = self._conn().execute("DELETE FROM tasks WHERE task_id = ?", (task_id,))
+        return cursor.rowcount > 0
+
+    def _scan(self) -> Iterator[Dict[str, Any]]:
+        rows = self._conn().execute("SELECT data FROM tasks").fetchall()
+        return (json.loads(row[0]) for row in rows)
+
+    def prune(self, max_age_seconds: float) -> int:
+        cursor = self._conn().execute(
+            "DELETE FROM tasks WHERE updated < ?", (time.time() - max_age_seconds,)
+        )
+        return cursor.rowcount
+
+
+# ==========================================
+# REDIS PROTOCOL
+# ==========================================
+class RedisTaskStore(CoalescingTaskStore):
+    """
+    Store for any Redis-protocol server. Keys expire on their own,
+    so prune() is a no-op.
+    """
+
+    KEY_PREFIX = "magetool:task:"
+
+    def __init__(self, url: str, ttl_seconds: int, flush_interval_ms: int = None):
+        super().__init__(flush_interval_ms)
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("TASK_STORE_BACKEND=redis requires the 'redis' package (pip install redis)")
+
+        self.ttl_seconds = ttl_seconds
+        self._client = redis.Redis.from_url(url, decode_responses=True)
+        logger.info(f"Redis task store: {url}")
+
+    def _key(self, task_id: str) -> str:
+        return f"{self.KEY_PREFIX}{task_id}"
+
+    def _read(self, task_id: str) -> Optional[Dict[str, Any]]:
+        data = self._client.get(self._key(task_id))
+        return json.loads(data) if data else None
+
+    def _write(self, task_id: str, task: Dict[str, Any]):
+        self._client.set(self._key(task_id), json.dumps(task, default=str), ex=self.ttl_seconds)
+
+    def _merge(self, task_id: str, progress: Dict[str, Any]):
+        key = self._key(task_id)
+
+        def apply(pipe):
+            # WATCHed: the transaction is retried if the key changes before EXEC
+            data = pipe.get(key)
+            merged = merge_progress(json.loads(data), progress) if data else None
+            if merged is not None:
+                pipe.multi()
+                pipe.set(key, json.dumps(merged, default=str), ex=self.ttl_seconds)
+
+        self._client.transaction(apply, key)
+
+    def _remove(self, task_id: str) -> bool:
+        return self._client.delete(self._key(task_id)) > 0
+
+    def _scan(self) -> Iterator[Dict[str, Any]]:
+        for key in self._client.scan_iter(match=f"{self.KEY_PREFIX}*", count=500):
+            data = self._client.get(key)
+            if data:
+                yield json.loads(data)
+
+
+# ==========================================
+# FACTORY
+# ==========================================
+def create_task_store(backend: str = None) -> TaskStore:
+    """Build the store selected by TASK_STORE_BACKEND"""
+    backend = (backend or settings.TASK_STORE_BACKEND).lower()
+
+    if backend == "sqlite":
+        db_path = settings.TASK_STORE_PATH or settings.TEMP_DIR / "state" / "tasks.db"
+        return SQLiteTaskStore(db_path)
+    if backend == "redis":
+        ttl = settings.FILE_EXPIRY_MINUTES * 60 * 2
+        return RedisTaskStore(settings.TASK_STORE_REDIS_URL, ttl)
+    if backend != "memory":
+        logger.warning(f"Unknown TASK_STORE_BACKEND '{backend}', using memory")
+    return MemoryTaskStore()
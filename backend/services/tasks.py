@@ -1,18 +1,21 @@
 """
 Task Management Service
-In-memory task tracking with status management
+Task tracking with status management on a pluggable store (see services.task_store)
 """
 
 import uuid
 import time
+import logging
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable, List
 from enum import Enum
 
 from config import get_settings
+from services.task_store import create_task_store
 
 settings = get_settings()
+logger = logging.getLogger("magetool.tasks")
 
 
 class TaskStatus(str, Enum):
@@ -24,15 +27,40 @@ class TaskStatus(str, Enum):
     CANCELLED = "cancelled"
 
 
-# In-memory task storage
-task_store: Dict[str, Dict[str, Any]] = {}
+# Task storage backend (memory / sqlite / redis - TASK_STORE_BACKEND)
+task_store = create_task_store()
+
+# Callbacks fired after every task mutation: listener(task_id, task)
+# task is None when the task was deleted
+TaskListener = Callable[[str, Optional[Dict[str, Any]]], None]
+_task_listeners: List[TaskListener] = []
+
+
+def add_task_listener(listener: TaskListener):
+    """Subscribe to task mutations"""
+    _task_listeners.append(listener)
+
+
+def remove_task_listener(listener: TaskListener):
+    """Unsubscribe from task mutations"""
+    if listener in _task_listeners:
+        _task_listeners.remove(listener)
+
+
+def _notify_listeners(task_id: str, task: Optional[Dict[str, Any]]):
+    """Fan a task mutation out to all listeners (never raises)"""
+    for listener in list(_task_listeners):
+        try:
+            listener(task_id, task)
+        except Exception as e:
+            logger.warning(f"Task listener failed for {task_id}: {e}")
 
 
 def create_task(original_filename: str, task_type: str) -> str:
     """Create a new task and return its ID"""
     task_id = uuid.uuid4().hex  # Full 32-char hex — impossible to brute-force
     
-    task_store[task_id] = {
+    task = {
         "task_id": task_id,
         "status": TaskStatus.QUEUED,
         "original_filename": original_filename,
@@ -45,17 +73,69 @@ def create_task(original_filename: str, task_type: str) -> str:
         "output_path": None,
         "error_message": None,
         "file_size": None,
+        "metrics": {},  # Runtime metrics (e.g. encode_speed)
         # New fields for deferred processing
         "input_path": None,
+        "input_info": None,  # Ingest record: size, sha256, mime
         "params": {},  # Store processing parameters
     }
+    task_store.put(task_id, task)
+    _notify_listeners(task_id, task)
     
     return task_id
 
 
 def get_task(task_id: str) -> Optional[Dict[str, Any]]:
     """Get task by ID"""
-    return task_store.get(task_id)
+    task = task_store.get(task_id)
+    if task and not isinstance(task["status"], TaskStatus):
+        task["status"] = TaskStatus(task["status"])  # Persistent stores return plain strings
+    return task
+
+
+# ==========================================
+# CANCELLATION
+# ==========================================
+# Marker files, so processors running in pool processes (or other workers)
+# see a cancel even when they hold a private copy of the task.
+def _cancel_marker(task_id: str) -> Path:
+    return settings.TEMP_DIR / "state" / "cancel" / task_id
+
+
+def is_cancel_requested(task_id: str) -> bool:
+    """True once cancel_task() was called for this task"""
+    return _cancel_marker(task_id).exists()
+
+
+def cancel_task(task_id: str) -> bool:
+    """Mark a task CANCELLED and signal its running processes to stop"""
+    task = get_task(task_id)
+    if not task:
+        return False
+    
+    marker = _cancel_marker(task_id)
+    marker.parent.mkdir(parents=True, exist_ok=True)
+    marker.touch()
+    
+    return update_task(task_id, status=TaskStatus.CANCELLED)
+
+
+def prune_cancel_markers(max_age_seconds: float) -> int:
+    """Delete cancel markers older than max_age_seconds"""
+    marker_dir = settings.TEMP_DIR / "state" / "cancel"
+    if not marker_dir.exists():
+        return 0
+    
+    cutoff = time.time() - max_age_seconds
+    removed = 0
+    for marker in marker_dir.iterdir():
+        try:
+            if marker.stat().st_mtime < cutoff:
+                marker.unlink()
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
 
 
 def update_task(
@@ -69,12 +149,20 @@ def update_task(
     file_size: Optional[int] = None,
     input_path: Optional[Path] = None,
     params: Optional[Dict[str, Any]] = None,
+    metrics: Optional[Dict[str, Any]] = None,
+    input_info: Optional[Dict[str, Any]] = None,
 ) -> bool:
-    """Update task status and fields"""
-    task = task_store.get(task_id)
+    """Update task status and fields (metrics are merged, not replaced)"""
+    task = get_task(task_id)
     if not task:
         return False
     
+    # CANCELLED is final: late progress/FAILED writes from the dying job are dropped
+    if status != TaskStatus.CANCELLED and (
+        task["status"] == TaskStatus.CANCELLED or is_cancel_requested(task_id)
+    ):
+        return False
+    
     task["updated_at"] = datetime.utcnow().isoformat() + "Z"
     
     if status is not None:
@@ -95,13 +183,49 @@ def update_task(
         task["input_path"] = str(input_path)
     if params is not None:
         task["params"] = params
+    if input_info is not None:
+        task["input_info"] = input_info
+    if metrics is not None:
+        task["metrics"] = {**(task.get("metrics") or {}), **metrics}
+    
+    # Progress-only updates (incl. metrics) are coalesced by persistent stores
+    progress_only = all(
+        value is None for value in (
+            status, output_filename, output_path, error_message, file_size, input_path, params,
+            input_info,
+        )
+    )
+    task_store.put(task_id, task, coalesce=progress_only)
+    
+    _notify_listeners(task_id, task)
+    return True
+
+
+def apply_task_state(task_id: str, state: Dict[str, Any]) -> bool:
+    """
+    Merge a full task snapshot into the store.
+    Used to sync updates made by processors running in another process.
+    """
+    if task_store.shared:
+        # The other process already wrote to the shared store
+        _notify_listeners(task_id, state)
+        return True
     
+    task = get_task(task_id)
+    if not task:
+        return False
+    if task["status"] == TaskStatus.CANCELLED:
+        return False
+    
+    task.update(state)
+    task_store.put(task_id, task)
+    _notify_listeners(task_id, task)
     return True
 
 
 def delete_task(task_id: str) -> bool:
     """Delete a task and clean up its files"""
-    task = task_store.get(task_id)
+    task = get_task(task_id)
     if not task:
         return False
     
@@ -116,11 +240,14 @@ def delete_task(task_id: str) -> bool:
         output_pattern = f"{task_id}_output.*"
         for f in settings.TEMP_DIR.glob(output_pattern):
             f.unlink()
+        
+        _cancel_marker(task_id).unlink(missing_ok=True)
     except Exception:
         pass
     
     # Remove from store
-    del task_store[task_id]
+    task_store.delete(task_id)
+    _notify_listeners(task_id, None)
     return True
 
 
@@ -170,6 +297,7 @@ def format_task_response(task: Dict[str, Any]) -> Dict[str, Any]:
         "estimated_time_remaining_seconds": task.get("estimated_time_remaining_seconds"),
         "error_message": task.get("error_message"),
         "file_size": task.get("file_size"),
+        "metrics": task.get("metrics") or {},
     }
     
     # Add download URL if complete
@@ -0,0 +1,259 @@
+"""
+AI Upscaler
+===========
+Real-ESRGAN super-resolution with bounded memory:
+
+- the RRDBNet for each scale lives in the model pool
+  (services/model_pool.py): loaded once per process and kept warm,
+  instead of rebuilt per request
+- the image runs through the network in overlapping tiles: tile size
+  comes from the memory actually available (MemAvailable / cgroup limit)
+  so a large input can't blow up RAM, overlaps are feather-blended so
+  tile seams don't show
+- tiles run on a thread pool (torch releases the GIL), intra-op threads
+  split between them
+- each run reports its tile plan and the process's peak RSS while it ran
+
+Callers handle ImportError (torch / basicsr not installed) with their
+non-AI fallbacks.
+"""
+
+import os
+import math
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Dict, Any, Callable, List, Tuple
+
+import numpy as np
+
+from config import get_settings
+from services.model_pool import available_memory, current_rss, use_model
+
+logger = logging.getLogger("magetool.upscaler")
+settings = get_settings()
+
+# Official Real-ESRGAN weights per scale
+MODEL_URLS = {
+    2: "https://github.com/xinntao/Real-ESRGAN/releases/download/v0.2.1/RealESRGAN_x2plus.pth",
+    4: "https://github.com/xinntao/Real-ESRGAN/releases/download/v0.1.0/RealESRGAN_x4plus.pth",
+}
+
+# Rough RRDBNet (64 feat, 23 blocks) CPU working set per input pixel of a tile,
+# including the upsampled tail at scale^2 pixels
+BYTES_PER_TILE_PIXEL = 16 * 1024
+MIN_TILE, MAX_TILE = 64, 1024
+TILE_OVERLAP = 16  # input pixels shared with each neighbour, blended
+MAX_THREADS = 4
+
+# RRDBNet x2 pixel-unshuffles its input: tile sides padded to a multiple of this
+MOD_PAD = 4
+
+
+# ==========================================
+# MEMORY
+# ==========================================
+class PeakRss:
+    """Context manager sampling this process's RSS; .peak_mb once done"""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        while True:
+            rss = current_rss()
+            if rss is not None:
+                self.peak = max(self.peak, rss)
+            if self._stop.wait(self.interval):
+                break
+
+    def __enter__(self) -> "PeakRss":
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        if not self.peak:
+            import resource  # no /proc: lifetime peak is the best there is
+            self.peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    @property
+    def peak_mb(self) -> float:
+        return round(self.peak / (1024 * 1024), 1)
+
+
+# ==========================================
+# TILING
+# ==========================================
+def upscale_threads() -> int:
+    return settings.UPSCALE_THREADS or min(os.cpu_count() or 1, MAX_THREADS)
+
+
+def choose_tile_size(height: int, width: int, scale: int, workers: int,
+                     available: Optional[int] = None) -> int:
+    """Largest tile side whose working set fits the memory budget, per worker"""
+    if settings.UPSCALE_TILE_SIZE > 0:
+        return settings.UPSCALE_TILE_SIZE
+    if available is None:
+        available = available_memory()
+    # The blended output (float32 RGB + weights) lives next to the tiles
+    output_bytes = height * width * scale * scale * 4 * 4
+    budget = available * settings.UPSCALE_MEMORY_FRACTION - output_bytes
+    side = int(math.sqrt(max(budget, 0) / max(workers, 1) / BYTES_PER_TILE_PIXEL))
+    side = max(MIN_TILE, min(MAX_TILE, side // 16 * 16))
+    return min(side, max(height, width))
+
+
+def _ramp(length: int, fade_start: int, fade_end: int) -> np.ndarray:
+    """1D blend weights: linear fade-in over fade_start, fade-out over fade_end"""
+    weights = np.ones(length, dtype=np.float32)
+    fade_start, fade_end = min(fade_start, length), min(fade_end, length)
+    if fade_start:
+        weights[:fade_start] = (np.arange(fade_start, dtype=np.float32) + 0.5) / fade_start
+    if fade_end:
+        weights[length - fade_end:] = np.minimum(
+            weights[length - fade_end:], (np.arange(fade_end, 0, -1, dtype=np.float32) - 0.5) / fade_end
+        )
+    return weights
+
+
+def tile_grid(height: int, width: int, tile: int, overlap: int) -> List[Tuple[int, int, int, int]]:
+    """(y0, y1, x0, x1) input boxes: a tile x tile grid, each box grown by overlap"""
+    boxes = []
+    for y in range(0, height, tile):
+        for x in range(0, width, tile):
+            boxes.append((
+                max(y - overlap, 0), min(y + tile + overlap, height),
+                max(x - overlap, 0), min(x + tile + overlap, width),
+            ))
+    return boxes
+
+
+def upscale_tiled(image: np.ndarray, infer: Callable[[np.ndarray], np.ndarray], scale: int,
+                  tile: int, overlap: int = TILE_OVERLAP, workers: int = 1,
+                  on_progress: Optional[Callable[[float], None]] = None) -> np.ndarray:
+    """
+    Run `infer` (HxWx3 float -> sHxsWx3 float) over overlapping tiles of
+    `image` on `workers` threads and feather-blend the results.
+    """
+    height, width = image.shape[:2]
+    output = np.zeros((height * scale, width * scale, 3), dtype=np.float32)
+    weight_sum = np.zeros((height * scale, width * scale), dtype=np.float32)
+    boxes = tile_grid(height, width, tile, overlap)
+    lock = threading.Lock()
+    done = [0]
+
+    def run(box):
+        y0, y1, x0, x1 = box
+        result = infer(image[y0:y1, x0:x1])
+        # Cross-fade across the whole shared strip; image borders keep full weight
+        fade = 2 * overlap * scale
+        weights = np.outer(
+            _ramp(result.shape[0], fade if y0 > 0 else 0, fade if y1 < height else 0),
+            _ramp(result.shape[1], fade if x0 > 0 else 0, fade if x1 < width else 0),
+        )
+        oy, ox = y0 * scale, x0 * scale
+        with lock:
+            output[oy:oy + result.shape[0], ox:ox + result.shape[1]] += result * weights[..., None]
+            weight_sum[oy:oy + result.shape[0], ox:ox + result.shape[1]] += weights
+            done[0] += 1
+            if on_progress is not None:
+                on_progress(done[0] / len(boxes))
+
+    if workers > 1 and len(boxes) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(run, boxes))
+    else:
+        for box in boxes:
+            run(box)
+
+    output /= np.maximum(weight_sum, 1e-6)[..., None]
+    return output
+
+
+# ==========================================
+# MODEL
+# ==========================================
+def model_dir() -> Path:
+    return settings.MODEL_DIR or settings.TEMP_DIR / "models"
+
+
+def load_realesrgan(scale: int):
+    """Build the Real-ESRGAN network for `scale` (model pool loader)"""
+    import torch
+    from basicsr.archs.rrdbnet_arch import RRDBNet
+    from basicsr.utils.download_util import load_file_from_url
+
+    model_dir().mkdir(parents=True, exist_ok=True)
+    weights_path = load_file_from_url(MODEL_URLS[scale], model_dir=str(model_dir()), progress=False)
+    state = torch.load(weights_path, map_location="cpu")
+    model = RRDBNet(num_in_ch=3, num_out_ch=3, num_feat=64, num_block=23, num_grow_ch=32, scale=scale)
+    model.load_state_dict(state["params_ema"] if "params_ema" in state else state["params"], strict=True)
+    model.eval()
+    return model
+
+
+def _model_infer(model, scale: int) -> Callable[[np.ndarray], np.ndarray]:
+    import torch
+
+    def infer(tile: np.ndarray) -> np.ndarray:
+        height, width = tile.shape[:2]
+        pad_h, pad_w = -height % MOD_PAD, -width % MOD_PAD
+        rgb = np.pad(tile[..., ::-1], ((0, pad_h), (0, pad_w), (0, 0)), mode="edge")
+        tensor = torch.from_numpy(np.ascontiguousarray(rgb.transpose(2, 0, 1)))[None]
+        with torch.inference_mode():
+            result = model(tensor)[0].clamp_(0, 1).numpy()
+        return result.transpose(1, 2, 0)[:height * scale, :width * scale, ::-1]
+
+    return infer
+
+
+def upscale_file(input_path: Path, output_path: Path, scale: int,
+                 on_progress: Optional[Callable[[float], None]] = None) -> Dict[str, Any]:
+    """
+    Real-ESRGAN upscale of an image file to PNG. Raises ImportError when
+    torch/basicsr/cv2 are missing. Returns the tile plan and peak RSS.
+    """
+    import cv2
+    import torch
+
+    with PeakRss() as rss, use_model(f"realesrgan_x{scale}") as model:
+        image = cv2.imread(str(input_path), cv2.IMREAD_UNCHANGED)
+        if image is None:
+            raise Exception("Failed to load image with OpenCV")
+        max_range = 65535.0 if image.dtype == np.uint16 else 255.0
+        alpha = None
+        if image.ndim == 2:
+            image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        elif image.shape[2] == 4:
+            image, alpha = image[..., :3], image[..., 3]
+
+        height, width = image.shape[:2]
+        workers = upscale_threads()
+        tile = choose_tile_size(height, width, scale, workers)
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers))
+
+        output = upscale_tiled(
+            image.astype(np.float32) / max_range, _model_infer(model, scale), scale,
+            tile, workers=workers, on_progress=on_progress,
+        )
+        output = np.rint(output * max_range).astype(image.dtype)
+        if alpha is not None:
+            alpha = cv2.resize(alpha, (width * scale, height * scale), interpolation=cv2.INTER_LINEAR)
+            output = np.dstack([output, alpha])
+        cv2.imwrite(str(output_path), output)
+
+    report = {
+        "tile_size": tile,
+        "tiles": len(tile_grid(height, width, tile, TILE_OVERLAP)),
+        "threads": workers,
+        "peak_rss_mb": rss.peak_mb,
+    }
+    logger.info(f"Upscaled {width}x{height} x{scale}: {report}")
+    return report
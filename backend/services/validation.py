@@ -50,6 +50,15 @@ MIME_TYPE_MAPPING = {
     "json": ["application/json", "text/plain"],
 }
 
+def detect_mime_from_buffer(data: bytes) -> Optional[str]:
+    """MIME type from the leading bytes of a file (None if libmagic is unavailable)"""
+    try:
+        return magic.from_buffer(data, mime=True)
+    except Exception as e:
+        logger.error(f"Magic validation failed: {e}")
+        return None
+
+
 def validate_file_content(file_path: Path, expected_extension: str = None) -> bool:
     """
     Validate that the file content matches its extension using magic bytes.
@@ -65,16 +74,23 @@ def validate_file_content(file_path: Path, expected_extension: str = None) -> bo
         detected_mime = mime.from_file(str(file_path))
     except Exception as e:
         logger.error(f"Magic validation failed: {e}")
+        detected_mime = None
+
+    return validate_mime(detected_mime, expected_extension or file_path.suffix)
+
+
+def validate_mime(detected_mime: Optional[str], expected_extension: str) -> bool:
+    """
+    Check a detected MIME type against the file extension.
+    Raises HTTPException if they don't match.
+    """
+    if detected_mime is None:
         # Fallback: if python-magic fails (e.g. missing system libs), warn but allow
         # In strict mode we might want to fail, but for now we prioritize availability
         logger.warning("Skipping magic validation due to library error")
         return True
 
-    # If no extension provided, infer from path
-    if not expected_extension:
-        expected_extension = file_path.suffix.lstrip(".").lower()
-    else:
-        expected_extension = expected_extension.lstrip(".").lower()
+    expected_extension = expected_extension.lstrip(".").lower()
 
     # Get allowed mime types for this extension
     allowed_mimes = MIME_TYPE_MAPPING.get(expected_extension)
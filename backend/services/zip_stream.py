@@ -0,0 +1,220 @@
+"""
+Streaming ZIP Packaging
+=======================
+Image sets (video frames, PDF pages) go straight into a ZIP_STORED
+archive one image at a time:
+
+- JPEG/PNG are already compressed, deflating them again burns CPU for
+  a percent or two, so entries are stored
+- FFmpeg writes frames to stdout (`-f image2pipe`); FrameSplitter cuts
+  the byte stream at image boundaries and each frame is appended to the
+  archive as soon as it is complete - no frame folder, no glob/sort
+- the pipe is read only as fast as the archive is written, so FFmpeg
+  blocks instead of buffering: memory stays at about one frame and the
+  only disk used is the archive itself, whatever the frame count
+
+The archive is a regular file, so the download route streams it as
+before.
+"""
+
+import time
+import zipfile
+import asyncio
+import logging
+from pathlib import Path
+from typing import Optional, List, Callable
+
+from services.process_runner import run_process
+
+logger = logging.getLogger("magetool.zip")
+
+# Min seconds between progress callbacks while packaging
+PROGRESS_INTERVAL = 1.0
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+# ==========================================
+# ARCHIVE
+# ==========================================
+class StoredZip:
+    """ZIP_STORED archive written entry by entry"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.count = 0
+        self._zip = zipfile.ZipFile(self.path, "w", zipfile.ZIP_STORED, allowZip64=True)
+
+    def add(self, name: str, data: bytes):
+        info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+        info.compress_type = zipfile.ZIP_STORED
+        self._zip.writestr(info, data)
+        self.count += 1
+
+    def close(self):
+        self._zip.close()
+
+    def __enter__(self) -> "StoredZip":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        if exc_type is not None:
+            self.path.unlink(missing_ok=True)
+
+
+# ==========================================
+# IMAGE STREAM SPLITTING
+# ==========================================
+class FrameSplitter:
+    """
+    Cuts concatenated JPEG or PNG images (FFmpeg image2pipe output) into
+    single images. PNGs are walked chunk by chunk up to IEND; JPEGs
+    segment by segment, scanning entropy-coded data for the EOI marker.
+    Parsing resumes where the previous feed stopped.
+    """
+
+    def __init__(self, image_format: str):
+        self.png = image_format.lower() == "png"
+        self.buffer = bytearray()
+        self._pos = 0
+        self._in_scan = False
+
+    def feed(self, data: bytes) -> List[bytes]:
+        """Add stream bytes; returns the images completed by them"""
+        self.buffer += data
+        images = []
+        while self.buffer:
+            end = self._png_end() if self.png else self._jpeg_end()
+            if end is None:
+                break
+            images.append(bytes(self.buffer[:end]))
+            del self.buffer[:end]
+            self._pos, self._in_scan = 0, False
+        return images
+
+    @property
+    def pending(self) -> int:
+        """Bytes of an incomplete image (non-zero at end of stream = truncated)"""
+        return len(self.buffer)
+
+    def _png_end(self) -> Optional[int]:
+        buf = self.buffer
+        if self._pos == 0:
+            if len(buf) < len(PNG_SIGNATURE):
+                return None
+            if not buf.startswith(PNG_SIGNATURE):
+                raise ValueError("Corrupt PNG stream")
+            self._pos = len(PNG_SIGNATURE)
+        while len(buf) >= self._pos + 8:
+            length = int.from_bytes(buf[self._pos:self._pos + 4], "big")
+            chunk_type = bytes(buf[self._pos + 4:self._pos + 8])
+            chunk_end = self._pos + 12 + length  # length, type, data, CRC
+            if chunk_type == b"IEND":
+                return chunk_end if len(buf) >= chunk_end else None
+            self._pos = chunk_end
+        return None
+
+    def _jpeg_end(self) -> Optional[int]:
+        buf = self.buffer
+        if self._pos == 0:
+            if len(buf) < 2:
+                return None
+            if buf[0] != 0xFF or buf[1] != 0xD8:
+                raise ValueError("Corrupt JPEG stream")
+            self._pos = 2
+        while True:
+            pos = self._pos
+            if self._in_scan:
+                # Entropy-coded data: FF00 is a stuffed byte, FFD0-FFD7 restart markers
+                marker = buf.find(b"\xff", pos)
+                if marker < 0:
+                    self._pos = len(buf)
+                    return None
+                if marker + 1 >= len(buf):
+                    self._pos = marker
+                    return None
+                code = buf[marker + 1]
+                if code == 0x00 or 0xD0 <= code <= 0xD7:
+                    self._pos = marker + 2
+                elif code == 0xFF:
+                    self._pos = marker + 1
+                else:
+                    self._pos, self._in_scan = marker, False
+                continue
+
+            if len(buf) < pos + 2:
+                return None
+            if buf[pos] != 0xFF:
+                raise ValueError("Corrupt JPEG stream")
+            code = buf[pos + 1]
+            if code == 0xFF:  # fill byte
+                self._pos = pos + 1
+            elif code == 0xD9:  # EOI
+                return pos + 2
+            elif code in (0xD8, 0x01) or 0xD0 <= code <= 0xD7:  # markers without a length
+                self._pos = pos + 2
+            else:
+                if len(buf) < pos + 4:
+                    return None
+                self._pos = pos + 2 + int.from_bytes(buf[pos + 2:pos + 4], "big")
+                self._in_scan = code == 0xDA  # SOS: entropy data follows its header
+                if self._pos > len(buf):
+                    return None
+
+
+# ==========================================
+# FFMPEG -> ZIP
+# ==========================================
+async def frames_to_zip(input_args: List[str], image_format: str, output_path: Path,
+                        name_pattern: str = "frame_{:05d}", timeout: Optional[float] = 600,
+                        task_id: Optional[str] = None,
+                        on_progress: Optional[Callable[[int], None]] = None) -> int:
+    """
+    Run FFmpeg with `input_args` (inputs, filters, encoder options) writing
+    image2pipe to stdout, storing each frame in a ZIP as it arrives.
+    Returns the frame count; raises on FFmpeg or stream errors.
+    """
+    extension = "png" if image_format == "png" else "jpg"
+    splitter = FrameSplitter(extension)
+    errors: List[Exception] = []
+    last_progress = [0.0]
+
+    with StoredZip(output_path) as archive:
+        def on_chunk(data: bytes):
+            if errors:
+                return  # drain the pipe so FFmpeg can exit
+            try:
+                for image in splitter.feed(data):
+                    archive.add(f"{name_pattern.format(archive.count + 1)}.{extension}", image)
+            except Exception as e:
+                errors.append(e)
+                return
+            now = time.monotonic()
+            if on_progress is not None and now - last_progress[0] >= PROGRESS_INTERVAL:
+                last_progress[0] = now
+                on_progress(archive.count)
+
+        codec = "png" if extension == "png" else "mjpeg"
+        try:
+            result = await run_process(
+                ["ffmpeg", "-y", "-nostats", "-v", "error"] + input_args
+                + ["-f", "image2pipe", "-c:v", codec, "-"],
+                timeout=timeout, task_id=task_id, on_stdout_chunk=on_chunk,
+            )
+        except FileNotFoundError:
+            raise Exception("FFmpeg not installed")
+
+        if errors:
+            raise errors[0]
+        if not result.ok:
+            raise Exception(f"FFmpeg error: {result.error}")
+        if splitter.pending:
+            raise Exception(f"Frame stream ended inside an image ({splitter.pending} bytes)")
+        logger.info(f"Packed {archive.count} frames into {output_path.name}")
+        return archive.count
+
+
+def frames_to_zip_sync(*args, **kwargs) -> int:
+    """Blocking frames_to_zip() for sync processors"""
+    return asyncio.run(frames_to_zip(*args, **kwargs))
@@ -0,0 +1,37 @@
+"""
+Shared test fixtures
+"""
+
+import os
+
+import pytest
+
+from services.probe import get_probe_cache, get_keyframe_cache
+
+
+@pytest.fixture
+def fake_tools(tmp_path, monkeypatch):
+    """
+    Stand-in executables ahead of the real ones on PATH, probe caches cleared:
+
+        log = fake_tools(ffprobe="echo '{...}'\\n", ffmpeg='for last; do :; done\\n...')
+
+    Each value is a /bin/sh script body. Every call first appends its
+    arguments to <name>.log; the ffmpeg log path is returned (the other
+    logs sit next to it). Calling again replaces the named tools.
+    """
+    bin_dir = tmp_path / "bin"
+
+    def install(**scripts: str):
+        bin_dir.mkdir(exist_ok=True)
+        for name, body in scripts.items():
+            tool = bin_dir / name
+            tool.write_text(f"#!/bin/sh\necho \"$*\" >> {bin_dir / name}.log\n{body}")
+            tool.chmod(0o755)
+        if not os.environ["PATH"].startswith(f"{bin_dir}{os.pathsep}"):
+            monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+        get_probe_cache().clear()
+        get_keyframe_cache().clear()
+        return bin_dir / "ffmpeg.log"
+
+    return install
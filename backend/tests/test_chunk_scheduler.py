@@ -0,0 +1,190 @@
+"""
+Chunk scheduler: work stealing, retries, speculative re-execution, local fallback,
+load-aware worker ranking
+Run from backend/: python -m pytest tests/test_chunk_scheduler.py
+"""
+
+import asyncio
+from pathlib import Path
+
+import httpx
+import pytest
+
+import services.chunk_scheduler as chunk_scheduler
+from services.chunk_scheduler import ChunkScheduler, ChunkJobFailed, WorkerStats, LOCAL
+from services.cluster import ClusterOrchestrator, VideoChunk
+from services.cluster_transport import ClusterTransport
+
+
+def make_chunks(count: int, duration: float = 1.0):
+    return [
+        VideoChunk(f"job_chunk_{i}", Path(f"chunk_{i}.mp4"), i * duration, (i + 1) * duration, duration)
+        for i in range(count)
+    ]
+
+
+def run_job(workers, run_attempt, chunks, stats=None):
+    async def scenario():
+        scheduler = ChunkScheduler(workers, run_attempt, stats if stats is not None else {})
+        running = asyncio.ensure_future(scheduler.run())
+        for chunk in chunks:
+            scheduler.add(chunk)
+            await asyncio.sleep(0)
+        scheduler.close()
+        return scheduler, await asyncio.wait_for(running, timeout=10)
+
+    return asyncio.run(scenario())
+
+
+def test_fast_workers_steal_more_chunks():
+    delays = {"http://fast": 0.01, "http://slow": 0.1}
+
+    async def run_attempt(chunk, executor, attempt):
+        await asyncio.sleep(delays[executor])
+        return Path(f"{chunk.chunk_id}.out")
+
+    _, done = run_job(list(delays), run_attempt, make_chunks(12))
+    by_worker = [c.worker_url for c in done]
+
+    assert all(c.output_path for c in done)
+    assert by_worker.count("http://fast") > by_worker.count("http://slow")
+
+
+def test_failed_chunks_retry_elsewhere_and_bad_worker_is_dropped():
+    calls = []
+
+    async def run_attempt(chunk, executor, attempt):
+        calls.append(executor)
+        await asyncio.sleep(0.01)
+        if executor == "http://bad":
+            raise RuntimeError("worker crashed")
+        return Path(f"{chunk.chunk_id}.out")
+
+    scheduler, done = run_job(["http://bad", "http://good"], run_attempt, make_chunks(6))
+
+    assert {c.worker_url for c in done} == {"http://good"}
+    assert scheduler.retries >= 1
+    assert calls.count("http://bad") == 2  # CLUSTER_WORKER_MAX_FAILURES
+
+
+def test_local_fallback_when_all_workers_fail():
+    async def run_attempt(chunk, executor, attempt):
+        if executor != LOCAL:
+            raise RuntimeError("space is sleeping")
+        return Path(f"{chunk.chunk_id}.out")
+
+    scheduler, done = run_job(["http://a"], run_attempt, make_chunks(3))
+    assert {c.worker_url for c in done} == {LOCAL}
+    assert scheduler.local_chunks == 3
+
+
+def test_chunk_fails_after_max_attempts():
+    async def run_attempt(chunk, executor, attempt):
+        raise RuntimeError("corrupt chunk")
+
+    with pytest.raises(ChunkJobFailed):
+        run_job([], run_attempt, make_chunks(1))
+
+
+def test_failed_job_cancels_attempts_still_running(monkeypatch):
+    monkeypatch.setattr(chunk_scheduler.settings, "CLUSTER_MAX_ATTEMPTS", 1)
+    cancelled = []
+
+    async def run_attempt(chunk, executor, attempt):
+        if chunk.chunk_id == "job_chunk_0":
+            await asyncio.sleep(0.01)
+            raise RuntimeError("corrupt chunk")
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            cancelled.append(chunk.chunk_id)
+            raise
+
+    async def scenario():
+        scheduler = ChunkScheduler(["http://a", "http://b"], run_attempt, {})
+        for chunk in make_chunks(2):
+            scheduler.add(chunk)
+        scheduler.close()
+        with pytest.raises(ChunkJobFailed):
+            await asyncio.wait_for(scheduler.run(), timeout=10)
+        # Before asyncio.run() tears down leftover tasks
+        return list(cancelled)
+
+    assert asyncio.run(scenario()) == ["job_chunk_1"]
+
+
+def test_straggler_is_speculatively_reexecuted(monkeypatch):
+    monkeypatch.setattr(chunk_scheduler, "MIN_SPECULATE_SECONDS", 0.05)
+    cancelled = []
+
+    async def run_attempt(chunk, executor, attempt):
+        if executor == "http://stuck":
+            try:
+                await asyncio.sleep(30)
+            except asyncio.CancelledError:
+                cancelled.append(chunk.chunk_id)
+                raise
+        await asyncio.sleep(0.01)
+        return Path(f"{chunk.chunk_id}.out")
+
+    # History says a 1s chunk takes ~0.01s on either worker
+    stats = {url: WorkerStats(url, throughput=100.0) for url in ("http://stuck", "http://ok")}
+    scheduler, done = run_job(["http://stuck", "http://ok"], run_attempt, make_chunks(2), stats)
+
+    assert {c.worker_url for c in done} == {"http://ok"}
+    assert scheduler.speculative_runs == 1
+    assert len(cancelled) == 1
+
+
+def test_chunk_count_follows_throughput_history(tmp_path):
+    orchestrator = ClusterOrchestrator(worker_urls=["http://a", "http://b"], temp_dir=tmp_path)
+    workers = ["http://a", "http://b"]
+
+    # No history: CLUSTER_CHUNKS_PER_WORKER per worker
+    assert orchestrator.plan_chunk_count(600, workers) == 8
+
+    # 2x realtime workers, 30s target -> 60s of media per chunk
+    for url in workers:
+        orchestrator.worker_stats[url] = WorkerStats(url, throughput=2.0)
+    assert orchestrator.plan_chunk_count(600, workers) == 10
+
+    # Short clips never go below CLUSTER_MIN_CHUNK_SECONDS per chunk
+    assert orchestrator.plan_chunk_count(10, workers) == 2
+
+
+def test_workers_are_ranked_by_reported_load(tmp_path):
+    reports = {
+        "busy": {"queue_depth": 3, "active_ffmpeg": 3, "max_processes": 4, "cpu_load": 0.9, "disk_free_mb": 9000},
+        "idle": {"queue_depth": 0, "active_ffmpeg": 0, "max_processes": 4, "cpu_load": 0.1,
+                 "disk_free_mb": 9000, "encode_speed": 3.0},
+        "full": {"queue_depth": 0, "active_ffmpeg": 0, "max_processes": 4, "cpu_load": 0.0, "disk_free_mb": 100},
+        "legacy": {"status": "healthy", "active_tasks": 1, "disk_free_mb": 9000},  # before load reporting
+    }
+    requests = []
+
+    async def handler(request: httpx.Request):
+        requests.append(request.url.host)
+        if request.url.host == "down":
+            return httpx.Response(503)
+        return httpx.Response(200, json=reports[request.url.host])
+
+    urls = [f"http://{host}" for host in ("busy", "idle", "full", "legacy", "down")]
+    orchestrator = ClusterOrchestrator(worker_urls=urls, temp_dir=tmp_path)
+    orchestrator.transport = ClusterTransport(http_transport=httpx.MockTransport(handler))
+
+    async def scenario():
+        try:
+            first = await orchestrator.get_healthy_workers()
+            second = await orchestrator.get_healthy_workers()
+            return first, second, await orchestrator.get_worker_loads()
+        finally:
+            await orchestrator.transport.aclose()
+
+    first, second, loads = asyncio.run(scenario())
+
+    # Low-disk and down workers get nothing; the idle, fast worker goes first
+    assert first == ["http://idle", "http://legacy", "http://busy"]
+    assert second == first
+    assert len(requests) == len(urls)  # second lookup served from the TTL cache
+    assert loads["http://idle"].free_slots() == 2
+    assert loads["http://busy"].free_slots() == 1
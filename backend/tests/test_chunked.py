@@ -0,0 +1,94 @@
+"""
+Local chunked encoding: keyframe-aligned segment planning and the
+split -> parallel encode -> concat flow, and the cluster's single-pass
+segment split (with stand-in ffmpeg/ffprobe)
+Run from backend/: python -m pytest tests/test_chunked.py
+"""
+
+import asyncio
+
+from services.chunked import plan_segments, transcode_chunked
+from services.probe import parse_gops
+
+
+def test_plan_snaps_cuts_to_nearest_keyframe():
+    gops = [(t, 0) for t in (0, 9.5, 19.8, 31, 40.2, 50, 61)]
+    segments = plan_segments(70, gops, count=3)
+    assert segments == [(0.0, 19.8), (19.8, 50), (50, None)]
+
+
+def test_plan_balances_encode_cost():
+    # 10 GOPs of 6s; the first 30s are 9x more complex (bytes) than the rest
+    gops = [(t, 900 if t < 30 else 100) for t in range(0, 60, 6)]
+    (_, first_cut), _ = plan_segments(60, gops, count=2)
+    # Equal duration would cut at 30s; equal cost cuts inside the heavy half
+    assert first_cut == 24
+
+
+def test_plan_respects_min_segment_length():
+    gops = [(float(t), 0) for t in range(0, 60, 2)]
+    # 60s with 20s minimum -> at most 3 segments, whatever was requested
+    assert len(plan_segments(60, gops, count=8, min_seconds=20)) == 3
+    # Too short or no usable keyframes -> one segment (caller encodes normally)
+    assert plan_segments(30, gops, count=4, min_seconds=20) == [(0.0, None)]
+    assert plan_segments(120, [(0.0, 0)], count=4) == [(0.0, None)]
+
+
+def test_parse_gops():
+    output = "0.000000,500,K_\n0.040000,20,__\n2.002000,400,K_\n1.900000,30,__\nN/A,10,K_\n"
+    assert parse_gops(output) == [(0.0, 520), (2.002, 440)]
+
+
+def test_chunked_encode_commands(tmp_path, fake_tools):
+    log = fake_tools(
+        ffprobe=(
+            "case \"$*\" in *packet=*) for t in 0 10 20 30 40 50; do echo \"$t.000000,1000,K_\"; done ;;\n"
+            "*) echo '{\"streams\":[{\"codec_type\":\"video\"},{\"codec_type\":\"audio\"}],"
+            "\"format\":{\"duration\":\"60.0\"}}' ;; esac\n"
+        ),
+        ffmpeg="for last; do :; done\necho encoded > \"$last\"\n",
+    )
+
+    source = tmp_path / "in.mp4"
+    source.write_bytes(b"video")
+    output = tmp_path / "out.mp4"
+
+    result = transcode_chunked(source, output, ["-c:v", "libx264"], ["-c:a", "aac"], workers=2)
+
+    assert result == (True, "")
+    assert output.read_text() == "encoded\n"
+    commands = log.read_text().splitlines()
+    segment_starts = sorted(c.split("-ss ")[1].split()[0] for c in commands if "-ss " in c)
+    assert segment_starts == ["0.000000", "20.000000", "40.000000"]
+    assert sum("-map 0:a:0" in c for c in commands) == 1  # audio encoded once
+    assert "-f concat" in commands[-1] and "-c copy" in commands[-1]
+
+
+def test_cluster_split_is_single_pass_and_pipelined(tmp_path, fake_tools):
+    from services.cluster import ClusterOrchestrator
+
+    log = fake_tools(
+        ffprobe=(
+            "case \"$*\" in *packet=*) for t in 0 10 20 30 40 50; do echo \"$t.000000,1000,K_\"; done ;;\n"
+            "*) echo '{\"streams\":[{\"codec_type\":\"video\"}],\"format\":{\"duration\":\"60.0\"}}' ;; esac\n"
+        ),
+        # Stand-in segment muxer: writes each chunk, then reports it on the segment list
+        ffmpeg=(
+            f"for i in 0 1 2; do echo data > {tmp_path}/job_chunk_00$i.mp4; "
+            "echo \"job_chunk_00$i.mp4,$((i * 20)).000000,$((i * 20 + 20)).000000\"; done\n"
+        ),
+    )
+
+    source = tmp_path / "in.mp4"
+    source.write_bytes(b"video")
+    orchestrator = ClusterOrchestrator(worker_urls=["http://w1"], temp_dir=tmp_path)
+    seen = []
+
+    chunks = asyncio.run(orchestrator.split_video_into_chunks(source, 3, "job", on_chunk=seen.append))
+
+    assert seen == chunks
+    assert [(c.start_time, c.end_time) for c in chunks] == [(0, 20), (20, 40), (40, 60)]
+    assert all(c.chunk_path.read_text() == "data\n" for c in chunks)
+    command = log.read_text().splitlines()
+    assert len(command) == 1  # one FFmpeg pass for all chunks
+    assert "-segment_times 19.999000,39.999000" in command[0]
@@ -0,0 +1,73 @@
+"""
+Cluster transport: streamed multipart upload, streamed download, concurrent health checks
+Run from backend/: python -m pytest tests/test_cluster_transport.py
+"""
+
+import time
+import asyncio
+
+import httpx
+
+from services.cluster_transport import ClusterTransport, TRANSFER_CHUNK_SIZE
+
+
+def test_upload_streams_multipart_with_length(tmp_path):
+    chunk = tmp_path / "chunk.mp4"
+    chunk.write_bytes(b"v" * (TRANSFER_CHUNK_SIZE * 3 + 7))
+    seen = {}
+
+    async def handler(request: httpx.Request):
+        body = await request.aread()
+        seen["length"] = int(request.headers["content-length"])
+        seen["body"] = body
+        seen["chunked"] = "transfer-encoding" in request.headers
+        return httpx.Response(200, json={"status": "complete"})
+
+    async def scenario():
+        transport = ClusterTransport(http_transport=httpx.MockTransport(handler))
+        try:
+            return await transport.upload_file("http://w/process-chunk", chunk, {"task_id": "t1"})
+        finally:
+            await transport.aclose()
+
+    assert asyncio.run(scenario()) == {"status": "complete"}
+    assert seen["length"] == len(seen["body"])
+    assert not seen["chunked"]
+    assert b'name="task_id"\r\n\r\nt1\r\n' in seen["body"]
+    assert chunk.read_bytes() in seen["body"]
+
+
+def test_download_streams_to_disk(tmp_path):
+    payload = b"x" * (TRANSFER_CHUNK_SIZE * 2 + 11)
+
+    async def handler(request: httpx.Request):
+        return httpx.Response(200, content=payload)
+
+    async def scenario():
+        transport = ClusterTransport(http_transport=httpx.MockTransport(handler))
+        try:
+            return await transport.download_to("http://w/download/t1", tmp_path / "out.mp4")
+        finally:
+            await transport.aclose()
+
+    assert asyncio.run(scenario()) == len(payload)
+    assert (tmp_path / "out.mp4").read_bytes() == payload
+
+
+def test_health_checks_run_concurrently():
+    async def handler(request: httpx.Request):
+        await asyncio.sleep(0.3)
+        return httpx.Response(200 if request.url.host != "down" else 503)
+
+    async def scenario():
+        transport = ClusterTransport(http_transport=httpx.MockTransport(handler))
+        try:
+            started = time.monotonic()
+            health = await transport.check_all(["http://a", "http://b", "http://c", "http://down"])
+            return health, time.monotonic() - started
+        finally:
+            await transport.aclose()
+
+    health, elapsed = asyncio.run(scenario())
+    assert health == {"http://a": True, "http://b": True, "http://c": True, "http://down": False}
+    assert elapsed < 0.9
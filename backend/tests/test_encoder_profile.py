@@ -0,0 +1,83 @@
+"""
+Encoder calibration: preset/thread choice from a profile, and the
+startup benchmark persisting it once per node (stand-in ffmpeg)
+Run from backend/: python -m pytest tests/test_encoder_profile.py
+"""
+
+import json
+import asyncio
+
+from services import encoder_profile
+from services.encoder_profile import EncoderProfile, EncoderChoice, ensure_calibrated, get_encoder_profile
+
+RESULTS = [
+    {"preset": "ultrafast", "threads": 4, "speed": 12.0, "bytes": 900},
+    {"preset": "veryfast", "threads": 4, "speed": 6.0, "bytes": 600},
+    {"preset": "veryfast", "threads": 2, "speed": 4.0, "bytes": 600},
+    {"preset": "medium", "threads": 4, "speed": 2.0, "bytes": 500},
+    {"preset": "medium", "threads": 2, "speed": 1.2, "bytes": 500},
+    {"preset": "slower", "threads": 4, "speed": 1.5, "bytes": 400},
+]
+
+
+def test_choice_trades_size_for_the_target_speed(monkeypatch):
+    monkeypatch.setattr(encoder_profile.settings, "ENCODER_MAX_PRESET", "medium")
+    profile = EncoderProfile(RESULTS, {})
+
+    # 720p30: medium keeps up, and 2 threads are enough ("slower" is above the ceiling)
+    assert profile.choose(1.0, 1280, 720, 30) == EncoderChoice("medium", 2)
+    # 1080p needs 2.25x the 720p speed
+    assert profile.choose(1.0, 1920, 1080, 30) == EncoderChoice("veryfast", 2)
+    # 4K60 is out of reach: fastest measured combination
+    assert profile.choose(1.0, 3840, 2160, 60) == EncoderChoice("ultrafast", 4)
+
+    monkeypatch.setattr(encoder_profile.settings, "ENCODER_MAX_PRESET", "slower")
+    assert profile.choose(1.0, 1280, 720, 30) == EncoderChoice("slower", 4)
+    assert EncoderProfile([], {}).choose(1.0) == EncoderChoice("medium", None)
+
+
+def test_calibration_is_persisted_and_reused(tmp_path, monkeypatch, fake_tools):
+    log = fake_tools(ffmpeg=(
+        "case \"$*\" in *-version*) echo 'ffmpeg version test'; exit 0 ;; esac\n"
+        "for last; do :; done\necho encoded > \"$last\"\n"
+    ))
+    monkeypatch.setattr(encoder_profile.settings, "ENCODER_PROFILE_PATH", tmp_path / "profile.json")
+    monkeypatch.setattr(encoder_profile.settings, "ENCODER_CALIBRATION_ENABLED", True)
+    monkeypatch.setattr(encoder_profile.settings, "ENCODER_MAX_PRESET", "veryfast")
+    monkeypatch.setattr(encoder_profile.settings, "TEMP_DIR", tmp_path)
+
+    profile = asyncio.run(ensure_calibrated())
+    expected_runs = 3 * len(encoder_profile.thread_candidates())
+
+    assert len(profile.results) == expected_runs
+    assert json.loads((tmp_path / "profile.json").read_text())["signature"]["ffmpeg"] == "ffmpeg version test"
+    assert get_encoder_profile().results == profile.results
+    assert not (tmp_path / "profile.lock").exists()
+
+    # Same node: no second benchmark
+    asyncio.run(ensure_calibrated())
+    encodes = [line for line in log.read_text().splitlines() if "-version" not in line]
+    assert len(encodes) == expected_runs
+
+
+def test_calibration_waits_for_idle_pools_after_the_startup_delay(monkeypatch):
+    calls = []
+    monkeypatch.setattr(encoder_profile.settings, "ENCODER_CALIBRATION_DELAY_SECONDS", 0)
+    monkeypatch.setattr(encoder_profile, "CALIBRATION_IDLE_POLL_SECONDS", 0)
+
+    pending = [1, 1, 0]  # a job runs for the first two checks
+
+    class BusyExecutor:
+        def stats(self):
+            calls.append("stats")
+            return {"video": {"pending": pending.pop(0)}}
+
+    async def calibrated():
+        calls.append("calibrate")
+
+    monkeypatch.setattr("services.executor.get_executor", lambda: BusyExecutor())
+    monkeypatch.setattr(encoder_profile, "ensure_calibrated", calibrated)
+
+    asyncio.run(encoder_profile.calibrate_after_startup())
+    asyncio.run(encoder_profile._wait_for_idle_pools())
+    assert calls == ["calibrate", "stats", "stats", "stats"]
@@ -0,0 +1,122 @@
+"""
+Task events: hub fan-out from any thread, end of stream, the SSE route
+and the WebSocket handshake check
+Run from backend/: python -m pytest tests/test_events.py
+"""
+
+import json
+import asyncio
+import threading
+
+import jwt
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from config import get_settings
+from routes import events
+from services.events import TaskEventHub
+from services.tasks import create_task, update_task, delete_task, TaskStatus
+
+settings = get_settings()
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(events.router, prefix="/api")
+    return TestClient(app)
+
+
+def finished_task() -> str:
+    task_id = create_task("clip.mp4", "video_compress")
+    update_task(task_id, status=TaskStatus.COMPLETE, progress_percent=100)
+    return task_id
+
+
+def test_hub_fans_out_updates_from_other_threads():
+    task_id = create_task("clip.mp4", "video_compress")
+
+    async def scenario():
+        hub = TaskEventHub()
+        hub.attach(asyncio.get_running_loop())
+        try:
+            streams = [hub.stream(task_id) for _ in range(2)]
+            first = [await stream.__anext__() for stream in streams]
+            assert hub.subscriber_count() == 2
+
+            # update_task() from a non-loop thread, as the executor drain thread does
+            worker = threading.Thread(
+                target=update_task, args=(task_id,), kwargs={"status": TaskStatus.COMPLETE, "progress_percent": 100}
+            )
+            worker.start()
+            worker.join()
+
+            rest = [[event async for event in stream] for stream in streams]
+            return first, rest, hub.subscriber_count()
+        finally:
+            hub.detach()
+
+    first, rest, subscribers = asyncio.run(scenario())
+    assert [event["status"] for event in first] == ["queued", "queued"]
+    # Terminal status ends every stream and unsubscribes it
+    assert [[event["status"] for event in events] for events in rest] == [["complete"], ["complete"]]
+    assert subscribers == 0
+
+
+def test_hub_stream_ends_when_the_task_is_deleted():
+    task_id = create_task("clip.mp4", "video_compress")
+
+    async def scenario():
+        hub = TaskEventHub()
+        hub.attach(asyncio.get_running_loop())
+        try:
+            stream = hub.stream(task_id)
+            await stream.__anext__()
+            delete_task(task_id)
+            return [event async for event in stream]
+        finally:
+            hub.detach()
+
+    assert asyncio.run(scenario()) == []
+
+
+def test_sse_streams_status_then_end(client):
+    task_id = finished_task()
+    with client.stream("GET", f"/api/events/{task_id}") as response:
+        assert response.headers["content-type"].startswith("text/event-stream")
+        body = "".join(response.iter_text())
+
+    status, end = body.strip().split("\n\n")
+    assert status.startswith("event: status\ndata: ")
+    assert json.loads(status.split("data: ", 1)[1])["status"] == "complete"
+    assert end == "event: end\ndata: {}"
+    assert client.get("/api/events/missing").status_code == 404
+
+
+def test_websocket_rejects_missing_or_bad_credentials(client):
+    for kwargs in ({}, {"headers": {"X-Magetool-Secret": "wrong"}}, {"subprotocols": ["bearer", "not-a-jwt"]}):
+        with pytest.raises(WebSocketDisconnect) as closed:
+            with client.websocket_connect("/api/ws", **kwargs):
+                pass
+        assert closed.value.code == 1008
+
+
+def test_websocket_accepts_secret_jwt_subprotocol_or_query(client):
+    token = jwt.encode({"sub": "frontend"}, settings.API_SECRET, algorithm="HS256")
+    task_id = finished_task()
+
+    for url, kwargs in (
+        ("/api/ws", {"headers": {"X-Magetool-Secret": settings.API_SECRET}}),
+        ("/api/ws", {"subprotocols": ["bearer", token]}),
+        (f"/api/ws?token={token}", {}),
+    ):
+        with client.websocket_connect(url, **kwargs) as ws:
+            if "subprotocols" in kwargs:
+                assert ws.accepted_subprotocol == "bearer"
+            ws.send_json({"action": "subscribe", "task_id": task_id})
+            assert ws.receive_json()["task"]["status"] == "complete"
+            assert ws.receive_json() == {"type": "end", "task_id": task_id}
+            ws.send_json({"action": "subscribe", "task_id": "missing"})
+            assert ws.receive_json()["error"] == "Task not found"
@@ -0,0 +1,105 @@
+"""
+Job executor: category pools in spawned processes, task updates
+forwarded to the parent, queue limits and cancellation while queued
+Run from backend/: python -m pytest tests/test_executor.py
+"""
+
+import time
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routes import core
+from routes.core import register_processor, PROCESSOR_CATEGORIES
+from services.executor import JobExecutor, QueueFullError
+from services.tasks import create_task, get_task, update_task, cancel_task, TaskStatus
+
+
+def gated_job(task_id: str, input_path: Path, original_filename: str, gate: str = ""):
+    """Reports half-way, waits for `gate` to exist, then completes"""
+    input_path.with_suffix(".ran").touch()
+    update_task(task_id, status=TaskStatus.PROCESSING, progress_percent=50, metrics={"stage": "half"})
+    deadline = time.monotonic() + 10
+    while not Path(gate).exists() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    update_task(task_id, status=TaskStatus.COMPLETE, progress_percent=100)
+
+
+# Imported again by the pool process, which looks the processor up by task_type
+register_processor("test_gated_job", gated_job)
+
+
+def new_task(tmp_path: Path, name: str, gate: Path) -> str:
+    task_id = create_task(f"{name}.bin", "test_gated_job")
+    input_path = tmp_path / f"{name}.bin"
+    input_path.write_bytes(b"input")
+    update_task(task_id, status=TaskStatus.UPLOADED, input_path=input_path, params={"gate": str(gate)})
+    return task_id
+
+
+def submit(executor: JobExecutor, task_id: str, category: str = "document"):
+    task = get_task(task_id)
+    return executor.submit(
+        category, "test_gated_job", gated_job, task_id, Path(task["input_path"]),
+        task["original_filename"], task["params"],
+    )
+
+
+def wait_for(condition, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.05)
+
+
+@pytest.fixture
+def executor():
+    executor = JobExecutor({"document": 1}, queue_size=1)
+    yield executor
+    executor.shutdown()
+
+
+def test_unknown_module_and_category_fall_back_to_document(executor):
+    assert PROCESSOR_CATEGORIES["test_gated_job"] == "document"  # not in MODULE_CATEGORIES
+    assert executor._resolve_category("gpu") == "document"
+
+
+def test_updates_are_forwarded_queue_limits_and_queued_cancel(tmp_path, executor, monkeypatch):
+    gate = tmp_path / "gate"
+    running, queued, rejected = (new_task(tmp_path, name, gate) for name in ("running", "queued", "rejected"))
+
+    first = submit(executor, running, category="gpu")
+    # Progress set in the pool process reaches the parent's store
+    wait_for(lambda: get_task(running)["progress_percent"] == 50)
+    assert get_task(running)["metrics"]["stage"] == "half"
+
+    second = submit(executor, queued)
+    assert get_task(queued)["status"] == TaskStatus.QUEUED
+    assert executor.stats()["document"]["pending"] == 2
+
+    # One running + one waiting fills the category
+    with pytest.raises(QueueFullError) as full:
+        submit(executor, rejected)
+    assert full.value.retry_after >= core.settings.JOB_RETRY_AFTER_SECONDS
+
+    # ... and the API answers 429 with the hint
+    monkeypatch.setattr(core, "get_executor", lambda: executor)
+    monkeypatch.setattr(core.settings, "RESULT_CACHE_ENABLED", False)
+    app = FastAPI()
+    app.include_router(core.router)
+    response = TestClient(app).post(f"/start/{rejected}")
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) == full.value.retry_after
+
+    # Cancelled while waiting: the processor never starts
+    cancel_task(queued)
+    gate.touch()
+    first.result(timeout=30)
+    second.result(timeout=30)
+
+    wait_for(lambda: get_task(running)["status"] == TaskStatus.COMPLETE)
+    assert get_task(queued)["status"] == TaskStatus.CANCELLED
+    assert (tmp_path / "running.ran").exists() and not (tmp_path / "queued.ran").exists()
+    wait_for(lambda: executor.stats()["document"]["pending"] == 0)
@@ -0,0 +1,76 @@
+"""
+FFmpeg -progress parsing: percent, ETA, encode speed and throttling
+Run from backend/: python -m pytest tests/test_ffmpeg_progress.py
+"""
+
+from services.ffmpeg import ProgressTracker, parse_timestamp, parse_speed
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def progress_block(out_time_us: int, speed: str, state: str = "continue"):
+    return [
+        "frame=120\n",
+        f"out_time_us={out_time_us}\n",
+        f"out_time_ms={out_time_us}\n",
+        f"speed={speed}\n",
+        f"progress={state}\n",
+    ]
+
+
+def feed_block(tracker, lines):
+    updates = [tracker.feed(line) for line in lines]
+    return [u for u in updates if u is not None]
+
+
+def test_percent_eta_and_speed_from_progress_block():
+    clock = FakeClock()
+    tracker = ProgressTracker(duration=100.0, progress_range=(30, 90), clock=clock)
+
+    clock.now = 5.0
+    updates = feed_block(tracker, progress_block(50_000_000, "2.5x"))
+
+    assert updates == [{
+        "metrics": {"encode_speed": 2.5},
+        "progress_percent": 60,  # halfway through 30..90
+        "estimated_time_remaining": 20,  # 50 s of media left at 2.5x
+    }]
+
+
+def test_updates_are_throttled_but_end_always_emits():
+    clock = FakeClock()
+    tracker = ProgressTracker(duration=10.0, interval=1.0, clock=clock)
+
+    clock.now = 0.1
+    assert feed_block(tracker, progress_block(1_000_000, "1x"))
+    clock.now = 0.5
+    assert not feed_block(tracker, progress_block(2_000_000, "1x"))
+    clock.now = 0.6
+    final = feed_block(tracker, progress_block(10_000_000, "1x", state="end"))
+    assert final[0]["progress_percent"] == 90
+    assert final[0]["estimated_time_remaining"] == 0
+
+
+def test_unknown_duration_still_reports_speed():
+    clock = FakeClock()
+    tracker = ProgressTracker(duration=None, clock=clock)
+
+    clock.now = 4.0
+    updates = feed_block(tracker, progress_block(8_000_000, "N/A"))
+
+    # Falls back to media seconds per wall second
+    assert updates == [{"metrics": {"encode_speed": 2.0}}]
+
+
+def test_time_and_speed_parsing():
+    assert parse_timestamp("00:01:30.5") == 90.5
+    assert parse_timestamp("12") == 12.0
+    assert parse_timestamp("undefined") is None
+    assert parse_speed("1.37x") == 1.37
+    assert parse_speed("N/A") is None
@@ -0,0 +1,35 @@
+"""
+Frame sampler: N keyframes in one seek-per-point FFmpeg run, cached per
+content hash (stand-in ffmpeg/ffprobe)
+Run from backend/: python -m pytest tests/test_frame_sampler.py
+"""
+
+import asyncio
+
+from services import frame_sampler
+from services.frame_sampler import sample_keyframes, sample_times
+
+
+def test_sample_points_and_cache(tmp_path, monkeypatch, fake_tools):
+    log = fake_tools(
+        ffprobe="echo '{\"streams\":[{\"codec_type\":\"video\"}],\"format\":{\"duration\":\"60.0\"}}'\n",
+        ffmpeg="for arg; do case \"$arg\" in *.jpg) echo jpeg > \"$arg\" ;; esac; done\n",
+    )
+    monkeypatch.setattr(frame_sampler.settings, "TEMP_DIR", tmp_path)
+
+    assert sample_times(60.0, 3) == [10.0, 30.0, 50.0]
+    assert sample_times(None, 3) == [0.0]
+
+    source = tmp_path / "in.mp4"
+    source.write_bytes(b"video")
+    frames = asyncio.run(sample_keyframes(source, "ab" * 32, count=3, width=640))
+
+    assert len(frames) == 3
+    (command,) = log.read_text().splitlines()  # one FFmpeg run for all points
+    assert command.count("-skip_frame nokey -i") == 3
+    assert "-ss 10.0 " in command and "-ss 50.0 " in command
+    assert "-map 2:v:0 -frames:v 1" in command
+
+    # Same content again: served from the cache, FFmpeg not run
+    assert asyncio.run(sample_keyframes(source, "ab" * 32, count=3, width=640)) == frames
+    assert len(log.read_text().splitlines()) == 1
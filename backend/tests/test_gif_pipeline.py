@@ -0,0 +1,49 @@
+"""
+GIF pipeline: frames/palette cache per clip, no extra renders for full
+jobs, preview with a size estimate (stand-in ffmpeg)
+Run from backend/: python -m pytest tests/test_gif_pipeline.py
+"""
+
+import pytest
+
+from services import gif_pipeline
+from services.gif_pipeline import make_gif
+
+
+@pytest.fixture
+def ffmpeg_log(tmp_path, monkeypatch, fake_tools):
+    monkeypatch.setattr(gif_pipeline.settings, "TEMP_DIR", tmp_path)
+    return fake_tools(ffmpeg="for last; do :; done\necho data > \"$last\"\n")
+
+
+def test_retries_reuse_decoded_frames_and_palette(tmp_path, ffmpeg_log):
+    source = tmp_path / "in.mp4"
+    source.write_bytes(b"video")
+
+    first = make_gif(source, tmp_path / "a.gif", 15, 640, "2", "10")
+    assert not first["frames_cached"] and "estimated_size" not in first
+    # Decode, palette, render - no sample render for an estimate
+    decode, palettegen, render = ffmpeg_log.read_text().splitlines()
+    assert "-ss 2 -i" in decode and "fps=15,scale=640:-1:flags=lanczos" in decode
+    assert "palettegen" in palettegen and "paletteuse" in render
+
+    ffmpeg_log.write_text("")
+    second = make_gif(source, tmp_path / "b.gif", 15, 640, "2", "10")
+    assert second["frames_cached"] and second["palette_cached"]
+    assert not any("palettegen" in c or str(source) in c for c in ffmpeg_log.read_text().splitlines())
+
+    # Another width is decoded from the source (one lanczos pass, as in the single graph)
+    ffmpeg_log.write_text("")
+    make_gif(source, tmp_path / "c.gif", 15, 480, "2", "10")
+    decode = ffmpeg_log.read_text().splitlines()[0]
+    assert str(source) in decode and "fps=15,scale=480:-1:flags=lanczos" in decode
+
+
+def test_preview_is_small_and_estimates_the_full_render(tmp_path, ffmpeg_log):
+    source = tmp_path / "in.mp4"
+    source.write_bytes(b"video")
+
+    report = make_gif(source, tmp_path / "p.gif", 16, 640, preview=True)
+    assert (report["fps"], report["width"]) == (8, 320)
+    assert "fps=8,scale=320:-1" in ffmpeg_log.read_text().splitlines()[0]
+    assert report["estimated_size"] == (tmp_path / "p.gif").stat().st_size * 8
@@ -0,0 +1,70 @@
+"""
+Upload ingest: hash + MIME sniff while streaming, mid-stream size limit
+Run from backend/: python -m pytest tests/test_ingest.py
+"""
+
+import asyncio
+import hashlib
+import io
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from PIL import Image
+
+from services import ingest
+
+
+def make_upload(data: bytes, filename: str) -> UploadFile:
+    return UploadFile(file=io.BytesIO(data), filename=filename)
+
+
+def png_bytes() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), "red").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_record_has_size_digest_and_mime(tmp_path):
+    data = png_bytes()
+    destination = tmp_path / "upload.png"
+
+    record = asyncio.run(ingest.save_upload_file(make_upload(data, "a.png"), destination, "image"))
+
+    assert record.size == len(data)
+    assert record.sha256 == hashlib.sha256(data).hexdigest()
+    assert record.mime == "image/png"
+    assert destination.read_bytes() == data
+
+
+def test_size_limit_is_enforced_mid_stream(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, "max_upload_bytes", lambda category: 1024 * 1024)
+    destination = tmp_path / "big.mp4"
+    data = b"\x00" * (3 * 1024 * 1024)
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(ingest.save_upload_file(make_upload(data, "big.mp4"), destination, "video", validate=False))
+
+    assert error.value.status_code == 413
+    assert not destination.exists()
+
+
+def test_content_extension_mismatch_is_rejected(tmp_path):
+    destination = tmp_path / "fake.png"
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(ingest.save_upload_file(make_upload(b"%PDF-1.4\n%...", "fake.png"), destination, "image"))
+
+    assert error.value.status_code == 400
+    assert not destination.exists()
+
+
+def test_read_upload_enforces_the_limit_and_the_batch_budget(monkeypatch):
+    monkeypatch.setattr(ingest, "max_upload_bytes", lambda category: 1024 * 1024)
+    data = png_bytes()
+
+    assert asyncio.run(ingest.read_upload(make_upload(data, "a.png"), "image", budget=len(data))) == data
+    for upload, budget in ((make_upload(b"\x00" * (2 * 1024 * 1024), "big.png"), None),
+                           (make_upload(data, "a.png"), len(data) - 1)):
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(ingest.read_upload(upload, "image", budget))
+        assert error.value.status_code == 413
@@ -0,0 +1,64 @@
+"""
+Model pool: one shared load per model, preload by process, idle models
+evicted under memory pressure, stats published per process
+Run from backend/: python -m pytest tests/test_model_pool.py
+"""
+
+import os
+
+from services import model_pool
+from services.model_pool import ModelPool, collect_stats
+
+
+def make_pool(monkeypatch, tmp_path):
+    monkeypatch.setattr(model_pool.settings, "TEMP_DIR", tmp_path)
+    monkeypatch.setattr(model_pool.settings, "MODEL_MIN_FREE_MB", 1024)
+    monkeypatch.setattr(model_pool.settings, "MODEL_IDLE_SECONDS", 0)
+    loads = []
+    pool = ModelPool()
+    for name in ("ocr", "bg"):
+        pool.register(name, lambda name=name: loads.append(name) or object(),
+                      processes=("image", "api") if name == "bg" else ("image",))
+    return pool, loads
+
+
+def test_models_load_once_and_are_shared(tmp_path, monkeypatch):
+    pool, loads = make_pool(monkeypatch, tmp_path)
+    monkeypatch.setattr(model_pool, "available_memory", lambda: 8 * 1024 ** 3)
+
+    with pool.use("ocr") as first:
+        with pool.use("ocr") as second:
+            assert first is second
+    assert loads == ["ocr"]
+
+    assert pool.preload("api", names=["ocr", "bg", "missing"]) == ["bg"]
+    stats = pool.stats()["models"]
+    assert stats["ocr"]["uses"] == 2 and stats["ocr"]["in_use"] == 0
+    assert stats["bg"]["load_seconds"] >= 0
+
+    # Published for /metrics
+    (published,) = collect_stats()
+    assert published["pid"] == os.getpid() and set(published["models"]) == {"ocr", "bg"}
+
+
+def test_idle_models_evicted_under_memory_pressure(tmp_path, monkeypatch):
+    pool, loads = make_pool(monkeypatch, tmp_path)
+    free = [8 * 1024 ** 3]
+    monkeypatch.setattr(model_pool, "available_memory", lambda: free[0])
+
+    with pool.use("ocr"):
+        pass
+    with pool.use("bg"):
+        assert pool.evict_idle() == []  # plenty of memory
+
+        free[0] = 100 * 1024 ** 2
+        # "bg" is in use: only the idle one goes
+        assert pool.evict_idle() == ["ocr"]
+    assert pool.evict_idle() == ["bg"]
+    assert pool.stats()["evictions"] == 2
+
+    # Evicted models come back on demand
+    free[0] = 8 * 1024 ** 3
+    with pool.use("ocr"):
+        pass
+    assert loads == ["ocr", "bg", "ocr"]
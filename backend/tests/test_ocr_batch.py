@@ -0,0 +1,93 @@
+"""
+OCR pipeline: pages prepared in memory, same-sized pages recognized in
+one batched call, results handed out page by page (stand-in reader);
+the batch upload route dropping the whole task when one file is rejected
+Run from backend/: python -m pytest tests/test_ocr_batch.py
+"""
+
+import io
+from contextlib import contextmanager
+
+import numpy as np
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from routes import image
+from services import ocr_batch
+from services.ocr_batch import combined_text, run_ocr
+from services.tasks import get_task
+
+
+class FakeReader:
+    def __init__(self):
+        self.calls = []
+
+    def _lines(self, array):
+        box = [[0, 0], [10, 0], [10, 5], [0, 5]]
+        return [(box, f"{array.shape[1]}x{array.shape[0]}", np.float64(0.98765))]
+
+    def readtext(self, array, batch_size=1):
+        self.calls.append(("single", array.shape))
+        return self._lines(array)
+
+    def readtext_batched(self, arrays, batch_size=1):
+        self.calls.append(("batched", len(arrays)))
+        return [self._lines(array) for array in arrays]
+
+
+def test_batches_same_sized_pages_and_streams_results(tmp_path, monkeypatch):
+    reader = FakeReader()
+
+    @contextmanager
+    def fake_use_model(name):
+        yield reader
+
+    monkeypatch.setattr(ocr_batch, "use_model", fake_use_model)
+    monkeypatch.setattr(ocr_batch.settings, "OCR_BATCH_SIZE", 4)
+
+    sources = []
+    for i, (size, mode) in enumerate([((640, 480), "RGB"), ((640, 480), "L"), ((4000, 1000), "RGBA"),
+                                      ((640, 480), "RGB"), ((640, 480), "RGB")]):
+        path = tmp_path / f"scan_{i}.png"
+        Image.new(mode, size).save(path)
+        sources.append((path, path.name))
+
+    streamed = []
+    pages = run_ocr(sources, on_page=streamed.append)
+
+    # Batch of 4: three 640x480 pages in one call, the downscaled one alone; then the rest
+    assert reader.calls == [("batched", 3), ("single", (500, 2000, 3)), ("single", (480, 640, 3))]
+    assert streamed == pages
+    assert [page["page"] for page in pages] == [1, 2, 3, 4, 5]
+    assert pages[2]["text"] == "2000x500" and pages[2]["source"] == "scan_2.png"
+    assert pages[0]["lines"][0] == {"text": "640x480", "confidence": 0.988, "box": [[0, 0], [10, 0], [10, 5], [0, 5]]}
+
+    text = combined_text(pages)
+    assert text.startswith("=== Page 1 (scan_0.png) ===\n640x480")
+    assert combined_text(pages[:1]) == "640x480"
+
+
+def test_rejected_file_removes_the_half_uploaded_batch(monkeypatch):
+    created = []
+    original = image.create_task
+
+    def create_task(*args):
+        created.append(original(*args))
+        return created[-1]
+
+    monkeypatch.setattr(image, "create_task", create_task)
+    app = FastAPI()
+    app.include_router(image.router, prefix="/api/image")
+
+    png = io.BytesIO()
+    Image.new("RGB", (8, 8)).save(png, format="PNG")
+    response = TestClient(app).post("/api/image/ocr-batch", files=[
+        ("files", ("page1.png", png.getvalue(), "image/png")),
+        ("files", ("page2.png", b"%PDF-1.4\n", "image/png")),  # content doesn't match the extension
+    ])
+
+    assert response.status_code == 400
+    task_id, = created
+    assert get_task(task_id) is None
+    assert not list(image.settings.TEMP_DIR.glob(f"{task_id}_*"))
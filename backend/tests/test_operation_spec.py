@@ -0,0 +1,107 @@
+"""
+Operation specs: single-pass commands, chunk-safety rules, and a spec
+operation run through the cluster (stand-in ffmpeg/ffprobe and worker)
+Run from backend/: python -m pytest tests/test_operation_spec.py
+"""
+
+import json
+import asyncio
+
+import httpx
+
+from services.operation_spec import (
+    OperationSpec, chain_blocker, rotate_spec, speed_spec, mute_spec, gif_spec, add_music_spec,
+)
+
+
+def test_local_commands_match_single_pass_processors():
+    assert rotate_spec("270", "mp4").local_args("in.mp4", "out.mp4") == [
+        "-i", "in.mp4", "-vf", "transpose=2", "-c:a", "copy", "out.mp4",
+    ]
+    assert speed_spec(4.0, True, "mp4").local_args("in.mp4", "out.mp4") == [
+        "-i", "in.mp4", "-vf", "setpts=0.25*PTS", "-an", "out.mp4",
+    ]
+    assert gif_spec(15, 640, "5", "3").local_args("in.mp4", "out.gif") == [
+        "-ss", "5", "-i", "in.mp4", "-t", "3", "-filter_complex",
+        "fps=15,scale=640:-1:flags=lanczos,split[s0][s1];"
+        "[s0]palettegen=max_colors=256:stats_mode=full[p];[s1][p]paletteuse=dither=floyd_steinberg",
+        "out.gif",
+    ]
+    assert add_music_spec("music.mp3", False, 0.5).local_args("in.mp4", "out.mp4") == [
+        "-i", "in.mp4", "-i", "music.mp3", "-c:v", "copy", "-filter_complex",
+        "[1:a]volume=0.5[a1];[0:a][a1]amix=inputs=2:duration=first", "-shortest", "out.mp4",
+    ]
+
+
+def test_chunk_safety_rules():
+    assert rotate_spec("90", "mp4").chunk_blocker() is None
+    assert speed_spec(1.5, True, "mp4").chunk_blocker() is None
+    assert gif_spec(15, 640).chunk_blocker() is None  # palette runs after the join
+    assert "stream-copied" in mute_spec("mp4").chunk_blocker()
+    assert "stream-copied" in add_music_spec("m.mp3", True, 1.0).chunk_blocker()
+    assert "trimmed" in gif_spec(15, 640, start_time="2").chunk_blocker()
+
+    assert chain_blocker("scale=-2:720,setpts=PTS-STARTPTS,fps=30") is None
+    assert "not linear" in chain_blocker("setpts=N/FRAME_RATE/TB")
+    assert "whole stream" in chain_blocker("reverse")
+    assert "simple chain" in chain_blocker("split[a][b]")
+
+    spec = speed_spec(1.5, True, "mp4")
+    assert OperationSpec.from_dict(json.loads(spec.to_json())) == spec
+
+
+def test_spec_operation_runs_video_on_workers_and_audio_once(tmp_path, fake_tools):
+    from services.cluster import ClusterOrchestrator
+
+    log = fake_tools(
+        ffprobe=(
+            "case \"$*\" in *packet=*) for t in 0 10 20 30 40 50; do echo \"$t.000000,1000,K_\"; done ;;\n"
+            "*) echo '{\"streams\":[{\"codec_type\":\"video\"},{\"codec_type\":\"audio\"}],"
+            "\"format\":{\"duration\":\"60.0\"}}' ;; esac\n"
+        ),
+        ffmpeg=(
+            "case \"$*\" in *segment*)\n"
+            f"  for i in 0 1 2; do echo data > {tmp_path}/job_chunk_00$i.mp4; "
+            "echo \"job_chunk_00$i.mp4,$((i * 20)).000000,$((i * 20 + 20)).000000\"; done ;;\n"
+            "*) for last; do :; done; echo encoded > \"$last\" ;; esac\n"
+        ),
+    )
+
+    specs_sent = []
+
+    async def handler(request: httpx.Request):
+        if request.url.path == "/health":
+            return httpx.Response(200, json={"status": "healthy"})
+        if request.url.path == "/jobs":
+            body = (await request.aread()).decode(errors="replace")
+            specs_sent.append(body.split('name="spec"\r\n\r\n')[1].split("\r\n")[0])
+            return httpx.Response(202, json={"status": "queued", "stream_url": request.url.path + "/x/stream"})
+        if request.url.path.endswith("/stream"):
+            return httpx.Response(200, content=b"chunk")
+        return httpx.Response(200, json={"status": "complete", "output_size": 5})
+
+    source = tmp_path / "in.mp4"
+    source.write_bytes(b"video")
+    orchestrator = ClusterOrchestrator(worker_urls=["http://w1"], temp_dir=tmp_path)
+    orchestrator.transport.http_transport = httpx.MockTransport(handler)
+
+    async def scenario():
+        try:
+            return await orchestrator.process_distributed(source, task_id="job", spec=speed_spec(1.5, True, "mp4"))
+        finally:
+            await orchestrator.transport.aclose()
+
+    result = asyncio.run(scenario())
+
+    assert result["success"], result
+    assert json.loads(specs_sent[0]) == {"name": "speed", "video_filter": "setpts=0.6666666666666666*PTS",
+                                         "video_codec": []}
+    commands = log.read_text().splitlines()
+    split, audio, merge = (
+        next(c for c in commands if "segment" in c),
+        next(c for c in commands if "atempo" in c),
+        commands[-1],
+    )
+    assert "0:a:0" not in split  # chunks carry video only
+    assert "-vn -af atempo=1.5 -c:a aac" in audio
+    assert "-f concat" in merge and "job_audio.mka" in merge and "-c copy" in merge
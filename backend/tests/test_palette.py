@@ -0,0 +1,67 @@
+"""
+Color palette engine: dominant colors and shares, near-white/black
+weighting, transparency
+Run from backend/: python -m pytest tests/test_palette.py
+"""
+
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from services.palette import PaletteError, extract_palette
+
+
+def blocks(fills, mode="RGB", size=(400, 100)):
+    """Vertical stripes: [(color, share of width)]"""
+    array = np.zeros((size[1], size[0], len(mode)), dtype=np.uint8)
+    x = 0
+    for color, share in fills:
+        width = int(size[0] * share)
+        array[:, x:x + width] = color
+        x += width
+    return Image.fromarray(array, mode)
+
+
+def test_dominant_colors_and_shares():
+    image = blocks([((200, 30, 30), 0.5), ((30, 30, 200), 0.3), ((40, 160, 60), 0.2)])
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+
+    colors = extract_palette(buffer.getvalue(), num_colors=3)
+
+    assert [c["hex"] for c in colors] == ["#c81e1e", "#1e1ec8", "#28a03c"]
+    assert [c["percentage"] for c in colors] == [50.0, 30.0, 20.0]
+    # Asking for more colors than the image has returns what is there
+    assert len(extract_palette(image, num_colors=8)) == 3
+
+
+def test_ignore_extremes_and_transparency():
+    image = blocks([((255, 255, 255), 0.6), ((5, 5, 5), 0.2), ((220, 120, 20), 0.2)])
+    assert extract_palette(image, 2)[0]["hex"] == "#ffffff"
+
+    (only,) = extract_palette(image, 2, weighting="ignore_extremes")
+    assert only["hex"] == "#dc7814" and only["percentage"] == 100.0
+
+    # Fully transparent pixels don't count
+    rgba = blocks([((255, 0, 0, 0), 0.7), ((0, 0, 255, 255), 0.3)], mode="RGBA")
+    assert extract_palette(rgba, 2) == [{"hex": "#0000ff", "rgb": {"r": 0, "g": 0, "b": 255}, "percentage": 100.0}]
+
+    with pytest.raises(PaletteError):
+        extract_palette(image, 2, weighting="vivid")
+
+
+def test_clusters_a_photo_like_image_deterministically():
+    rng = np.random.default_rng(1)
+    noisy = np.clip(
+        np.asarray(blocks([((180, 60, 60), 0.5), ((60, 60, 180), 0.5)]), dtype=np.float32)
+        + rng.normal(0, 20, (100, 400, 3)), 0, 255,
+    ).astype(np.uint8)
+    image = Image.fromarray(noisy)
+
+    colors = extract_palette(image, 2)
+    assert colors == extract_palette(image, 2)
+    centers = sorted((c["rgb"]["r"], c["rgb"]["b"]) for c in colors)
+    assert abs(centers[0][0] - 60) < 8 and abs(centers[0][1] - 180) < 8
+    assert abs(centers[1][0] - 180) < 8 and abs(centers[1][1] - 60) < 8
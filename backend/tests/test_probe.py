@@ -0,0 +1,68 @@
+"""
+Probe service: ffprobe JSON parsing and the (path, mtime, size) LRU
+Run from backend/: python -m pytest tests/test_probe.py
+"""
+
+import asyncio
+
+from services.probe import MediaInfo, ProbeCache, probe_media, probe_duration
+
+FFPROBE_OUTPUT = """{
+  "streams": [
+    {"index": 0, "codec_type": "video", "codec_name": "h264", "width": 1920, "height": 1080,
+     "r_frame_rate": "30000/1001", "avg_frame_rate": "0/0", "display_aspect_ratio": "16:9"},
+    {"index": 1, "codec_type": "audio", "codec_name": "aac", "sample_rate": "48000", "channels": 2}
+  ],
+  "format": {"format_name": "mov,mp4,m4a,3gp,3g2,mj2", "duration": "12.500000",
+             "size": "1048576", "bit_rate": "671088", "tags": {"title": "clip"}}
+}"""
+
+
+def test_media_info_parsing():
+    import json
+
+    info = MediaInfo.from_ffprobe("clip.mp4", json.loads(FFPROBE_OUTPUT))
+
+    assert info.duration == 12.5
+    assert info.size == 1048576
+    assert info.video.width == 1920
+    assert round(info.video.fps, 2) == 29.97
+    assert info.video.avg_fps is None
+    assert info.audio.sample_rate == 48000
+    assert info.has_audio and info.has_video
+    assert info.tags == {"title": "clip"}
+    assert not hasattr(info, "__dict__")
+
+
+def test_lru_eviction():
+    cache = ProbeCache(max_entries=2)
+    cache.put(("a", 1, 1), "A")
+    cache.put(("b", 1, 1), "B")
+    assert cache.get(("a", 1, 1)) == "A"  # a is now most recent
+    cache.put(("c", 1, 1), "C")
+
+    assert cache.get(("b", 1, 1)) is None
+    assert cache.get(("a", 1, 1)) == "A"
+
+
+def test_probe_runs_once_per_file_version(tmp_path, fake_tools):
+    calls = fake_tools(ffprobe=f"cat <<'EOF'\n{FFPROBE_OUTPUT}\nEOF\n").with_name("ffprobe.log")
+
+    media = tmp_path / "clip.mp4"
+    media.write_bytes(b"one")
+
+    async def scenario():
+        # Concurrent callers share one ffprobe process, later ones hit the cache
+        first = await asyncio.gather(*(probe_media(media) for _ in range(3)))
+        duration = await probe_duration(media)
+        return first, duration
+
+    infos, duration = asyncio.run(scenario())
+    assert duration == 12.5
+    assert infos[0] is infos[1] is infos[2]
+    assert len(calls.read_text().splitlines()) == 1
+
+    # New contents -> new size/mtime -> new probe
+    media.write_bytes(b"changed")
+    asyncio.run(probe_media(media))
+    assert len(calls.read_text().splitlines()) == 2
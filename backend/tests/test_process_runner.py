@@ -0,0 +1,54 @@
+"""
+Async process runner: stderr ring buffer, timeout group kill, task cancellation
+Run from backend/: python -m pytest tests/test_process_runner.py
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from services.process_runner import run_process, run_process_sync
+from services.tasks import create_task, cancel_task, delete_task
+
+
+def test_stdout_and_stderr_tail():
+    result = run_process_sync(
+        ["sh", "-c", "echo out; for i in 1 2 3 4 5; do echo err$i >&2; done"],
+        stderr_lines=2,
+    )
+    assert result.ok
+    assert result.text == "out\n"
+    assert result.stderr == "err4\nerr5\n"
+
+
+def test_timeout_kills_whole_process_group():
+    started = time.monotonic()
+    # The background sleep keeps stdout open - only a group kill ends the run
+    result = run_process_sync(["sh", "-c", "sleep 30 & sleep 30"], timeout=0.5)
+
+    assert result.timed_out
+    assert not result.ok
+    assert time.monotonic() - started < 10
+
+
+def test_cancel_task_stops_running_process():
+    task_id = create_task("clip.mp4", "video_convert")
+
+    async def scenario():
+        run = asyncio.create_task(run_process(["sleep", "30"], task_id=task_id))
+        await asyncio.sleep(0.3)
+        cancel_task(task_id)
+        return await asyncio.wait_for(run, timeout=10)
+
+    try:
+        result = asyncio.run(scenario())
+        assert result.cancelled
+        assert result.error == "Task cancelled"
+    finally:
+        delete_task(task_id)
+
+
+def test_missing_executable_raises():
+    with pytest.raises(FileNotFoundError):
+        run_process_sync(["magetool-definitely-not-installed"])
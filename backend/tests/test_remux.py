@@ -0,0 +1,145 @@
+"""
+Stream-copy fast paths: codec/container matrix, audio copy, smart-cut
+planning and the smart-cut commands (stand-in ffmpeg/ffprobe)
+Run from backend/: python -m pytest tests/test_remux.py
+"""
+
+from pathlib import Path
+
+from services.probe import MediaInfo
+from services.remux import copy_blocker, audio_copy_allowed, plan_smart_cut, edge_encoder_args, smart_trim
+
+
+def media(video=None, audio=None, audio_bit_rate=None):
+    streams = []
+    if video:
+        streams.append({"index": 0, "codec_type": "video", "codec_name": video})
+    if audio:
+        streams.append({"index": 1, "codec_type": "audio", "codec_name": audio, "bit_rate": audio_bit_rate})
+    return MediaInfo.from_ffprobe(Path("in"), {"streams": streams, "format": {"duration": "30"}})
+
+
+def test_codec_matrix():
+    assert copy_blocker(media("h264", "aac"), "mkv") is None
+    assert copy_blocker(media("h264", "aac"), "mov") is None
+    assert "video codec h264" in copy_blocker(media("h264", "aac"), "webm")
+    assert "audio codec vorbis" in copy_blocker(media("vp9", "vorbis"), "mp4")
+    assert copy_blocker(media("vp9", "opus"), "webm") is None
+
+    assert audio_copy_allowed(media("h264", "aac", "128000"), "m4a", "192k")
+    assert not audio_copy_allowed(media("h264", "aac", "320000"), "m4a", "192k")  # asked for less
+    assert not audio_copy_allowed(media("h264", "aac"), "wav")
+    assert not audio_copy_allowed(media("h264"), "mp3")
+
+
+def test_smart_cut_plan():
+    keyframes = [0.0, 2.0, 4.0, 6.0, 8.0]
+    assert plan_smart_cut(1.0, 7.5, keyframes) == [("encode", 1.0, 2.0), ("copy", 2.0, 6.0), ("encode", 6.0, 7.5)]
+    assert plan_smart_cut(2.02, 6.0, keyframes) == [("copy", 2.0, 6.0)]
+    assert plan_smart_cut(2.5, 3.5, keyframes) == [("encode", 2.5, 3.5)]
+
+    # Below the cut only within tolerance, and then the closest keyframe
+    assert plan_smart_cut(2.0, 6.0, [1.96, 1.98, 4.0, 6.0])[0] == ("copy", 1.98, 6.0)
+    assert plan_smart_cut(2.0, 6.0, [1.9, 4.0, 6.0]) == [("encode", 2.0, 4.0), ("copy", 4.0, 6.0)]
+
+
+def test_edge_encoder_args_follow_the_source_profile():
+    def video(codec, profile=None, level=None):
+        stream = {"index": 0, "codec_type": "video", "codec_name": codec, "profile": profile, "level": level}
+        return MediaInfo.from_ffprobe(Path("in"), {"streams": [stream]}).video
+
+    assert edge_encoder_args(video("h264", "High", 40), "mp4") == ["-profile:v", "high", "-level", "4.0"]
+    assert edge_encoder_args(video("hevc", "Main 10", 123), "mov") == [
+        "-profile:v", "main10", "-x265-params", "level-idc=4.1",
+    ]
+    assert edge_encoder_args(video("h264", "Main", -99), "mkv") == ["-profile:v", "main"]
+    # Unknown profile: fine in MKV (in-band parameter sets), not in MP4/MOV
+    assert edge_encoder_args(video("h264"), "mkv") == []
+    assert edge_encoder_args(video("h264", "Extended", 30), "mp4") is None
+
+
+def smart_cut_tools(fake_tools, codec="h264", start_time=0.0, encoders="libx264 libx265", profile="High"):
+    """Stand-ins for a 10s clip with keyframes every 2s from `start_time`"""
+    keyframes = " ".join(f"{start_time + t:.6f}" for t in (0, 2, 4, 6, 8))
+    return fake_tools(
+        ffprobe=(
+            f"case \"$*\" in *packet=*) for t in {keyframes}; do echo \"$t,100,K_\"; done ;;\n"
+            f"*) echo '{{\"streams\":[{{\"index\":0,\"codec_type\":\"video\",\"codec_name\":\"{codec}\",\"pix_fmt\":\"yuv420p\","
+            f"\"profile\":\"{profile}\",\"level\":40}},"
+            "{\"index\":1,\"codec_type\":\"audio\",\"codec_name\":\"aac\"}],"
+            f"\"format\":{{\"duration\":\"10.0\",\"start_time\":\"{start_time}\"}}}}' ;; esac\n"
+        ),
+        ffmpeg=(
+            f"case \"$*\" in *-encoders*) for e in {encoders}; do echo \" V..... $e\"; done; exit 0 ;; esac\n"
+            "for last; do :; done\necho data > \"$last\"\n"
+        ),
+    )
+
+
+def encodes(log):
+    return [line for line in log.read_text().splitlines() if "-encoders" not in line]
+
+
+def test_smart_trim_copies_the_middle(tmp_path, fake_tools):
+    log = smart_cut_tools(fake_tools)
+
+    source = tmp_path / "in.mp4"
+    source.write_bytes(b"video")
+    assert smart_trim(source, tmp_path / "out.mp4", "00:00:01", "7.5", task_id="cut") == (True, "")
+
+    head, middle, tail, join = encodes(log)
+    assert "-ss 1.000000" in head and "-t 1.000000" in head and "-c:v libx264" in head and "-pix_fmt yuv420p" in head
+    assert "-profile:v high -level 4.0" in head
+    assert "-ss 2.000000" in middle and "-c:v copy -bsf:v h264_mp4toannexb" in middle
+    assert "-ss 6.000000" in tail and "-t 1.500000" in tail and "-c:v libx264" in tail
+    assert "-f concat" in join and "-ss 1.000000" in join and "-map 1:a -c copy" in join
+
+
+def test_smart_trim_keyframes_are_relative_to_the_container_start(tmp_path, fake_tools):
+    # MPEG-TS style offset: first packet at 1.4s, -ss 0 is still the first frame
+    log = smart_cut_tools(fake_tools, start_time=1.4)
+
+    source = tmp_path / "in.mp4"
+    source.write_bytes(b"video")
+    assert smart_trim(source, tmp_path / "out.mp4", "1", "7.5", task_id="cut") == (True, "")
+
+    head, middle, tail, _ = encodes(log)
+    assert "-ss 1.000000" in head and "-t 1.000000" in head
+    assert "-ss 2.000000" in middle and "-t 4.000000" in middle
+    assert "-ss 6.000000" in tail and "-t 1.500000" in tail
+
+
+def test_smart_trim_falls_back_without_the_encoder(tmp_path, fake_tools):
+    log = smart_cut_tools(fake_tools, codec="hevc", encoders="libx264")
+
+    source = tmp_path / "in.mp4"
+    source.write_bytes(b"video")
+    assert smart_trim(source, tmp_path / "out.mp4", "1", "7.5", task_id="cut") is None
+    assert encodes(log) == []
+
+
+def test_smart_trim_audio_starts_with_the_snapped_cut(tmp_path, fake_tools):
+    log = smart_cut_tools(fake_tools)
+
+    source = tmp_path / "in.mp4"
+    source.write_bytes(b"video")
+    # 1.97 is on the 2.0 keyframe: no head, and the audio starts there too
+    assert smart_trim(source, tmp_path / "out.mp4", "1.97", "7.5", task_id="cut") == (True, "")
+
+    middle, tail, join = encodes(log)
+    assert "-ss 2.000000" in middle and "-c:v copy" in middle
+    assert "-ss 2.000000" in join and "-t 5.500000" in join
+
+
+def test_smart_trim_mp4_needs_a_matching_profile(tmp_path, fake_tools):
+    log = smart_cut_tools(fake_tools, profile="Extended")
+
+    source = tmp_path / "in.mp4"
+    source.write_bytes(b"video")
+    assert smart_trim(source, tmp_path / "out.mp4", "1", "7.5", task_id="cut") is None
+    assert encodes(log) == []
+
+    # MKV keeps the parameter sets of every piece: smart cut with encoder defaults
+    assert smart_trim(source, tmp_path / "out.mkv", "1", "7.5", task_id="cut") == (True, "")
+    head = encodes(log)[0]
+    assert "-c:v libx264" in head and "-profile:v" not in head
@@ -0,0 +1,74 @@
+"""
+Result cache: key normalization, hardlinked hits, LRU eviction by size
+Run from backend/: python -m pytest tests/test_result_cache.py
+"""
+
+import os
+import time
+
+from services.result_cache import ResultCache, cache_key, rename_output
+
+
+def test_key_ignores_unset_values_and_number_formatting():
+    digest = "ab" * 32
+    assert cache_key(digest, "video_compress", {"quality": "high", "start_time": "undefined"}) == \
+        cache_key(digest, "video_compress", {"quality": "high "})
+    assert cache_key(digest, "video_speed", {"speed_factor": 2.0}) == \
+        cache_key(digest, "video_speed", {"speed_factor": 2})
+    assert cache_key(digest, "video_compress", {"quality": "high"}) != \
+        cache_key(digest, "video_compress", {"quality": "low"})
+
+
+def test_extra_input_files_are_keyed_by_content(tmp_path):
+    first, second = tmp_path / "a.mp3", tmp_path / "b.mp3"
+    first.write_bytes(b"same audio")
+    second.write_bytes(b"same audio")
+    digest = "cd" * 32
+
+    assert cache_key(digest, "add_music", {"audio_path": str(first)}) == \
+        cache_key(digest, "add_music", {"audio_path": str(second)})
+
+    # ocr-batch: [[path, original filename], ...] - content and name count, the temp path doesn't
+    assert cache_key(digest, "ocr_batch", {"inputs": [[str(first), "scan.png"]]}) == \
+        cache_key(digest, "ocr_batch", {"inputs": [[str(second), "scan.png"]]})
+    assert cache_key(digest, "ocr_batch", {"inputs": [[str(first), "scan.png"]]}) != \
+        cache_key(digest, "ocr_batch", {"inputs": [[str(first), "other.png"]]})
+
+
+def test_hit_is_a_hardlink(tmp_path):
+    cache = ResultCache(root=tmp_path / "cache", max_bytes=1024)
+    output = tmp_path / "out.pdf"
+    output.write_bytes(b"x" * 100)
+
+    assert cache.put("k1", output, {"output_filename": "report_compressed.pdf"})
+    linked = tmp_path / "copy.pdf"
+    meta = cache.get("k1", linked)
+
+    assert meta["output_filename"] == "report_compressed.pdf"
+    assert os.path.samefile(linked, output)
+    assert cache.get("missing", tmp_path / "none") is None
+
+
+def test_lru_eviction_by_size(tmp_path):
+    cache = ResultCache(root=tmp_path / "cache", max_bytes=250)
+    for name in ("a", "b"):
+        path = tmp_path / name
+        path.write_bytes(b"x" * 100)
+        cache.put(name, path, {})
+        time.sleep(0.01)
+
+    # Touch "a" so "b" becomes the least recently used
+    cache.get("a", tmp_path / "a_hit")
+    time.sleep(0.01)
+    third = tmp_path / "c"
+    third.write_bytes(b"x" * 100)
+    cache.put("c", third, {})
+
+    assert cache.get("b", tmp_path / "b_hit") is None
+    assert cache.get("a", tmp_path / "a_hit2") is not None
+    assert cache.get("c", tmp_path / "c_hit") is not None
+
+
+def test_rename_output_follows_new_upload_name():
+    assert rename_output("report_compressed.pdf", "report.pdf", "invoice.pdf") == "invoice_compressed.pdf"
+    assert rename_output("collage_3_images.jpg", "a.jpg", "b.jpg") == "collage_3_images.jpg"
@@ -0,0 +1,104 @@
+"""
+Target-size compression: bitrate planning, overshoot correction and
+pass-1 stats reuse (stand-in ffmpeg/ffprobe)
+Run from backend/: python -m pytest tests/test_target_size.py
+"""
+
+from pathlib import Path
+
+import pytest
+
+from services import target_size
+from services.target_size import plan_bitrates, encode_to_size, TargetSizeError
+
+
+def test_bitrate_plan_fits_the_budget():
+    video, audio = plan_bitrates(25 * 1024 * 1024, 120, has_audio=True)
+    assert audio == 128
+    assert (video + audio) * 1000 * 120 / 8 <= 25 * 1024 * 1024
+
+    # Tight budget: audio drops to 64k before video gets starved
+    assert plan_bitrates(1_000_000, 20, has_audio=True)[1] == 64
+
+    with pytest.raises(TargetSizeError, match="at least"):
+        plan_bitrates(100_000, 600, has_audio=False)
+
+
+def test_second_pass_retries_and_first_pass_is_reused(tmp_path, monkeypatch, fake_tools):
+    log = fake_tools(
+        ffprobe="echo '{\"streams\":[{\"codec_type\":\"video\"}],\"format\":{\"duration\":\"10.0\"}}'\n",
+        # Pass 1 writes the stats; pass 2 overshoots its bitrate by 4%
+        ffmpeg=(
+            "prev=''\n"
+            "for arg; do case \"$prev\" in -passlogfile) logfile=$arg ;; -b:v) kbps=${arg%k} ;; esac; "
+            "prev=$arg; last=$arg; done\n"
+            "case \"$*\" in *'-pass 1'*) touch \"$logfile-0.log\" \"$logfile-0.log.mbtree\" ;;\n"
+            "*) head -c $((kbps * 1300)) /dev/zero > \"$last\" ;; esac\n"
+        ),
+    )
+    monkeypatch.setattr(target_size.settings, "TEMP_DIR", tmp_path)
+
+    source = tmp_path / "in.mp4"
+    source.write_bytes(b"video")
+    first = encode_to_size(source, tmp_path / "out1.mp4", 1_000_000)
+
+    assert first["achieved_size"] <= 1_000_000
+    assert first["second_passes"] == 2 and not first["first_pass_reused"]
+    assert (tmp_path / f"passlog_{target_size.hash_file(source)[:32]}_medium-0.log").exists()
+
+    second = encode_to_size(source, tmp_path / "out2.mp4", 2_000_000)
+    assert second["first_pass_reused"] and second["achieved_size"] <= 2_000_000
+    assert sum("-pass 1" in line for line in log.read_text().splitlines()) == 1
+
+
+def test_target_never_met_fails_and_drops_the_output(tmp_path, monkeypatch, fake_tools):
+    log = fake_tools(
+        ffprobe="echo '{\"streams\":[{\"codec_type\":\"video\"}],\"format\":{\"duration\":\"10.0\"}}'\n",
+        # Every pass 2 comes out at twice the budget, whatever the bitrate
+        ffmpeg=(
+            "for arg; do last=$arg; done\n"
+            "case \"$*\" in *'-pass 1'*) ;; *) head -c 2000000 /dev/zero > \"$last\" ;; esac\n"
+        ),
+    )
+    monkeypatch.setattr(target_size.settings, "TEMP_DIR", tmp_path)
+
+    source = tmp_path / "in.mp4"
+    source.write_bytes(b"video")
+    with pytest.raises(TargetSizeError, match=r"1\.0 MB .*last attempt: 1\.9 MB"):
+        encode_to_size(source, tmp_path / "out.mp4", 1_000_000)
+
+    assert not (tmp_path / "out.mp4").exists()
+    second_passes = [line for line in log.read_text().splitlines() if "-pass 2" in line]
+    assert 1 <= len(second_passes) <= target_size.MAX_SECOND_PASSES
+
+
+def test_first_pass_is_not_published_while_another_request_publishes(tmp_path, monkeypatch, fake_tools):
+    log = fake_tools(
+        ffprobe="echo '{\"streams\":[{\"codec_type\":\"video\"}],\"format\":{\"duration\":\"10.0\"}}'\n",
+        ffmpeg=(
+            "prev=''\n"
+            "for arg; do case \"$prev\" in -passlogfile) logfile=$arg ;; esac; prev=$arg; last=$arg; done\n"
+            "case \"$*\" in *'-pass 1'*) echo mine > \"$logfile-0.log\"; echo mine > \"$logfile-0.log.mbtree\" ;;\n"
+            "*) head -c 1000 /dev/zero > \"$last\" ;; esac\n"
+        ),
+    )
+    monkeypatch.setattr(target_size.settings, "TEMP_DIR", tmp_path)
+
+    source = tmp_path / "in.mp4"
+    source.write_bytes(b"video")
+    prefix = target_size.passlog_prefix(target_size.hash_file(source), "medium")
+    lock = tmp_path / f"{prefix.name}.lock"
+    lock.touch()
+
+    # Pass 2 runs on this request's own pair; the shared prefix stays untouched
+    encode_to_size(source, tmp_path / "out.mp4", 1_000_000, task_id="t1")
+    second_pass = next(line for line in log.read_text().splitlines() if "-pass 2" in line)
+    assert f"-passlogfile {prefix}_t1 " in second_pass
+    assert not any(prefix.parent.glob(f"{prefix.name}-0.log*"))
+    assert lock.exists()
+
+    # Lock free: the pair is published for the next request
+    lock.unlink()
+    encode_to_size(source, tmp_path / "out.mp4", 1_000_000, task_id="t2")
+    assert Path(f"{prefix}-0.log").exists() and Path(f"{prefix}-0.log.mbtree").exists()
+    assert not lock.exists()
@@ -0,0 +1,88 @@
+"""
+Task store backends: SQLite sharing + progress write coalescing
+Run from backend/: python -m pytest tests/test_task_store.py
+"""
+
+import time
+
+from services.task_store import SQLiteTaskStore, MemoryTaskStore
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    db_path = tmp_path / "tasks.db"
+    writer = SQLiteTaskStore(db_path, flush_interval_ms=50)
+    reader = SQLiteTaskStore(db_path, flush_interval_ms=50)
+
+    writer.put("abc", {"task_id": "abc", "status": "processing", "progress_percent": 10})
+    assert reader.get("abc")["progress_percent"] == 10
+
+    assert writer.delete("abc")
+    assert reader.get("abc") is None
+
+
+def test_progress_writes_are_coalesced(tmp_path):
+    db_path = tmp_path / "tasks.db"
+    writer = SQLiteTaskStore(db_path, flush_interval_ms=200)
+    reader = SQLiteTaskStore(db_path, flush_interval_ms=200)
+
+    writer.put("abc", {"task_id": "abc", "status": "processing", "progress_percent": 10})
+    for percent in range(11, 60):
+        writer.put("abc", {"task_id": "abc", "status": "processing", "progress_percent": percent}, coalesce=True)
+
+    # Writer sees its own buffered state, other processes see the last flushed one
+    assert writer.get("abc")["progress_percent"] == 59
+    assert reader.get("abc")["progress_percent"] == 10
+
+    time.sleep(0.5)
+    assert reader.get("abc")["progress_percent"] == 59
+
+
+def test_status_write_supersedes_buffered_progress(tmp_path):
+    store = SQLiteTaskStore(tmp_path / "tasks.db", flush_interval_ms=200)
+
+    store.put("abc", {"task_id": "abc", "status": "processing", "progress_percent": 10})
+    store.put("abc", {"task_id": "abc", "status": "processing", "progress_percent": 80}, coalesce=True)
+    store.put("abc", {"task_id": "abc", "status": "complete", "progress_percent": 100})
+
+    time.sleep(0.5)  # a late flush must not resurrect the stale progress
+    assert store.get("abc")["status"] == "complete"
+    assert store.get("abc")["progress_percent"] == 100
+
+
+def test_buffered_progress_never_overwrites_another_process_status(tmp_path):
+    db_path = tmp_path / "tasks.db"
+    job = SQLiteTaskStore(db_path, flush_interval_ms=100)  # pool process
+    api = SQLiteTaskStore(db_path, flush_interval_ms=100)  # API process
+
+    job.put("abc", {"task_id": "abc", "status": "processing", "progress_percent": 10, "metrics": {"a": 1}})
+    job.put("abc", {"task_id": "abc", "status": "processing", "progress_percent": 20,
+                    "metrics": {"a": 1, "speed": 2.0}}, coalesce=True)
+    api.put("abc", {"task_id": "abc", "status": "cancelled", "progress_percent": 10, "metrics": {"a": 1}})
+
+    time.sleep(0.3)
+    task = api.get("abc")
+    assert task["status"] == "cancelled" and task["progress_percent"] == 10
+    assert job.get("abc")["status"] == "cancelled"
+
+    # Still running: progress is merged into the row, fields written meanwhile are kept
+    job.put("def", {"task_id": "def", "status": "processing", "progress_percent": 0, "metrics": {"a": 1}})
+    api.put("def", {"task_id": "def", "status": "processing", "progress_percent": 0,
+                    "output_filename": "x.mp4", "metrics": {"a": 1}})
+    job.put("def", {"task_id": "def", "status": "processing", "progress_percent": 40,
+                    "metrics": {"a": 1, "b": 2}}, coalesce=True)
+    assert job.get("def")["output_filename"] == "x.mp4"  # own buffered view over the current row
+
+    time.sleep(0.3)
+    task = api.get("def")
+    assert task["output_filename"] == "x.mp4"
+    assert task["progress_percent"] == 40 and task["metrics"] == {"a": 1, "b": 2}
+
+def test_memory_store_prune():
+    store = MemoryTaskStore()
+    store.put("old", {"task_id": "old"})
+    store.put("new", {"task_id": "new"})
+    store._touched["old"] -= 3600
+
+    assert store.prune(600) == 1
+    assert store.get("old") is None
+    assert store.get("new") is not None
@@ -0,0 +1,46 @@
+"""
+Tiled upscaling: blended tiles match a whole-image pass, tile size
+follows the memory budget (stand-in network)
+Run from backend/: python -m pytest tests/test_upscaler.py
+"""
+
+import numpy as np
+
+from services import upscaler
+from services.upscaler import PeakRss, choose_tile_size, upscale_tiled
+
+
+def nearest(scale):
+    return lambda tile: np.repeat(np.repeat(tile, scale, axis=0), scale, axis=1)
+
+
+def test_tiles_blend_back_to_whole_image():
+    image = np.random.default_rng(0).random((70, 53, 3), dtype=np.float32)
+    progress = []
+
+    tiled = upscale_tiled(image, nearest(2), 2, tile=24, overlap=4, workers=3,
+                          on_progress=progress.append)
+
+    np.testing.assert_allclose(tiled, nearest(2)(image), atol=1e-5)
+    assert len(progress) == 9 and progress[-1] == 1.0
+
+
+def test_tile_size_follows_memory(monkeypatch):
+    monkeypatch.setattr(upscaler.settings, "UPSCALE_TILE_SIZE", 0)
+    monkeypatch.setattr(upscaler.settings, "UPSCALE_MEMORY_FRACTION", 0.5)
+    gib = 1024 ** 3
+
+    small = choose_tile_size(2000, 2000, 4, workers=4, available=2 * gib)
+    large = choose_tile_size(2000, 2000, 4, workers=1, available=8 * gib)
+    assert upscaler.MIN_TILE <= small < large <= upscaler.MAX_TILE
+    assert choose_tile_size(2000, 2000, 4, workers=1, available=0) == upscaler.MIN_TILE
+    assert choose_tile_size(100, 80, 2, workers=1, available=64 * gib) == 100
+
+    monkeypatch.setattr(upscaler.settings, "UPSCALE_TILE_SIZE", 256)
+    assert choose_tile_size(2000, 2000, 4, workers=4, available=0) == 256
+
+
+def test_peak_rss_is_measured():
+    with PeakRss() as rss:
+        block = np.ones(8 * 1024 * 1024, dtype=np.uint8)
+    assert block.sum() and rss.peak_mb > 0
@@ -0,0 +1,131 @@
+"""
+Worker chunk jobs: accepted at once, encoded in the background, streamed
+back while encoding - and the orchestrator's side of it (stand-in ffmpeg)
+Run from backend/: python -m pytest tests/test_worker_jobs.py
+"""
+
+import time
+import asyncio
+import importlib.util
+from pathlib import Path
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from services.cluster import ClusterOrchestrator, VideoChunk
+from services.cluster_transport import ClusterTransport
+
+WORKER_MAIN = Path(__file__).resolve().parent.parent / "worker" / "main.py"
+
+
+@pytest.fixture
+def worker(tmp_path, monkeypatch, fake_tools):
+    fake_tools(
+        # Writes the output in two parts with a pause, reporting progress like -progress pipe:1
+        ffmpeg=(
+            "for last; do :; done\n[ \"$last\" = \"-\" ] && exit 0\n"
+            "echo out_time_us=1000000\necho part1 > \"$last\"\nsleep 0.3\n"
+            "echo part2 >> \"$last\"\necho out_time_us=2000000\necho progress=end\n"
+        ),
+        ffprobe="echo '{\"format\":{\"duration\":\"2.0\"}}'\n",
+    )
+    monkeypatch.setenv("TEMP_DIR", str(tmp_path / "worker"))
+
+    spec = importlib.util.spec_from_file_location("magetool_worker_main", WORKER_MAIN)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    with TestClient(module.app) as client:
+        yield client
+
+
+def submit(client, task_id, **fields):
+    return client.post(
+        "/jobs",
+        data={"task_id": task_id, "operation": "compress", **fields},
+        files={"file": ("chunk.mp4", b"video", "video/mp4")},
+    )
+
+
+def test_job_is_accepted_before_encoding_and_streams_output(worker):
+    started = time.monotonic()
+    response = submit(worker, "c1", stream="true")
+
+    assert response.status_code == 202
+    assert time.monotonic() - started < 0.3
+    job = response.json()
+    assert job["status"] == "queued"
+    assert job["stream_url"] == "/jobs/c1/stream"
+
+    streamed = worker.get(job["stream_url"])
+    assert streamed.content == b"part1\npart2\n"
+
+    status = worker.get("/jobs/c1").json()
+    assert status["status"] == "complete"
+    assert status["progress_percent"] == 100
+    assert status["out_time"] == 2.0
+    assert status["output_size"] == len(streamed.content)
+
+
+def test_polled_job_and_cancel(worker):
+    job = submit(worker, "c2", output_format="mkv").json()
+    assert "stream_url" not in job  # only mp4/mov are fragmented
+
+    deadline = time.monotonic() + 5
+    while worker.get("/jobs/c2").json()["status"] != "complete" and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert worker.get("/download/c2").content == b"part1\npart2\n"
+
+    submit(worker, "c3")
+    assert worker.delete("/jobs/c3").json()["status"] == "cancelled"
+    assert worker.get("/download/c3").status_code == 400
+
+
+def test_orchestrator_follows_stream_and_falls_back_for_old_workers(tmp_path):
+    seen = []
+
+    async def handler(request: httpx.Request):
+        seen.append((request.method, request.url.host, request.url.path))
+        if request.url.host == "old":
+            if request.url.path == "/jobs":
+                return httpx.Response(404)
+            if request.url.path == "/process-chunk":
+                return httpx.Response(200, json={"status": "complete"})
+            return httpx.Response(200, content=b"legacy")
+        if request.url.path == "/jobs":
+            return httpx.Response(202, json={"status": "queued", "stream_url": "/jobs/job_chunk_0_a1/stream"})
+        if request.url.path.endswith("/stream"):
+            return httpx.Response(200, content=b"fragmented")
+        return httpx.Response(200, json={"status": "complete", "output_size": len(b"fragmented")})
+
+    chunk_path = tmp_path / "chunk.mp4"
+    chunk_path.write_bytes(b"video")
+    chunk = VideoChunk("job_chunk_0", chunk_path, 0, 10, 10)
+    orchestrator = ClusterOrchestrator(worker_urls=["http://new", "http://old"], temp_dir=tmp_path)
+    orchestrator.transport = ClusterTransport(http_transport=httpx.MockTransport(handler))
+
+    async def scenario():
+        try:
+            streamed = await orchestrator.process_chunk_remote(chunk, "http://new", 1, "compress", "medium", "mp4")
+            legacy = await orchestrator.process_chunk_remote(chunk, "http://old", 2, "compress", "medium", "mp4")
+            return streamed.read_bytes(), legacy.read_bytes()
+        finally:
+            await orchestrator.transport.aclose()
+
+    assert asyncio.run(scenario()) == (b"fragmented", b"legacy")
+    assert ("GET", "new", "/download/job_chunk_0_a1") not in seen  # no separate download pass
+    assert ("POST", "old", "/process-chunk") in seen
+
+
+def test_spec_jobs_only_accept_allowed_filters_and_options(worker):
+    ok = submit(worker, "s1", operation="spec",
+                spec='{"video_filter": "setpts=0.5*PTS,scale=-2:720", "video_codec": ["-c:v", "libx264"]}')
+    assert ok.status_code == 202
+
+    for spec in (
+        '{"video_filter": "movie=/etc/passwd"}',
+        '{"video_filter": "[0:v]scale=10:10"}',
+        '{"video_codec": ["-c:v", "libx264", "-i", "/etc/passwd"]}',
+        "not json",
+    ):
+        assert submit(worker, "s2", operation="spec", spec=spec).status_code == 400
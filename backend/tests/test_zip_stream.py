@@ -0,0 +1,59 @@
+"""
+Streaming ZIP packaging: splitting image2pipe output at image boundaries
+and storing frames as they arrive (stand-in ffmpeg)
+Run from backend/: python -m pytest tests/test_zip_stream.py
+"""
+
+import io
+import zipfile
+
+import pytest
+from PIL import Image
+
+from services.zip_stream import FrameSplitter, frames_to_zip_sync
+
+
+def encode(image_format: str, count: int) -> list:
+    images = []
+    for i in range(count):
+        buffer = io.BytesIO()
+        # Noise keeps 0xFF bytes (stuffing) in the JPEG entropy data
+        Image.effect_noise((64, 48), 40 + i).convert("RGB").save(
+            buffer, format="PNG" if image_format == "png" else "JPEG", quality=90,
+        )
+        images.append(buffer.getvalue())
+    return images
+
+
+@pytest.mark.parametrize("image_format", ["jpg", "png"])
+def test_splitter_finds_every_image_across_chunk_boundaries(image_format):
+    images = encode(image_format, 5)
+    stream = b"".join(images)
+
+    splitter = FrameSplitter(image_format)
+    found = []
+    for offset in range(0, len(stream), 777):
+        found += splitter.feed(stream[offset:offset + 777])
+
+    assert found == images
+    assert splitter.pending == 0
+
+
+def test_frames_are_stored_uncompressed(tmp_path, fake_tools):
+    images = encode("jpg", 4)
+    (tmp_path / "stream.bin").write_bytes(b"".join(images))
+    fake_tools(ffmpeg=f"cat {tmp_path}/stream.bin\n")
+
+    output = tmp_path / "frames.zip"
+    assert frames_to_zip_sync(["-i", "in.mp4"], "jpg", output) == 4
+
+    with zipfile.ZipFile(output) as zf:
+        assert zf.namelist() == [f"frame_{i:05d}.jpg" for i in range(1, 5)]
+        assert all(info.compress_type == zipfile.ZIP_STORED for info in zf.infolist())
+        assert zf.read("frame_00003.jpg") == images[2]
+
+    # A stream cut inside a frame fails and leaves no archive behind
+    (tmp_path / "stream.bin").write_bytes(b"".join(images)[:-10])
+    with pytest.raises(Exception, match="ended inside an image"):
+        frames_to_zip_sync(["-i", "in.mp4"], "jpg", output)
+    assert not output.exists()
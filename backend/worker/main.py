@@ -13,19 +13,23 @@ This file is the complete HF Space worker app.
 """
 
 import logging
-import subprocess
 import asyncio
 import aiofiles
 import time
 import os
+import signal
+import hashlib
+import json
+import re
+from collections import deque, OrderedDict
 from pathlib import Path
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Callable
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 
 # ==========================================
 # CONFIGURATION
@@ -49,60 +53,182 @@ class TaskStatus:
     PROCESSING = "processing"
     COMPLETE = "complete"
     FAILED = "failed"
+    CANCELLED = "cancelled"
 
 
 # ==========================================
 # HELPER FUNCTIONS
 # ==========================================
-def run_ffmpeg(args: list, timeout: int = 600) -> tuple[bool, str]:
-    """Run FFmpeg command and return success status and output"""
+# Largest chunk upload accepted (enforced while streaming)
+MAX_CHUNK_UPLOAD_BYTES = int(os.environ.get("MAX_CHUNK_UPLOAD_MB", "500")) * 1024 * 1024
+
+# Max concurrent FFmpeg/ffprobe processes (default: CPU cores)
+MAX_PROCESSES = int(os.environ.get("MAX_PROCESSES", "0")) or os.cpu_count() or 1
+STDERR_TAIL_LINES = 200
+_process_slots: Optional[asyncio.Semaphore] = None
+
+# Load reporting for the orchestrator (/health)
+_active_ffmpeg = 0
+ENCODE_SPEED_ALPHA = 0.3  # weight of the newest chunk in the encode speed average
+encode_speed = {"benchmark": None, "observed": None}  # x realtime
+
+
+async def _kill_group(process: asyncio.subprocess.Process):
+    """SIGTERM the process group, SIGKILL after 5 s"""
+    if process.returncode is not None:
+        return
     try:
-        result = subprocess.run(
-            ["ffmpeg", "-y"] + args,
-            capture_output=True,
-            text=True,
-            timeout=timeout,
+        os.killpg(process.pid, signal.SIGTERM)
+        try:
+            await asyncio.wait_for(process.wait(), timeout=5)
+        except asyncio.TimeoutError:
+            os.killpg(process.pid, signal.SIGKILL)
+            await process.wait()
+    except ProcessLookupError:
+        pass
+
+
+async def run_process(command: list, timeout: float,
+                      on_stdout_line: Optional[Callable[[str], None]] = None) -> tuple[Optional[int], str, str]:
+    """
+    Run a command without blocking the event loop.
+    Returns (returncode, stdout, stderr tail); returncode is None on timeout.
+    With on_stdout_line, stdout is handed over line by line instead.
+    """
+    global _process_slots, _active_ffmpeg
+    if _process_slots is None:
+        _process_slots = asyncio.Semaphore(MAX_PROCESSES)
+
+    is_ffmpeg = command[0] == "ffmpeg"
+
+    async with _process_slots:
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=True,  # own process group, killed as a whole
         )
-        return result.returncode == 0, result.stderr
-    except subprocess.TimeoutExpired:
-        return False, "Processing timeout exceeded"
+        if is_ffmpeg:
+            _active_ffmpeg += 1
+        try:
+            return await _communicate(process, timeout, on_stdout_line)
+        finally:
+            if is_ffmpeg:
+                _active_ffmpeg -= 1
+
+
+async def _communicate(process: asyncio.subprocess.Process, timeout: float,
+                       on_stdout_line: Optional[Callable[[str], None]] = None) -> tuple[Optional[int], str, str]:
+    """Collect output of a started process (timeout / cancel kill its group)"""
+    stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+
+    async def read_stdout():
+        if on_stdout_line is None:
+            return await process.stdout.read()
+        while line := await process.stdout.readline():
+            on_stdout_line(line.decode("utf-8", errors="replace"))
+        return b""
+
+    async def read_stderr():
+        while line := await process.stderr.readline():
+            stderr_tail.append(line.decode("utf-8", errors="replace"))
+
+    io = asyncio.gather(read_stdout(), read_stderr(), process.wait())
+    try:
+        stdout, _, _ = await asyncio.wait_for(asyncio.shield(io), timeout=timeout)
+    except asyncio.TimeoutError:
+        await _kill_group(process)
+        await asyncio.wait({io}, timeout=5)
+        return None, "", "".join(stderr_tail)
+    except asyncio.CancelledError:
+        await _kill_group(process)
+        raise
+
+    return process.returncode, stdout.decode("utf-8", errors="replace"), "".join(stderr_tail)
+
+
+async def run_ffmpeg(args: list, timeout: int = 600,
+                     on_progress: Optional[Callable[[str], None]] = None) -> tuple[bool, str]:
+    """Run FFmpeg command and return success status and output"""
+    command = ["ffmpeg", "-y"]
+    if on_progress is not None:
+        # key=value progress blocks on stdout (out_time_us, speed, progress=end)
+        command += ["-nostats", "-progress", "pipe:1"]
+    try:
+        returncode, _, stderr = await run_process(command + args, timeout, on_progress)
+        if returncode is None:
+            return False, "Processing timeout exceeded"
+        return returncode == 0, stderr
     except FileNotFoundError:
         return False, "FFmpeg not installed"
     except Exception as e:
         return False, str(e)
 
 
-def get_video_duration(file_path: Path) -> float:
+# ffprobe results keyed by (path, mtime_ns, size) - one probe per chunk file
+PROBE_CACHE_SIZE = int(os.getenv("PROBE_CACHE_SIZE", "128"))
+_probe_cache: "OrderedDict[tuple, dict]" = OrderedDict()
+
+
+async def probe_media(file_path: Path) -> dict:
+    """ffprobe -show_format -show_streams as JSON (cached, raises on failure)"""
+    stat = file_path.stat()
+    key = (str(file_path.resolve()), stat.st_mtime_ns, stat.st_size)
+    if key in _probe_cache:
+        _probe_cache.move_to_end(key)
+        return _probe_cache[key]
+
+    returncode, stdout, stderr = await run_process(
+        [
+            "ffprobe", "-v", "error",
+            "-print_format", "json",
+            "-show_format", "-show_streams",
+            str(file_path)
+        ],
+        timeout=30,
+    )
+    if returncode != 0:
+        raise RuntimeError(stderr.strip() or "ffprobe failed")
+
+    data = json.loads(stdout or "{}")
+    _probe_cache[key] = data
+    while len(_probe_cache) > PROBE_CACHE_SIZE:
+        _probe_cache.popitem(last=False)
+    return data
+
+
+async def get_video_duration(file_path: Path) -> float:
     """Get video duration in seconds using ffprobe"""
     try:
-        result = subprocess.run(
-            [
-                "ffprobe", "-v", "error",
-                "-show_entries", "format=duration",
-                "-of", "default=noprint_wrappers=1:nokey=1",
-                str(file_path)
-            ],
-            capture_output=True,
-            text=True,
-            timeout=30
-        )
-        return float(result.stdout.strip())
+        data = await probe_media(file_path)
+        return float(data.get("format", {}).get("duration", 0))
     except Exception as e:
         logger.error(f"Failed to get video duration: {e}")
         return 0
 
 
-async def save_upload_file(upload_file: UploadFile, destination: Path) -> int:
-    """Save uploaded file to disk using async chunked streaming."""
+async def save_upload_file(upload_file: UploadFile, destination: Path) -> dict:
+    """
+    Save uploaded file to disk using async chunked streaming.
+    Hashes while writing and stops as soon as MAX_CHUNK_UPLOAD_MB is exceeded.
+    """
+    digest = hashlib.sha256()
+    total_size = 0
     try:
-        total_size = 0
         async with aiofiles.open(destination, "wb") as f:
             while chunk := await upload_file.read(1024 * 1024):  # 1MB chunks
-                await f.write(chunk)
                 total_size += len(chunk)
-        return total_size
+                if total_size > MAX_CHUNK_UPLOAD_BYTES:
+                    raise HTTPException(status_code=413, detail="Chunk too large")
+                digest.update(chunk)
+                await f.write(chunk)
+    except BaseException:
+        destination.unlink(missing_ok=True)
+        raise
     finally:
         await upload_file.close()
+    return {"size": total_size, "sha256": digest.hexdigest()}
 
 
 def get_disk_free_mb() -> float:
@@ -115,6 +241,229 @@ def get_disk_free_mb() -> float:
         return -1
 
 
+def get_cpu_load() -> float:
+    """1-minute load average per core (0 = idle, 1 = every core busy)"""
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (OSError, AttributeError):
+        return 0.0
+
+
+def record_encode_speed(media_seconds: float, wall_seconds: float):
+    """Fold a finished chunk into the observed encode speed (x realtime)"""
+    if media_seconds <= 0 or wall_seconds <= 0:
+        return
+    sample = media_seconds / wall_seconds
+    previous = encode_speed["observed"]
+    encode_speed["observed"] = sample if previous is None else previous + ENCODE_SPEED_ALPHA * (sample - previous)
+
+
+async def benchmark_encode_speed():
+    """Score this worker before the first chunk: 2 s of synthetic 720p through libx264 -preset fast"""
+    duration = 2
+    started = time.monotonic()
+    try:
+        returncode, _, _ = await run_process(
+            [
+                "ffmpeg", "-y",
+                "-f", "lavfi", "-i", f"testsrc2=size=1280x720:rate=30:duration={duration}",
+                "-c:v", "libx264", "-preset", "fast",
+                "-f", "null", "-",
+            ],
+            timeout=120,
+        )
+    except FileNotFoundError:
+        logger.warning("FFmpeg not installed, no encode speed benchmark")
+        return
+    if returncode == 0:
+        encode_speed["benchmark"] = duration / (time.monotonic() - started)
+        logger.info(f"Encode speed benchmark: {encode_speed['benchmark']:.2f}x realtime")
+
+
+# ==========================================
+# CHUNK JOBS
+# ==========================================
+# Chunks encoded at once (the rest wait queued) and jobs accepted at most
+MAX_JOBS = int(os.environ.get("MAX_JOBS", "0")) or MAX_PROCESSES
+MAX_QUEUED_JOBS = int(os.environ.get("MAX_QUEUED_JOBS", "0")) or 4 * MAX_JOBS
+CHUNK_TIMEOUT = int(os.environ.get("CHUNK_TIMEOUT", "600"))
+
+# Streamed output: fragmented MP4 (a fragment per keyframe) is valid while still growing
+STREAMABLE_FORMATS = {"mp4", "mov"}
+FRAGMENTED_MP4_FLAGS = ["-movflags", "+frag_keyframe+empty_moov+default_base_moof"]
+STREAM_READ_SIZE = 256 * 1024
+STREAM_POLL_SECONDS = 0.2
+
+_job_slots: Optional[asyncio.Semaphore] = None
+_job_tasks: dict = {}  # task_id -> asyncio.Task of a queued/running job
+
+
+# operation=spec: a filter chain plus codec options from the orchestrator
+# (services/operation_spec.py). Only per-frame / timestamp filters and plain
+# encoder options are accepted - nothing that reads files or other inputs.
+SPEC_FILTERS = {
+    "scale", "transpose", "hflip", "vflip", "crop", "pad", "format", "setsar", "setdar",
+    "eq", "hue", "unsharp", "lutyuv", "colorchannelmixer", "fps", "setpts",
+}
+SPEC_CODEC_OPTIONS = {
+    "-c:v", "-crf", "-preset", "-tune", "-pix_fmt", "-b:v", "-maxrate", "-bufsize",
+    "-profile:v", "-g", "-r",
+}
+SPEC_VALUE = re.compile(r"^[\w.:+\-]+$")
+
+
+def spec_ffmpeg_args(spec_json: str, input_path: Path) -> list:
+    """Validate a chunk spec and turn it into FFmpeg arguments (video only)"""
+    try:
+        spec = json.loads(spec_json)
+        video_filter = spec.get("video_filter") or ""
+        codec = [str(v) for v in spec.get("video_codec") or []]
+    except (ValueError, AttributeError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid spec")
+    
+    if any(c in video_filter for c in "[];"):
+        raise HTTPException(status_code=400, detail="Spec filter must be a simple chain")
+    for item in filter(None, video_filter.split(",")):
+        name = item.strip().split("=", 1)[0]
+        if name not in SPEC_FILTERS:
+            raise HTTPException(status_code=400, detail=f"Filter not allowed: {name}")
+    if len(codec) % 2 or any(
+        option not in SPEC_CODEC_OPTIONS or not SPEC_VALUE.match(value)
+        for option, value in zip(codec[::2], codec[1::2])
+    ):
+        raise HTTPException(status_code=400, detail="Codec options not allowed")
+    
+    args = ["-i", str(input_path), "-map", "0:v:0"]
+    if video_filter:
+        args += ["-vf", video_filter]
+    return args + codec + ["-an"]
+
+
+def chunk_ffmpeg_args(operation: str, quality: str, input_path: Path, output_path: Path,
+                      stream: bool = False, spec: Optional[str] = None) -> list:
+    """FFmpeg arguments for a chunk operation"""
+    if operation == "spec":
+        if not spec:
+            raise HTTPException(status_code=400, detail="operation=spec needs a spec")
+        args = spec_ffmpeg_args(spec, input_path)
+    elif operation == "compress":
+        crf_map = {"low": "16", "medium": "20", "high": "26"}
+        crf = crf_map.get(quality, "20")
+        
+        args = [
+            "-i", str(input_path),
+            "-c:v", "libx264",
+            "-crf", crf,
+            "-preset", "fast",
+            "-c:a", "aac",
+            "-b:a", "128k",
+        ]
+    elif operation == "convert":
+        args = [
+            "-i", str(input_path),
+            "-preset", "fast",
+        ]
+    else:
+        raise HTTPException(status_code=400, detail=f"Unknown operation: {operation}")
+    
+    if stream:
+        args += FRAGMENTED_MP4_FLAGS
+    return args + [str(output_path)]
+
+
+def pending_jobs() -> int:
+    """Chunks accepted and not finished"""
+    return len([t for t in tasks.values() if t["status"] in (TaskStatus.QUEUED, TaskStatus.PROCESSING)])
+
+
+def _progress_callback(job: dict) -> Callable[[str], None]:
+    """Fold FFmpeg -progress lines into the job record"""
+    def on_line(line: str):
+        key, _, value = line.strip().partition("=")
+        if key in ("out_time_us", "out_time_ms"):  # both are microseconds
+            try:
+                seconds = int(value) / 1_000_000
+            except ValueError:
+                return
+            job["out_time"] = round(seconds, 2)
+            if job.get("duration"):
+                job["progress_percent"] = min(99, int(100 * seconds / job["duration"]))
+        elif key == "speed":
+            try:
+                job["speed"] = float(value.rstrip("x"))
+            except ValueError:
+                pass
+    return on_line
+
+
+async def run_chunk_job(task_id: str, input_path: Path, output_path: Path, ffmpeg_args: list):
+    """Encode one accepted chunk (at most MAX_JOBS at once)"""
+    global _job_slots
+    if _job_slots is None:
+        _job_slots = asyncio.Semaphore(MAX_JOBS)
+    
+    job = tasks[task_id]
+    try:
+        async with _job_slots:
+            job["status"] = TaskStatus.PROCESSING
+            job["started_at"] = datetime.utcnow().isoformat()
+            job["duration"] = await get_video_duration(input_path)
+            
+            # Timed for the encode speed score
+            started = time.monotonic()
+            success, error = await run_ffmpeg(ffmpeg_args, CHUNK_TIMEOUT, _progress_callback(job))
+        
+        if not success:
+            job["status"] = TaskStatus.FAILED
+            job["error"] = error
+            output_path.unlink(missing_ok=True)
+            return
+        
+        record_encode_speed(job["duration"], time.monotonic() - started)
+        job["status"] = TaskStatus.COMPLETE
+        job["progress_percent"] = 100
+        job["output_size"] = output_path.stat().st_size
+    except asyncio.CancelledError:
+        job["status"] = TaskStatus.CANCELLED
+        output_path.unlink(missing_ok=True)
+        raise
+    except Exception as e:
+        logger.error(f"Chunk processing failed: {e}")
+        job["status"] = TaskStatus.FAILED
+        job["error"] = str(e)
+    finally:
+        input_path.unlink(missing_ok=True)
+        _job_tasks.pop(task_id, None)
+
+
+async def submit_chunk_job(file: UploadFile, task_id: str, operation: str, quality: str,
+                           output_format: str, stream: bool = False, spec: Optional[str] = None) -> dict:
+    """Save the uploaded chunk and queue its encode; returns the job record"""
+    if task_id in _job_tasks:
+        raise HTTPException(status_code=409, detail="Task already running")
+    if pending_jobs() >= MAX_QUEUED_JOBS:
+        raise HTTPException(status_code=503, detail="Worker busy")
+    
+    stream = stream and output_format in STREAMABLE_FORMATS
+    input_ext = Path(file.filename).suffix.lstrip(".") or "mp4"
+    input_path = TEMP_DIR / f"{task_id}_input.{input_ext}"
+    output_path = TEMP_DIR / f"{task_id}_output.{output_format}"
+    ffmpeg_args = chunk_ffmpeg_args(operation, quality, input_path, output_path, stream, spec)
+    
+    upload = await save_upload_file(file, input_path)
+    tasks[task_id] = {
+        "status": TaskStatus.QUEUED,
+        "operation": operation,
+        "queued_at": datetime.utcnow().isoformat(),
+        "input_sha256": upload["sha256"],
+        "output_path": str(output_path),
+        "stream": stream,
+        "progress_percent": 0,
+    }
+    _job_tasks[task_id] = asyncio.create_task(run_chunk_job(task_id, input_path, output_path, ffmpeg_args))
+    return tasks[task_id]
+
+
 # ==========================================
 # BACKGROUND CLEANUP
 # ==========================================
@@ -153,11 +502,15 @@ async def lifespan(app: FastAPI):
     logger.info("🔧 Magetool Worker starting...")
     TEMP_DIR.mkdir(parents=True, exist_ok=True)
     cleanup_task = asyncio.create_task(cleanup_old_files())
+    benchmark_task = asyncio.create_task(benchmark_encode_speed())
     logger.info("✅ Magetool Worker ready!")
     
     yield
     
     cleanup_task.cancel()
+    benchmark_task.cancel()
+    for job_task in list(_job_tasks.values()):
+        job_task.cancel()
     logger.info("👋 Worker shutdown")
 
 
@@ -198,12 +551,21 @@ async def root():
 
 @app.get("/health")
 async def health():
-    """Detailed health check"""
+    """Detailed health check plus the load figures the orchestrator routes by"""
+    active_tasks = len([t for t in tasks.values() if t["status"] == TaskStatus.PROCESSING])
+    speed = encode_speed["observed"] or encode_speed["benchmark"]
     return {
         "status": "healthy",
-        "active_tasks": len([t for t in tasks.values() if t["status"] == TaskStatus.PROCESSING]),
+        "active_tasks": active_tasks,
         "total_tasks": len(tasks),
         "disk_free_mb": round(get_disk_free_mb(), 2),
+        "queue_depth": pending_jobs(),  # chunks accepted and not finished
+        "max_jobs": MAX_JOBS,
+        "active_ffmpeg": _active_ffmpeg,
+        "max_processes": MAX_PROCESSES,
+        "cpu_count": os.cpu_count() or 1,
+        "cpu_load": round(get_cpu_load(), 2),
+        "encode_speed": round(speed, 2) if speed else None,  # x realtime
     }
 
 
@@ -214,72 +576,28 @@ async def process_chunk(
     operation: str = Form(...),
     quality: str = Form(default="medium"),
     output_format: str = Form(default="mp4"),
+    spec: str = Form(default=None),
 ):
     """
-    Process a video chunk.
+    Process a video chunk and answer when it is done (kept for older
+    orchestrators - POST /jobs doesn't hold the connection).
     
     Operations:
     - compress: Compress with CRF
     - convert: Convert format
+    - spec: JSON {"video_filter", "video_codec"} from the orchestrator
     """
     try:
-        # Save uploaded chunk
-        input_ext = Path(file.filename).suffix.lstrip(".") or "mp4"
-        input_path = TEMP_DIR / f"{task_id}_input.{input_ext}"
-        await save_upload_file(file, input_path)
-        
-        # Track task
-        tasks[task_id] = {
-            "status": TaskStatus.PROCESSING,
-            "operation": operation,
-            "started_at": datetime.utcnow().isoformat(),
-        }
+        job = await submit_chunk_job(file, task_id, operation, quality, output_format, spec=spec)
+        await asyncio.wait({_job_tasks[task_id]})
         
-        output_path = TEMP_DIR / f"{task_id}_output.{output_format}"
-        
-        # Build FFmpeg command
-        if operation == "compress":
-            crf_map = {"low": "16", "medium": "20", "high": "26"}
-            crf = crf_map.get(quality, "20")
-            
-            ffmpeg_args = [
-                "-i", str(input_path),
-                "-c:v", "libx264",
-                "-crf", crf,
-                "-preset", "fast",
-                "-c:a", "aac",
-                "-b:a", "128k",
-                str(output_path),
-            ]
-        elif operation == "convert":
-            ffmpeg_args = [
-                "-i", str(input_path),
-                "-preset", "fast",
-                str(output_path),
-            ]
-        else:
-            raise HTTPException(status_code=400, detail=f"Unknown operation: {operation}")
-        
-        # Process
-        success, error = run_ffmpeg(ffmpeg_args)
-        
-        # Cleanup input
-        input_path.unlink(missing_ok=True)
-        
-        if not success:
-            tasks[task_id]["status"] = TaskStatus.FAILED
-            tasks[task_id]["error"] = error
-            raise HTTPException(status_code=500, detail=f"FFmpeg error: {error}")
-        
-        # Update task
-        tasks[task_id]["status"] = TaskStatus.COMPLETE
-        tasks[task_id]["output_path"] = str(output_path)
-        tasks[task_id]["output_size"] = output_path.stat().st_size
+        if job["status"] != TaskStatus.COMPLETE:
+            raise HTTPException(status_code=500, detail=f"FFmpeg error: {job.get('error', job['status'])}")
         
         return {
             "task_id": task_id,
             "status": "complete",
-            "output_size": output_path.stat().st_size,
+            "output_size": job["output_size"],
             "download_url": f"/download/{task_id}",
         }
         
@@ -293,14 +611,94 @@ async def process_chunk(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/jobs", status_code=202)
+async def create_job(
+    file: UploadFile = File(...),
+    task_id: str = Form(...),
+    operation: str = Form(...),
+    quality: str = Form(default="medium"),
+    output_format: str = Form(default="mp4"),
+    stream: bool = Form(default=False),
+    spec: str = Form(default=None),
+):
+    """
+    Accept a chunk and encode it in the background.
+    
+    Poll /jobs/{task_id} for progress, then GET /download/{task_id}; or,
+    with stream=true (mp4/mov), read /jobs/{task_id}/stream while it
+    encodes - fragmented MP4 that ends when the encode does.
+    """
+    job = await submit_chunk_job(file, task_id, operation, quality, output_format, stream, spec)
+    response = {
+        "task_id": task_id,
+        "status": job["status"],
+        "status_url": f"/jobs/{task_id}",
+        "download_url": f"/download/{task_id}",
+    }
+    if job["stream"]:
+        response["stream_url"] = f"/jobs/{task_id}/stream"
+    return response
+
+
 @app.get("/status/{task_id}")
+@app.get("/jobs/{task_id}")
 async def get_task_status(task_id: str):
-    """Get status of a chunk processing task"""
+    """Get status and progress of a chunk processing task"""
     if task_id not in tasks:
         raise HTTPException(status_code=404, detail="Task not found")
     return tasks[task_id]
 
 
+@app.delete("/jobs/{task_id}")
+async def cancel_job(task_id: str):
+    """Stop a job (e.g. the orchestrator's losing speculative copy) and drop its output"""
+    if task_id not in tasks:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    job_task = _job_tasks.get(task_id)
+    if job_task is not None:
+        job_task.cancel()
+        await asyncio.gather(job_task, return_exceptions=True)
+    
+    job = tasks[task_id]
+    if job["status"] != TaskStatus.FAILED:
+        job["status"] = TaskStatus.CANCELLED
+    Path(job["output_path"]).unlink(missing_ok=True)
+    return {"task_id": task_id, "status": job["status"]}
+
+
+@app.get("/jobs/{task_id}/stream")
+async def stream_job(task_id: str):
+    """
+    Encoded output while it is being written. The body ends when the
+    encode completes and is cut off if it fails.
+    """
+    if task_id not in tasks:
+        raise HTTPException(status_code=404, detail="Task not found")
+    job = tasks[task_id]
+    if not job.get("stream"):
+        raise HTTPException(status_code=400, detail="Task was not submitted with stream=true")
+    output_path = Path(job["output_path"])
+    
+    async def follow():
+        position = 0
+        while True:
+            finished = job["status"] not in (TaskStatus.QUEUED, TaskStatus.PROCESSING)
+            if output_path.exists():
+                async with aiofiles.open(output_path, "rb") as f:
+                    await f.seek(position)
+                    while chunk := await f.read(STREAM_READ_SIZE):
+                        position += len(chunk)
+                        yield chunk
+            if finished:
+                if job["status"] != TaskStatus.COMPLETE:
+                    raise RuntimeError(f"Task {task_id} {job['status']}")
+                return
+            await asyncio.sleep(STREAM_POLL_SECONDS)
+    
+    return StreamingResponse(follow(), media_type="video/mp4")
+
+
 @app.get("/download/{task_id}")
 async def download_chunk(task_id: str):
     """Download processed chunk"""
@@ -384,6 +384,9 @@ export interface TaskResponse {
     error_message?: string;
     download_url?: string;
     file_size?: number;
+    metrics?: {
+        encode_speed?: number; // FFmpeg speed, x realtime
+    };
 }
 
 export interface UploadResponse {
@@ -677,13 +680,80 @@ export const startProcessing = async (taskId: string): Promise<{ task_id: string
     }
 };
 
-// Poll for task completion
+// Cancel a queued or running task (server kills its FFmpeg/LibreOffice processes)
+export const cancelTask = async (taskId: string): Promise<{ task_id: string; status: string; message: string }> => {
+    const serverUrl = getServerForTask(taskId);
+    try {
+        const token = await getToken();
+        const headers: Record<string, string> = {};
+        if (token) headers['Authorization'] = `Bearer ${token}`;
+        else if (process.env.NEXT_PUBLIC_API_SECRET) headers['X-Magetool-Secret'] = process.env.NEXT_PUBLIC_API_SECRET;
+
+        const response = await axios.post(`${serverUrl}/api/cancel/${taskId}`, {}, {
+            timeout: 30000,
+            headers
+        });
+        return response.data;
+    } catch (error) {
+        if (error instanceof AxiosError) {
+            throw new Error(parseErrorResponse(error));
+        }
+        throw error;
+    }
+};
+
+// Watch task progress over Server-Sent Events (resolves null if the stream is unavailable)
+const watchTaskEvents = (
+    taskId: string,
+    onProgress?: (task: TaskResponse) => void
+): Promise<TaskResponse | null> => {
+    return new Promise((resolve, reject) => {
+        if (typeof window === 'undefined' || typeof EventSource === 'undefined') {
+            resolve(null);
+            return;
+        }
+
+        const serverUrl = getServerForTask(taskId);
+        const source = new EventSource(`${serverUrl}/api/events/${taskId}`);
+        let lastStatus: TaskResponse | null = null;
+
+        source.addEventListener('status', (event) => {
+            const status: TaskResponse = JSON.parse((event as MessageEvent).data);
+            lastStatus = status;
+
+            if (onProgress) {
+                onProgress(status);
+            }
+
+            if (status.status === 'complete') {
+                source.close();
+                resolve(status);
+            } else if (status.status === 'failed' || status.status === 'cancelled') {
+                source.close();
+                reject(new Error(status.error_message || 'Task failed'));
+            }
+        });
+
+        // Stream dropped before a terminal state (proxy, network, old server) - fall back to polling
+        source.onerror = () => {
+            source.close();
+            resolve(lastStatus && lastStatus.status === 'complete' ? lastStatus : null);
+        };
+    });
+};
+
+// Poll for task completion (pushes via SSE when available, polls /status as fallback)
 export const pollTaskStatus = async (
     taskId: string,
     onProgress?: (task: TaskResponse) => void,
     intervalMs = 2000,
     maxAttempts = 300 // 10 minutes max polling for large video processing
 ): Promise<TaskResponse> => {
+    const pushed = await watchTaskEvents(taskId, onProgress);
+    if (pushed) {
+        return pushed;
+    }
+
     return new Promise((resolve, reject) => {
         let attempts = 0;
 